@@ -13,10 +13,11 @@ import pandas as pd
 from dash.dash_table.Format import Group
 from dash.exceptions import PreventUpdate
 from components.sidebar import create_layout
-from datetime import datetime, timedelta
-import requests
+from utils.salto_export import SaltoAuthError, download_year as download_salto_year
+from datetime import datetime
 import io
-import random
+import os
+import tempfile
 import plotly.express as px
 import plotly.graph_objects as go
 import base64
@@ -726,81 +727,6 @@ def handle_tab_switch(active_tab):
         return ""
     return ""
 
-# Add this function to handle SALTO API requests
-def download_salto_entries(site_id, start_date, end_date, bearer_token):
-    """Download entries from SALTO API for a specific date range"""
-    url = f'https://connect.my-clay.com/v1.1/sites/{site_id}/entries/export'
-    
-    params = {
-        'export_file_name': 'entries.csv',
-        'from_date': start_date.strftime('%Y-%m-%dT00:00:00.000Z'),
-        'to_date': end_date.strftime('%Y-%m-%dT23:59:59.999Z')
-    }
-    
-    # First, make the OPTIONS request
-    options_headers = {
-        'accept': '*/*',
-        'accept-language': 'en-GB,en-US;q=0.9,en;q=0.8',
-        'access-control-request-headers': 'authorization,clp-disable-odata-v3-conversion,x-datadog-origin,x-datadog-parent-id,x-datadog-sampling-priority,x-datadog-trace-id',
-        'access-control-request-method': 'GET',
-        'origin': 'https://app.saltoks.com',
-        'referer': 'https://app.saltoks.com/',
-        'sec-fetch-dest': 'empty',
-        'sec-fetch-mode': 'cors',
-        'sec-fetch-site': 'cross-site',
-        'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36'
-    }
-    
-    try:
-        # Make OPTIONS request
-        options_response = requests.options(url, params=params, headers=options_headers)
-        # 204 is a successful response for OPTIONS
-        if options_response.status_code not in [200, 204]:
-            raise Exception(f"Error en la solicitud OPTIONS: {options_response.status_code}")
-        
-        # Then make the GET request
-        get_headers = {
-            'accept': 'application/json, text/plain, */*',
-            'accept-language': 'en-GB,en-US;q=0.9,en;q=0.8',
-            'authorization': f'Bearer {bearer_token}',
-            'clp-disable-odata-v3-conversion': 'true',
-            'origin': 'https://app.saltoks.com',
-            'referer': 'https://app.saltoks.com/',
-            'sec-ch-ua': '"Not A(Brand";v="8", "Chromium";v="132", "Google Chrome";v="132"',
-            'sec-ch-ua-mobile': '?0',
-            'sec-ch-ua-platform': '"macOS"',
-            'sec-fetch-dest': 'empty',
-            'sec-fetch-mode': 'cors',
-            'sec-fetch-site': 'cross-site',
-            'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36',
-            'x-datadog-origin': 'rum',
-            'x-datadog-sampling-priority': '1',
-            'x-datadog-parent-id': str(random.randint(1000000000000000000, 9999999999999999999)),
-            'x-datadog-trace-id': str(random.randint(1000000000000000000, 9999999999999999999))
-        }
-        
-        response = requests.get(url, params=params, headers=get_headers)
-        
-        if response.status_code == 401:
-            raise Exception("El token de acceso es inválido o ha expirado. Por favor, obtenga un nuevo token.")
-        
-        if response.status_code == 200:
-            try:
-                df = pd.read_csv(io.StringIO(response.text))
-                return df
-            except Exception as e:
-                print(f"Error parsing CSV: {e}")
-                print(f"Response content: {response.text[:200]}...")
-                return None
-        else:
-            error_msg = f"Error en la respuesta de SALTO (código {response.status_code})"
-            if response.text:
-                error_msg += f": {response.text}"
-            raise Exception(error_msg)
-            
-    except Exception as e:
-        raise Exception(f"Error al descargar datos: {str(e)}")
-
 # Update the callback for download functionality
 @callback(
     [Output("download-dataframe", "data"),
@@ -817,57 +743,34 @@ def download_yearly_data(n_clicks, site_id, year, bearer_token):
     if not n_clicks or not site_id or not year or not bearer_token:
         raise PreventUpdate
     
+    # Validate bearer token format
+    if not bearer_token.strip().startswith("eyJ"):
+        return (None, "Error: El token de acceso no tiene el formato correcto. Debe comenzar con 'eyJ'", 0, "Error")
+    
+    # Months are downloaded in parallel and streamed to disk, then merged into this file
+    fd, output_path = tempfile.mkstemp(prefix=f"salto_data_{year}_", suffix=".csv")
+    os.close(fd)
     try:
-        # Validate bearer token format
-        if not bearer_token.strip().startswith("eyJ"):
-            return (None, "Error: El token de acceso no tiene el formato correcto. Debe comenzar con 'eyJ'", 0, "Error")
-        
-        all_data = []
-        total_months = 12
-        
-        # Try first month to validate credentials
-        start_date = datetime(year, 1, 1)
-        end_date = datetime(year, 1, 31)
-        try:
-            test_data = download_salto_entries(site_id, start_date, end_date, bearer_token)
-            if test_data is not None:
-                all_data.append(test_data)
-        except Exception as e:
-            return (None, str(e), 0, "Error")
-        
-        # If we get here, token is valid, continue with remaining months
-        for month in range(2, 13):
-            try:
-                start_date = datetime(year, month, 1)
-                if month == 12:
-                    end_date = datetime(year, month, 31)
-                else:
-                    end_date = datetime(year, month + 1, 1) - timedelta(days=1)
-                
-                monthly_data = download_salto_entries(site_id, start_date, end_date, bearer_token)
-                if monthly_data is not None and not monthly_data.empty:
-                    all_data.append(monthly_data)
-            except Exception as e:
-                print(f"Error en mes {month}: {str(e)}")
-                continue
-        
-        if all_data:
-            final_df = pd.concat(all_data, ignore_index=True)
-            return (
-                dcc.send_data_frame(
-                    final_df.to_csv,
-                    f"salto_data_{year}.csv",
-                    index=False
-                ),
-                f"Descarga completada para el año {year}. Total registros: {len(final_df)}",
-                100,
-                "100%"
-            )
-        else:
+        result = download_salto_year(site_id, year, bearer_token.strip(), output_path)
+        
+        if not result["rows"]:
             return (None, "No se encontraron datos para el período seleccionado", 0, "Error")
-            
+        
+        status = f"Descarga completada para el año {year}. Total registros: {result['rows']}"
+        if result["errors"]:
+            status += f" (meses con errores: {', '.join(str(month) for month in sorted(result['errors']))})"
+        return (
+            dcc.send_file(output_path, filename=f"salto_data_{year}.csv"),
+            status,
+            100,
+            "100%"
+        )
+    except SaltoAuthError as e:
+        return (None, str(e), 0, "Error")
     except Exception as e:
         return (None, f"Error: {str(e)}", 0, "Error")
+    finally:
+        os.remove(output_path)
 
 # Add callback for progress updates
 @callback(
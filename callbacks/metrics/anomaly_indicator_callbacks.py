@@ -1,7 +1,6 @@
 from dash import Output, Input, html
-import pandas as pd
-import json
 from utils.logging import get_logger
+from utils.metrics.dataset_store import get_metrics_dataframe, has_metrics_data
 
 logger = get_logger(__name__)
 
@@ -17,12 +16,12 @@ def register_anomaly_indicator_callbacks(app):
         """
         Actualiza el indicador de filtros y muestra información sobre anomalías corregidas.
         """
-        if not data:
+        if not has_metrics_data(data):
             return ""
         
         try:
             # Convertir los datos JSON a DataFrame
-            df = pd.DataFrame(json.loads(data))
+            df = get_metrics_dataframe(data)
             
             # Crear el indicador básico con información sobre los datos filtrados
             indicator_elements = [
@@ -26,6 +26,7 @@ from components.metrics.charts import (
     create_monthly_averages_chart
 )
 from utils.data_loader import load_all_csv_data
+from utils.metrics.dataset_store import put_metrics_dataset, get_metrics_dataframe, has_metrics_data
 from constants.metrics import CONSUMPTION_TAGS_MAPPING
 from plotly.subplots import make_subplots
 
@@ -85,15 +86,14 @@ def register_chart_callbacks(app):
                 if auto_triggered:
                     print("[INFO] load_data - Auto-triggered refresh due to empty data - cache was automatically cleared")
         
-        # Check if consumption tags have changed since last call
+        # Check if consumption tags have changed since last call. The readings cache
+        # is kept per file, so a different tag selection is assembled from the
+        # files already cached instead of clearing it.
         prev_consumption_tags = prev_tags_data.get("consumption_tags") if prev_tags_data else None
         tags_changed = prev_consumption_tags is not None and sorted(prev_consumption_tags) != sorted(consumption_tags or [])
         
         if tags_changed:
-            print(f"[INFO] load_data - Consumption tags changed from {prev_consumption_tags} to {consumption_tags}, clearing cache")
-            # Clear the cache if tags changed
-            from utils.data_loader import clear_data_cache
-            clear_data_cache()
+            print(f"[INFO] load_data - Consumption tags changed from {prev_consumption_tags} to {consumption_tags}")
             force_refresh = True
         
         if not ((trigger_id == "metrics-analyze-button" and n_clicks) or 
@@ -121,7 +121,12 @@ def register_chart_callbacks(app):
             
             # Measure loading time
             start_time = time.time()
-            df = load_all_csv_data(consumption_tags=consumption_tags, project_id=project_id, jwt_token=token)
+            df = load_all_csv_data(
+                consumption_tags=consumption_tags,
+                project_id=project_id,
+                jwt_token=token,
+                columns=['date', 'consumption', 'asset_id', 'consumption_type', 'project_id']
+            )
             load_time = time.time() - start_time
             
             if df is None or df.empty:
@@ -151,12 +156,9 @@ def register_chart_callbacks(app):
             else:
                 print(f"[INFO] load_data - Loaded {len(df)} real records in {load_time:.2f} seconds")
             
-            # Simplify DataFrame processing for serialization
+            # Publish the dataset server-side; the store only keeps a handle
             try:
-                # Use a more efficient approach to create serializable data
-                simplified_data = []
-                
-                # Only process the necessary columns to reduce overhead
+                # Only keep the necessary columns to reduce overhead
                 essential_columns = ['date', 'consumption', 'asset_id', 'consumption_type', 'client_id', 'project_id']
                 df = df.reindex(columns=[col for col in essential_columns if col in df.columns])
                 
@@ -164,7 +166,7 @@ def register_chart_callbacks(app):
                 for col in essential_columns:
                     if col not in df.columns:
                         if col == 'date':
-                            df[col] = pd.Timestamp.now().strftime('%Y-%m-%d')
+                            df[col] = pd.Timestamp.now().normalize()
                         elif col == 'consumption':
                             df[col] = 100.0
                         elif col == 'asset_id':
@@ -176,53 +178,25 @@ def register_chart_callbacks(app):
                         elif col == 'project_id':
                             df[col] = project_id if project_id else "project_1"
                 
-                # Ensure date column is datetime
+                # Ensure date column is datetime (day precision, as before)
                 if not pd.api.types.is_datetime64_any_dtype(df['date']):
                     df['date'] = pd.to_datetime(df['date'], errors='coerce')
-                    df = df.dropna(subset=['date'])
+                df = df.dropna(subset=['date'])
+                df['date'] = df['date'].dt.normalize()
                 
                 # Ensure consumption is float
                 if not pd.api.types.is_float_dtype(df['consumption']):
                     df['consumption'] = pd.to_numeric(df['consumption'], errors='coerce')
                     df = df.dropna(subset=['consumption'])
                 
-                # Create serializable list with batch processing to improve performance
-                batch_size = 5000
-                total_rows = len(df)
-                
-                for start_idx in range(0, total_rows, batch_size):
-                    end_idx = min(start_idx + batch_size, total_rows)
-                    batch = df.iloc[start_idx:end_idx]
-                    
-                    for _, row in batch.iterrows():
-                        simplified_row = {}
-                        for col in batch.columns:
-                            # Handle different data types efficiently
-                            if pd.api.types.is_datetime64_any_dtype(pd.Series([row[col]])):
-                                simplified_row[col] = None if pd.isna(row[col]) else row[col].strftime('%Y-%m-%d')
-                            elif pd.isna(row[col]):
-                                simplified_row[col] = None
-                            else:
-                                # Convert directly to basic types
-                                val = row[col]
-                                if not isinstance(val, (str, int, float, bool, type(None))):
-                                    try:
-                                        simplified_row[col] = str(val)
-                                    except:
-                                        simplified_row[col] = None
-                                else:
-                                    simplified_row[col] = val
-                        
-                        simplified_data.append(simplified_row)
-                
-                # Measure serialization time
+                # Measure publishing time
                 serialize_start = time.time()
-                json_data = json.dumps(simplified_data)
+                handle = put_metrics_dataset(df.reset_index(drop=True))
                 serialize_time = time.time() - serialize_start
                 
-                print(f"[INFO] load_data - Serialized {len(simplified_data)} records in {serialize_time:.2f} seconds")
+                print(f"[INFO] load_data - Published dataset {handle['dataset_id']} with {handle['rows']} records in {serialize_time:.2f} seconds")
                 print("== METRICS DATA LOADING COMPLETED ==")
-                return json_data
+                return handle
                 
             except Exception as e:
                 print(f"[ERROR] load_data - Error serializing data: {str(e)}")
@@ -242,7 +216,7 @@ def register_chart_callbacks(app):
     )
     def toggle_visualization_container(json_data):
         """Toggle visibility of visualization container based on data availability."""
-        if not json_data or json_data == "[]":
+        if not has_metrics_data(json_data):
             return {"display": "none"}
         return {"display": "block"}
     
@@ -259,7 +233,7 @@ def register_chart_callbacks(app):
             return {"display": "none"}, {"display": "block"}
         
         # Si se ha hecho clic pero no hay datos, mostrar el mensaje de carga
-        if not json_data or json_data == "[]":
+        if not has_metrics_data(json_data):
             return {"display": "flex", "flex-direction": "column", "align-items": "center", "justify-content": "center"}, {"display": "none"}
         
         # Si hay datos, ocultar ambos mensajes
@@ -277,12 +251,12 @@ def register_chart_callbacks(app):
     )
     def update_time_series_chart(json_data, client_id, project_id, asset_id, consumption_tags, start_date, end_date):
         """Update time series chart based on selected filters."""
-        if not json_data or json_data == "[]":
+        if not has_metrics_data(json_data):
             return create_time_series_chart(pd.DataFrame())
         
         try:
             # Convertir JSON a DataFrame
-            df = pd.DataFrame(json.loads(json_data))
+            df = get_metrics_dataframe(json_data)
             
             # Procesar datos según filtros
             filtered_df = process_metrics_data(
@@ -316,12 +290,12 @@ def register_chart_callbacks(app):
     )
     def update_distribution_chart(json_data, client_id, project_id, asset_id, consumption_tags, start_date, end_date):
         """Update distribution chart based on selected filters."""
-        if not json_data or json_data == "[]":
+        if not has_metrics_data(json_data):
             return create_consumption_distribution_chart(pd.DataFrame(), 'asset_id')
         
         try:
             # Convertir JSON a DataFrame
-            df = pd.DataFrame(json.loads(json_data))
+            df = get_metrics_dataframe(json_data)
             
             # Procesar datos según filtros
             filtered_df = process_metrics_data(
@@ -359,12 +333,12 @@ def register_chart_callbacks(app):
     )
     def update_trend_chart(json_data, client_id, project_id, asset_id, consumption_tags, start_date, end_date, time_period):
         """Update trend chart based on selected filters and time period."""
-        if not json_data or json_data == "[]":
+        if not has_metrics_data(json_data):
             return create_consumption_trend_chart(pd.DataFrame())
         
         try:
             # Convertir JSON a DataFrame
-            df = pd.DataFrame(json.loads(json_data))
+            df = get_metrics_dataframe(json_data)
             
             # Procesar datos según filtros
             filtered_df = process_metrics_data(
@@ -397,12 +371,12 @@ def register_chart_callbacks(app):
     )
     def update_assets_comparison_chart(json_data, client_id, project_id, consumption_tags, start_date, end_date):
         """Update assets comparison chart based on selected filters."""
-        if not json_data or json_data == "[]":
+        if not has_metrics_data(json_data):
             return create_bar_chart(pd.DataFrame(), 'asset_id')
         
         try:
             # Convertir JSON a DataFrame
-            df = pd.DataFrame(json.loads(json_data))
+            df = get_metrics_dataframe(json_data)
             
             # Procesar datos según filtros
             filtered_df = process_metrics_data(
@@ -447,7 +421,7 @@ def register_chart_callbacks(app):
 
         active_tag = summary_type_store_data.get("active_tag") if summary_type_store_data else None
 
-        if not json_data or json_data == "[]" or not active_tag:
+        if not has_metrics_data(json_data) or not active_tag:
             return default_figure
 
         # Map tag to human readable name for filtering
@@ -463,7 +437,7 @@ def register_chart_callbacks(app):
         elif "FLOW" in active_tag: unit = "personas"
 
         try:
-            df = pd.DataFrame(json.loads(json_data))
+            df = get_metrics_dataframe(json_data)
             
             # Filter main df by the selected type for this section
             df_filtered_type = df[df['consumption_type'] == human_readable_name].copy()
@@ -558,7 +532,7 @@ def register_chart_callbacks(app):
 
         active_tag = summary_type_store_data.get("active_tag") if summary_type_store_data else None
 
-        if not json_data or json_data == "[]" or not active_tag:
+        if not has_metrics_data(json_data) or not active_tag:
             return default_figure
 
         # Map tag to human readable name for filtering
@@ -574,7 +548,7 @@ def register_chart_callbacks(app):
         elif "FLOW" in active_tag: unit = "personas"
 
         try:
-            df = pd.DataFrame(json.loads(json_data))
+            df = get_metrics_dataframe(json_data)
             
             # Filter main df by the selected type for this section
             df_filtered_type = df[df['consumption_type'] == human_readable_name].copy()
@@ -678,7 +652,7 @@ def register_chart_callbacks(app):
         
         try:
             # Convertir JSON a DataFrame
-            if not json_data or json_data == "[]":
+            if not has_metrics_data(json_data):
                 # Si no hay datos, mostrar un mensaje de error
                 error_msg = html.Div([
                     html.I(className="fas fa-exclamation-circle me-2"),
@@ -686,7 +660,7 @@ def register_chart_callbacks(app):
                 ], className="alert alert-warning")
                 return dash.no_update, error_msg, "mb-3 show"
                 
-            df = pd.DataFrame(json.loads(json_data))
+            df = get_metrics_dataframe(json_data)
             
             # Procesar datos según filtros
             filtered_df = process_metrics_data(
@@ -833,7 +807,7 @@ def register_chart_callbacks(app):
             return False, "", "", False, "", ""
         
         # Verificar si hay datos para exportar
-        if not json_data or json_data == "[]":
+        if not has_metrics_data(json_data):
             return False, "", "", True, "No hay datos disponibles para exportar. Por favor, asegúrese de que hay datos cargados.", "Error de Exportación"
         
         # Mostrar notificación según el formato seleccionado
@@ -1,12 +1,11 @@
 from dash import Output, Input, State, callback_context
 import dash
-import json
-import pandas as pd
 import time
 import dash_bootstrap_components as dbc
 from constants.metrics import CONSUMPTION_TAGS_MAPPING
 
 from utils.api import get_clientes, get_projects, get_assets, get_project_assets, extract_list_from_response
+from utils.metrics.dataset_store import has_metrics_data
 
 def register_filter_callbacks(app):
     """Register callbacks for filters."""
@@ -298,9 +297,8 @@ def register_filter_callbacks(app):
         if current_refresh_data and current_refresh_data.get("auto_triggered"):
             return dash.no_update
             
-        data = json.loads(json_data) if json_data else None
-        # Verifica si los datos están vacíos o si hay una estructura de error común
-        if not data or (isinstance(data, dict) and data.get("error")):
+        # Verifica si los datos están vacíos (el store guarda un handle del dataset)
+        if not has_metrics_data(json_data):
             print("[INFO METRICS] auto_refresh_on_empty_data - Datos vacíos o con error, iniciando refresco automático.")
             return {"timestamp": time.time(), "auto_triggered": True} 
         
@@ -1,12 +1,91 @@
 from dash import Output, Input, State, callback_context, html
 import dash
-import json
 import pandas as pd
 from datetime import datetime, timedelta
 import locale
 import dash_bootstrap_components as dbc
 
 from utils.metrics.data_processing import process_metrics_data
+from utils.metrics.dataset_store import put_metrics_dataset, get_metrics_dataframe, has_metrics_data
+
+def create_update_readings_error_card(error):
+    """Card shown when the readings update could not be started or crashed."""
+    return dbc.Card([
+        dbc.CardHeader(html.H5([html.I(className="fas fa-exclamation-triangle me-2 text-danger"), "Error inesperado"])),
+        dbc.CardBody([
+            html.P(f"Error: {str(error)}", className="lead text-danger"),
+            html.P("Por favor, contacte al administrador del sistema.")
+        ])
+    ], className="mb-4 shadow-sm border-danger")
+
+def create_update_readings_result_card(result):
+    """Card with the result of a finished readings update."""
+    if result.get("success", False):
+        # Formatear los meses procesados para su mejor visualización
+        months_processed = result.get('months_processed', [])
+        months_display = ", ".join(months_processed) if months_processed else "Ninguno"
+        
+        return dbc.Card([
+            dbc.CardHeader(html.H5([html.I(className="fas fa-check-circle me-2 text-success"), "Lecturas actualizadas con éxito"])),
+            dbc.CardBody([
+                html.P(result.get("message", "Lecturas actualizadas con éxito"), className="lead"),
+                dbc.Row([
+                    dbc.Col([
+                        html.Strong("Total de tareas:"),
+                        html.Span(f" {result.get('total_tasks', 0)}", className="ms-2")
+                    ], width=6),
+                    dbc.Col([
+                        html.Strong("Tareas exitosas:"),
+                        html.Span(f" {result.get('success_count', 0)}", className="ms-2 text-success")
+                    ], width=6)
+                ], className="mb-2"),
+                dbc.Row([
+                    dbc.Col([
+                        html.Strong("Tareas con errores:"),
+                        html.Span(f" {result.get('error_count', 0)}", className="ms-2 text-danger")
+                    ], width=6),
+                    dbc.Col([
+                        html.Strong("Meses procesados:"),
+                        html.Span(f" {months_display}", className="ms-2")
+                    ], width=6)
+                ], className="mb-3"),
+                dbc.Button([
+                    html.I(className="fas fa-sync-alt me-2"),
+                    "Actualizar visualización"
+                ], id="refresh-data-btn", color="primary", className="mt-2")
+            ])
+        ], className="mb-4 shadow-sm border-success")
+    else:
+        return dbc.Card([
+            dbc.CardHeader(html.H5([html.I(className="fas fa-exclamation-circle me-2 text-danger"), "Error al actualizar lecturas"])),
+            dbc.CardBody([
+                html.P(result.get("message", "Error desconocido al actualizar lecturas"), className="lead text-danger"),
+                html.P("Por favor, verifique los parámetros e intente nuevamente.")
+            ])
+        ], className="mb-4 shadow-sm border-danger")
+
+def create_update_readings_job_component(job):
+    """Progress of a readings update job while it runs, and its result card once finished."""
+    from components.regeneration_progress import create_regeneration_progress_component
+    
+    status = job.get("status")
+    if status in ("queued", "in_progress"):
+        return create_regeneration_progress_component(
+            job,
+            container_id="metrics-update-readings-progress",
+            interval_id=None,
+            cancel_button_id="metrics-update-readings-cancel",
+            title="Progreso de la actualización de lecturas"
+        )
+    if status == "cancelled":
+        return dbc.Alert(
+            f"Actualización de lecturas cancelada tras procesar {job.get('processed', 0)} de {job.get('total', 0)} tareas. "
+            "Las lecturas ya descargadas se han guardado.",
+            color="warning"
+        )
+    if status == "completed" and job.get("result"):
+        return create_update_readings_result_card(job["result"])
+    return create_update_readings_result_card({"success": False, "message": job.get("message")})
 
 def register_metrics_callbacks(app):
     """Register callbacks for metrics."""
@@ -47,7 +126,7 @@ def register_metrics_callbacks(app):
 
         active_tag = kpi_type_store_data.get("active_tag") if kpi_type_store_data else None
         
-        if not json_data or json_data == "[]" or not active_tag:
+        if not has_metrics_data(json_data) or not active_tag:
             return default_return
         
         # --- NUEVO: Mapear el tag interno al nombre legible ---
@@ -60,7 +139,7 @@ def register_metrics_callbacks(app):
         
         try:
             # Convertir JSON a DataFrame
-            df = pd.DataFrame(json.loads(json_data))
+            df = get_metrics_dataframe(json_data)
             
             # 1. Filter using the HUMAN-READABLE NAME
             df_filtered_by_tag = df[df['consumption_type'] == human_readable_name].copy()
@@ -240,7 +319,7 @@ def register_metrics_callbacks(app):
     )
     def update_filter_indicator(json_data, client_id, project_id, asset_id, consumption_tags, date_period, start_date, end_date, token_data):
         """Update filter indicator based on selected filters."""
-        if not json_data or json_data == "[]":
+        if not has_metrics_data(json_data):
             return ""
         
         try:
@@ -316,7 +395,9 @@ def register_metrics_callbacks(app):
             return "" 
     
     @app.callback(
-        Output("metrics-update-readings-result", "children"),
+        [Output("metrics-update-readings-result", "children"),
+         Output("metrics-update-readings-job", "data"),
+         Output("metrics-update-readings-interval", "disabled")],
         [Input("metrics-update-readings-button", "n_clicks")],
         [State("metrics-project-filter", "value"),
          State("metrics-consumption-tags-filter", "value"),
@@ -327,92 +408,72 @@ def register_metrics_callbacks(app):
         prevent_initial_call=True
     )
     def update_readings(n_clicks, project_id, consumption_tags, date_period, start_date, end_date, token_data):
-        """Update readings when the update button is clicked."""
+        """Queue a background job that updates the readings when the update button is clicked."""
         if not n_clicks:
-            return ""
+            return "", dash.no_update, dash.no_update
         
         if not project_id or project_id == "all":
             return html.Div([
                 html.P("Debe seleccionar un proyecto específico para actualizar las lecturas.", className="text-danger")
-            ])
+            ]), dash.no_update, dash.no_update
         
         if not consumption_tags or len(consumption_tags) == 0:
             return html.Div([
                 html.P("Debe seleccionar al menos un tipo de consumo para actualizar las lecturas.", className="text-danger")
-            ])
+            ]), dash.no_update, dash.no_update
         
         # Obtener el token JWT si está disponible
         token = None
         if token_data and "token" in token_data:
             token = token_data["token"]
         
-        # Llamar a la función para actualizar las lecturas solo para el período seleccionado
-        from utils.api import get_daily_readings_for_period_multiple_tags_project_parallel
+        # Encolar la actualización de lecturas del período seleccionado; el progreso se consulta con el intervalo
+        from utils.async_fetch import submit_readings_update
+        from utils.jobs import get_job_manager
         
         try:
             print(f"[INFO] Actualizando lecturas para proyecto {project_id}, tags {consumption_tags}, período: {start_date} a {end_date}")
-            result = get_daily_readings_for_period_multiple_tags_project_parallel(
-                project_id, 
-                consumption_tags, 
-                start_date, 
-                end_date, 
-                token=token
-            )
-            
-            if result.get("success", False):
-                # Formatear los meses procesados para su mejor visualización
-                months_processed = result.get('months_processed', [])
-                months_display = ", ".join(months_processed) if months_processed else "Ninguno"
-                
-                return dbc.Card([
-                    dbc.CardHeader(html.H5([html.I(className="fas fa-check-circle me-2 text-success"), "Lecturas actualizadas con éxito"])),
-                    dbc.CardBody([
-                        html.P(result.get("message", "Lecturas actualizadas con éxito"), className="lead"),
-                        dbc.Row([
-                            dbc.Col([
-                                html.Strong("Total de tareas:"),
-                                html.Span(f" {result.get('total_tasks', 0)}", className="ms-2")
-                            ], width=6),
-                            dbc.Col([
-                                html.Strong("Tareas exitosas:"),
-                                html.Span(f" {result.get('success_count', 0)}", className="ms-2 text-success")
-                            ], width=6)
-                        ], className="mb-2"),
-                        dbc.Row([
-                            dbc.Col([
-                                html.Strong("Tareas con errores:"),
-                                html.Span(f" {result.get('error_count', 0)}", className="ms-2 text-danger")
-                            ], width=6),
-                            dbc.Col([
-                                html.Strong("Meses procesados:"),
-                                html.Span(f" {months_display}", className="ms-2")
-                            ], width=6)
-                        ], className="mb-3"),
-                        dbc.Button([
-                            html.I(className="fas fa-sync-alt me-2"),
-                            "Actualizar visualización"
-                        ], id="refresh-data-btn", color="primary", className="mt-2")
-                    ])
-                ], className="mb-4 shadow-sm border-success")
-            else:
-                return dbc.Card([
-                    dbc.CardHeader(html.H5([html.I(className="fas fa-exclamation-circle me-2 text-danger"), "Error al actualizar lecturas"])),
-                    dbc.CardBody([
-                        html.P(result.get("message", "Error desconocido al actualizar lecturas"), className="lead text-danger"),
-                        html.P("Por favor, verifique los parámetros e intente nuevamente.")
-                    ])
-                ], className="mb-4 shadow-sm border-danger")
+            job_id = submit_readings_update(project_id, consumption_tags, start_date, end_date, token=token)
+            return create_update_readings_job_component(get_job_manager().get(job_id)), job_id, False
         except Exception as e:
             print(f"[ERROR] Error al actualizar lecturas: {str(e)}")
             import traceback
             print(traceback.format_exc())
-            return dbc.Card([
-                dbc.CardHeader(html.H5([html.I(className="fas fa-exclamation-triangle me-2 text-danger"), "Error inesperado"])),
-                dbc.CardBody([
-                    html.P(f"Error: {str(e)}", className="lead text-danger"),
-                    html.P("Por favor, contacte al administrador del sistema.")
-                ])
-            ], className="mb-4 shadow-sm border-danger")
+            return create_update_readings_error_card(e), None, True
+    
+    @app.callback(
+        [Output("metrics-update-readings-result", "children", allow_duplicate=True),
+         Output("metrics-update-readings-interval", "disabled", allow_duplicate=True)],
+        [Input("metrics-update-readings-interval", "n_intervals")],
+        [State("metrics-update-readings-job", "data")],
+        prevent_initial_call=True
+    )
+    def poll_update_readings_job(n_intervals, job_id):
+        """Show the progress of the readings update job, and its result once finished."""
+        if not job_id:
+            return dash.no_update, True
+        
+        from utils.jobs import get_job_manager, ACTIVE_STATES
+        
+        job = get_job_manager().get(job_id, include_details=False)
+        if job is None:
+            return html.Div("No se encontró el proceso de actualización de lecturas.", className="alert alert-warning"), True
+        return create_update_readings_job_component(job), job["status"] not in ACTIVE_STATES
+    
+    @app.callback(
+        Output("metrics-update-readings-cancel", "disabled"),
+        [Input("metrics-update-readings-cancel", "n_clicks")],
+        [State("metrics-update-readings-job", "data")],
+        prevent_initial_call=True
+    )
+    def cancel_update_readings_job(n_clicks, job_id):
+        """Cancel the readings update job."""
+        if not n_clicks or not job_id:
+            return dash.no_update
+        
+        from utils.jobs import get_job_manager
+        get_job_manager().cancel(job_id)
+        return True
     
     @app.callback(
         Output("metrics-data-store", "data", allow_duplicate=True),
@@ -460,70 +521,18 @@ def register_metrics_callbacks(app):
             if 'client_id' not in df.columns:
                 df['client_id'] = client_id
             
-            # Simplificar el DataFrame para evitar problemas de serialización
+            # Las columnas Period no se conservan en el store: convertirlas a fecha
+            for col in df.columns:
+                if isinstance(df[col].dtype, pd.PeriodDtype):
+                    df[col] = df[col].dt.to_timestamp()
+            
+            # Publicar el dataset en el servidor; el store solo guarda el handle
             try:
-                # Convertir a JSON
-                try:
-                    # Crear una lista de diccionarios simplificada
-                    simplified_data = []
-                    for _, row in df.iterrows():
-                        simplified_row = {}
-                        for col in df.columns:
-                            # Manejar diferentes tipos de datos
-                            if pd.api.types.is_datetime64_any_dtype(pd.Series([row[col]])):
-                                # Verificar si el valor es NaT antes de aplicar strftime
-                                if pd.isna(row[col]) or pd.isnull(row[col]):
-                                    simplified_row[col] = None
-                                else:
-                                    simplified_row[col] = row[col].strftime('%Y-%m-%d')
-                            elif hasattr(row[col], 'to_timestamp'):  # Para objetos Period
-                                try:
-                                    simplified_row[col] = row[col].to_timestamp().strftime('%Y-%m-%d')
-                                except:
-                                    # Si hay error al convertir el período, usar None
-                                    simplified_row[col] = None
-                            elif pd.isna(row[col]):
-                                simplified_row[col] = None
-                            else:
-                                simplified_row[col] = row[col]
-                        simplified_data.append(simplified_row)
-                    
-                    # Convertir a JSON
-                    try:
-                        json_data = json.dumps(simplified_data)
-                        
-                        print(f"[INFO] Se cargaron {len(df)} registros desde archivos CSV")
-                        return json_data
-                    except TypeError as e:
-                        # Capturar error de tipos no serializables
-                        print(f"[ERROR] Error de tipo al serializar a JSON: {str(e)}")
-                        
-                        # Intentar una segunda pasada con conversión más estricta
-                        try:
-                            # Convertir todos los valores problemáticos a str o None
-                            for i, item in enumerate(simplified_data):
-                                for key, value in list(item.items()):
-                                    if not (isinstance(value, (str, int, float, bool, type(None)))):
-                                        try:
-                                            simplified_data[i][key] = str(value)
-                                        except:
-                                            simplified_data[i][key] = None
-                            
-                            json_data = json.dumps(simplified_data)
-                            print(f"[INFO] Datos serializados a JSON en segunda pasada, {len(simplified_data)} registros")
-                            return json_data
-                        except Exception as e2:
-                            print(f"[ERROR] Error en segunda pasada al serializar a JSON: {str(e2)}")
-                            import traceback
-                            print(traceback.format_exc())
-                            return dash.no_update
-                except Exception as e:
-                    print(f"[ERROR] Error al crear lista simplificada: {str(e)}")
-                    import traceback
-                    print(traceback.format_exc())
-                    return dash.no_update
+                handle = put_metrics_dataset(df)
+                print(f"[INFO] Se cargaron {len(df)} registros desde archivos CSV")
+                return handle
             except Exception as e:
-                print(f"[ERROR] Error al serializar a JSON: {str(e)}")
+                print(f"[ERROR] Error al publicar el dataset: {str(e)}")
                 import traceback
                 print(traceback.format_exc())
                 return dash.no_update
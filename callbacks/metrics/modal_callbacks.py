@@ -1,8 +1,8 @@
 import json
-import pandas as pd
 from dash.dependencies import Input, Output, State
 from dash import callback_context
 from components.metrics.detail_modal import create_calculation_detail_content
+from utils.metrics.dataset_store import get_metrics_dataframe, has_metrics_data
 
 def register_modal_callbacks(app):
     """Register callbacks for the calculation detail modal."""
@@ -105,12 +105,12 @@ def register_modal_callbacks(app):
         Returns:
             str: Metadatos de cálculo en formato JSON
         """
-        if not json_data:
+        if not has_metrics_data(json_data):
             return "{}"
         
         try:
             # Convertir JSON a DataFrame
-            df = pd.DataFrame(json.loads(json_data))
+            df = get_metrics_dataframe(json_data)
             
             # Procesar datos según filtros
             from utils.metrics.data_processing import process_metrics_data, generate_calculation_metadata
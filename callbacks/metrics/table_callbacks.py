@@ -1,6 +1,5 @@
 import dash
 from dash import Output, Input, State, callback_context
-import json
 import pandas as pd
 import dash_bootstrap_components as dbc
 import numpy as np
@@ -8,6 +7,7 @@ from datetime import datetime
 import io
 
 from utils.metrics.data_processing import generate_monthly_readings_by_consumption_type, generate_monthly_consumption_summary, process_metrics_data
+from utils.metrics.dataset_store import get_metrics_dataframe, has_metrics_data
 from components.metrics.tables import create_monthly_readings_by_consumption_type, create_monthly_readings_table, create_monthly_summary_table
 
 def register_table_callbacks(app):
@@ -25,13 +25,12 @@ def register_table_callbacks(app):
     )
     def update_monthly_readings_by_consumption_type(json_data, client_id, project_id, asset_id, consumption_tags, start_date, end_date):
         """Update monthly readings table by consumption type."""
-        if not json_data or not consumption_tags:
+        if not has_metrics_data(json_data) or not consumption_tags:
             return create_monthly_readings_by_consumption_type({})
         
         try:
             # Parse JSON data
-            data = json.loads(json_data)
-            df = pd.DataFrame(data)
+            df = get_metrics_dataframe(json_data)
             
             print(f"update_monthly_readings_by_consumption_type: Loaded DataFrame with {len(df)} rows")
             
@@ -82,7 +81,7 @@ def register_table_callbacks(app):
         from utils.logging import get_logger
         logger = get_logger(__name__)
         
-        if not json_data:
+        if not has_metrics_data(json_data):
             logger.warning("No JSON data available for monthly readings table")
             return "", None
         
@@ -90,8 +89,7 @@ def register_table_callbacks(app):
             logger.info("Starting update of monthly readings table")
             
             # Parse JSON data
-            data = json.loads(json_data)
-            df = pd.DataFrame(data)
+            df = get_metrics_dataframe(json_data)
             
             logger.debug(f"Parsed DataFrame with shape: {df.shape if not df.empty else 'Empty DataFrame'}")
             
@@ -484,7 +482,7 @@ def register_table_callbacks(app):
 
         active_tag = summary_type_store_data.get("active_tag") if summary_type_store_data else None
 
-        if not json_data or json_data == "[]" or not active_tag:
+        if not has_metrics_data(json_data) or not active_tag:
             return default_table
 
         # Map tag to human readable name for filtering
@@ -494,7 +492,7 @@ def register_table_callbacks(app):
              return default_table
 
         try:
-            df = pd.DataFrame(json.loads(json_data))
+            df = get_metrics_dataframe(json_data)
             
             # --- Filter data for the selected type --- 
             df_filtered_type = df[df['consumption_type'] == human_readable_name].copy()
@@ -581,7 +579,7 @@ def register_table_callbacks(app):
         
         try:
             # Convertir JSON a DataFrame
-            if not json_data or json_data == "[]":
+            if not has_metrics_data(json_data):
                 # Si no hay datos, mostrar un mensaje de error
                 error_msg = html.Div([
                     html.I(className="fas fa-exclamation-circle me-2"),
@@ -589,7 +587,7 @@ def register_table_callbacks(app):
                 ], className="alert alert-warning")
                 return dash.no_update, error_msg, "mb-3 show"
                 
-            df = pd.DataFrame(json.loads(json_data))
+            df = get_metrics_dataframe(json_data)
             
             # Procesar datos según filtros
             filtered_df = process_metrics_data(
@@ -875,7 +873,7 @@ def register_table_callbacks(app):
             return False, "", "", False, "", ""
         
         # Verificar si hay datos para exportar
-        if not json_data or json_data == "[]":
+        if not has_metrics_data(json_data):
             return False, "", "", True, "No hay datos disponibles para exportar. Por favor, asegúrese de que hay datos cargados.", "Error de Exportación"
         
         # Mostrar notificación según el formato seleccionado
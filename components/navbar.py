@@ -105,6 +105,17 @@ def register_callbacks(app):
         if not token_data or 'token' not in token_data:
             return "Tipo: Usuario"
         
+        # Reanudar los trabajos de este usuario que un reinicio dejó esperando credenciales
+        try:
+            from utils.auth import token_identity
+            from utils.jobs import get_job_manager
+            get_job_manager().resume_awaiting_auth(
+                token_identity(token_data['token']),
+                {'token': token_data['token'], 'token_data': token_data}
+            )
+        except Exception as e:
+            logger.error(f"Error al reanudar los trabajos pendientes: {str(e)}")
+        
         # Obtener datos del usuario desde el token JWT
         try:
             user_data = auth_service.get_user_data_from_token(token_data['token'])
@@ -6,7 +6,7 @@ import dash_bootstrap_components as dbc
 from dash import html, dcc
 import plotly.graph_objects as go
 
-def create_progress_bar(progress_value, success_count=0, failed_count=0, total_count=0):
+def create_progress_bar(progress_value, success_count=0, failed_count=0, total_count=0, title="Progreso de la regeneración"):
     """
     Crea una barra de progreso con información sobre éxitos y fallos.
     
@@ -15,6 +15,7 @@ def create_progress_bar(progress_value, success_count=0, failed_count=0, total_c
         success_count: Número de regeneraciones exitosas
         failed_count: Número de regeneraciones fallidas
         total_count: Número total de regeneraciones
+        title: Título de la tarjeta
         
     Returns:
         dbc.Card: Componente de barra de progreso
@@ -32,7 +33,7 @@ def create_progress_bar(progress_value, success_count=0, failed_count=0, total_c
     
     return dbc.Card(
         dbc.CardBody([
-            html.H5("Progreso de la regeneración", className="card-title"),
+            html.H5(title, className="card-title"),
             html.Div([
                 dbc.Progress(
                     value=progress_value,
@@ -110,27 +111,35 @@ def create_progress_chart(success_count, failed_count):
     # Devolver solo la figura, no el componente dcc.Graph
     return fig
 
-def create_regeneration_progress_component(progress_data=None):
+def create_regeneration_progress_component(progress_data=None, container_id="regeneration-progress-container",
+                                           interval_id="regeneration-progress-interval", cancel_button_id=None,
+                                           title="Progreso de la regeneración"):
     """
     Crea un componente completo para mostrar el progreso de la regeneración.
     
     Args:
-        progress_data: Datos del progreso de la regeneración
+        progress_data: Datos del progreso de la regeneración (o el estado de un
+            trabajo de utils.jobs, que tiene las mismas claves)
             {
                 'total': número total de regeneraciones,
                 'processed': número de regeneraciones procesadas,
                 'success': número de regeneraciones exitosas,
                 'failed': número de regeneraciones fallidas,
-                'status': estado de la regeneración ('in_progress', 'completed', etc.)
+                'status': estado de la regeneración ('queued', 'in_progress', 'awaiting_auth', 'completed', 'cancelled', etc.)
             }
+        container_id: ID del contenedor del componente
+        interval_id: ID del dcc.Interval que refresca el progreso (None si lo gestiona el layout)
+        cancel_button_id: ID del botón de cancelar; si se indica, se muestra mientras el trabajo está activo
+        title: Título de la barra de progreso
         
     Returns:
         html.Div: Componente de progreso
     """
-    if progress_data is None or progress_data.get('total', 0) == 0:
+    active = progress_data is not None and progress_data.get('status') in ('queued', 'in_progress', 'awaiting_auth')
+    if progress_data is None or (progress_data.get('total', 0) == 0 and not active):
         return html.Div(
             dbc.Alert("No hay datos de progreso disponibles", color="info"),
-            id="regeneration-progress-container"
+            id=container_id
         )
     
     total = progress_data.get('total', 0)
@@ -148,7 +157,8 @@ def create_regeneration_progress_component(progress_data=None):
             progress_value=progress_percent,
             success_count=success,
             failed_count=failed,
-            total_count=total
+            total_count=total,
+            title=title
         ),
         
         # Mostrar el gráfico solo si hay datos procesados
@@ -164,24 +174,38 @@ def create_regeneration_progress_component(progress_data=None):
         html.Div([
             html.I(
                 className={
+                    'queued': "fas fa-clock me-2",
                     'in_progress': "fas fa-spinner fa-spin me-2",
+                    'awaiting_auth': "fas fa-user-lock me-2 text-warning",
                     'completed': "fas fa-check-circle me-2 text-success",
-                    'failed': "fas fa-exclamation-circle me-2 text-danger"
+                    'failed': "fas fa-exclamation-circle me-2 text-danger",
+                    'cancelled': "fas fa-ban me-2 text-warning"
                 }.get(status, "fas fa-info-circle me-2")
             ),
             {
-                'in_progress': "Regeneración en progreso...",
-                'completed': "Regeneración completada",
-                'failed': "Regeneración fallida"
+                'queued': "En cola, esperando a que termine otro proceso...",
+                'in_progress': "Cancelando..." if progress_data.get('cancel_requested') else "En progreso...",
+                'awaiting_auth': "Interrumpido por un reinicio: se reanudará al volver a iniciar sesión",
+                'completed': "Completado",
+                'failed': "Fallido",
+                'cancelled': "Cancelado"
             }.get(status, f"Estado: {status}")
         ], className="text-center mt-3 fs-5"),
         
+        # Botón para cancelar el trabajo mientras está activo
+        html.Div(
+            dbc.Button([html.I(className="fas fa-stop-circle me-2"), "Cancelar"],
+                       id=cancel_button_id, color="outline-danger", size="sm",
+                       disabled=bool(progress_data.get('cancel_requested'))),
+            className="text-center mt-2"
+        ) if cancel_button_id and active else None,
+        
         # Intervalo para actualizar el progreso si está en curso
         dcc.Interval(
-            id='regeneration-progress-interval',
+            id=interval_id,
             interval=2000,  # 2 segundos
-            disabled=status != 'in_progress'
-        )
-    ], id="regeneration-progress-container")
+            disabled=not active
+        ) if interval_id else None
+    ], id=container_id)
     
     return progress_component 
\ No newline at end of file
@@ -1078,13 +1078,18 @@ def register_callbacks(app):
                 ], width=3)
             ]
             
+            # Emisiones de cada punto, calculadas una sola vez para todas las gráficas
+            emissions_series = calculate_carbon_emissions(np.asarray(energy_consumption, dtype=float))
+            hour_slots = np.arange(len(emissions_series)) % 24
+            anomaly_indices = np.flatnonzero(anomalies)
+            
             # Evolución de emisiones (gráfica temporal)
             emission_evolution = html.Div([
                 dcc.Graph(
                     figure={
                         'data': [
                             {'x': [i for i in range(len(energy_consumption))], 
-                             'y': [calculate_carbon_emissions(value) for value in energy_consumption], 
+                             'y': emissions_series.tolist(), 
                              'type': 'scatter', 
                              'mode': 'lines',
                              'name': 'Emisiones CO2',
@@ -1138,10 +1143,10 @@ def register_callbacks(app):
                         'data': [
                             {'x': ['00-06h', '06-12h', '12-18h', '18-24h'], 
                              'y': [
-                                 np.mean([calculate_carbon_emissions(value) for i, value in enumerate(energy_consumption) if i % 24 < 6]),
-                                 np.mean([calculate_carbon_emissions(value) for i, value in enumerate(energy_consumption) if 6 <= i % 24 < 12]),
-                                 np.mean([calculate_carbon_emissions(value) for i, value in enumerate(energy_consumption) if 12 <= i % 24 < 18]),
-                                 np.mean([calculate_carbon_emissions(value) for i, value in enumerate(energy_consumption) if i % 24 >= 18])
+                                 np.mean(emissions_series[hour_slots < 6]),
+                                 np.mean(emissions_series[(hour_slots >= 6) & (hour_slots < 12)]),
+                                 np.mean(emissions_series[(hour_slots >= 12) & (hour_slots < 18)]),
+                                 np.mean(emissions_series[hour_slots >= 18])
                              ], 
                              'type': 'bar',
                              'marker': {'color': ['#28a745', '#17a2b8', '#ffc107', '#dc3545']}
@@ -1166,14 +1171,14 @@ def register_callbacks(app):
                         figure={
                             'data': [
                                 {'x': [i for i in range(len(energy_consumption))], 
-                                 'y': [calculate_carbon_emissions(value) for value in energy_consumption], 
+                                 'y': emissions_series.tolist(), 
                                  'type': 'scatter', 
                                  'mode': 'lines',
                                  'name': 'Emisiones CO2',
                                  'line': {'color': '#17a2b8'}
                                 },
-                                {'x': [i for i in range(len(anomalies)) if anomalies[i]], 
-                                 'y': [calculate_carbon_emissions(energy_consumption[i]) for i in range(len(anomalies)) if anomalies[i]], 
+                                {'x': anomaly_indices.tolist(), 
+                                 'y': emissions_series[anomaly_indices].tolist(), 
                                  'type': 'scatter', 
                                  'mode': 'markers',
                                  'name': 'Anomalías',
@@ -5000,7 +5000,7 @@ def register_callbacks(app):
         if trigger_id == "proceed-regeneration" and n_clicks:
             try:
                 # Verificar si ya hay una regeneración en progreso
-                from utils.regeneration import regenerate_readings_in_bulk, get_regeneration_status, is_regeneration_in_progress
+                from utils.regeneration import submit_bulk_regeneration, get_regeneration_status, is_regeneration_in_progress
                 from components.regeneration_progress import create_regeneration_progress_component
                 
                 if is_regeneration_in_progress():
@@ -5020,41 +5020,17 @@ def register_callbacks(app):
                     debug_log("[DEBUG] execute_bulk_regeneration - No hay elementos para regenerar")
                     return html.Div("No hay elementos para regenerar con los filtros seleccionados.", className="alert alert-warning"), dash.no_update, dash.no_update
                 
-                # Iniciar la regeneración en un hilo separado
-                import threading
-                
-                def regeneration_thread():
-                    try:
-                        debug_log("[DEBUG] execute_bulk_regeneration - Iniciando hilo de regeneración")
-                        regenerate_readings_in_bulk(
-                            error_list=filtered_errors.get('items', []),
-                            project_id=project_id,
-                            token_data=token_data,
-                            only_errors=only_errors if only_errors is not None else True,
-                            continue_on_error=continue_on_error if continue_on_error is not None else True
-                        )
-                        debug_log("[DEBUG] execute_bulk_regeneration - Regeneración completada")
-                    except Exception as e:
-                        debug_log(f"[ERROR] Error en hilo de regeneración: {str(e)}")
-                        import traceback
-                        debug_log(traceback.format_exc())
-                
-                # Iniciar el hilo
-                thread = threading.Thread(target=regeneration_thread)
-                thread.daemon = True
-                thread.start()
-                debug_log("[DEBUG] execute_bulk_regeneration - Hilo de regeneración iniciado")
-                
-                # Inicializar datos de progreso
-                progress_data = {
-                    'total': len(filtered_errors.get('items', [])),
-                    'processed': 0,
-                    'success': 0,
-                    'failed': 0,
-                    'status': 'in_progress'
-                }
+                # Encolar la regeneración como trabajo en segundo plano
+                job_id = submit_bulk_regeneration(
+                    error_list=filtered_errors.get('items', []),
+                    project_id=project_id,
+                    token_data=token_data,
+                    only_errors=only_errors if only_errors is not None else True,
+                    continue_on_error=continue_on_error if continue_on_error is not None else True
+                )
+                debug_log(f"[DEBUG] execute_bulk_regeneration - Trabajo de regeneración encolado: {job_id}")
                 
-                progress_component = create_regeneration_progress_component(progress_data)
+                progress_component = create_regeneration_progress_component(get_regeneration_status(job_id))
                 
                 return progress_component, dash.no_update, dash.no_update
             
@@ -5083,7 +5059,7 @@ def register_callbacks(app):
                 progress_component = create_regeneration_progress_component(status)
                 
                 # Si la regeneración ha terminado, mostrar los resultados
-                if status.get('status') == 'completed':
+                if status.get('status') in ('completed', 'cancelled'):
                     debug_log("[DEBUG] execute_bulk_regeneration - Regeneración completada, mostrando resultados")
                     from layouts.bulk_regeneration import create_results_summary
                     results_component = create_results_summary(status)
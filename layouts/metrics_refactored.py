@@ -228,6 +228,9 @@ def create_layout():
             
             # Resultado de actualización de lecturas
             html.Div(id="metrics-update-readings-result", className="mt-3"),
+            # Trabajo de actualización en curso y sondeo de su progreso
+            dcc.Store(id="metrics-update-readings-job"),
+            dcc.Interval(id="metrics-update-readings-interval", interval=2000, disabled=True),
             
             # Notificación de procesamiento
             dbc.Alert(
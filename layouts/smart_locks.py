@@ -8,7 +8,11 @@ from components.smart_locks.lock_table import create_locks_table
 from components.smart_locks.nfc_grid import create_nfc_display_grid, create_lock_type_grid
 from utils.logging import get_logger
 from utils.error_handlers import handle_exceptions
-from utils.api import get_devices, get_nfc_passwords, update_nfc_code_value, get_project_assets, get_asset_devices
+from utils.api import get_nfc_passwords, update_nfc_code_value
+from utils.lock_inventory import get_lock_inventory_service
+from utils.nfc_cache import get_nfc_password_cache
+from utils.nfc_assignment import MASTER_CARD_SLOT, execute_plan, lock_result, plan_assignment, plan_summary, plan_unassignment
+from utils.nfc_card_index import get_nfc_card_index
 from utils.nfc_helper import fetch_for_asset as fetch_nfc_passwords_for_asset, get_available_slots, check_card_exists, validate_card_uuid, get_master_card_slot
 import time
 import concurrent.futures
@@ -315,6 +319,9 @@ layout = html.Div([
                         html.Span("Cada tarjeta será asignada a un slot disponible en todas las cerraduras seleccionadas.")
                     ], className="alert alert-info mt-3"),
                     
+                    # Plan previsto antes de asignar
+                    html.Div(id="master-card-plan-preview"),
+                    
                     # Resultados después de enviar
                     html.Div(id="master-card-results-container", className="mt-4", style={"display": "none"}),
                     
@@ -324,6 +331,7 @@ layout = html.Div([
             ]),
             dbc.ModalFooter([
                 dbc.Button("Cancelar", id="master-card-cancel", color="secondary", className="me-auto", n_clicks=0),
+                dbc.Button("Previsualizar", id="master-card-preview-button", color="secondary", outline=True, className="me-2", n_clicks=0),
                 dbc.Button("Asignar Tarjetas", id="master-card-confirm", color="primary", n_clicks=0)
             ])
         ], id="master-card-modal", size="lg", is_open=False),
@@ -389,6 +397,9 @@ layout = html.Div([
                         ])
                     ], className="alert alert-warning mt-3"),
                 
+                # Plan previsto antes de desasignar
+                html.Div(id="unassign-card-plan-preview"),
+                
                 # Resultados después de enviar
                 html.Div(id="unassign-card-results-container", className="mt-4", style={"display": "none"}),
                 
@@ -398,12 +409,149 @@ layout = html.Div([
             ]),
             dbc.ModalFooter([
                 dbc.Button("Cancelar", id="unassign-card-cancel", color="secondary", className="me-auto", n_clicks=0),
+                dbc.Button("Previsualizar", id="unassign-card-preview-button", color="secondary", outline=True, className="me-2", n_clicks=0),
                 dbc.Button("Confirmar Desasignación", id="unassign-card-confirm", color="danger", n_clicks=0)
             ])
         ], id="unassign-card-modal", size="lg", is_open=False),
     ])
 ])
 
+
+def _parse_assign_uuids(text):
+    """Parsea los UUIDs a asignar, normalizados a AA:BB:CC:DD y sin duplicados"""
+    if not text:
+        return []
+    
+    # Normalizar separadores
+    normalized_text = text.replace(',', '\n').replace(';', '\n')
+    
+    # Dividir por líneas y espacios
+    lines = normalized_text.split('\n')
+    all_tokens = []
+    for line in lines:
+        tokens = line.strip().split()
+        all_tokens.extend(tokens)
+    
+    # Filtrar y validar tokens
+    potential_uuids = [token.strip() for token in all_tokens if token.strip()]
+    valid_uuids = []
+    
+    # Patrones para validación
+    pattern_colon = r'^([0-9A-F]{2}:){3}[0-9A-F]{2}$'
+    pattern_dash = r'^([0-9A-F]{2}-){3}[0-9A-F]{2}$'
+    pattern_plain = r'^[0-9A-F]{8}$'
+    pattern_long = r'^[0-9A-F]{12,16}$'
+    
+    for token in potential_uuids:
+        token_upper = token.upper()
+        
+        if (re.match(pattern_colon, token_upper, re.IGNORECASE) or 
+            re.match(pattern_dash, token_upper, re.IGNORECASE) or 
+            re.match(pattern_plain, token_upper, re.IGNORECASE) or
+            re.match(pattern_long, token_upper, re.IGNORECASE)):
+            
+            # Normalizar formato
+            if ':' not in token_upper and '-' not in token_upper:
+                if len(token_upper) >= 8:
+                    formatted = ':'.join([token_upper[i:i+2] for i in range(0, min(8, len(token_upper)), 2)])
+                    valid_uuids.append(formatted)
+                else:
+                    valid_uuids.append(token_upper)
+            else:
+                valid_uuids.append(token_upper)
+    
+    # Eliminar duplicados manteniendo orden
+    seen = set()
+    unique_uuids = []
+    for uuid in valid_uuids:
+        if uuid not in seen:
+            seen.add(uuid)
+            unique_uuids.append(uuid)
+    
+    return unique_uuids
+
+
+def _parse_unassign_uuids(text):
+    """Parsea y valida UUIDs múltiples desde el texto de entrada"""
+    if not text:
+        return []
+    
+    # Reemplazar múltiples separadores con comas
+    text = re.sub(r'[;|\n\r]+', ',', text.strip())
+    text = re.sub(r'\s+', ' ', text)  # Normalizar espacios
+    
+    # Dividir por comas y espacios
+    potential_uuids = [uuid.strip() for uuid in text.replace(' ', ',').split(',') if uuid.strip()]
+    
+    # Validar y normalizar cada UUID
+    valid_uuids = []
+    uuid_pattern = re.compile(r'^[0-9A-Fa-f:]{8,}$|^[0-9A-Fa-f-]{8,}$|^[0-9A-Fa-f]{8,}$')
+    
+    for uuid in potential_uuids:
+        if uuid_pattern.match(uuid):
+            # Normalizar formato
+            clean_uuid = uuid.replace(':', '').replace('-', '').upper()
+            if len(clean_uuid) >= 8:
+                valid_uuids.append(uuid)  # Mantener formato original
+    
+    return valid_uuids
+
+
+def _plan_preview(plans):
+    """Tabla con el plan de asignación/desasignación de cada cerradura, antes de ejecutarlo"""
+    summary = plan_summary(plans)
+    header_stats = [
+        html.Span("Escrituras: ", className="fw-bold me-1"),
+        html.Span(f"{summary.get('pending', 0)} en {summary['gateways']} gateways", className="me-3"),
+        html.Span("Ya asignadas: ", className="fw-bold me-1"),
+        html.Span(f"{summary.get('already_assigned', 0)}", className="text-info me-3"),
+        html.Span("No encontradas: ", className="fw-bold me-1"),
+        html.Span(f"{summary.get('not_found', 0)}", className="text-info me-3"),
+        html.Span("Cerraduras con errores: ", className="fw-bold me-1"),
+        html.Span(f"{summary['locks_with_errors']}", className="text-danger")
+    ]
+    if summary["master_cards"]:
+        header_stats.extend([
+            html.Span(" | ", className="mx-2"),
+            html.Span(f"{summary['master_cards']} tarjetas ocuparán el slot de tarjeta maestra ({MASTER_CARD_SLOT})",
+                      className="text-warning")
+        ])
+
+    rows = []
+    for lock_plan in plans:
+        if lock_plan["error"]:
+            operations = html.Span(lock_plan["error"], className="text-danger")
+        elif not lock_plan["operations"]:
+            operations = html.Span("Sin cambios", className="text-muted")
+        else:
+            operations = [
+                html.Div([
+                    html.Small(operation["uuid"], className="me-2 font-monospace"),
+                    html.Small(
+                        operation["message"] + (" (tarjeta maestra)" if operation["master"] and operation["status"] == "pending" else ""),
+                        className="badge " + {
+                            "pending": "bg-primary",
+                            "already_assigned": "bg-info",
+                            "not_found": "bg-secondary"
+                        }.get(operation["status"], "bg-secondary")
+                    )
+                ], className="mb-1") for operation in lock_plan["operations"]
+            ]
+        rows.append(html.Tr([html.Td(lock_plan["name"]), html.Td(operations)]))
+
+    return html.Div([
+        html.H6("Plan previsto (no se ha escrito nada todavía)", className="mb-2"),
+        html.Div(header_stats, className="mb-2"),
+        html.Div(
+            html.Table([
+                html.Thead(html.Tr([html.Th("Cerradura"), html.Th("Operaciones")])),
+                html.Tbody(rows)
+            ], className="table table-sm"),
+            style={"maxHeight": "300px", "overflowY": "auto"}
+        )
+    ], className="alert alert-light border mt-3")
+
+
 # Registrar callbacks para la página de Smart Locks
 def register_callbacks(app):
     """
@@ -609,257 +757,15 @@ def register_callbacks(app):
             logger.error("No hay token JWT disponible para cargar cerraduras")
             return None, ""
         
-        # PASO 1: Obtener los dispositivos a nivel de proyecto (Source A)
-        project_devices = get_devices(
-            project_id=project_id, 
-            jwt_token=token, 
-            device_types=["lock", "qr_lock"]  # Filtrar por tipos de cerradura en el servidor
-        )
-        
-        # Filtrar dispositivos de proyecto por sensor para asegurar compatibilidad
-        project_lock_devices = []
-        for device in project_devices:
-            has_lock_sensor = False
-            has_community_door = False
-            
-            # Verificar ambos criterios de identificación
-            for sensor in device.get("sensors", []):
-                if sensor.get("sensor_type") == "LOCK":
-                    has_lock_sensor = True
-                if sensor.get("usage") == "CommunityDoor":
-                    has_community_door = True
-                    
-            # Incluir el dispositivo si cumple al menos uno de los criterios
-            if has_lock_sensor or has_community_door:
-                # Añadir información de scope
-                device["scope"] = {"type": "Project"}
-                project_lock_devices.append(device)
-        
-        logger.info(f"Cargados {len(project_lock_devices)} dispositivos de cerradura a nivel de proyecto para {project_id}")
-        
-        # PASO 2a: Obtener la lista de assets/espacios del proyecto
-        assets = get_project_assets(project_id, token)
-        
-        # PASO 2b: Obtener dispositivos para cada asset
-        asset_lock_devices = []
-        for asset in assets:
-            asset_id = asset.get("id") or asset.get("asset_id")
-            asset_name = asset.get("name") or asset.get("nombre")
-            asset_alias_value = asset.get("alias", "") 
-            asset_staircase_value = asset.get("staircase", "") 
-            asset_apartment_value = asset.get("apartment", "") 
-            
-            if not asset_id:
-                logger.warning(f"No se pudo determinar el ID del asset: {asset}")
-                continue
-                
-            # Obtener dispositivos del asset
-            asset_devices = get_asset_devices(
-                asset_id=asset_id,
-                jwt_token=token,
-                device_types="lock"  # Cambiado: solo usar "lock" para assets
-            )
-            
-            # Añadir logging para diagnosticar el problema
-            for i, device in enumerate(asset_devices):
-                logger.debug(f"Dispositivo {i+1} de asset {asset_id}: {device}")
-            
-            # Procesar los dispositivos
-            for device_container in asset_devices:
-                # Verificar si el dispositivo tiene una estructura anidada con "devices"
-                if isinstance(device_container, dict) and "devices" in device_container and isinstance(device_container["devices"], list):
-                    # Procesar cada dispositivo dentro del array "devices"
-                    logger.debug(f"Encontrado contenedor con {len(device_container['devices'])} dispositivos anidados")
-                    
-                    # Extraer el gateway_id del contenedor (es el uuid a nivel del contenedor)
-                    container_gateway_id = device_container.get("uuid")
-                    if container_gateway_id:
-                        logger.info(f"Extrayendo gateway_id={container_gateway_id} del contenedor para asignarlo a sus dispositivos")
-                    
-                    # Extraer asset_id del contenedor si existe
-                    container_asset_id = device_container.get("asset_id")
-                    if container_asset_id and container_asset_id != asset_id:
-                        logger.info(f"El contenedor tiene su propio asset_id={container_asset_id} diferente del asset actual={asset_id}")
-                    
-                    for nested_device in device_container["devices"]:
-                        has_lock_sensor = False
-                        device_id = nested_device.get("device_id", "desconocido")
-                        
-                        nested_device["alias"] = asset_alias_value
-                        nested_device["staircase"] = asset_staircase_value
-                        nested_device["apartment"] = asset_apartment_value
-
-                        # Asegurarse de que el dispositivo tenga el asset_id
-                        if "asset_id" not in nested_device:
-                            # Prioridad: 1) asset_id del contenedor si existe, 2) asset_id del asset actual
-                            if container_asset_id:
-                                nested_device["asset_id"] = container_asset_id
-                                logger.debug(f"Asignado asset_id={container_asset_id} del contenedor al dispositivo {device_id}")
-                            elif asset_id:
-                                nested_device["asset_id"] = asset_id
-                                logger.debug(f"Asignado asset_id={asset_id} del asset actual al dispositivo {device_id}")
-                        
-                        # Asignar el gateway_id del contenedor al dispositivo
-                        if container_gateway_id and "gateway_id" not in nested_device:
-                            nested_device["gateway_id"] = container_gateway_id
-                            logger.debug(f"Asignado gateway_id={container_gateway_id} al dispositivo anidado {device_id}")
-                        
-                        # Verificar sensores de cerradura en el dispositivo anidado
-                        for sensor in nested_device.get("sensors", []):
-                            logger.debug(f"Analizando sensor en dispositivo anidado {device_id}: tipo={sensor.get('sensor_type')}, usage={sensor.get('usage')}")
-                            
-                            if (sensor.get("sensor_type", "").upper() == "LOCK" or
-                                sensor.get("type", "").upper() == "LOCK" or
-                                sensor.get("usage") == "CommunityDoor" or
-                                "lock" in str(sensor.get("sensor_type", "")).lower()):
-                                has_lock_sensor = True
-                                logger.debug(f"Dispositivo anidado {device_id} identificado como cerradura por su sensor")
-                                break
-                        
-                        # Comprobar tipo de dispositivo
-                        device_type = str(nested_device.get("device_type", "")).lower()
-                        if not has_lock_sensor and ("lock" in device_type or "cerradura" in device_type):
-                            has_lock_sensor = True
-                            logger.debug(f"Dispositivo anidado {device_id} identificado como cerradura por su tipo: {device_type}")
-                        
-                        # Comprobar lock_type si existe
-                        lock_type = nested_device.get("lock_type", "")
-                        if not has_lock_sensor and lock_type:
-                            has_lock_sensor = True
-                            logger.debug(f"Dispositivo anidado {device_id} identificado como cerradura por su lock_type: {lock_type}")
-                        
-                        # Incluir dispositivo si se identificó como cerradura
-                        if has_lock_sensor:
-                            # Añadir información de scope
-                            nested_device["scope"] = {
-                                "type": "Asset",
-                                "id": asset_id,
-                                "name": asset_name
-                            }
-                            # nested_device["alias"] = asset_alias_value # Already added above
-                            asset_lock_devices.append(nested_device)
-                            logger.debug(f"Dispositivo anidado {device_id} añadido a la lista de cerraduras")
-                else:
-                    # Procesar dispositivo normal (no anidado)
-                    has_lock_sensor = False
-                    device_id = device_container.get("device_id", "desconocido")
-                    
-                    device_container["alias"] = asset_alias_value
-                    device_container["staircase"] = asset_staircase_value
-                    device_container["apartment"] = asset_apartment_value
-
-                    # ADD THIS CHECK AND ASSIGNMENT:
-                    if "asset_id" not in device_container and asset_id: # asset_id is from the outer loop
-                        device_container["asset_id"] = asset_id
-                        logger.debug(f"Assigned asset_id={asset_id} from outer loop to direct device {device_id}")
-
-                    # Extraer el gateway_id del dispositivo si existe un campo uuid
-                    if "uuid" in device_container and "gateway_id" not in device_container:
-                        device_container["gateway_id"] = device_container.get("uuid")
-                        logger.debug(f"Asignado gateway_id={device_container['gateway_id']} desde uuid al dispositivo {device_id}")
-                    
-                    # Verificar sensores
-                    for sensor in device_container.get("sensors", []):
-                        logger.debug(f"Analizando sensor en dispositivo {device_id}: tipo={sensor.get('sensor_type')}, usage={sensor.get('usage')}")
-                        
-                        if (sensor.get("sensor_type", "").upper() == "LOCK" or
-                            sensor.get("type", "").upper() == "LOCK" or
-                            sensor.get("usage") == "CommunityDoor" or
-                            "lock" in str(sensor.get("sensor_type", "")).lower()):
-                            has_lock_sensor = True
-                            logger.debug(f"Dispositivo {device_id} identificado como cerradura por su sensor")
-                            break
-                    
-                    # Comprobar tipo de dispositivo
-                    device_type = str(device_container.get("device_type", "")).lower()
-                    if not has_lock_sensor and ("lock" in device_type or "cerradura" in device_type):
-                        has_lock_sensor = True
-                        logger.debug(f"Dispositivo {device_id} identificado como cerradura por su tipo: {device_type}")
-                    
-                    # Incluir dispositivo si se identificó como cerradura
-                    if has_lock_sensor:
-                        # Añadir información de scope
-                        device_container["scope"] = {
-                            "type": "Asset",
-                            "id": asset_id,
-                            "name": asset_name
-                        }
-                        # device_container["alias"] = asset_alias_value # Already added above
-                        asset_lock_devices.append(device_container)
-                        logger.debug(f"Dispositivo {device_id} añadido a la lista de cerraduras")
-                    else:
-                        logger.debug(f"Dispositivo {device_id} NO reconocido como cerradura")
-        
-        logger.info(f"Cargados {len(asset_lock_devices)} dispositivos de cerradura a nivel de asset para {len(assets)} assets del proyecto {project_id}")
-        
-        # PASO 3: Consolidar los resultados
-        consolidated_devices = []
-        
-        # Función para generar clave única para cada dispositivo
-        def get_device_key(device):
-            return device.get("device_id", "")
-        
-        # Primero añadir todos los dispositivos de nivel de asset
-        device_keys = set()
-        for device in asset_lock_devices:
-            device_key = get_device_key(device)
-            device_keys.add(device_key)
-            consolidated_devices.append(device)
-        
-        # Luego añadir dispositivos de nivel de proyecto que no estén en los de asset
-        for device in project_lock_devices:
-            device_key = get_device_key(device)
-            if device_key not in device_keys:
-                consolidated_devices.append(device)
+        # El botón de actualizar refresca el inventario (solo los assets que han cambiado);
+        # el resto de disparadores reutilizan el inventario en caché
+        ctx = dash.callback_context
+        triggered = ctx.triggered[0]["prop_id"].split(".")[0] if ctx.triggered else None
+        refresh = triggered == "smart-locks-refresh-button"
         
+        consolidated_devices = get_lock_inventory_service().get_inventory(project_id, token, refresh=refresh)
         logger.info(f"Total consolidado: {len(consolidated_devices)} dispositivos de cerradura para el proyecto {project_id}")
         
-        # PASO 4: Verificar y asegurar que cada dispositivo tenga gateway_id
-        logger.info("Verificando que todos los dispositivos tengan gateway_id...")
-        devices_without_gateway = []
-        
-        for i, device in enumerate(consolidated_devices):
-            device_id = device.get("device_id")
-            gateway_id = device.get("gateway_id")
-            
-            if not gateway_id:
-                logger.warning(f"Dispositivo {device_id} no tiene gateway_id. Intentando obtenerlo de la API...")
-                devices_without_gateway.append((i, device_id))
-        
-        # Si hay dispositivos sin gateway_id, intentar obtenerlos
-        if devices_without_gateway:
-            logger.warning(f"Se encontraron {len(devices_without_gateway)} dispositivos sin gateway_id")
-            
-            # Intentar obtener gateway_id de los passwords NFC (más completo)
-            for i, device_id in devices_without_gateway:
-                device = consolidated_devices[i]
-                asset_id = device.get("asset_id")
-                
-                if asset_id:
-                    try:
-                        from utils.api import get_nfc_passwords
-                        
-                        # Obtener los passwords NFC para este asset
-                        nfc_data = get_nfc_passwords(asset_id, token)
-                        
-                        if nfc_data and isinstance(nfc_data, dict) and 'data' in nfc_data:
-                            data_section = nfc_data['data']
-                            
-                            # Buscar el dispositivo en los datos NFC
-                            if isinstance(data_section, dict) and 'devices' in data_section:
-                                for nfc_device in data_section['devices']:
-                                    if nfc_device.get('device_id') == device_id and 'gateway_id' in nfc_device:
-                                        consolidated_devices[i]['gateway_id'] = nfc_device['gateway_id']
-                                        logger.info(f"Se obtuvo gateway_id={nfc_device['gateway_id']} para device_id={device_id} desde los datos NFC")
-                                        break
-                    except Exception as e:
-                        logger.error(f"Error al intentar obtener gateway_id para device_id={device_id}: {str(e)}")
-        
-        # Contar cuántos dispositivos quedaron sin gateway_id
-        devices_still_without_gateway = [device.get("device_id") for device in consolidated_devices if not device.get("gateway_id")]
-        if devices_still_without_gateway:
-            logger.warning(f"Después de intentar obtener los gateway_id, estos dispositivos aún no tienen uno: {devices_still_without_gateway}")
-        
         return consolidated_devices, ""
     
     # Callback para actualizar el estado de una cerradura específica
@@ -1334,9 +1240,6 @@ def register_callbacks(app):
         # Valores a mostrar para cada sensor
         nfc_values = []
         
-        # Cache para las respuestas de la API por asset_id
-        nfc_passwords_cache = {}
-        
         # Agrupar sensores por asset_id para reducir las llamadas a la API
         sensors_by_asset = {}
         for sensor_data in nfc_sensors_data:
@@ -1373,12 +1276,8 @@ def register_callbacks(app):
                 continue
             
             try:
-                # Obtener o cargar del cache los datos de passwords NFC
-                if asset_id not in nfc_passwords_cache:
-                    logger.info(f"Obteniendo datos NFC para asset_id {asset_id}")
-                    nfc_passwords_cache[asset_id] = get_nfc_passwords(asset_id, token)
-                
-                nfc_passwords_data = nfc_passwords_cache[asset_id]
+                # Datos de passwords NFC del asset (caché compartida por asset)
+                nfc_passwords_data = get_nfc_passwords(asset_id, token)
                 
                 # Log de depuración para ver el formato de los datos
                 logger.debug(f"Datos NFC para {asset_id}: Tipo={type(nfc_passwords_data)}")
@@ -2220,12 +2119,13 @@ def register_callbacks(app):
     @app.callback(
         Output("nfc-update-trigger", "data", allow_duplicate=True),
         [Input("nfc-refresh-button", "n_clicks")],
-        [State("nfc-update-trigger", "data")],
+        [State("nfc-update-trigger", "data"),
+         State("nfc-grid-data-store", "data")],
         prevent_initial_call=True,
         id='refresh_nfc_data_callback'  # Add a unique ID
     )
     @handle_exceptions(default_return={"refreshed": False})
-    def refresh_nfc_data(n_clicks, current_data):
+    def refresh_nfc_data(n_clicks, current_data, grid_data):
         """
         Refresca los datos de la matriz NFC cuando se hace clic en el botón de refrescar
         """
@@ -2234,6 +2134,14 @@ def register_callbacks(app):
             
         logger.info(f"Refreshing NFC data triggered by button click ({n_clicks})")
         
+        # Descartar los códigos NFC cacheados e indexados de los assets de la matriz
+        nfc_cache = get_nfc_password_cache()
+        card_index = get_nfc_card_index()
+        for asset_id in (grid_data or {}).get("asset_ids", []):
+            nfc_cache.invalidate(asset_id)
+            card_index.invalidate(asset_id)
+        logger.info(f"Caché de códigos NFC: {nfc_cache.stats()}")
+        
         # Si current_data es None, inicializarlo
         if current_data is None:
             current_data = {}
@@ -2444,6 +2352,9 @@ def register_callbacks(app):
                         logger.error(f"Error fetching NFC data for asset {current_asset_id_iter}: {str(e_fetch)}")
                         nfc_data_by_asset[current_asset_id_iter] = [] # Ensure it's an empty list on error
 
+            # Indexar las tarjetas de la grid (los datos ya están en la caché de códigos NFC)
+            get_nfc_card_index().ensure_assets(asset_ids_to_process, token)
+
             # Now iterate through the assets that are supposed to be in the grid
             for current_asset_id_processed in asset_ids_to_process:
                 devices_from_fetch_for_this_asset = nfc_data_by_asset.get(current_asset_id_processed, [])
@@ -3732,35 +3643,8 @@ def register_callbacks(app):
                 className="alert alert-danger"
             ), {"display": "block"}, False, "", dash.no_update
             
-        # Función para parsear UUIDs del texto de entrada
-        def parse_uuids_from_text(text):
-            """Parsea y valida UUIDs múltiples desde el texto de entrada"""
-            if not text:
-                return []
-            
-            # Reemplazar múltiples separadores con comas
-            import re
-            text = re.sub(r'[;|\n\r]+', ',', text.strip())
-            text = re.sub(r'\s+', ' ', text)  # Normalizar espacios
-            
-            # Dividir por comas y espacios
-            potential_uuids = [uuid.strip() for uuid in text.replace(' ', ',').split(',') if uuid.strip()]
-            
-            # Validar y normalizar cada UUID
-            valid_uuids = []
-            uuid_pattern = re.compile(r'^[0-9A-Fa-f:]{8,}$|^[0-9A-Fa-f-]{8,}$|^[0-9A-Fa-f]{8,}$')
-            
-            for uuid in potential_uuids:
-                if uuid_pattern.match(uuid):
-                    # Normalizar formato
-                    clean_uuid = uuid.replace(':', '').replace('-', '').upper()
-                    if len(clean_uuid) >= 8:
-                        valid_uuids.append(uuid)  # Mantener formato original
-            
-            return valid_uuids
-        
         # Parsear UUIDs del input (vacío significa desasignar todas)
-        uuid_list = parse_uuids_from_text(uuid_text) if uuid_text and uuid_text.strip() else []
+        uuid_list = _parse_unassign_uuids(uuid_text) if uuid_text and uuid_text.strip() else []
         mode = "specific" if uuid_list else "all"
             
         devices = selected_devices_data.get("devices", [])
@@ -3783,40 +3667,11 @@ def register_callbacks(app):
         # Mostrar indicador de carga mientras se procesan las actualizaciones
         loading_indicator = dbc.Spinner(size="sm", color="primary")
         
-        # Procesar en paralelo para mejor rendimiento
-        from concurrent.futures import ThreadPoolExecutor
-        import time
-        
-        results = []
-        device_results = {}
-        
-        def process_device_unassignment(device):
-            """Procesa la desasignación para un dispositivo específico"""
-            device_name = device.get("name", "Cerradura sin nombre")
-            try:
-                # Llamar a la nueva función de múltiples tarjetas
-                success, message, details = unassign_multiple_cards_for_lock(device, uuid_list, token)
-                
-                return {
-                    "device": device,
-                    "device_name": device_name,
-                    "success": success,
-                    "message": message,
-                    "details": details
-                }
-            except Exception as e:
-                logger.error(f"Error desasignando tarjetas para {device_name}: {str(e)}")
-                return {
-                    "device": device,
-                    "device_name": device_name,
-                    "success": False,
-                    "message": f"Error: {str(e)}",
-                    "details": []
-                }
-        
-        # Ejecutar procesamiento en paralelo
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            device_results_list = list(executor.map(process_device_unassignment, devices))
+        # Plan de todas las cerraduras a partir de una única lectura de sus códigos NFC;
+        # las escrituras se ejecutan en paralelo entre gateways y en serie dentro de cada uno
+        card_index = get_nfc_card_index()
+        card_index.ensure_assets({device.get("asset_id") for device in devices}, token, refresh=True)
+        plans = execute_plan(plan_unassignment(devices, uuid_list, card_index), token)
         
         # Contadores globales
         total_successful = 0
@@ -3830,11 +3685,9 @@ def register_callbacks(app):
         # Procesar resultados de cada dispositivo
         device_summaries = []
         
-        for result in device_results_list:
-            device_name = result["device_name"]
-            success = result["success"]
-            message = result["message"]
-            details = result["details"]
+        for lock_plan in plans:
+            device_name = lock_plan["name"]
+            success, message, details = lock_result(lock_plan)
             
             # Contadores por dispositivo
             device_successful = 0
@@ -4062,63 +3915,8 @@ def register_callbacks(app):
                 "No hay cerraduras seleccionadas para asignar tarjetas NFC"
             ], className="alert alert-warning"), {"display": "block"}, True, "", dash.no_update
         
-        # Parsear múltiples UUIDs del texto
-        def parse_uuids_from_text(text):
-            if not text:
-                return []
-            
-            import re
-            
-            # Normalizar separadores
-            normalized_text = text.replace(',', '\n').replace(';', '\n')
-            
-            # Dividir por líneas y espacios
-            lines = normalized_text.split('\n')
-            all_tokens = []
-            for line in lines:
-                tokens = line.strip().split()
-                all_tokens.extend(tokens)
-            
-            # Filtrar y validar tokens
-            potential_uuids = [token.strip() for token in all_tokens if token.strip()]
-            valid_uuids = []
-            
-            # Patrones para validación
-            pattern_colon = r'^([0-9A-F]{2}:){3}[0-9A-F]{2}$'
-            pattern_dash = r'^([0-9A-F]{2}-){3}[0-9A-F]{2}$'
-            pattern_plain = r'^[0-9A-F]{8}$'
-            pattern_long = r'^[0-9A-F]{12,16}$'
-            
-            for token in potential_uuids:
-                token_upper = token.upper()
-                
-                if (re.match(pattern_colon, token_upper, re.IGNORECASE) or 
-                    re.match(pattern_dash, token_upper, re.IGNORECASE) or 
-                    re.match(pattern_plain, token_upper, re.IGNORECASE) or
-                    re.match(pattern_long, token_upper, re.IGNORECASE)):
-                    
-                    # Normalizar formato
-                    if ':' not in token_upper and '-' not in token_upper:
-                        if len(token_upper) >= 8:
-                            formatted = ':'.join([token_upper[i:i+2] for i in range(0, min(8, len(token_upper)), 2)])
-                            valid_uuids.append(formatted)
-                        else:
-                            valid_uuids.append(token_upper)
-                    else:
-                        valid_uuids.append(token_upper)
-            
-            # Eliminar duplicados manteniendo orden
-            seen = set()
-            unique_uuids = []
-            for uuid in valid_uuids:
-                if uuid not in seen:
-                    seen.add(uuid)
-                    unique_uuids.append(uuid)
-            
-            return unique_uuids
-        
         # Parsear los UUIDs
-        uuid_list = parse_uuids_from_text(uuid_text)
+        uuid_list = _parse_assign_uuids(uuid_text)
         
         if not uuid_list:
             return html.Div([
@@ -4139,87 +3937,66 @@ def register_callbacks(app):
         total_already_assigned = 0
         total_auth_errors = 0
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            # Crear un futuro para cada dispositivo
-            future_to_device = {
-                executor.submit(
-                    update_multiple_cards_for_lock, 
-                    device, 
-                    uuid_list, 
-                    token
-                ): device for device in selected_devices
-            }
+        # Plan de todas las cerraduras a partir de una única lectura de sus códigos NFC;
+        # las escrituras se ejecutan en paralelo entre gateways y en serie dentro de cada uno
+        card_index = get_nfc_card_index()
+        card_index.ensure_assets({device.get("asset_id") for device in selected_devices}, token, refresh=True)
+        plans = execute_plan(plan_assignment(selected_devices, uuid_list, card_index), token)
+        
+        for lock_plan in plans:
+            device_name = lock_plan["name"]
+            success, message, card_details = lock_result(lock_plan)
+            
+            # Contar resultados por tipo
+            device_successful = sum(1 for detail in card_details if detail["status"] == "success")
+            device_already_assigned = sum(1 for detail in card_details if detail["status"] == "already_assigned")
+            device_auth_errors = sum(1 for detail in card_details if detail["status"] == "auth_error")
+            device_failed = sum(1 for detail in card_details if detail["status"] == "failed")
+            
+            total_successful += device_successful
+            total_already_assigned += device_already_assigned
+            total_auth_errors += device_auth_errors
+            total_failed += device_failed
             
-            # Procesar los resultados
-            for future in concurrent.futures.as_completed(future_to_device):
-                device = future_to_device[future]
-                device_name = device.get("display_name", device.get("lock_name", "Cerradura desconocida"))
+            # Determinar icono y clase CSS
+            if device_auth_errors > 0:
+                icon_class = "fas fa-exclamation-triangle text-warning"
+                row_class = "table-warning"
+            elif device_failed > 0:
+                icon_class = "fas fa-times-circle text-danger"
+                row_class = "table-danger"
+            elif device_successful > 0:
+                icon_class = "fas fa-check-circle text-success"
+                row_class = "table-success"
+            else:
+                icon_class = "fas fa-info-circle text-info"
+                row_class = "table-info"
+            
+            # Crear detalles de tarjetas para este dispositivo
+            card_details_html = []
+            for detail in card_details:
+                status_badge_class = {
+                    "success": "bg-success",
+                    "already_assigned": "bg-info",
+                    "auth_error": "bg-warning text-dark",
+                    "failed": "bg-danger"
+                }.get(detail["status"], "bg-secondary")
                 
-                try:
-                    success, message, card_details = future.result()
-                    
-                    # Contar resultados por tipo
-                    device_successful = sum(1 for detail in card_details if detail["status"] == "success")
-                    device_already_assigned = sum(1 for detail in card_details if detail["status"] == "already_assigned")
-                    device_auth_errors = sum(1 for detail in card_details if detail["status"] == "auth_error")
-                    device_failed = sum(1 for detail in card_details if detail["status"] == "failed")
-                    
-                    total_successful += device_successful
-                    total_already_assigned += device_already_assigned
-                    total_auth_errors += device_auth_errors
-                    total_failed += device_failed
-                    
-                    # Determinar icono y clase CSS
-                    if device_auth_errors > 0:
-                        icon_class = "fas fa-exclamation-triangle text-warning"
-                        row_class = "table-warning"
-                    elif device_failed > 0:
-                        icon_class = "fas fa-times-circle text-danger"
-                        row_class = "table-danger"
-                    elif device_successful > 0:
-                        icon_class = "fas fa-check-circle text-success"
-                        row_class = "table-success"
-                    else:
-                        icon_class = "fas fa-info-circle text-info"
-                        row_class = "table-info"
-                    
-                    # Crear detalles de tarjetas para este dispositivo
-                    card_details_html = []
-                    for detail in card_details:
-                        status_badge_class = {
-                            "success": "bg-success",
-                            "already_assigned": "bg-info",
-                            "auth_error": "bg-warning text-dark",
-                            "failed": "bg-danger"
-                        }.get(detail["status"], "bg-secondary")
-                        
-                        card_details_html.append(
-                            html.Div([
-                                html.Small(detail["uuid"], className="me-2 font-monospace"),
-                                html.Small(detail["message"], className=f"badge {status_badge_class}")
-                            ], className="mb-1")
-                        )
-                    
-                    device_results.append({
-                        "device_name": device_name,
-                        "icon_class": icon_class,
-                        "row_class": row_class,
-                        "message": message,
-                        "card_details": card_details_html,
-                        "summary": f"{device_successful}✓ {device_already_assigned}ℹ {device_auth_errors}⚠ {device_failed}✗"
-                    })
-                    
-                except Exception as e:
-                    logger.error(f"Error procesando dispositivo {device_name}: {str(e)}")
-                    device_results.append({
-                        "device_name": device_name,
-                        "icon_class": "fas fa-times-circle text-danger",
-                        "row_class": "table-danger",
-                        "message": f"Error: {str(e)}",
-                        "card_details": [],
-                        "summary": f"0✓ 0ℹ 0⚠ {len(uuid_list)}✗"
-                    })
-                    total_failed += len(uuid_list)
+                card_details_html.append(
+                    html.Div([
+                        html.Small(detail["uuid"], className="me-2 font-monospace"),
+                        html.Small(detail["message"], className=f"badge {status_badge_class}")
+                    ], className="mb-1")
+                )
+            
+            device_results.append({
+                "device_name": device_name,
+                "icon_class": icon_class,
+                "row_class": row_class,
+                "message": message,
+                "card_details": card_details_html,
+                "summary": f"{device_successful}✓ {device_already_assigned}ℹ {device_auth_errors}⚠ {device_failed}✗"
+            })
         
         # Crear tabla de resultados detallada
         result_rows = []
@@ -4582,458 +4359,54 @@ def register_callbacks(app):
         
         return dash.no_update
 
-    # Función para actualizar múltiples tarjetas en una cerradura individual
-    def update_multiple_cards_for_lock(device, uuid_list, jwt_token):
-        """
-        Actualiza múltiples UUIDs de tarjetas NFC para una cerradura específica,
-        usando slots disponibles secuencialmente.
-        
-        Args:
-            device: Diccionario con datos de la cerradura
-            uuid_list: Lista de UUIDs de tarjetas NFC
-            jwt_token: Token JWT para autenticación
-            
-        Returns:
-            Tupla (success, message, details) con el resultado de la operación
-        """
-        from utils.nfc_helper import get_available_slots, check_card_exists
-        
-        # Usar el ID numérico real del dispositivo para llamadas API
-        # Dar prioridad a 'real_device_id', luego a 'id', y como último recurso 'device_id' (y verificar si es numérico)
-        numeric_device_id = device.get("real_device_id")
-        if not numeric_device_id:
-            numeric_device_id = device.get("id") # 'id' en el contexto de la tabla NFC es el device_id numérico
-            if numeric_device_id:
-                 logger.info(f"Usando device.get('id') ({numeric_device_id}) como ID numérico porque 'real_device_id' no fue encontrado.")
-        
-        if not numeric_device_id: # Si sigue sin encontrarse, probar 'device_id' y validar
-            potential_numeric_id = device.get("device_id")
-            try:
-                if potential_numeric_id:
-                    int(potential_numeric_id) # Verificar si es convertible a int
-                    numeric_device_id = potential_numeric_id
-                    logger.warning(f"Usando device.get('device_id') ({numeric_device_id}) como ID numérico porque 'real_device_id' e 'id' no fueron encontrados o no eran numéricos.")
-            except (ValueError, TypeError):
-                logger.error(f"Error Crítico: 'real_device_id' e 'id' no encontrados, y 'device_id' ('{potential_numeric_id}') no es numérico.")
-                return False, f"Error interno: ID de dispositivo no válido para asignación.", []
-
-        # El 'device_id' descriptivo (display_name) para logging
-        descriptive_device_id = device.get("device_id") # Esto es el display_label
-        if not descriptive_device_id: # Fallback si 'device_id' no es el display_name
-            descriptive_device_id = device.get("display_name", device.get("lock_name", "Cerradura desconocida"))
-
-        # Para compatibilidad con el código existente de logs
-        device_id = descriptive_device_id
-
-        gateway_id = device.get("gateway_id")
-        asset_id = device.get("asset_id")
-        
-        logger.info(f"Actualizando {len(uuid_list)} tarjetas para: numeric_device_id={numeric_device_id}, descriptive_device_id='{descriptive_device_id}', gateway_id={gateway_id}, asset_id={asset_id}")
-        
-        if not numeric_device_id: # Chequeo final
-            return False, "Falta ID numérico del dispositivo", []
-            
-        if not gateway_id:
-            return False, f"Falta el ID del gateway necesario para el dispositivo {descriptive_device_id} (ID: {numeric_device_id})", []
-        
-        if not uuid_list or len(uuid_list) == 0:
-            return False, "No se proporcionaron UUIDs para asignar", []
-        
-        try:
-            # Para el caso de dispositivos sin sensores definidos, crear una estructura básica
-            if "sensors" not in device or not device["sensors"]:
-                logger.warning(f"Dispositivo {device_id} no tiene sensores definidos, creando estructura básica")
-                device = {
-                    "device_id": device_id,
-                    "real_device_id": device_id,
-                    "gateway_id": gateway_id,
-                    "asset_id": asset_id,
-                    "sensors": []  # Lista vacía de sensores
-                }
-            
-            # Encontrar slots disponibles
-            available_slots = get_available_slots(device)
-            logger.info(f"Slots disponibles para dispositivo {device_id}: {available_slots}")
-            
-            if not available_slots:
-                # En caso de no encontrar slots, usar slots predeterminados como respaldo
-                logger.warning(f"No se encontraron slots disponibles para {device_id}, usando slots predeterminados")
-                available_slots = [str(i) for i in range(7, 99)]
-            
-            # Verificar si hay suficientes slots para todas las tarjetas
-            if len(uuid_list) > len(available_slots):
-                return False, f"No hay suficientes slots disponibles. Necesarios: {len(uuid_list)}, Disponibles: {len(available_slots)}", []
-            
-            # Procesar cada UUID
-            results = []
-            successful_assignments = 0
-            failed_assignments = 0
-            already_assigned = 0
-            auth_errors = 0
-            
-            for i, uuid_value in enumerate(uuid_list):
-                try:
-                    # Verificar si la tarjeta ya existe
-                    card_exists, existing_slot = check_card_exists(device, uuid_value)
-                    if card_exists:
-                        logger.info(f"La tarjeta {uuid_value} ya existe en el slot {existing_slot} del dispositivo {device_id}")
-                        results.append({
-                            "uuid": uuid_value,
-                            "slot": existing_slot,
-                            "status": "already_assigned",
-                            "message": f"Ya asignada en slot {existing_slot}"
-                        })
-                        already_assigned += 1
-                        continue
-                    
-                    # Usar el siguiente slot disponible
-                    if i < len(available_slots):
-                        slot_number = available_slots[i]
-                    else:
-                        # No debería llegar aquí debido a la verificación anterior
-                        results.append({
-                            "uuid": uuid_value,
-                            "slot": None,
-                            "status": "failed",
-                            "message": "No hay slots disponibles"
-                        })
-                        failed_assignments += 1
-                        continue
-                    
-                    # Asegurar formato correcto
-                    if ":" not in uuid_value and "-" not in uuid_value and len(uuid_value) == 8:
-                        uuid_formatted = ":".join([uuid_value[i:i+2] for i in range(0, len(uuid_value), 2)])
-                    else:
-                        uuid_formatted = uuid_value
-                    
-                    # Llamar a la API para actualizar el código NFC
-                    from utils.api import update_nfc_code_value
-                    
-                    logger.info(f"Actualizando tarjeta NFC {uuid_formatted} en slot {slot_number} para dispositivo {device_id}")
-                    
-                    success, response = update_nfc_code_value(
-                        asset_id=asset_id,
-                        device_id=str(numeric_device_id), # Usar el ID numérico
-                        sensor_id=slot_number,
-                        new_value=uuid_formatted,
-                        jwt_token=jwt_token,
-                        gateway_id=gateway_id,
-                        is_master_card=slot_number == "7"
-                    )
-                    
-                    if success:
-                        logger.info(f"Tarjeta {uuid_formatted} asignada correctamente al slot {slot_number} para dispositivo {device_id}")
-                        results.append({
-                            "uuid": uuid_value,
-                            "slot": slot_number,
-                            "status": "success",
-                            "message": f"Asignada al slot {slot_number}"
-                        })
-                        successful_assignments += 1
-                        
-                        # Actualizar la estructura del dispositivo para futuras verificaciones
-                        # Esto ayuda con las verificaciones de tarjetas ya existentes en la misma operación
-                        if "sensors" not in device:
-                            device["sensors"] = []
-                        
-                        # Buscar si ya existe un sensor con este ID, si no, agregarlo
-                        sensor_found = False
-                        for sensor in device["sensors"]:
-                            if str(sensor.get("sensor_id", "")) == str(slot_number):
-                                sensor["password"] = uuid_formatted
-                                sensor_found = True
-                                break
-                        
-                        if not sensor_found:
-                            device["sensors"].append({
-                                "sensor_id": slot_number,
-                                "password": uuid_formatted,
-                                "sensor_type": "NFC_CODE"
-                            })
-                        else:
-                        # Manejar errores específicos
-                            error_message = str(response)
-                        
-                        if "Token expirado" in error_message or "Token JWT expirado" in error_message or "401" in error_message:
-                            logger.error(f"Error de autenticación al actualizar tarjeta {uuid_value} para {device_id}")
-                            results.append({
-                                "uuid": uuid_value,
-                                "slot": slot_number,
-                                "status": "auth_error",
-                                "message": "Error de autenticación"
-                            })
-                            auth_errors += 1
-                        else:
-                            logger.error(f"Error al actualizar tarjeta {uuid_value} para {device_id}: {response}")
-                            results.append({
-                                "uuid": uuid_value,
-                                "slot": slot_number,
-                                "status": "failed",
-                                "message": f"Error: {response}"
-                            })
-                            failed_assignments += 1
-                
-                except Exception as e:
-                    logger.error(f"Error procesando tarjeta {uuid_value} para {device_id}: {str(e)}")
-                    results.append({
-                        "uuid": uuid_value,
-                        "slot": None,
-                        "status": "failed",
-                        "message": f"Error: {str(e)}"
-                    })
-                    failed_assignments += 1
-            
-            # Determinar el resultado general
-            total_processed = successful_assignments + failed_assignments + already_assigned + auth_errors
-            
-            if successful_assignments == len(uuid_list):
-                return True, f"Todas las tarjetas ({successful_assignments}) asignadas correctamente", results
-            elif successful_assignments > 0:
-                return True, f"{successful_assignments} de {len(uuid_list)} tarjetas asignadas correctamente", results
-            elif already_assigned == len(uuid_list):
-                return True, f"Todas las tarjetas ({already_assigned}) ya estaban asignadas", results
-            elif auth_errors > 0:
-                return False, f"Error de autenticación en {auth_errors} tarjetas", results
-            else:
-                return False, f"No se pudo asignar ninguna tarjeta", results
-                
-        except Exception as e:
-            logger.error(f"Error general actualizando tarjetas para {device_id}: {str(e)}")
-            return False, f"Error: {str(e)}", []
-
-    # Función para desasignar múltiples tarjetas NFC de una cerradura específica
-    def unassign_multiple_cards_for_lock(device, uuid_list, jwt_token):
-        """
-        Desasigna múltiples UUIDs de tarjetas NFC de una cerradura específica.
-        
-        Args:
-            device: Diccionario con datos de la cerradura. Se espera que 'real_device_id' contenga el ID numérico
-                    y 'device_id' (o 'display_name') el nombre descriptivo.
-            uuid_list: Lista de UUIDs de tarjetas NFC a desasignar (vacía = desasignar todas)
-            jwt_token: Token JWT para autenticación
-            
-        Returns:
-            Tupla (success, message, details) con el resultado de la operación
-        """
-        from utils.nfc_helper import check_card_exists # Ensure import
-        from utils.api import update_nfc_code_value, get_nfc_passwords # Ensure imports
-        
-        numeric_device_id = device.get('real_device_id') 
-        descriptive_device_id = device.get('device_id') 
-        if not descriptive_device_id: 
-             descriptive_device_id = device.get('display_name', device.get('lock_name', "Cerradura desconocida"))
-
-        # Use descriptive_device_id for logging consistency with other parts of the code
-        device_id_for_log = descriptive_device_id
-
-        if not numeric_device_id:
-            logger.error(f"Error Crítico: No se pudo determinar el ID numérico del dispositivo para '{device_id_for_log}'. La clave 'real_device_id' falta en el objeto device: {list(device.keys()) if isinstance(device, dict) else 'Not a dict'}")
-            return False, f"Falta ID numérico del dispositivo {device_id_for_log}", []
-
-        gateway_id = device.get('gateway_id')
-        asset_id = device.get('asset_id')
-
-        logger.info(f"Desasignando tarjetas para: numeric_device_id={numeric_device_id}, descriptive_device_id='{device_id_for_log}', gateway_id={gateway_id}, asset_id={asset_id}")
-
-        if not gateway_id:
-            return False, f"Falta el ID del gateway necesario para el dispositivo {device_id_for_log} (ID: {numeric_device_id})", []
+    # Callbacks para previsualizar el plan de asignación/desasignación masiva sin escribir nada
+    @app.callback(
+        Output("master-card-plan-preview", "children"),
+        [Input("master-card-preview-button", "n_clicks"),
+         Input("master-card-modal", "is_open")],
+        [State("master-card-uuid-input", "value"),
+         State("master-card-selected-devices", "data"),
+         State("jwt-token-store", "data")],
+        prevent_initial_call=True
+    )
+    @handle_exceptions(default_return=None)
+    def preview_assign_plan(preview_clicks, is_open, uuid_text, selected_devices_data, token_data):
+        ctx = dash.callback_context
+        if not is_open or not ctx.triggered or ctx.triggered[0]['prop_id'] != "master-card-preview-button.n_clicks":
+            return None
         
-        if not asset_id: # Asset ID is crucial for fetching passwords
-            logger.error(f"Error Crítico: Falta asset_id para el dispositivo '{device_id_for_log}' (ID: {numeric_device_id}). No se pueden obtener las tarjetas actuales.")
-            return False, f"Falta ID de asset para el dispositivo {device_id_for_log}", []
-
-        # --- MODIFIED LOGIC TO FETCH AND USE FRESH NFC DATA ---
-        current_nfc_passwords_on_device = {} # Stores {sensor_id: password}
-        try:
-            logger.info(f"Fetching all NFC data for asset {asset_id} to find device {numeric_device_id}")
-            nfc_data_for_asset = get_nfc_passwords(asset_id, jwt_token) 
-            # REMOVED DEBUG LOGGING
-
-            if nfc_data_for_asset and isinstance(nfc_data_for_asset, dict) and 'data' in nfc_data_for_asset:
-                data_section = nfc_data_for_asset['data']
-                devices_in_asset_list = [] 
-                
-                if isinstance(data_section, dict) and 'devices' in data_section and isinstance(data_section['devices'], list):
-                    devices_in_asset_list = data_section['devices']
-                elif isinstance(data_section, list):
-                    devices_in_asset_list = data_section
-                elif isinstance(data_section, dict) and ('device_id' in data_section or 'real_device_id' in data_section) : 
-                    devices_in_asset_list = [data_section]
-                
-                # REMOVED DEBUG LOGGING
-
-                found_device_data_from_asset = None
-                for i, device_entry in enumerate(devices_in_asset_list):
-                    if not isinstance(device_entry, dict):
-                        # REMOVED DEBUG LOGGING
-                        continue
-
-                    id_keys_to_check = ['real_device_id', 'device_id', 'id'] 
-                    for key in id_keys_to_check:
-                        api_id_val = device_entry.get(key)
-                        if api_id_val is not None and str(api_id_val) == str(numeric_device_id):
-                            # REMOVED DEBUG LOGGING
-                            found_device_data_from_asset = device_entry
-                            break 
-                    if found_device_data_from_asset:
-                        break 
-                    else:
-                        # REMOVED DEBUG LOGGING
-                        pass # Replaced logger.debug with pass as it was the only statement in the else block
-                        
-                if found_device_data_from_asset:
-                    # REMOVED DEBUG LOGGING 
-                    for key, pw_val in found_device_data_from_asset.items():
-                        if key.startswith("sensor_"):
-                            sensor_id_val = key.replace("sensor_", "")
-                            if pw_val is not None and hasattr(pw_val, 'strip'):
-                                stripped_pw = str(pw_val).strip()
-                                if stripped_pw:
-                                    current_nfc_passwords_on_device[sensor_id_val] = stripped_pw
-                                    # REMOVED DEBUG LOGGING
-                                else:
-                                    # REMOVED DEBUG LOGGING
-                                    pass # Replaced logger.debug with pass
-                            elif pw_val: 
-                                current_nfc_passwords_on_device[sensor_id_val] = str(pw_val)
-                                # REMOVED DEBUG LOGGING
-                            else:
-                                # REMOVED DEBUG LOGGING
-                                pass # Replaced logger.debug with pass
-                    # REMOVED DEBUG LOGGING
-                else:
-                    logger.warning(f"Device {numeric_device_id} was NOT FOUND within asset {asset_id} NFC data after checking {len(devices_in_asset_list)} entries.") # Kept warning
-            else:
-                logger.warning(f"No NFC data in 'data' key or nfc_data_for_asset is not a dict for asset {asset_id}.") # Kept warning
-
-        except Exception as e:
-            logger.error(f"Error during parsing of nfc_data_for_asset for device {numeric_device_id}, asset {asset_id}: {str(e)}", exc_info=True)
+        token = token_data.get('token') if token_data else None
+        devices = (selected_devices_data or {}).get("devices", [])
+        uuid_list = _parse_assign_uuids(uuid_text)
+        if not token or not devices or not uuid_list:
+            return html.Div("Seleccione cerraduras e ingrese al menos un UUID válido para ver el plan",
+                            className="alert alert-warning mt-3")
+        
+        card_index = get_nfc_card_index()
+        card_index.ensure_assets({device.get("asset_id") for device in devices}, token, refresh=True)
+        return _plan_preview(plan_assignment(devices, uuid_list, card_index))
 
-        device_for_check = {
-            "device_id": descriptive_device_id, 
-            "real_device_id": numeric_device_id, 
-            "sensors": []
-        }
-        for sensor_id_str, password_str in current_nfc_passwords_on_device.items():
-            device_for_check["sensors"].append({
-                "sensor_id": sensor_id_str,
-                "password": password_str,
-                "sensor_type": "NFC_CODE" 
-            })
-        # REMOVED DEBUG LOGGING
+    @app.callback(
+        Output("unassign-card-plan-preview", "children"),
+        [Input("unassign-card-preview-button", "n_clicks"),
+         Input("unassign-card-modal", "is_open")],
+        [State("unassign-card-uuid-input", "value"),
+         State("unassign-card-selected-devices", "data"),
+         State("jwt-token-store", "data")],
+        prevent_initial_call=True
+    )
+    @handle_exceptions(default_return=None)
+    def preview_unassign_plan(preview_clicks, is_open, uuid_text, selected_devices_data, token_data):
+        ctx = dash.callback_context
+        if not is_open or not ctx.triggered or ctx.triggered[0]['prop_id'] != "unassign-card-preview-button.n_clicks":
+            return None
         
-        try:
-            uuids_to_unassign_details = [] # Stores {"uuid": "...", "slot": "...", "status_override": "..."}
-
-            if not uuid_list: # Mode: unassign all cards currently on device
-                logger.info(f"Mode: Unassign ALL cards for device {numeric_device_id} based on fresh data.")
-                if not device_for_check["sensors"]:
-                    logger.info(f"No active NFC cards found on device {numeric_device_id} (fresh data) to unassign.")
-                    return True, "No hay tarjetas activas para desasignar", []
-                for sensor in device_for_check["sensors"]:
-                    uuids_to_unassign_details.append({"uuid": sensor["password"], "slot": sensor["sensor_id"]})
-                if not uuids_to_unassign_details: # Should not happen if device_for_check.sensors was populated
-                     return True, "No hay tarjetas activas para desasignar (después de verificar datos frescos)", []
-                logger.info(f"Identified {len(uuids_to_unassign_details)} cards to unassign (ALL mode) for device {numeric_device_id}.")
-
-            else: # Mode: unassign specific UUIDs from the input uuid_list
-                logger.info(f"Mode: Unassign SPECIFIC cards for device {numeric_device_id}: {uuid_list} using fresh data for checks.")
-                for uuid_to_find in uuid_list:
-                    card_is_present, slot_found = check_card_exists(device_for_check, uuid_to_find)
-                    if card_is_present:
-                        uuids_to_unassign_details.append({"uuid": uuid_to_find, "slot": slot_found})
-                    else:
-                        uuids_to_unassign_details.append({"uuid": uuid_to_find, "slot": None, "status_override": "not_found"})
-                
-                if not any(d["slot"] is not None for d in uuids_to_unassign_details):
-                     logger.info(f"None of the specified UUIDs {uuid_list} were found on device {numeric_device_id} (fresh data).")
-                     results_for_not_found = [{"uuid": u, "slot": None, "status": "not_found", "message": "Tarjeta no encontrada"} for u in uuid_list]
-                     return True, "Ninguna de las tarjetas especificadas fue encontrada en el dispositivo.", results_for_not_found
-            
-            if not uuids_to_unassign_details:
-                logger.warning(f"No cards identified for unassignment for device {numeric_device_id}. Original list: {uuid_list}")
-                return True, "No hay tarjetas para procesar la desasignación", []
-
-            results = []
-            successful_unassignments = 0
-            failed_unassignments = 0
-            not_found_reported = 0 # For cards from uuid_list that were not found on device
-            auth_errors = 0
-
-            for unassign_detail in uuids_to_unassign_details:
-                uuid_to_remove = unassign_detail["uuid"]
-                slot_to_clear = unassign_detail["slot"]
-
-                if unassign_detail.get("status_override") == "not_found":
-                    results.append({"uuid": uuid_to_remove, "slot": None, "status": "not_found", "message": "Tarjeta no encontrada"})
-                    not_found_reported +=1
-                    continue
-
-                if not slot_to_clear: # Should be caught by status_override
-                    logger.error(f"Internal logic error: slot_to_clear is None for UUID {uuid_to_remove} without status_override. Skipping.")
-                    results.append({"uuid": uuid_to_remove, "slot": None, "status": "failed", "message": "Error interno: slot no identificado"})
-                    failed_unassignments+=1
-                    continue
-
-                try:
-                    logger.info(f"Attempting to unassign card (original UUID: {uuid_to_remove}) from slot {slot_to_clear} on device {numeric_device_id}")
-                    success, response = update_nfc_code_value(
-                        asset_id=asset_id,
-                        device_id=str(numeric_device_id),
-                        sensor_id=str(slot_to_clear),
-                        new_value="",
-                        jwt_token=jwt_token,
-                        gateway_id=gateway_id,
-                        is_master_card=(str(slot_to_clear) == "7")
-                    )
-
-                    if success:
-                        logger.info(f"Card from slot {slot_to_clear} unassigned successfully for device {numeric_device_id}.")
-                        results.append({"uuid": uuid_to_remove, "slot": slot_to_clear, "status": "success", "message": f"Desasignada del slot {slot_to_clear}"})
-                        successful_unassignments += 1
-                    else:
-                        error_message = str(response)
-                        status_to_report = "failed"
-                        if "Token expirado" in error_message or "Token JWT expirado" in error_message or "401" in error_message or "unauthorized" in error_message.lower():
-                            status_to_report = "auth_error"
-                            auth_errors += 1
-                        else:
-                            failed_unassignments += 1
-                        logger.error(f"Failed to unassign card from slot {slot_to_clear} for device {numeric_device_id}: {error_message}")
-                        results.append({"uuid": uuid_to_remove, "slot": slot_to_clear, "status": status_to_report, "message": f"Error: {error_message}"})
-
-                except Exception as e_inner:
-                    logger.error(f"Exception during unassignment for slot {slot_to_clear}, UUID {uuid_to_remove} on device {numeric_device_id}: {str(e_inner)}")
-                    results.append({"uuid": uuid_to_remove, "slot": slot_to_clear, "status": "failed", "message": f"Excepción: {str(e_inner)}"})
-                    failed_unassignments += 1
-            
-            total_processed_ops = successful_unassignments + failed_unassignments + auth_errors
-            target_ops = len(uuids_to_unassign_details) - not_found_reported
-
-            if successful_unassignments == target_ops and target_ops > 0 :
-                final_message = f"Todas las {successful_unassignments} tarjetas procesadas desasignadas correctamente."
-                if not_found_reported > 0 and uuid_list: # Only mention if specific UUIDs were given and some were not found
-                    final_message += f" {not_found_reported} tarjetas especificadas no fueron encontradas."
-                return True, final_message, results
-            elif successful_unassignments > 0:
-                final_message = f"{successful_unassignments} tarjetas desasignadas. {failed_unassignments} fallaron. {auth_errors} errores de auth."
-                if not_found_reported > 0 and uuid_list:
-                    final_message += f" {not_found_reported} no encontradas."
-                return True, final_message, results # Overall True if at least one succeeded
-            elif not_found_reported == len(uuid_list) and uuid_list: # All specified UUIDs were not found
-                 return True, "Ninguna de las tarjetas especificadas fue encontrada en el dispositivo.", results
-            elif auth_errors > 0 and successful_unassignments == 0 and failed_unassignments == 0:
-                 return False, f"Error de autenticación en {auth_errors} operaciones.", results
-            elif target_ops == 0 and not_found_reported > 0: # e.g. specific list given, none found
-                 return True, "Ninguna de las tarjetas especificadas para desasignar fue encontrada en el dispositivo.", results
-            elif target_ops == 0 and not uuid_list: # e.g. unassign all, but no cards were on device
-                 return True, "No había tarjetas activas en el dispositivo para desasignar.", results
-            else: 
-                final_message = f"No se pudo desasignar: {failed_unassignments} fallaron, {auth_errors} errores de auth."
-                if not_found_reported > 0 and uuid_list:
-                    final_message += f" {not_found_reported} no encontradas."
-                return False, final_message, results
-
-        except Exception as e_outer:
-            logger.error(f"Error general en unassign_multiple_cards_for_lock para {numeric_device_id}: {str(e_outer)}", exc_info=True)
-            return False, f"Error general procesando desasignaciones: {str(e_outer)}", []
+        token = token_data.get('token') if token_data else None
+        devices = (selected_devices_data or {}).get("devices", [])
+        if not token or not devices:
+            return html.Div("Seleccione cerraduras para ver el plan", className="alert alert-warning mt-3")
+        
+        uuid_list = _parse_unassign_uuids(uuid_text) if uuid_text and uuid_text.strip() else []
+        card_index = get_nfc_card_index()
+        card_index.ensure_assets({device.get("asset_id") for device in devices}, token, refresh=True)
+        return _plan_preview(plan_unassignment(devices, uuid_list, card_index))
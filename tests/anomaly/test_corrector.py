@@ -0,0 +1,92 @@
+# tests/anomaly/test_corrector.py
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.anomaly.corrector import AnomalyCorrector
+from utils.anomaly.detector import AnomalyDetector
+from tests.helpers.consumption import make_sorted_readings
+
+
+class TestAnomalyCorrector(unittest.TestCase):
+    def setUp(self):
+        self.corrector = AnomalyCorrector()
+        dates = [datetime(2023, 1, 1) + timedelta(days=i) for i in range(6)]
+        self.readings = pd.DataFrame({
+            'date': dates * 2,
+            'consumption': [100, 110, 20, 30, 5, 15] + [1000, 1010, 1020, 10, 20, 30],
+            'asset_id': ['A'] * 6 + ['B'] * 6,
+            'consumption_type': ['Agua fría'] * 6 + ['Energía general'] * 6,
+        })
+
+    def test_generated_series_are_increasing_after_correction(self):
+        df = make_sorted_readings(20, 200, seed=4)
+        anomalies = AnomalyDetector().detect_counter_resets(df)
+        self.assertGreater(len(anomalies), 5)
+
+        result = self.corrector.correct_counter_resets(df, anomalies)
+
+        first_reset = pd.DataFrame(anomalies).assign(date=lambda a: pd.to_datetime(a['date'])) \
+            .groupby(['asset_id', 'consumption_type'])['date'].min()
+        for key, series in result.groupby(['asset_id', 'consumption_type']):
+            series = series.sort_values('date')
+            # Tras la corrección, cada serie acumulada vuelve a ser creciente
+            self.assertGreater(series['corrected_value'].diff().min(), -1e-6)
+            # Las lecturas anteriores al primer reinicio no cambian
+            before = series['date'] < first_reset.get(key, pd.Timestamp.max)
+            np.testing.assert_allclose(series.loc[before, 'corrected_value'], series.loc[before, 'consumption'])
+            self.assertEqual(series['is_corrected'].tolist(), (~before).tolist())
+
+    def test_consecutive_resets_in_several_series(self):
+        shuffled = self.readings.sample(frac=1.0, random_state=1)
+        anomalies = AnomalyDetector().detect_counter_resets(shuffled)
+
+        result = self.corrector.correct_counter_resets(shuffled, anomalies)
+
+        # La lectura del reinicio toma el valor corregido de la anterior
+        # Se conserva el orden de las filas de entrada
+        self.assertListEqual(list(result.index), list(shuffled.index))
+        result = result.sort_index()
+        self.assertListEqual(result['corrected_value'].tolist(),
+                             [100, 110, 110, 120, 120, 130, 1000, 1010, 1020, 1020, 1030, 1040])
+        self.assertListEqual(result['is_corrected'].tolist(),
+                             [False, False, True, True, True, True, False, False, False, True, True, True])
+        self.assertEqual((result['correction_type'] == 'counter_reset').sum(), 7)
+
+    def test_sensor_replacement_is_only_marked(self):
+        anomalies = AnomalyDetector().detect_counter_resets(self.readings, detect_sensor_replacements=True)
+
+        result = self.corrector.correct_counter_resets(self.readings, anomalies)
+
+        series_b = result[result['asset_id'] == 'B']
+        self.assertListEqual(series_b['corrected_value'].tolist(), [1000, 1010, 1020, 10, 20, 30])
+        self.assertFalse(series_b['is_corrected'].any())
+        self.assertEqual(series_b['is_sensor_replacement'].eq(True).tolist(), [False] * 3 + [True] + [False] * 2)
+        self.assertEqual(series_b['is_last_before_replacement'].eq(True).tolist(), [False] * 2 + [True] + [False] * 3)
+        self.assertEqual(series_b.loc[9, 'correction_type'], 'sensor_replacement')
+
+    def test_reset_at_first_reading_uses_previous_value(self):
+        # Como en anomaly_config: valores corregidos ya inicializados y fechas en texto
+        readings = self.readings[self.readings['asset_id'] == 'A'].iloc[2:].copy()
+        readings['corrected_value'] = readings['consumption']
+        readings['is_corrected'] = False
+        anomalies = [
+            {'type': 'counter_reset', 'date': '2023-01-03T00:00:00', 'previous_value': 110,
+             'asset_id': 'A', 'consumption_type': 'Agua fría'},
+            {'type': 'counter_reset', 'date': '2023-01-05', 'previous_value': 30,
+             'asset_id': 'A', 'consumption_type': 'Agua fría'},
+            # Sin fila correspondiente: se ignora
+            {'type': 'counter_reset', 'date': '2023-02-01', 'previous_value': 30,
+             'asset_id': 'A', 'consumption_type': 'Agua fría'},
+        ]
+
+        result = self.corrector.correct_counter_resets(readings, anomalies)
+
+        self.assertListEqual(result['corrected_value'].tolist(), [110, 120, 120, 130])
+        self.assertTrue(result['is_corrected'].all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 # tests/anomaly/test_detector.py
 import unittest
+from unittest.mock import MagicMock
 import pandas as pd
 from datetime import datetime, timedelta
 from utils.anomaly.detector import AnomalyDetector
@@ -45,6 +46,66 @@ class TestAnomalyDetector(unittest.TestCase):
         self.assertEqual(anomaly['previous_value'], 140, "El valor anterior debería ser 140")
         self.assertEqual(anomaly['current_value'], 50, "El valor actual debería ser 50")
         self.assertEqual(anomaly['offset'], 90, "El offset debería ser 90")
+    
+    def test_batch_detection_per_series(self):
+        """Verifica que el lote compara cada lectura solo con la anterior de su serie"""
+        other = self.reset_data.assign(asset_id='asset2', consumption=[5000, 5100, 5200, 100, 200, 300, 400, 500, 600, 700])
+        readings = pd.concat([other, self.reset_data], ignore_index=True)
+        readings['consumption'] = readings['consumption'].astype(str)
+        readings.loc[19, 'consumption'] = 'Error'
+        readings = readings.sample(frac=1, random_state=1)
+        
+        anomalies = self.detector.find_counter_resets(readings, detect_sensor_replacements=True)
+        anomalies = anomalies.sort_values('asset_id', ascending=False)
+        
+        self.assertEqual(anomalies['asset_id'].tolist(), ['asset2', 'asset1'])
+        self.assertEqual(anomalies['type'].tolist(), ['sensor_replacement', 'counter_reset'])
+        self.assertEqual(anomalies['date'].tolist(), ['2023-01-04T00:00:00', '2023-01-06T00:00:00'])
+        self.assertEqual(anomalies['offset'].tolist(), [5100.0, 90.0])
+    
+    def test_batch_detection_thresholds(self):
+        """Verifica los umbrales de reinicio y de reemplazo de sensor en varias series"""
+        dates = pd.date_range("2024-01-01", periods=5, freq="D")
+        readings = pd.concat([
+            # 1000 -> 800 es justo el 80%: no es un reinicio
+            pd.DataFrame({'date': dates, 'consumption': [1000, 800, 700, 100, 150],
+                          'asset_id': 'asset1', 'consumption_type': 'Energía general'}),
+            pd.DataFrame({'date': dates[:4], 'consumption': [2000, 2100, 50, 60],
+                          'asset_id': 'asset1', 'consumption_type': 'Agua fría'}),
+            # Cae por debajo del 5%, pero el valor anterior no supera 1000
+            pd.DataFrame({'date': dates[:3], 'consumption': [900, 20, 30],
+                          'asset_id': 'asset2', 'consumption_type': 'Energía general'}),
+        ], ignore_index=True).sample(frac=1, random_state=2)
+        
+        for detect_replacements, water_type in ((False, 'counter_reset'), (True, 'sensor_replacement')):
+            anomalies = self.detector.find_counter_resets(readings, detect_replacements).sort_values('date')
+            self.assertEqual(anomalies['type'].tolist(), ['counter_reset', water_type, 'counter_reset'])
+            self.assertEqual(anomalies['asset_id'].tolist(), ['asset2', 'asset1', 'asset1'])
+            self.assertEqual(anomalies['consumption_type'].tolist(),
+                             ['Energía general', 'Agua fría', 'Energía general'])
+            self.assertEqual(anomalies['date'].tolist(),
+                             ['2024-01-02T00:00:00', '2024-01-03T00:00:00', '2024-01-04T00:00:00'])
+            self.assertEqual(anomalies['previous_value'].tolist(), [900.0, 2100.0, 700.0])
+            self.assertEqual(anomalies['current_value'].tolist(), [20.0, 50.0, 100.0])
+            self.assertEqual(anomalies['offset'].tolist(), [880.0, 2050.0, 600.0])
+    
+    def test_anomalies_are_saved_in_one_call(self):
+        """Verifica que las anomalías se guardan en bloque si el repositorio lo permite"""
+        repository = MagicMock()
+        detector = AnomalyDetector(repository)
+        readings = pd.concat([self.reset_data, self.reset_data.assign(asset_id='asset2')], ignore_index=True)
+        
+        anomalies = detector.find_counter_resets(readings)
+        self.assertEqual(len(anomalies), 2)
+        
+        repository.save_anomalies.assert_called_once()
+        self.assertEqual(repository.save_anomalies.call_args.args[0], anomalies.to_dict('records'))
+        repository.save_anomaly.assert_not_called()
+        
+        # Repositorios sin guardado en bloque: una llamada por anomalía
+        repository = MagicMock(spec=['save_anomaly'])
+        AnomalyDetector(repository).detect_counter_resets(self.reset_data)
+        self.assertEqual(repository.save_anomaly.call_count, 1)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,165 @@
+# tests/anomaly/test_streaming.py
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+
+from utils.anomaly.corrector import AnomalyCorrector
+from utils.anomaly.detector import AnomalyDetector
+from utils.anomaly.service import AnomalyService
+from utils.anomaly.streaming import StreamingAnomalyEvaluator, evaluate_readings_file
+from tests.helpers.consumption import make_sorted_readings
+
+COLD_WATER_TAG = "_TRANSVERSAL_CONSUMPTION_LIST_TAG_NAME_DOMESTIC_COLD_WATER"
+
+
+class TestStreamingAnomalyEvaluator(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.temp_dir, "stream_state.db")
+        self.df = make_sorted_readings(6, 120, seed=7)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _evaluator(self, **kwargs):
+        kwargs.setdefault('detect_sensor_replacements', False)
+        kwargs.setdefault('state_path', self.state_path)
+        kwargs.setdefault('legacy_state_path', None)
+        return StreamingAnomalyEvaluator(**kwargs)
+
+    def test_incremental_matches_full_evaluation(self):
+        full = self._evaluator(state_path=None).evaluate(self.df)
+
+        # Tres actualizaciones: cada una con el histórico completo hasta ese día
+        evaluator = self._evaluator()
+        chunks = []
+        for cutoff in ("2024-02-15", "2024-03-01", "2024-12-31"):
+            chunks.append(evaluator.evaluate(self.df[self.df['date'] <= cutoff]))
+            evaluator = self._evaluator()  # el estado se recupera desde disco
+        incremental = pd.concat(chunks).sort_values(['asset_id', 'consumption_type', 'date'], kind='mergesort')
+
+        self.assertEqual(len(incremental), len(self.df))
+        pd.testing.assert_frame_equal(incremental.reset_index(drop=True), full, check_dtype=False)
+
+        # Offsets y anomalías coinciden con el detector y el corrector por lotes
+        anomalies = AnomalyDetector().detect_counter_resets(self.df)
+        corrected = AnomalyCorrector().correct_counter_resets(self.df, anomalies)
+        np.testing.assert_allclose(full['corrected_value'], corrected['corrected_value'])
+        self.assertEqual(int((full['anomaly_type'] == 'counter_reset').sum()), len(anomalies))
+
+        # Media y varianza de Welford iguales a las del histórico completo
+        state = evaluator.get_state("ASSET00002", "Agua fría")
+        series = full[(full['asset_id'] == "ASSET00002") & (full['consumption_type'] == "Agua fría")]
+        daily = series['daily_consumption'].dropna()
+        self.assertEqual(state.count, len(daily))
+        self.assertAlmostEqual(state.mean, daily.mean())
+        self.assertAlmostEqual(state.std, daily.std())
+
+    def test_only_new_tail_is_scored_and_alerts_are_kept(self):
+        repository = MagicMock()
+        evaluator = self._evaluator(repository=repository, detect_sensor_replacements=True)
+        dates = pd.date_range("2024-01-01", periods=30, freq="D")
+        values = 1000 + np.cumsum(np.random.default_rng(0).uniform(8, 12, 30))
+        df = pd.DataFrame({'date': dates, 'asset_id': 'A', 'consumption_type': 'Agua fría', 'consumption': values})
+        evaluator.evaluate(df)
+
+        tail = pd.DataFrame({
+            'date': pd.date_range("2024-01-31", periods=3, freq="D"),
+            'asset_id': 'A', 'consumption_type': 'Agua fría',
+            'consumption': [values[-1] + 500, 10.0, 20.0],
+        })
+        scored = evaluator.evaluate(pd.concat([df, tail]))
+
+        self.assertEqual(scored['date'].tolist(), tail['date'].tolist())
+        self.assertEqual(scored['anomaly_type'].tolist(), ['consumption_spike', 'sensor_replacement', None])
+        self.assertEqual([a['type'] for a in repository.save_anomalies.call_args.args[0]], ['sensor_replacement'])
+        self.assertEqual([a['type'] for a in evaluator.get_alerts("A")], ['consumption_spike', 'sensor_replacement'])
+        self.assertTrue(evaluator.evaluate(pd.concat([df, tail])).empty)
+
+    def test_only_changed_series_are_saved(self):
+        evaluator = self._evaluator()
+        evaluator.evaluate(self.df[self.df['date'] <= "2024-03-01"])
+        with patch.object(evaluator, "_connect", wraps=evaluator._connect) as connect:
+            evaluator.save()
+        connect.assert_not_called()
+
+        statements = []
+        one_series = self.df[(self.df['asset_id'] == "ASSET00002") & (self.df['consumption_type'] == "Agua fría")]
+        real_connect = evaluator._connect
+
+        def tracing_connect():
+            conn = real_connect()
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        with patch.object(evaluator, "_connect", side_effect=tracing_connect):
+            evaluator.evaluate(one_series)
+        self.assertEqual(sum(statement.startswith("INSERT") for statement in statements), 1)
+
+        reloaded = self._evaluator()
+        self.assertEqual(reloaded.get_state("ASSET00002", "Agua fría").last_date, one_series['date'].max())
+        self.assertEqual(reloaded.get_state("ASSET00001", "Agua fría").last_date, pd.Timestamp("2024-03-01"))
+
+        reloaded.reset("ASSET00002", "Agua fría")
+        reloaded.save()
+        self.assertIsNone(self._evaluator().get_state("ASSET00002", "Agua fría"))
+
+    def test_backfilled_readings_reset_the_series(self):
+        series = self.df[(self.df['asset_id'] == "ASSET00001") & (self.df['consumption_type'] == "Agua fría")]
+        missing_month = (series['date'] >= "2024-02-01") & (series['date'] < "2024-03-01")
+        evaluator = self._evaluator()
+        evaluator.evaluate(series[~missing_month])
+
+        # Se descarga el mes que faltaba: el CSV vuelve a tener la serie completa
+        scored = evaluator.evaluate(series)
+        full = self._evaluator(state_path=None).evaluate(series)
+        pd.testing.assert_frame_equal(scored, full, check_dtype=False)
+        self.assertEqual(evaluator.get_state("ASSET00001", "Agua fría").readings, len(series))
+        self.assertTrue(evaluator.evaluate(series).empty)
+
+    def test_legacy_json_state_is_imported(self):
+        legacy = self._evaluator(state_path=None)
+        legacy.evaluate(self.df)
+        legacy_path = os.path.join(self.temp_dir, "stream_state.json")
+        with open(legacy_path, "w") as f:
+            json.dump({key: state.to_dict() for key, state in legacy._states.items()}, f, default=str)
+
+        imported = self._evaluator(legacy_state_path=legacy_path)
+        imported.save()
+        state = self._evaluator().get_state("ASSET00002", "Agua fría")
+        self.assertEqual(state.count, legacy.get_state("ASSET00002", "Agua fría").count)
+
+    def test_service_and_writer_hook(self):
+        evaluator = self._evaluator()
+        service = AnomalyService(repository=MagicMock(), streaming=evaluator)
+        readings = pd.DataFrame({
+            'date': pd.date_range("2024-01-01", periods=4, freq="D"),
+            'asset_id': 'A', 'consumption_type': 'Agua fría', 'consumption': [100, 110, 50, 60],
+        })
+        result = service.process_new_readings(readings)
+        self.assertEqual([alert['anomaly_type'] for alert in result['alerts']], ['counter_reset'])
+
+        data = pd.DataFrame({'date': ["2024-01-01", "2024-01-02"], 'value': ["5.0", "Error"]})
+        path = f"daily_readings_B_{COLD_WATER_TAG}.csv"
+        with patch("utils.anomaly.streaming.get_streaming_evaluator", return_value=evaluator), \
+                patch("config.feature_flags.is_feature_enabled", return_value=False):
+            self.assertIsNone(evaluate_readings_file(path, data))
+        with patch("utils.anomaly.streaming.get_streaming_evaluator", return_value=evaluator), \
+                patch("config.feature_flags.is_feature_enabled", return_value=True):
+            scored = evaluate_readings_file(path, data)
+        self.assertEqual(len(scored), 1)
+        self.assertEqual(evaluator.get_state("B", "Agua fría sanitaria").last_value, 5.0)
+
+        with patch("utils.anomaly.service.get_streaming_evaluator", return_value=evaluator):
+            # Las lecturas ya evaluadas por el evaluador compartido no se vuelven a puntuar
+            self.assertTrue(AnomalyService(repository=MagicMock()).process_new_readings(readings)['scored'].empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
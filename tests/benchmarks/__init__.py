@@ -0,0 +1 @@
+# tests/benchmarks/__init__.py
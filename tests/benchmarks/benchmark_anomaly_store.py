@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Benchmark de la consulta de anomalías.
+
+Mide la migración de los archivos anomaly_*.json a AnomalyStore y las consultas
+de AnomalyStore.query (SQLite con índices por asset, tipo de consumo y fecha).
+Por defecto guarda 20 000 anomalías y consulta las de 100 series (asset, tipo).
+
+Uso:
+    python -m tests.benchmarks.benchmark_anomaly_store [--anomalies 20000] [--queries 100]
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from utils.repositories.anomaly_store import AnomalyStore
+
+CONSUMPTION_TYPES = ["Agua fría", "Energía general"]
+
+
+def make_anomalies(n_anomalies):
+    """Anomalías repartidas entre assets, tipos de consumo y días (una por asset y día)."""
+    start = datetime(2023, 1, 1)
+    n_assets = max(n_anomalies // 20, 1)
+    return [{
+        'type': 'counter_reset',
+        'date': (start + timedelta(days=i // n_assets)).isoformat(),
+        'previous_value': 140.0,
+        'current_value': 50.0,
+        'asset_id': f"ASSET{i % n_assets:05d}",
+        'consumption_type': CONSUMPTION_TYPES[(i // n_assets) % len(CONSUMPTION_TYPES)],
+        'offset': 90.0,
+    } for i in range(n_anomalies)]
+
+
+def run(n_anomalies=20000, n_queries=100):
+    folder = tempfile.mkdtemp()
+    try:
+        anomalies = make_anomalies(n_anomalies)
+        for anomaly in anomalies:
+            path = os.path.join(folder, f"anomaly_{anomaly['asset_id']}_{anomaly['date'][:10].replace('-', '')}.json")
+            with open(path, 'w') as f:
+                json.dump(anomaly, f)
+        store = AnomalyStore(os.path.join(folder, "anomalies.db"))
+
+        t0 = time.perf_counter()
+        store.migrate_json_files(folder)
+        print(f"Migración de {n_anomalies} archivos JSON: {time.perf_counter() - t0:.2f} s")
+
+        series = [(a['asset_id'], a['consumption_type']) for a in anomalies[:n_queries]]
+
+        t0 = time.perf_counter()
+        found = sum(len(store.query(asset_id, consumption_type)) for asset_id, consumption_type in series)
+        store_time = time.perf_counter() - t0
+        print(f"Consultas indexadas: {store_time:.3f} s para {n_queries} series ({found} anomalías)")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--anomalies", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+    run(args.anomalies, args.queries)
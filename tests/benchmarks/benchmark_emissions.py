@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Benchmark del cálculo de emisiones de CO2.
+
+Mide el motor vectorizado de utils.carbon_footprint.emissions (factores
+asignados a todas las filas de una vez y estadísticas por grupo sobre arrays).
+Por defecto genera 1.000 assets × 2 tipos de energía × 30 días de consumo
+horario.
+
+Uso:
+    python -m tests.benchmarks.benchmark_emissions [--assets 1000] [--days 30]
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.carbon_footprint.emissions import compute_emissions, emission_anomaly_mask, summarize_emissions
+
+ENERGY_TYPES = ["electricity", "natural_gas"]
+
+
+def make_energy_consumption(n_assets, n_days, seed=0):
+    """Consumo horario (kWh) por asset y tipo de energía, con picos."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2024-01-01", periods=n_days * 24, freq='h')
+    n_series = n_assets * len(ENERGY_TYPES)
+
+    values = rng.gamma(3.0, 2.0, size=(n_series, len(dates)))
+    spikes = rng.random(values.shape) < 0.005
+    values[spikes] *= rng.uniform(4, 10, size=spikes.sum())
+
+    assets = np.repeat([f"ASSET{i:05d}" for i in range(n_assets)], len(ENERGY_TYPES))
+    types = np.tile(ENERGY_TYPES, n_assets)
+    return pd.DataFrame({
+        'date': np.tile(dates.values, n_series),
+        'asset_id': np.repeat(assets, len(dates)),
+        'energy_type': np.repeat(types, len(dates)),
+        'consumption': values.ravel().round(3),
+    })
+
+
+def run(n_assets=1000, n_days=30):
+    logging.disable(logging.WARNING)
+    df = make_energy_consumption(n_assets, n_days)
+    print(f"Consumos: {len(df)} filas ({n_assets} assets × {len(ENERGY_TYPES)} tipos × {n_days * 24} horas)")
+
+    t0 = time.perf_counter()
+    emissions = compute_emissions(df)
+    anomalies, _ = emission_anomaly_mask(emissions)
+    summary = summarize_emissions(emissions)
+    engine_time = time.perf_counter() - t0
+    print(f"Motor vectorizado: {engine_time:.2f} s ({int(anomalies.sum())} anomalías, {len(summary)} grupos)")
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--assets", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+    run(args.assets, args.days)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Benchmark de la carga del inventario de cerraduras de Smart Locks.
+
+Mide LockInventoryService (peticiones por asset en paralelo, caché por
+proyecto y refresco incremental) en frío, desde la caché y en un refresco
+incremental. La API se simula con una latencia fija por petición. Por defecto, 400 pisos con 20 ms
+por petición.
+
+Uso:
+    python -m tests.benchmarks.benchmark_lock_inventory [--assets 400] [--latency 0.02] [--workers 16]
+"""
+import argparse
+import logging
+import time
+
+from utils.lock_inventory import LockInventoryService
+from tests.helpers.locks import FakeLocksApi
+
+PROJECT_ID = "PROJECT-LOCKS"
+
+
+def run(n_assets=400, latency=0.02, workers=16):
+    logging.disable(logging.WARNING)
+    fake = FakeLocksApi(n_assets, latency)
+    service = LockInventoryService(ttl=300, max_workers=workers)
+
+    with fake.patched():
+        t0 = time.perf_counter()
+        cold = service.get_inventory(PROJECT_ID, "token")
+        cold_time = time.perf_counter() - t0
+        print(f"Carga en frío: {cold_time:.2f} s con {workers} hilos "
+              f"({len(cold)} cerraduras, {n_assets + 2} peticiones)")
+
+        t0 = time.perf_counter()
+        service.get_inventory(PROJECT_ID, "token")
+        print(f"Carga en caché: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+        # Dos cerraduras cambian de estado: el refresco solo consulta sus assets
+        for asset in fake.assets[:2]:
+            fake.connectivity[asset["id"]] = "OFFLINE"
+        before = fake.calls["get_asset_devices"]
+        t0 = time.perf_counter()
+        refreshed = service.get_inventory(PROJECT_ID, "token", refresh=True)
+        print(f"Refresco incremental: {time.perf_counter() - t0:.2f} s "
+              f"({fake.calls['get_asset_devices'] - before} assets consultados)")
+        assert sum(device.get("connectivity") == "OFFLINE" for device in refreshed) == 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--assets", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+    run(args.assets, args.latency, args.workers)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+Benchmark del planificador de asignaciones masivas de tarjetas NFC.
+
+Mide una asignación masiva con el planificador: una lectura por asset, plan
+completo y escrituras en paralelo entre gateways, en serie dentro de cada
+uno. La API se simula con una latencia fija por petición. Por defecto, 200 cerraduras (100 pisos con un gateway y 2
+cerraduras) y 5 tarjetas.
+
+Uso:
+    python -m tests.benchmarks.benchmark_nfc_assignment [--assets 100] [--locks 2] [--cards 5] [--latency 0.05]
+"""
+import argparse
+import logging
+import time
+
+from utils.nfc_assignment import execute_plan, plan_assignment, plan_summary
+from utils.nfc_card_index import NfcCardIndex
+from tests.helpers.nfc import FakeNfcWriteApi, format_uid, make_project_nfc_data, make_selection
+
+
+def planned_assign(devices, uuid_list, jwt_token, card_index=None):
+    card_index = card_index or NfcCardIndex()
+    card_index.ensure_assets({device["asset_id"] for device in devices}, jwt_token, refresh=True)
+    return execute_plan(plan_assignment(devices, uuid_list, card_index), jwt_token, retry_delay=0)
+
+
+def run(n_assets=100, locks_per_asset=2, cards=5, latency=0.05):
+    logging.disable(logging.WARNING)
+    project = make_project_nfc_data(n_assets, locks_per_asset, used_slots=10)
+    devices = make_selection(project)
+    uuid_list = [format_uid(0xB0000000 + i) for i in range(cards)]
+    print(f"{len(devices)} cerraduras en {n_assets} gateways, {cards} tarjetas, latencia {latency * 1000:.0f} ms")
+
+    fake = FakeNfcWriteApi(project, latency)
+    with fake.patched():
+        t0 = time.perf_counter()
+        plans = planned_assign(devices, uuid_list, "token")
+        planned_time = time.perf_counter() - t0
+    print(f"Planificador: {planned_time:.1f} s ({fake.reads} lecturas, {fake.writes} escrituras)")
+    print(f"Resumen: {plan_summary(plans)}")
+
+    assert fake.max_per_gateway == 1
+    assert fake.writes == len(devices) * cards
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--assets", type=int, default=100)
+    parser.add_argument("--locks", type=int, default=2)
+    parser.add_argument("--cards", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    run(args.assets, args.locks, args.cards, args.latency)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Benchmark de la caché de códigos NFC de Smart Locks.
+
+Simula una sesión en la página de Smart Locks: se abre la grid NFC
+(todos los assets), se cambia de pestaña varias veces, se abren modales de
+cerraduras y se asignan tarjetas. Compara las peticiones y el tiempo con la
+caché compartida frente a get_nfc_passwords_uncached, que llama a la API en
+cada callback. La API se simula con una latencia fija por petición.
+
+Uso:
+    python -m tests.benchmarks.benchmark_nfc_cache [--assets 200] [--latency 0.02] [--tab-switches 5]
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from utils import api
+from utils.nfc_cache import NfcPasswordCache
+from tests.helpers.nfc import FakeNfcApi
+
+
+def uncached_get_nfc_passwords(asset_id, jwt_token, refresh=False):
+    """get_nfc_passwords sin caché: cada callback consulta la API."""
+    return api.get_nfc_passwords_uncached(asset_id, jwt_token)
+
+
+def simulate_session(asset_ids, tab_switches):
+    """Grid NFC en paralelo + cambios de pestaña + modales + una asignación por asset."""
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        for _ in range(tab_switches):
+            list(executor.map(lambda asset_id: api.get_nfc_passwords(asset_id, "token"), asset_ids))
+    for asset_id in asset_ids[:20]:
+        api.get_nfc_passwords(asset_id, "token")
+        api.get_nfc_passwords(asset_id, "token")
+
+
+def run(n_assets=200, latency=0.02, tab_switches=5):
+    logging.disable(logging.WARNING)
+    asset_ids = [f"ASSET{i:04d}" for i in range(n_assets)]
+    fake = FakeNfcApi(latency)
+
+    with patch.object(api.auth_service, "make_api_request", fake.make_api_request):
+        with patch.object(api, "get_nfc_passwords", uncached_get_nfc_passwords):
+            t0 = time.perf_counter()
+            simulate_session(asset_ids, tab_switches)
+            uncached_time = time.perf_counter() - t0
+        uncached_requests, fake.requests = fake.requests, 0
+        print(f"Sin caché: {uncached_time:.2f} s, {uncached_requests} peticiones")
+
+        cache = NfcPasswordCache(ttl=120)
+        with patch("utils.api.get_nfc_password_cache", return_value=cache):
+            t0 = time.perf_counter()
+            simulate_session(asset_ids, tab_switches)
+            cached_time = time.perf_counter() - t0
+        stats = cache.stats()
+        print(f"Con caché: {cached_time:.2f} s, {fake.requests} peticiones "
+              f"(×{uncached_time / cached_time:.1f}, tasa de aciertos {stats['hit_rate']:.0%})")
+        assert fake.requests == n_assets
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--assets", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--tab-switches", type=int, default=5)
+    args = parser.parse_args()
+    run(args.assets, args.latency, args.tab_switches)
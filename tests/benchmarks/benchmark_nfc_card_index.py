@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Benchmark del índice de tarjetas NFC.
+
+Mide con NfcCardIndex las comprobaciones de una asignación masiva (¿está ya
+la tarjeta en la cerradura? ¿qué slot está libre?) y la búsqueda de una
+tarjeta en todo el proyecto. Por defecto, 400 pisos con 2 cerraduras, 40
+slots ocupados por cerradura y 50 tarjetas a asignar.
+
+Uso:
+    python -m tests.benchmarks.benchmark_nfc_card_index [--assets 400] [--locks 2] [--used-slots 40] [--cards 50]
+"""
+import argparse
+import logging
+import time
+
+from utils.nfc_card_index import NfcCardIndex
+from tests.helpers.nfc import format_uid, make_project_nfc_data, to_sensor_devices
+
+def index_plan(index, devices, cards):
+    plan = []
+    for device in devices:
+        reserved = 0
+        for card in cards:
+            slot = index.card_slot(device, card)
+            exists = slot is not None
+            if not exists:
+                slot = index.next_free_slot(device, reserved)
+                reserved |= 1 << int(slot)
+            plan.append((device["real_device_id"], card, slot, exists))
+    return plan
+
+
+def run(n_assets=400, locks_per_asset=2, used_slots=40, cards=50):
+    logging.disable(logging.WARNING)
+    project = make_project_nfc_data(n_assets, locks_per_asset, used_slots)
+    devices = to_sensor_devices(project)
+    existing = [devices[0]["sensors"][10]["password"], devices[-1]["sensors"][20]["password"]]
+    card_list = existing + [format_uid(0xA0000000 + i) for i in range(cards - len(existing))]
+    print(f"{len(devices)} cerraduras, {used_slots} slots ocupados por cerradura, {len(card_list)} tarjetas")
+
+    t0 = time.perf_counter()
+    index = NfcCardIndex()
+    for asset_id, nfc_data in project.items():
+        index.index_asset(asset_id, nfc_data)
+    build_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    planned = index_plan(index, devices, card_list)
+    index_time = time.perf_counter() - t0
+
+    print(f"Asignación masiva: {index_time:.3f} s (+{build_time:.2f} s de construcción)")
+
+    t0 = time.perf_counter()
+    found = [location for card in existing for location in index.find_card(card)]
+    find_time = time.perf_counter() - t0
+    print(f"Localizar {len(existing)} tarjetas en el proyecto: {find_time * 1000:.3f} ms")
+
+    assert len(found) == len(existing)
+    assert [(p[0], p[1]) for p in planned if p[3]] == [
+        (devices[0]["real_device_id"], existing[0]), (devices[-1]["real_device_id"], existing[1])
+    ]
+    assert all(int(p[2]) not in range(7, 7 + used_slots) for p in planned if not p[3])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--assets", type=int, default=400)
+    parser.add_argument("--locks", type=int, default=2)
+    parser.add_argument("--used-slots", type=int, default=40)
+    parser.add_argument("--cards", type=int, default=50)
+    args = parser.parse_args()
+    run(args.assets, args.locks, args.used_slots, args.cards)
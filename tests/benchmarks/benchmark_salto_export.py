@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Benchmark de la descarga anual de entradas de SALTO.
+
+Mide download_year (meses en paralelo, sin preflight OPTIONS, CSV escrito a
+disco en streaming y copiado por bloques). El servidor se simula con una
+latencia por petición y un ancho de banda fijo. Se mide el tiempo y el pico
+de memoria de Python (tracemalloc).
+
+Uso:
+    python -m tests.benchmarks.benchmark_salto_export [--rows 30000] [--latency 0.3] [--bandwidth 20]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+from utils.salto_export import download_year
+from tests.helpers.salto import FakeSaltoServer
+
+
+def measure(fn):
+    """Tiempo de una ejecución y pico de memoria de otra con tracemalloc (que la ralentiza)."""
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(rows=30000, latency=0.3, bandwidth_mb=20.0, year=2024):
+    logging.disable(logging.WARNING)
+    server = FakeSaltoServer(year, rows, latency, bandwidth_mb)
+    size_mb = sum(len(content) for content in server.months.values()) / 1e6
+    print(f"12 meses × {rows} entradas ({size_mb:.0f} MB), latencia {latency * 1000:.0f} ms, {bandwidth_mb:.0f} MB/s")
+
+    fd, output_path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        with server.patched():
+            result, elapsed, peak = measure(lambda: download_year("site", year, "eyJ", output_path))
+            output_size = os.path.getsize(output_path)
+            print(f"download_year: {elapsed:.1f} s, pico de memoria {peak / 1e6:.0f} MB, "
+                  f"{server.options_requests // 2} OPTIONS + {server.get_requests // 2} GET; "
+                  f"CSV de {output_size / 1e6:.0f} MB")
+    finally:
+        os.remove(output_path)
+
+    assert result["rows"] == 12 * rows
+    assert server.options_requests == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=30000)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--bandwidth", type=float, default=20.0)
+    args = parser.parse_args()
+    run(args.rows, args.latency, args.bandwidth)
@@ -0,0 +1 @@
+# tests/helpers/__init__.py
@@ -0,0 +1,34 @@
+# tests/helpers/cases.py
+"""
+Clase base de las pruebas unitarias de los módulos de rendimiento.
+"""
+import logging
+import shutil
+import tempfile
+import unittest
+
+
+class QuietTestCase(unittest.TestCase):
+    """
+    Silencia los avisos de los módulos probados durante cada prueba y ofrece
+    atajos para los recursos que se liberan al terminarla.
+
+    Las subclases que definen ``setUp`` deben llamar a ``super().setUp()``.
+    """
+
+    def setUp(self):
+        super().setUp()
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+    def enter_context(self, context):
+        """Entra en un context manager (un patch, ``Fake*Api.patched()``...) hasta el final de la prueba."""
+        value = context.__enter__()
+        self.addCleanup(context.__exit__, None, None, None)
+        return value
+
+    def make_temp_dir(self):
+        """Crea un directorio temporal que se borra al terminar la prueba."""
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, True)
+        return path
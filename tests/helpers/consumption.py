@@ -0,0 +1,84 @@
+"""
+Generadores de series de consumo sintéticas para los tests y los benchmarks.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+CONSUMPTION_TYPES = ["Agua fría", "Energía general"]
+COLD_WATER_TAG = "_TRANSVERSAL_CONSUMPTION_LIST_TAG_NAME_DOMESTIC_COLD_WATER"
+
+
+def make_daily_consumption(n_assets, n_days, seed=0):
+    """Consumo diario por asset y tipo, con picos, ceros y días sin lectura, que termina hoy."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end=pd.Timestamp.now().normalize(), periods=n_days, freq='D')
+    n_series = n_assets * len(CONSUMPTION_TYPES)
+
+    values = rng.gamma(4.0, 1.5, size=(n_series, n_days))
+    spikes = rng.random(values.shape) < 0.01
+    values[spikes] *= rng.uniform(5, 20, size=spikes.sum())
+    values[rng.random(values.shape) < 0.01] = 0.0
+    values[rng.random(values.shape) < 0.01] = np.nan
+
+    assets = np.repeat([f"ASSET{i:05d}" for i in range(n_assets)], len(CONSUMPTION_TYPES))
+    types = np.tile(CONSUMPTION_TYPES, n_assets)
+    df = pd.DataFrame({
+        'date': np.tile(dates.values, n_series),
+        'asset_id': np.repeat(assets, n_days),
+        'consumption_type': np.repeat(types, n_days),
+        'consumption': values.ravel(),
+    })
+    # Filas desordenadas, como al concatenar varios CSV
+    return df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def make_cumulative_readings(n_assets, n_days, seed=0):
+    """Lecturas acumuladas por asset y tipo, con reinicios, reemplazos y valores de error."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2024-01-01", periods=n_days, freq='D')
+    n_series = n_assets * len(CONSUMPTION_TYPES)
+
+    increments = rng.gamma(2.0, 5.0, size=(n_series, n_days))
+    values = rng.uniform(0, 5000, size=(n_series, 1)) + np.cumsum(increments, axis=1)
+    resets = rng.random(values.shape) < 0.005
+    for row, col in zip(*np.nonzero(resets)):
+        # Reinicio parcial o vuelta a cero (reemplazo) a partir de ese día
+        values[row, col:] -= values[row, col] * (0.5 if rng.random() < 0.5 else 0.99)
+
+    assets = np.repeat([f"ASSET{i:05d}" for i in range(n_assets)], len(CONSUMPTION_TYPES))
+    types = np.tile(CONSUMPTION_TYPES, n_assets)
+    df = pd.DataFrame({
+        'date': np.tile(dates.values, n_series),
+        'asset_id': np.repeat(assets, n_days),
+        'consumption_type': np.repeat(types, n_days),
+        'consumption': values.ravel().round(2),
+    })
+    # Filas desordenadas, como al concatenar varios CSV
+    return df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def make_sorted_readings(n_assets, n_days, seed=0):
+    """Lecturas acumuladas ordenadas por serie y fecha, como las que corrige la aplicación."""
+    df = make_cumulative_readings(n_assets, n_days, seed)
+    return df.sort_values(['asset_id', 'consumption_type', 'date'], kind='mergesort').reset_index(drop=True)
+
+
+def make_project_files(base_path, project_id, n_assets, n_days, seed=0):
+    """Un CSV de lecturas diarias (date, value) por asset, con picos y valores no numéricos."""
+    rng = np.random.default_rng(seed)
+    project_dir = os.path.join(base_path, project_id)
+    os.makedirs(project_dir, exist_ok=True)
+    dates = pd.date_range(end=pd.Timestamp.now().normalize(), periods=n_days, freq='D').strftime('%Y-%m-%d')
+
+    values = rng.gamma(4.0, 1.5, size=(n_assets, n_days)).round(2)
+    spikes = rng.random(values.shape) < 0.01
+    values[spikes] *= rng.uniform(5, 20, size=spikes.sum()).round(1)
+    for i in range(n_assets):
+        column = values[i].astype(object)
+        column[rng.random(n_days) < 0.005] = 'Error'
+        pd.DataFrame({'date': dates, 'value': column}).to_csv(
+            os.path.join(project_dir, f"daily_readings_ASSET{i:05d}_{COLD_WATER_TAG}.csv"), index=False
+        )
+    return project_dir
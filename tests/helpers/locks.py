@@ -0,0 +1,57 @@
+"""
+API de Smart Locks simulada para los tests y los benchmarks del inventario de cerraduras.
+"""
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from utils import api
+
+
+class FakeLocksApi:
+    """API simulada: un gateway con una cerradura por piso y dos puertas comunitarias."""
+
+    def __init__(self, n_assets, latency=0.02):
+        self.latency = latency
+        self.assets = [
+            {"id": f"ASSET{i:04d}", "name": f"Piso {i}", "alias": f"{i // 4 + 1}º{'ABCD'[i % 4]}",
+             "staircase": str(i % 3 + 1), "apartment": f"{i // 4 + 1}{'ABCD'[i % 4]}"}
+            for i in range(n_assets)
+        ]
+        self.connectivity = {asset["id"]: "ONLINE" for asset in self.assets}
+        self.calls = {"get_devices": 0, "get_project_assets": 0, "get_asset_devices": 0, "get_nfc_passwords": 0}
+
+    def _lock(self, asset_id):
+        return {"device_id": f"LOCK-{asset_id}", "device_type": "SMARTLOCK_NUKI", "asset_id": asset_id,
+                "connectivity": self.connectivity[asset_id],
+                "sensors": [{"sensor_id": "0", "sensor_type": "LOCK"}]}
+
+    def get_devices(self, project_id=None, jwt_token=None, device_types=None):
+        self.calls["get_devices"] += 1
+        time.sleep(self.latency)
+        community = [{"device_id": f"DOOR{i}", "gateway_id": f"GW-DOOR{i}",
+                      "sensors": [{"sensor_id": "0", "usage": "CommunityDoor"}]} for i in range(2)]
+        return community + [self._lock(asset["id"]) for asset in self.assets]
+
+    def get_project_assets(self, project_id, jwt_token=None):
+        self.calls["get_project_assets"] += 1
+        time.sleep(self.latency)
+        return [dict(asset) for asset in self.assets]
+
+    def get_asset_devices(self, asset_id, jwt_token=None, device_types=None):
+        self.calls["get_asset_devices"] += 1
+        time.sleep(self.latency)
+        return [{"uuid": f"GW-{asset_id}", "asset_id": asset_id, "devices": [self._lock(asset_id)]}]
+
+    def get_nfc_passwords(self, asset_id, jwt_token=None):
+        self.calls["get_nfc_passwords"] += 1
+        time.sleep(self.latency)
+        return {"data": {"devices": []}}
+
+    @contextmanager
+    def patched(self):
+        with patch.object(api, "get_devices", self.get_devices), \
+             patch.object(api, "get_project_assets", self.get_project_assets), \
+             patch.object(api, "get_asset_devices", self.get_asset_devices), \
+             patch.object(api, "get_nfc_passwords", self.get_nfc_passwords):
+            yield
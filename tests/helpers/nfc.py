@@ -0,0 +1,133 @@
+"""
+Respuestas y APIs de códigos NFC simuladas para los tests y los benchmarks de Smart Locks.
+"""
+import copy
+import threading
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import numpy as np
+
+from utils import api
+
+
+def make_nfc_response(asset_id, n_locks=2, n_slots=10):
+    """Respuesta de /sensor-passwords/deployment/{asset_id} con n_locks cerraduras."""
+    return {"data": [
+        {"device_name": f"Cerradura {asset_id}-{lock}", "device_type": "LOCK",
+         "sensor_passwords": [
+             {"device_id": f"{lock + 1}", "gateway_id": f"GW-{asset_id}", "sensor_id": str(slot),
+              "sensor_type": "NFC_CODE", "password": f"{asset_id}{lock}{slot:02d}" if slot % 3 == 0 else ""}
+             for slot in range(n_slots)
+         ]}
+        for lock in range(n_locks)
+    ]}
+
+
+class FakeNfcApi:
+    """Sustituto de auth_service.make_api_request para el endpoint de códigos NFC."""
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.requests = 0
+
+    def make_api_request(self, token, method, endpoint, data=None, params=None):
+        self.requests += 1
+        time.sleep(self.latency)
+        return make_nfc_response(endpoint.rsplit("/", 1)[-1])
+
+
+def format_uid(value):
+    """UID de 32 bits con el formato de las tarjetas (AA:BB:CC:DD)."""
+    return ":".join(f"{value:08X}"[i:i + 2] for i in range(0, 8, 2))
+
+
+def make_project_nfc_data(n_assets, locks_per_asset, used_slots, seed=0):
+    """Códigos NFC por asset en el formato de get_nfc_passwords."""
+    rng = np.random.default_rng(seed)
+    uids = rng.integers(0, 2 ** 32, size=(n_assets, locks_per_asset, used_slots))
+    project = {}
+    for a in range(n_assets):
+        asset_id = f"ASSET{a:04d}"
+        devices = []
+        for lock in range(locks_per_asset):
+            device = {"device_id": f"Cerradura {lock}", "real_device_id": str(lock + 1),
+                      "gateway_id": f"GW-{asset_id}", "asset_id": asset_id}
+            for slot in range(1, 99):
+                position = slot - 7
+                device[f"sensor_{slot}"] = format_uid(uids[a, lock, position]) if 0 <= position < used_slots else ""
+            devices.append(device)
+        project[asset_id] = {"data": {"devices": devices}}
+    return project
+
+
+def to_sensor_devices(project):
+    """Cerraduras con lista 'sensors', como las recibía check_card_exists."""
+    devices = []
+    for asset_id, nfc_data in project.items():
+        for device in nfc_data["data"]["devices"]:
+            sensors = [{"sensor_id": key[7:], "password": value}
+                       for key, value in device.items() if key.startswith("sensor_")]
+            devices.append({**{k: v for k, v in device.items() if not k.startswith("sensor_")}, "sensors": sensors})
+    return devices
+
+
+class FakeNfcWriteApi:
+    """API simulada de códigos NFC: lectura por asset y escritura por slot."""
+
+    def __init__(self, project, latency=0.05, failures=(), unreadable=()):
+        self.project = copy.deepcopy(project)
+        self.latency = latency
+        # (gateway_id, device_id, slot) cuya primera escritura falla
+        self.failures = set(failures)
+        # Assets cuya lectura falla (get_nfc_passwords devuelve None)
+        self.unreadable = set(unreadable)
+        self.reads = 0
+        self.writes = 0
+        self.max_per_gateway = 0
+        self._active = {}
+        self._lock = threading.Lock()
+
+    def get_nfc_passwords(self, asset_id, jwt_token, refresh=False):
+        with self._lock:
+            self.reads += 1
+            result = copy.deepcopy(self.project.get(asset_id, {"data": {"devices": []}}))
+        time.sleep(self.latency)
+        return None if asset_id in self.unreadable else result
+
+    def update_nfc_code_value(self, asset_id, device_id, sensor_id, new_value, jwt_token=None,
+                              gateway_id=None, is_master_card=False):
+        with self._lock:
+            self.writes += 1
+            self._active[gateway_id] = self._active.get(gateway_id, 0) + 1
+            self.max_per_gateway = max(self.max_per_gateway, self._active[gateway_id])
+        time.sleep(self.latency)
+        with self._lock:
+            self._active[gateway_id] -= 1
+            if (gateway_id, str(device_id), str(sensor_id)) in self.failures:
+                self.failures.discard((gateway_id, str(device_id), str(sensor_id)))
+                return False, "Error 503"
+            for device in self.project[asset_id]["data"]["devices"]:
+                if str(device["real_device_id"]) == str(device_id) and device["gateway_id"] == gateway_id:
+                    device[f"sensor_{sensor_id}"] = new_value
+        return True, None
+
+    def device_slots(self, asset_id, gateway_id, device_id):
+        for device in self.project[asset_id]["data"]["devices"]:
+            if str(device["real_device_id"]) == str(device_id) and device["gateway_id"] == gateway_id:
+                return {key[7:]: value for key, value in device.items() if key.startswith("sensor_") and value}
+        return {}
+
+    @contextmanager
+    def patched(self):
+        with patch.object(api, "get_nfc_passwords", self.get_nfc_passwords), \
+                patch.object(api, "update_nfc_code_value", self.update_nfc_code_value):
+            yield self
+
+
+def make_selection(project):
+    """Cerraduras seleccionadas en la grid NFC."""
+    return [{"asset_id": device["asset_id"], "gateway_id": device["gateway_id"],
+             "real_device_id": device["real_device_id"], "display_name": device["device_id"]}
+            for nfc_data in project.values() for device in nfc_data["data"]["devices"]]
@@ -0,0 +1,109 @@
+"""
+Exportación de entradas de SALTO simulada para los tests y los benchmarks.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import requests
+
+SALTO_COLUMNS = [
+    "Local Time", "UTC Time", "Event Category", "Event Detail", "Lock Name", "Lock Id",
+    "User First Name", "User Last Name", "User Id", "Access By", "Access Detail", "Site Name",
+]
+
+
+def make_month_csv(year, month, rows, seed=0):
+    """CSV de entradas de un mes, separado por ';' como la exportación de SALTO."""
+    rng = np.random.default_rng(seed + month)
+    start = datetime(year, month, 1)
+    seconds = np.sort(rng.integers(0, 28 * 86400, size=rows))
+    times = [(start + timedelta(seconds=int(s))).strftime("%m/%d/%Y %H:%M:%S") for s in seconds]
+    locks = rng.integers(1, 40, size=rows)
+    users = rng.integers(1, 500, size=rows)
+    frame = pd.DataFrame({
+        "Local Time": times,
+        "UTC Time": times,
+        "Event Category": np.where(rng.random(rows) < 0.9, "Access", "Alarm"),
+        "Event Detail": "Opened",
+        "Lock Name": [f"Puerta {lock}" for lock in locks],
+        "Lock Id": [f"lock-{lock:04d}" for lock in locks],
+        "User First Name": [f"Nombre{user}" for user in users],
+        "User Last Name": [f"Apellido{user}" for user in users],
+        "User Id": [f"user-{user:05d}" for user in users],
+        "Access By": "Key",
+        "Access Detail": "NFC",
+        "Site Name": "Site",
+    }, columns=SALTO_COLUMNS)
+    return frame.to_csv(sep=";", index=False).encode("utf-8")
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", bandwidth=None):
+        self.status_code = status_code
+        self.content = content
+        self.bandwidth = bandwidth
+
+    def _transfer(self, size):
+        if self.bandwidth:
+            time.sleep(size / self.bandwidth)
+
+    @property
+    def text(self):
+        self._transfer(len(self.content))
+        return self.content.decode("utf-8")
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            chunk = self.content[i:i + chunk_size]
+            self._transfer(len(chunk))
+            yield chunk
+
+    def close(self):
+        pass
+
+
+class FakeSaltoServer:
+    """Endpoint de exportación simulado; también hace de cliente HTTP compartido."""
+
+    def __init__(self, year, rows_per_month, latency=0.3, bandwidth_mb=20.0, statuses=None, months=None):
+        self.months = months or {month: make_month_csv(year, month, rows_per_month) for month in range(1, 13)}
+        self.latency = latency
+        self.bandwidth = bandwidth_mb * 1e6 if bandwidth_mb else None
+        # Código de respuesta por mes (200 por defecto)
+        self.statuses = statuses or {}
+        self.options_requests = 0
+        self.get_requests = 0
+        self.max_active = 0
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def options(self, url, params=None, headers=None, **kwargs):
+        with self._lock:
+            self.options_requests += 1
+        time.sleep(self.latency)
+        return FakeResponse(204)
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        month = int(params["from_date"][5:7])
+        with self._lock:
+            self.get_requests += 1
+            self._active += 1
+            self.max_active = max(self.max_active, self._active)
+        try:
+            time.sleep(self.latency)
+            status = self.statuses.get(month, 200)
+            return FakeResponse(status, self.months.get(month, b"") if status == 200 else b"error", self.bandwidth)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    @contextmanager
+    def patched(self):
+        with patch.object(requests, "options", self.options), patch.object(requests, "get", self.get), \
+                patch("utils.salto_export.get_http_client", return_value=self):
+            yield self
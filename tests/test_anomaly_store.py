@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from utils.repositories import reading_repository
+from utils.repositories.anomaly_store import AnomalyStore
+from utils.repositories.reading_repository import ReadingRepository
+
+
+def _anomaly(asset_id, date, consumption_type="Agua fría", anomaly_type="counter_reset", **extra):
+    anomaly = {
+        'type': anomaly_type, 'date': date, 'previous_value': 140.0, 'current_value': 50.0,
+        'asset_id': asset_id, 'consumption_type': consumption_type, 'offset': 90.0,
+    }
+    anomaly.update(extra)
+    return anomaly
+
+
+class TestAnomalyStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = AnomalyStore(os.path.join(self.temp_dir, "anomalies.db"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_query_filters_by_series_and_date_range(self):
+        self.store.save_many([
+            _anomaly("A", "2024-01-10T00:00:00"),
+            _anomaly("A", "2024-02-10T00:00:00"),
+            _anomaly("A", "2024-01-15T00:00:00", consumption_type="Energía general"),
+            _anomaly("B", "2024-01-20T00:00:00"),
+            _anomaly("C", "no es una fecha"),
+        ])
+
+        dates = lambda anomalies: [a['date'] for a in anomalies]
+        self.assertEqual(dates(self.store.query("A", "Agua fría")), ["2024-01-10T00:00:00", "2024-02-10T00:00:00"])
+        self.assertEqual(dates(self.store.query("A", start_date="2024-01-12", end_date="2024-02-01T00:00:00Z")),
+                         ["2024-01-15T00:00:00"])
+        self.assertEqual(dates(self.store.query(consumption_type="Agua fría", end_date="2024-01-31")),
+                         ["2024-01-10T00:00:00", "2024-01-20T00:00:00"])
+        # Las fechas no interpretables no se devuelven, como con los archivos JSON
+        self.assertEqual(len(self.store.query()), 4)
+        self.assertEqual(self.store.count(), 5)
+
+    def test_same_asset_and_day_keeps_last_and_update_keeps_original_type(self):
+        keys = self.store.save_many([_anomaly("A", "2024-01-10T00:00:00"),
+                                     _anomaly("A", "2024-01-10T12:00:00", current_value="55.5")])
+        self.assertEqual(keys, ["A_Agua fría_20240110"])
+        stored = self.store.query("A")
+        self.assertEqual(len(stored), 1)
+        self.assertEqual(stored[0]['current_value'], 55.5)
+
+        updated = dict(stored[0], type="sensor_replacement")
+        self.store.update_many([updated, _anomaly("B", "2024-03-01T00:00:00")])
+        self.assertEqual(self.store.get("A_Agua fría_20240110")['original_type'], "counter_reset")
+        self.assertEqual(self.store.get("A_Agua fría_20240110")['type'], "sensor_replacement")
+        self.assertNotIn('original_type', self.store.get("B_Agua fría_20240301"))
+
+    def test_same_day_resets_on_different_meters_are_kept(self):
+        keys = self.store.save_many([_anomaly("A", "2024-01-10T00:00:00"),
+                                     _anomaly("A", "2024-01-10T00:00:00", consumption_type="Agua caliente")])
+        self.assertEqual(keys, ["A_Agua fría_20240110", "A_Agua caliente_20240110"])
+        self.assertEqual(sorted(a['consumption_type'] for a in self.store.query("A")), ["Agua caliente", "Agua fría"])
+
+    def test_old_keys_are_migrated(self):
+        db_path = os.path.join(self.temp_dir, "old.db")
+        AnomalyStore(db_path)
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute("DELETE FROM store_meta")
+            conn.execute("INSERT INTO anomalies (anomaly_key, asset_id, consumption_type, date_key, type, payload) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         ("A_20240110", "A", "Agua fría", "2024-01-10 00:00:00.000000", "counter_reset",
+                          json.dumps(_anomaly("A", "2024-01-10T00:00:00"))))
+        conn.close()
+
+        store = AnomalyStore(db_path)
+        self.assertIsNone(store.get("A_20240110"))
+        self.assertEqual(store.get("A_Agua fría_20240110")['asset_id'], "A")
+        store.save_many([_anomaly("A", "2024-01-10T00:00:00", consumption_type="Agua caliente")])
+        self.assertEqual(store.count(), 2)
+
+    def test_migrates_json_files_once(self):
+        json_dir = os.path.join(self.temp_dir, "json")
+        os.makedirs(json_dir)
+        for anomaly in (_anomaly("A", "2024-01-10T00:00:00"), _anomaly("B", "2024-01-11T00:00:00")):
+            path = os.path.join(json_dir, f"anomaly_{anomaly['asset_id']}_{anomaly['date'][:10].replace('-', '')}.json")
+            with open(path, 'w') as f:
+                json.dump(anomaly, f)
+        with open(os.path.join(json_dir, "anomaly_broken_20240101.json"), 'w') as f:
+            f.write("{")
+        # Una anomalía ya presente en el almacén no se sobrescribe
+        self.store.save_many([_anomaly("A", "2024-01-10T00:00:00", anomaly_type="sensor_replacement")])
+
+        self.assertEqual(self.store.migrate_json_files(json_dir), 1)
+        self.assertEqual(self.store.migrate_json_files(json_dir), 0)
+        self.assertEqual(self.store.get("A_Agua fría_20240110")['type'], "sensor_replacement")
+        self.assertEqual([a['asset_id'] for a in self.store.query()], ["A", "B"])
+        self.assertTrue(os.path.exists(os.path.join(json_dir, "anomaly_B_20240111.json")))
+
+
+class TestReadingRepositoryAnomalies(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        patcher = patch.object(reading_repository, "ANOMALIES_PATH", os.path.join(self.temp_dir, ""))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_repository_uses_store_and_migrates_existing_files(self):
+        with open(os.path.join(self.temp_dir, "anomaly_A_20240110.json"), 'w') as f:
+            json.dump(_anomaly("A", "2024-01-10T00:00:00"), f)
+
+        repository = ReadingRepository()
+        self.assertEqual(repository.anomaly_store.db_path, os.path.join(self.temp_dir, "anomalies.db"))
+        self.assertEqual(len(repository.get_anomalies(asset_id="A", consumption_type="Agua fría")), 1)
+
+        self.assertEqual(repository.save_anomalies([_anomaly("B", "2024-01-12T00:00:00")]), ["B_Agua fría_20240112"])
+        repository.update_anomaly(_anomaly("A", "2024-01-10T00:00:00", anomaly_type="sensor_replacement"))
+        anomalies = ReadingRepository().get_anomalies(start_date="2024-01-01", end_date="2024-01-31")
+        self.assertEqual([(a['asset_id'], a['type']) for a in anomalies],
+                         [("A", "sensor_replacement"), ("B", "counter_reset")])
+        self.assertEqual(anomalies[0]['original_type'], "counter_reset")
+
+
+if __name__ == "__main__":
+    unittest.main()
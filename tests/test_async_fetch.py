@@ -0,0 +1,228 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+import utils.api as api
+from utils import async_fetch
+from utils.sensor_metadata import SensorMetadataCache
+
+TAG_NAME = "_TRANSVERSAL_CONSUMPTION_LIST_TAG_NAME_DOMESTIC_COLD_WATER"
+ASSETS = [f"ASSET{i}" for i in range(20)]
+
+
+def _sensors(asset_id):
+    return [{"tag_name": TAG_NAME, "gateway_id": "GW1", "device_id": f"DEV-{asset_id}", "sensor_id": "1"}]
+
+
+class _TimeSeriesHandler(BaseHTTPRequestHandler):
+    """Simula /data/assets/time-series: una lectura diaria por día del rango pedido."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        asset_id = parts.path.rsplit("/", 1)[-1]
+        with server.lock:
+            server.requests.append((asset_id, query["from"], query["until"]))
+            hits = server.hits[asset_id] = server.hits.get(asset_id, 0) + 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(0.01)
+            if asset_id == "FLAKY" and hits == 1:
+                status, data = 503, []
+            elif asset_id == "BROKEN":
+                status, data = 500, []
+            else:
+                status = 200
+                start = datetime.strptime(query["from"], "%m-%d-%Y")
+                end = datetime.strptime(query["until"], "%m-%d-%Y")
+                data = []
+                day = start
+                while day <= end:
+                    data.append({"ts": int((day + timedelta(hours=12)).timestamp()), "v": day.day})
+                    day += timedelta(days=1)
+            body = json.dumps({"data": data}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+@unittest.skipUnless(async_fetch.AIOHTTP_AVAILABLE, "aiohttp no está instalado")
+class TestAsyncFetch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _TimeSeriesHandler)
+        cls.server.daemon_threads = True
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.hits = {}
+        self.server.active = 0
+        self.server.max_active = 0
+        self.project_folder = tempfile.mkdtemp()
+        self.patches = [
+            patch.object(api, "ensure_project_folder_exists", return_value=self.project_folder),
+            patch.object(api, "get_sensors_with_tags", side_effect=lambda asset_id, token=None: _sensors(asset_id)),
+            patch("utils.api.get_sensor_metadata_cache", return_value=SensorMetadataCache(ttl=0)),
+            patch("utils.repositories.readings_writer.sync_readings_file"),
+            patch.object(api.auth_service, "get_user_data_from_token", return_value={"email": "test@example.com"}),
+            patch.object(api.auth_service, "get_auth_headers_from_token", return_value={"Authorization": "Bearer t"}),
+            patch("utils.http_client.backoff_delay", return_value=0),
+            patch.object(async_fetch, "backoff_delay", return_value=0),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        shutil.rmtree(self.project_folder, ignore_errors=True)
+
+    def _file(self, asset_id):
+        return os.path.join(self.project_folder, f"daily_readings_{asset_id}_{TAG_NAME}.csv")
+
+    def _run(self, asset_ids, concurrency=5):
+        with patch.object(api, "get_asset_ids_from_project", return_value=asset_ids):
+            return async_fetch.get_daily_readings_for_period_multiple_tags_project_async(
+                "PROJECT", [TAG_NAME], "2024-01-01", "2024-06-30", token="token",
+                concurrency=concurrency, base_url=self.base_url
+            )
+
+    def test_fetches_every_sensor_with_bounded_concurrency(self):
+        result = self._run(ASSETS, concurrency=5)
+
+        self.assertTrue(result["success"])
+        self.assertEqual(result["success_count"], len(ASSETS) * 6)
+        self.assertEqual(result["error_count"], 0)
+        self.assertEqual(result["months_processed"], [f"2024-0{m}" for m in range(1, 7)])
+        # Una petición por sensor para los seis meses consecutivos
+        self.assertEqual(len(self.server.requests), len(ASSETS))
+        self.assertEqual({r[1:] for r in self.server.requests}, {("01-01-2024", "06-30-2024")})
+        self.assertLessEqual(self.server.max_active, 5)
+        for asset_id in ASSETS:
+            df = pd.read_csv(self._file(asset_id))
+            self.assertEqual(len(df), 182)
+            self.assertEqual(df["date"].iloc[0], "2024-01-01")
+
+    def test_matches_threaded_updater_output(self):
+        self._run(["ASSET1"])
+        async_df = pd.read_csv(self._file("ASSET1"))
+        os.remove(self._file("ASSET1"))
+
+        def local_get(url, **kwargs):
+            import requests
+            return requests.get(url.replace(api.BASE_URL, self.base_url), **kwargs)
+
+        with patch.object(api, "get_asset_ids_from_project", return_value=["ASSET1"]), \
+             patch.object(api.http_client, "get", side_effect=local_get):
+            api.get_daily_readings_for_period_multiple_tags_project_parallel(
+                "PROJECT", [TAG_NAME], "2024-01-01", "2024-06-30", token="token"
+            )
+        pd.testing.assert_frame_equal(async_df, pd.read_csv(self._file("ASSET1")))
+
+    def test_only_pending_months_are_requested(self):
+        dates = pd.date_range("2024-01-01", "2024-03-31").strftime("%Y-%m-%d")
+        pd.DataFrame({"date": dates, "value": 1.0, "timestamp": 0}).to_csv(self._file("ASSET1"), index=False)
+
+        self._run(["ASSET1"])
+
+        self.assertEqual(self.server.requests, [("ASSET1", "04-01-2024", "06-30-2024")])
+        df = pd.read_csv(self._file("ASSET1"))
+        self.assertEqual(len(df), 182)
+        self.assertEqual(df.loc[df["date"] == "2024-01-15", "value"].iloc[0], 1.0)
+
+    def test_retries_server_errors_and_reports_failures(self):
+        result = self._run(["FLAKY", "BROKEN"])
+
+        self.assertTrue(result["success"])
+        self.assertEqual(result["success_count"], 6)
+        self.assertEqual(result["error_count"], 6)
+        self.assertEqual(self.server.hits["FLAKY"], 2)
+        self.assertEqual(self.server.hits["BROKEN"], 1 + api.http_client.max_retries)
+        self.assertTrue(os.path.exists(self._file("FLAKY")))
+        self.assertFalse(os.path.exists(self._file("BROKEN")))
+
+    def test_readings_update_job_reports_progress(self):
+        from utils.jobs import JobManager
+
+        manager = JobManager(storage_path=os.path.join(self.project_folder, "jobs"), persist_interval=0)
+        self.addCleanup(manager.shutdown)
+        with patch.object(async_fetch, "get_job_manager", return_value=manager), \
+             patch.object(async_fetch, "ASYNC_FETCH_CONCURRENCY", 5), \
+             patch.object(api, "BASE_URL", self.base_url), \
+             patch.object(api, "get_asset_ids_from_project", return_value=ASSETS[:3]):
+            job_id = async_fetch.submit_readings_update("PROJECT", [TAG_NAME], "2024-01-01", "2024-06-30", token="token")
+            job = manager.wait(job_id, timeout=10)
+
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual((job["total"], job["processed"], job["success"]), (18, 18, 18))
+        self.assertEqual(job["result"]["success_count"], 18)
+
+    def test_cancellation_stops_pending_requests_and_writes(self):
+        class CancelAfterFirstRequests:
+            def __init__(self, server):
+                self.server = server
+
+            def is_cancelled(self):
+                return len(self.server.requests) >= 2
+
+            def set_total(self, total):
+                pass
+
+            def advance(self, success=True, count=1):
+                pass
+
+        with patch.object(api, "get_asset_ids_from_project", return_value=ASSETS):
+            result = async_fetch.get_daily_readings_for_period_multiple_tags_project_async(
+                "PROJECT", [TAG_NAME], "2024-01-01", "2024-06-30", token="token",
+                concurrency=2, base_url=self.base_url, job=CancelAfterFirstRequests(self.server)
+            )
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(result["success_count"], 0)
+        self.assertEqual(result["error_count"], len(ASSETS) * 6)
+        self.assertFalse(any(os.path.exists(self._file(asset_id)) for asset_id in ASSETS))
+
+
+class TestAsyncFetchFallback(unittest.TestCase):
+    def test_falls_back_to_threaded_updater_without_aiohttp(self):
+        with patch.object(async_fetch, "AIOHTTP_AVAILABLE", False), \
+             patch.object(api, "get_daily_readings_for_period_multiple_tags_project_parallel",
+                          return_value={"success": True}) as threaded:
+            result = async_fetch.get_daily_readings_for_period_multiple_tags_project_async(
+                "PROJECT", [TAG_NAME], "2024-01-01", "2024-06-30", token="token"
+            )
+        self.assertEqual(result, {"success": True})
+        threaded.assert_called_once_with("PROJECT", [TAG_NAME], "2024-01-01", "2024-06-30", "token")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import logging
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from utils.anomaly_experimental.contextual_detection import ContextualAnomalyDetector
+from tests.helpers.consumption import make_daily_consumption
+
+RESULT_COLUMNS = ['is_contextual_anomaly', 'contextual_anomaly_confidence',
+                  'contextual_anomaly_type', 'contextual_anomaly_threshold']
+FIXED_THRESHOLDS = {
+    'medium_threshold': 5.0, 'high_threshold': 10.0,
+    'medium_threshold_pct': 50.0, 'high_threshold_pct': 100.0,
+    'daily_max': 30.0, 'sudden_increase': 5.0,
+}
+
+
+class TestContextualAnomalyDetector(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.INFO)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+    def _fixed_thresholds(self):
+        def thresholds(df, **kwargs):
+            keys = df[['asset_id', 'consumption_type']].drop_duplicates().itertuples(index=False, name=None)
+            return {key: dict(FIXED_THRESHOLDS) for key in keys}
+        return patch("utils.anomaly_experimental.contextual_detection.compute_thresholds", side_effect=thresholds)
+
+    def test_groups_are_scored_separately(self):
+        df = pd.DataFrame({
+            'date': pd.to_datetime(['2024-01-02', '2024-01-01', '2024-01-01', '2024-01-02',
+                                    '2024-01-01', '2024-01-02', '2024-01-02', '2024-01-01']),
+            'asset_id': ['A', 'A', 'A', 'B', 'B', 'B', 'A', 'LONE'],
+            'consumption_type': ['Agua fría', 'Agua fría', 'Energía general', 'Agua fría',
+                                 'Agua fría', 'Agua fría', 'Energía general', 'Agua fría'],
+            'consumption': [9.0, 8.0, 20.0, 16.0, 10.0, 16.0, 9.0, 50.0],
+        })
+        with self._fixed_thresholds():
+            result = ContextualAnomalyDetector().detect_anomalies(df)
+
+        # B tiene dos lecturas el mismo día: solo la primera cambia respecto al día anterior.
+        # LONE tiene una única lectura y no se evalúa aunque supere daily_max.
+        self.assertEqual(result['is_contextual_anomaly'].tolist(),
+                         [False, False, False, True, False, False, True, False])
+        self.assertEqual(result.loc[3, 'contextual_anomaly_type'], 'percentage_change')
+        self.assertAlmostEqual(result.loc[3, 'contextual_anomaly_confidence'], 0.4 + (60 / 50 - 1) * 0.1)
+        self.assertEqual(result.loc[3, 'contextual_anomaly_threshold'], 50.0)
+        # 20 -> 9: -11 supera el umbral alto absoluto y se mantiene frente al -55%
+        self.assertEqual(result.loc[6, 'contextual_anomaly_type'], 'absolute_change')
+        self.assertAlmostEqual(result.loc[6, 'contextual_anomaly_confidence'], 0.5 + (11 / 10 - 1) * 0.1)
+        self.assertEqual(result.loc[6, 'contextual_anomaly_threshold'], 10.0)
+        pd.testing.assert_frame_equal(result[df.columns], df)
+
+    def test_rules_with_fixed_thresholds(self):
+        df = pd.DataFrame({
+            # Desordenado a propósito: se puntúa en orden de fecha
+            'date': pd.to_datetime(['2024-01-03', '2024-01-01', '2024-01-02', '2024-01-04', '2024-01-05']),
+            'asset_id': 'A',
+            'consumption_type': 'Agua fría',
+            'consumption': [20.0, 8.0, 9.0, 35.0, 36.0],
+        })
+        with self._fixed_thresholds():
+            result = ContextualAnomalyDetector().detect_anomalies(df)
+        by_date = result.set_index(result['date'].dt.day)
+
+        # Primera lectura: sin lectura anterior, no se evalúa
+        self.assertFalse(by_date.loc[1, 'is_contextual_anomaly'])
+        self.assertFalse(by_date.loc[2, 'is_contextual_anomaly'])
+        # 9 -> 20: +11 supera el umbral alto absoluto, pero el +122% da más confianza
+        self.assertEqual(by_date.loc[3, 'contextual_anomaly_type'], 'percentage_change')
+        self.assertAlmostEqual(by_date.loc[3, 'contextual_anomaly_confidence'], 0.6 + (1100 / 9 / 100 - 1) * 0.1)
+        self.assertEqual(by_date.loc[3, 'contextual_anomaly_threshold'], 100.0)
+        # 20 -> 35: supera daily_max, que sustituye a la confianza < 0.8
+        self.assertEqual(by_date.loc[4, 'contextual_anomaly_type'], 'daily_max_exceeded')
+        self.assertAlmostEqual(by_date.loc[4, 'contextual_anomaly_confidence'], 0.5 + (35 / 30 - 1) * 0.1)
+        self.assertEqual(by_date.loc[5, 'contextual_anomaly_type'], 'daily_max_exceeded')
+        self.assertIsNone(by_date.loc[2, 'contextual_anomaly_type'])
+
+    def test_single_asset_mode_only_scores_that_asset(self):
+        df = make_daily_consumption(3, 60, seed=1)
+        with self._fixed_thresholds():
+            result = ContextualAnomalyDetector("ASSET00001", "Agua fría").detect_anomalies(df)
+            missing = ContextualAnomalyDetector("OTHER", "Agua fría").detect_anomalies(df)
+
+        selected = (df['asset_id'] == "ASSET00001") & (df['consumption_type'] == "Agua fría")
+        self.assertTrue(result.loc[selected, 'is_contextual_anomaly'].any())
+        self.assertFalse(result.loc[~selected, 'is_contextual_anomaly'].any())
+        self.assertTrue(np.all(result.loc[~selected, 'contextual_anomaly_confidence'] == 0.0))
+        self.assertNotIn('is_contextual_anomaly', missing.columns)
+
+
+if __name__ == "__main__":
+    unittest.main()
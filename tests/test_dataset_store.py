@@ -0,0 +1,73 @@
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from utils.metrics import dataset_store
+from utils.metrics.dataset_store import (
+    clear_metrics_datasets,
+    get_metrics_dataframe,
+    has_metrics_data,
+    put_metrics_dataset,
+)
+
+
+class TestMetricsDatasetStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.patches = [
+            patch.object(dataset_store, "DATASET_SPILL_PATH", self.temp_dir),
+            patch.object(dataset_store, "DATASET_CACHE_SIZE", 2),
+        ]
+        for p in self.patches:
+            p.start()
+        clear_metrics_datasets()
+
+        self.df = pd.DataFrame({
+            "date": pd.to_datetime(["2024-01-01", "2024-01-02"]),
+            "consumption": [1.5, 2.5],
+            "asset_id": ["ASSET1", "ASSET1"],
+        })
+
+    def tearDown(self):
+        clear_metrics_datasets()
+        for p in reversed(self.patches):
+            p.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_handle_roundtrip_returns_copy(self):
+        handle = put_metrics_dataset(self.df)
+        self.assertEqual(handle["rows"], 2)
+        self.assertEqual(handle["columns"], ["date", "consumption", "asset_id"])
+        self.assertTrue(has_metrics_data(handle))
+
+        df = get_metrics_dataframe(handle)
+        pd.testing.assert_frame_equal(df, self.df)
+        df.loc[0, "consumption"] = 99.0
+        self.assertEqual(get_metrics_dataframe(handle).loc[0, "consumption"], 1.5)
+
+    def test_evicted_dataset_is_resolved_from_spill(self):
+        handle = put_metrics_dataset(self.df)
+        put_metrics_dataset(self.df)
+        put_metrics_dataset(self.df)
+        self.assertNotIn(handle["dataset_id"], dataset_store._datasets)
+
+        pd.testing.assert_frame_equal(get_metrics_dataframe(handle), self.df)
+
+    def test_legacy_and_invalid_values(self):
+        self.assertFalse(has_metrics_data(None))
+        self.assertFalse(has_metrics_data("[]"))
+        self.assertFalse(has_metrics_data({"dataset_id": "abc", "rows": 0}))
+
+        legacy = json.dumps([{"asset_id": "ASSET1", "consumption": 1.0}])
+        self.assertEqual(len(get_metrics_dataframe(legacy)), 1)
+
+        self.assertTrue(get_metrics_dataframe({"dataset_id": "../../etc/passwd", "rows": 1}).empty)
+        self.assertTrue(get_metrics_dataframe({"dataset_id": "0" * 32, "rows": 1}).empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from utils.carbon_footprint.analysis import (
+    calculate_carbon_emissions, calculate_total_emissions, compare_emission_periods, detect_emission_anomalies
+)
+from utils.carbon_footprint.emissions import (
+    EMISSION_FACTORS, compare_periods, compute_emissions, emission_anomaly_mask, summarize_emissions
+)
+from tests.helpers.cases import QuietTestCase
+
+
+class TestEmissions(QuietTestCase):
+    def test_wrappers_keep_single_series_results(self):
+        # Consumo: media 1.9 y desviación 2.7, umbral 1.9 + 2 × 2.7 = 7.3 kWh por el factor
+        consumption = [1.0] * 9 + [10.0]
+        for energy_type, factor in (("electricity", 0.108), ("heating_oil", 0.27), ("unknown", 0.108)):
+            with self.subTest(energy_type=energy_type):
+                anomalies, threshold = detect_emission_anomalies(consumption, energy_type)
+                self.assertEqual(np.flatnonzero(anomalies).tolist(), [9])
+                self.assertAlmostEqual(threshold, 7.3 * factor)
+
+        self.assertEqual(calculate_carbon_emissions(10, "natural_gas"), 10 * EMISSION_FACTORS["natural_gas"])
+        np.testing.assert_allclose(calculate_carbon_emissions([1, 2]), [0.108, 0.216])
+        self.assertEqual(calculate_carbon_emissions(["a"]), 0)
+        self.assertAlmostEqual(calculate_total_emissions([10, 20], "heating_oil"), 30 * 0.27)
+        self.assertEqual(calculate_total_emissions([]), 0)
+        # Puntos no numéricos en un array de objetos: cuentan como 0
+        consumption = np.array([1.0] * 8 + ['x', 50.0], dtype=object)
+        anomalies, _ = detect_emission_anomalies(consumption)
+        self.assertEqual(np.flatnonzero(anomalies).tolist(), [9])
+
+        comparison = compare_emission_periods([10, 10], [20, 20])
+        self.assertAlmostEqual(comparison["change_percentage"], -50.0)
+        self.assertTrue(comparison["is_improved"])
+        self.assertFalse(comparison["is_simulated"])
+
+    def test_grouped_engine_scores_each_series(self):
+        dates = pd.date_range('2024-01-01', periods=10)
+        df = pd.concat([
+            pd.DataFrame({'date': dates, 'asset_id': 'A', 'energy_type': 'electricity',
+                          'consumption': [1.0] * 9 + [10.0]}),
+            pd.DataFrame({'date': dates, 'asset_id': 'A', 'energy_type': 'natural_gas', 'consumption': 2.0}),
+            pd.DataFrame({'date': dates, 'asset_id': 'B', 'energy_type': 'electricity',
+                          'consumption': [10.0] + [1.0] * 9}),
+        ], ignore_index=True).sample(frac=1.0, random_state=3)
+        emissions = compute_emissions(df)
+        anomalies, thresholds = emission_anomaly_mask(emissions)
+        scored = emissions.assign(anomaly=anomalies, threshold=thresholds).sort_index()
+        summary = summarize_emissions(emissions).set_index(['asset_id', 'energy_type'])
+
+        self.assertEqual(np.flatnonzero(scored['anomaly']).tolist(), [9, 20])
+        np.testing.assert_allclose(scored['threshold'], [7.3 * 0.108] * 10 + [0.4] * 10 + [7.3 * 0.108] * 10)
+        np.testing.assert_allclose(summary['total_emissions'], [19 * 0.108, 20 * 0.2, 19 * 0.108])
+        self.assertEqual(summary['days_covered'].tolist(), [10, 10, 10])
+        np.testing.assert_allclose(summary['annual_emissions'], summary['total_emissions'] * 36.5)
+
+    def test_monthly_emission_factors(self):
+        df = pd.DataFrame({
+            'date': pd.to_datetime(['2024-01-15', '2024-02-15', '2024-03-15', '2024-02-01']),
+            'asset_id': 'A',
+            'energy_type': ['electricity', 'electricity', 'electricity', 'natural_gas'],
+            'consumption': [100.0, 100.0, 'Error', 100.0],
+        })
+        monthly = {'electricity': {'2024-01': 0.2, '2024-02': 0.1}}
+        emissions = compute_emissions(df, monthly_factors=monthly)
+
+        np.testing.assert_allclose(emissions['emission_factor'], [0.2, 0.1, 0.108, 0.20])
+        np.testing.assert_allclose(emissions['emissions'], [20.0, 10.0, 0.0, 20.0])
+
+        table = pd.DataFrame({'energy_type': ['natural_gas'], 'month': [pd.Timestamp('2024-02-01')], 'factor': [0.3]})
+        np.testing.assert_allclose(compute_emissions(df, monthly_factors=table)['emission_factor'],
+                                   [0.108, 0.108, 0.108, 0.3])
+
+    def test_period_comparison_by_group(self):
+        df = pd.DataFrame({
+            'date': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04'] * 2),
+            'asset_id': ['A'] * 4 + ['B'] * 4,
+            'consumption': [10.0, 10.0, 5.0, 5.0, 0.0, 0.0, 1.0, 1.0],
+        })
+        comparison = compare_periods(compute_emissions(df), '2024-01-03', '2024-01-04').set_index('asset_id')
+
+        self.assertAlmostEqual(comparison.loc['A', 'current_total'], 10 * 0.108)
+        self.assertAlmostEqual(comparison.loc['A', 'previous_total'], 20 * 0.108)
+        self.assertAlmostEqual(comparison.loc['A', 'change_percentage'], -50.0)
+        self.assertTrue(comparison.loc['A', 'is_improved'])
+        # Sin emisiones en el período anterior: +100 %
+        self.assertEqual(comparison.loc['B', 'change_percentage'], 100.0)
+        self.assertFalse(comparison.loc['B', 'is_improved'])
+
+
+if __name__ == "__main__":
+    unittest.main()
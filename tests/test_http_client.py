@@ -0,0 +1,192 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import requests
+
+from utils import auth as auth_module
+from utils import http_client as http_client_module
+from utils.http_client import HttpClient, TokenBucket, endpoint_key
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Servidor de prueba: responde según la ruta y cuenta las peticiones."""
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            hits = server.hits[self.path]
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            if self.path.startswith("/flaky") and hits <= 2:
+                status = 503
+            elif self.path.startswith("/unavailable-once") and hits == 1:
+                status = 503
+            elif self.path.startswith("/unauthorized-once") and hits == 1:
+                status = 401
+            elif self.path.startswith("/error"):
+                status = 500
+            elif self.path.startswith("/slow"):
+                time.sleep(0.05)
+                status = 200
+            else:
+                status = 200
+            body = json.dumps({"path": self.path, "hits": hits}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    do_GET = _respond
+    do_POST = _respond
+
+
+class _ServerTestCase(unittest.TestCase):
+    """Levanta el servidor de prueba y anula las esperas del backoff."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.lock = threading.Lock()
+        cls.server.hits = {}
+        cls.server.active = 0
+        cls.server.max_active = 0
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.hits.clear()
+        self.server.max_active = 0
+        self.backoff_patch = patch.object(http_client_module, "backoff_delay", return_value=0)
+        self.backoff_patch.start()
+
+    def tearDown(self):
+        self.backoff_patch.stop()
+
+
+class TestHttpClient(_ServerTestCase):
+    def test_retries_5xx_and_reports_stats(self):
+        client = HttpClient(rate_limit=0)
+        response = client.get(f"{self.base_url}/flaky/ASSET1234567")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["hits"], 3)
+        stats = client.get_stats()[f"GET 127.0.0.1:{self.server.server_address[1]}/flaky/{{id}}"]
+        self.assertEqual((stats["requests"], stats["retries"], stats["errors"]), (1, 2, 0))
+
+    def test_post_is_not_retried_on_5xx(self):
+        client = HttpClient(rate_limit=0)
+        response = client.post(f"{self.base_url}/error", json={})
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(self.server.hits["/error"], 1)
+        self.assertEqual(list(client.get_stats().values())[0]["errors"], 1)
+
+    def test_gives_up_after_max_retries(self):
+        client = HttpClient(rate_limit=0, max_retries=2)
+        response = client.get(f"{self.base_url}/error")
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(self.server.hits["/error"], 3)
+
+    def test_per_host_concurrency_limit(self):
+        client = HttpClient(rate_limit=0, max_per_host=3)
+        threads = [threading.Thread(target=client.get, args=(f"{self.base_url}/slow",)) for _ in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(self.server.hits["/slow"], 12)
+        self.assertLessEqual(self.server.max_active, 3)
+
+    def test_token_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=50, capacity=5)
+        start = time.monotonic()
+        for _ in range(15):
+            bucket.acquire()
+        # 5 fichas iniciales + 10 a 50/s
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+    def test_endpoint_key_groups_identifiers(self):
+        self.assertEqual(
+            endpoint_key("get", "https://services.alfredsmartdata.com/data/assets/time-series/DFBCNX4TYKR4B?from=1"),
+            "GET services.alfredsmartdata.com/data/assets/time-series/{id}",
+        )
+        self.assertEqual(
+            endpoint_key("GET", "https://services.alfredsmartdata.com/projects/7f81f1bd-0bc9-4802-a67c-265368c46399/assets"),
+            "GET services.alfredsmartdata.com/projects/{id}/assets",
+        )
+
+
+class TestAuthenticatedRequestRetry(_ServerTestCase):
+    """Reintento propio de make_authenticated_request_with_retry sobre el del cliente HTTP."""
+
+    def setUp(self):
+        super().setUp()
+        service = auth_module.auth_service
+        patchers = [
+            patch.object(service, "check_token_expiry_and_renew", return_value=(True, "token")),
+            patch.object(service, "get_auth_headers_from_token", return_value={"Authorization": "Bearer token"}),
+            patch.object(auth_module, "backoff_delay", return_value=0),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _request(self, method, path):
+        return auth_module.auth_service.make_authenticated_request_with_retry(
+            "token", method, f"{self.base_url}{path}", data={})
+
+    def test_post_is_retried_once_on_5xx(self):
+        success, response = self._request("POST", "/unavailable-once")
+        self.assertTrue(success)
+        self.assertEqual(self.server.hits["/unavailable-once"], 2)
+
+        success, error = self._request("POST", "/error")
+        self.assertFalse(success)
+        self.assertIn("500", error)
+        self.assertEqual(self.server.hits["/error"], 2)
+
+    def test_get_is_not_retried_on_top_of_the_client(self):
+        with patch.object(auth_module.http_client, "max_retries", 1):
+            success, _ = self._request("GET", "/error")
+        self.assertFalse(success)
+        # 1 intento + 1 reintento del cliente, sin reintentos propios
+        self.assertEqual(self.server.hits["/error"], 2)
+
+    def test_401_renews_the_token_and_retries_once(self):
+        success, response = self._request("POST", "/unauthorized-once")
+        self.assertTrue(success)
+        self.assertEqual(self.server.hits["/unauthorized-once"], 2)
+        self.assertEqual(auth_module.auth_service.check_token_expiry_and_renew.call_count, 2)
+
+    def test_post_is_retried_once_on_connection_error(self):
+        with patch.object(auth_module.http_client, "request",
+                          side_effect=requests.exceptions.ConnectionError("down")) as request:
+            success, error = self._request("POST", "/ok")
+        self.assertFalse(success)
+        self.assertEqual(error, "Error de conexión")
+        self.assertEqual(request.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
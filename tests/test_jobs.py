@@ -0,0 +1,264 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from utils import jobs
+from utils.jobs import JobManager, register_job_handler
+
+
+def _counting_job(job, items, fail_on=None):
+    job.set_total(len(items))
+    for item in items:
+        job.check_cancelled()
+        job.advance(success=item != fail_on, detail={'item': item})
+    return {'items': len(items)}
+
+
+def _blocking_job(job, release_key):
+    _events[release_key].wait(5)
+    for _ in range(100):
+        if job.is_cancelled():
+            break
+        job.advance()
+    return {}
+
+
+_events = {}
+register_job_handler("test_counting", _counting_job)
+register_job_handler("test_blocking", _blocking_job)
+
+
+class TestJobManager(unittest.TestCase):
+    def setUp(self):
+        self.storage = tempfile.mkdtemp()
+        self.managers = []
+
+    def tearDown(self):
+        for event in _events.values():
+            event.set()
+        for manager in self.managers:
+            manager.shutdown()
+        shutil.rmtree(self.storage, ignore_errors=True)
+
+    def _manager(self, **kwargs):
+        kwargs.setdefault("persist_interval", 0)
+        manager = JobManager(storage_path=self.storage, **kwargs)
+        self.managers.append(manager)
+        return manager
+
+    def _block(self, key):
+        _events[key] = threading.Event()
+        return key
+
+    def test_job_runs_in_background_and_reports_progress(self):
+        manager = self._manager()
+        job_id = manager.submit("test_counting", {'items': [1, 2, 3], 'fail_on': 2})
+
+        job = manager.wait(job_id, timeout=5)
+        self.assertEqual(job['status'], jobs.JOB_COMPLETED)
+        self.assertEqual((job['total'], job['processed'], job['success'], job['failed']), (3, 3, 2, 1))
+        self.assertEqual(job['result'], {'items': 3})
+        self.assertEqual([d['item'] for d in job['details']], [1, 2, 3])
+
+        with open(os.path.join(self.storage, f"{job_id}.json")) as f:
+            record = json.load(f)
+        self.assertEqual(record['status'], jobs.JOB_COMPLETED)
+        self.assertEqual(record['params'], {'items': [1, 2, 3], 'fail_on': 2})
+
+    def test_unknown_kind_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self._manager().submit("no_such_job")
+
+    def test_cancel_queued_and_running_jobs(self):
+        manager = self._manager(max_workers=1)
+        running = manager.submit("test_blocking", {'release_key': self._block("a")})
+        queued = manager.submit("test_counting", {'items': [1]})
+
+        self.assertEqual(manager.get(queued)['status'], jobs.JOB_QUEUED)
+        self.assertEqual(manager.find_active("test_blocking")['job_id'], running)
+        self.assertTrue(manager.cancel(queued))
+        self.assertTrue(manager.cancel(running))
+        _events["a"].set()
+
+        self.assertEqual(manager.wait(running, timeout=5)['status'], jobs.JOB_CANCELLED)
+        self.assertEqual(manager.wait(running)['processed'], 0)
+        queued_job = manager.wait(queued, timeout=5)
+        self.assertEqual(queued_job['status'], jobs.JOB_CANCELLED)
+        self.assertEqual(queued_job['processed'], 0)
+        self.assertFalse(manager.cancel(running))
+        self.assertIsNone(manager.find_active("test_blocking"))
+
+    def test_interrupted_jobs_are_resumed_by_a_new_manager(self):
+        job = jobs.Job("test_counting", {'items': [1, 2]})
+        job.status = jobs.JOB_RUNNING
+        os.makedirs(self.storage, exist_ok=True)
+        with open(os.path.join(self.storage, f"{job.id}.json"), "w") as f:
+            json.dump(job.to_record(), f)
+
+        manager = self._manager()
+        resumed = manager.wait(job.id, timeout=5)
+        self.assertEqual(resumed['status'], jobs.JOB_COMPLETED)
+        self.assertEqual(resumed['resumed'], 1)
+        self.assertEqual(resumed['processed'], 2)
+
+    def test_secrets_are_not_persisted_and_park_the_job(self):
+        manager = self._manager()
+        job_id = manager.submit("test_counting", {'items': [1]}, secrets={'fail_on': "eyJ.secret"}, owner="user-a")
+        manager.wait(job_id, timeout=5)
+        with open(os.path.join(self.storage, f"{job_id}.json")) as f:
+            content = f.read()
+        self.assertNotIn("eyJ.secret", content)
+        self.assertEqual(json.loads(content)['secret_params'], ['fail_on'])
+
+        job = jobs.Job("test_counting", {'items': [1, 2]}, secrets={'fail_on': "eyJ.secret"}, owner="user-a")
+        job.status = jobs.JOB_RUNNING
+        with open(os.path.join(self.storage, f"{job.id}.json"), "w") as f:
+            json.dump(job.to_record(), f)
+
+        parked = self._manager().get(job.id)
+        self.assertEqual(parked['status'], jobs.JOB_AWAITING_AUTH)
+        self.assertIn("autentic", parked['message'])
+        self.assertEqual(parked['processed'], 0)
+        with open(os.path.join(self.storage, f"{job.id}.json")) as f:
+            self.assertEqual(json.load(f)['status'], jobs.JOB_AWAITING_AUTH)
+
+    def test_parked_job_resumes_with_the_owners_next_session(self):
+        job = jobs.Job("test_counting", {'items': [1, 2]}, secrets={'fail_on': "eyJ.old"}, owner="user-a")
+        job.status = jobs.JOB_RUNNING
+        os.makedirs(self.storage, exist_ok=True)
+        with open(os.path.join(self.storage, f"{job.id}.json"), "w") as f:
+            json.dump(job.to_record(), f)
+
+        manager = self._manager()
+        # Otra sesión no lo reanuda ni le entrega sus credenciales
+        self.assertEqual(manager.resume_awaiting_auth("user-b", {'fail_on': 2}), [])
+        self.assertEqual(manager.resume_awaiting_auth("user-a", {'other': 2}), [])
+        self.assertEqual(manager.get(job.id)['status'], jobs.JOB_AWAITING_AUTH)
+
+        self.assertEqual(manager.resume_awaiting_auth("user-a", {'fail_on': 2, 'other': 3}), [job.id])
+        resumed = manager.wait(job.id, timeout=5)
+        self.assertEqual(resumed['status'], jobs.JOB_COMPLETED)
+        self.assertEqual(resumed['resumed'], 1)
+        self.assertEqual((resumed['success'], resumed['failed']), (1, 1))
+
+    def test_parked_job_can_be_cancelled(self):
+        job = jobs.Job("test_counting", {'items': [1]}, secrets={'fail_on': "eyJ.old"}, owner="user-a")
+        job.status = jobs.JOB_QUEUED
+        os.makedirs(self.storage, exist_ok=True)
+        with open(os.path.join(self.storage, f"{job.id}.json"), "w") as f:
+            json.dump(job.to_record(), f)
+
+        manager = self._manager()
+        self.assertTrue(manager.cancel(job.id))
+        self.assertEqual(manager.get(job.id)['status'], jobs.JOB_CANCELLED)
+        self.assertEqual(manager.resume_awaiting_auth("user-a", {'fail_on': 2}), [])
+
+    def test_history_is_pruned(self):
+        manager = self._manager(history_limit=2)
+        job_ids = [manager.submit("test_counting", {'items': []}) for _ in range(4)]
+        for job_id in job_ids:
+            manager.wait(job_id, timeout=5)
+
+        self.assertEqual(len(manager.list_jobs("test_counting")), 2)
+        self.assertEqual(len(os.listdir(self.storage)), 2)
+
+
+class TestRegenerationJob(unittest.TestCase):
+    def setUp(self):
+        self.storage = tempfile.mkdtemp()
+        self.manager = JobManager(storage_path=self.storage, persist_interval=0)
+        self.errors = [
+            {'asset_id': f"A{i}", 'consumption_type': "Agua", 'period': "2024-01"} for i in range(4)
+        ]
+
+    def tearDown(self):
+        self.manager.shutdown()
+        shutil.rmtree(self.storage, ignore_errors=True)
+
+    def test_bulk_regeneration_runs_as_job_without_status_file(self):
+        from utils import regeneration
+
+        with patch.object(regeneration, "get_job_manager", return_value=self.manager), \
+             patch.object(regeneration, "regenerate_single_reading", return_value=True) as single, \
+             patch.object(regeneration, "save_regeneration_status") as save_status:
+            job_id = regeneration.submit_bulk_regeneration(self.errors, "P1", "token")
+            self.manager.wait(job_id, timeout=5)
+            status = regeneration.get_regeneration_status()
+            in_progress = regeneration.is_regeneration_in_progress()
+
+        self.assertEqual(single.call_count, 4)
+        save_status.assert_not_called()
+        self.assertFalse(in_progress)
+        self.assertEqual(status['job_id'], job_id)
+        self.assertEqual((status['status'], status['total'], status['success']), ("completed", 4, 4))
+        self.assertEqual(len(status['details']), 4)
+
+    def test_resumed_regeneration_skips_recorded_tasks(self):
+        from utils import regeneration
+
+        # Sin token no hace falta volver a autenticarse y el trabajo se reanuda
+        job = jobs.Job(regeneration.REGENERATION_JOB, {
+            'error_list': self.errors, 'project_id': "P1",
+        }, secrets={'token_data': None})
+        job.status = jobs.JOB_RUNNING
+        job.total, job.processed, job.success = 4, 2, 2
+        job.details = [dict(error, status='success') for error in self.errors[:2]]
+        with open(os.path.join(self.storage, f"{job.id}.json"), "w") as f:
+            json.dump(job.to_record(), f)
+        self.manager.shutdown()
+
+        with patch.object(regeneration, "regenerate_single_reading", return_value=True) as single:
+            self.manager = JobManager(storage_path=self.storage, persist_interval=0)
+            resumed = self.manager.wait(job.id, timeout=5)
+
+        self.assertEqual([c.kwargs['asset_id'] for c in single.call_args_list], ["A2", "A3"])
+        self.assertEqual((resumed['status'], resumed['processed'], resumed['success']), ("completed", 4, 4))
+
+    def test_token_is_not_written_to_disk(self):
+        from utils import regeneration
+
+        with patch.object(regeneration, "get_job_manager", return_value=self.manager), \
+             patch.object(regeneration, "regenerate_single_reading", return_value=True) as single:
+            job_id = regeneration.submit_bulk_regeneration(self.errors, "P1", "eyJ.secret")
+            self.manager.wait(job_id, timeout=5)
+
+        self.assertEqual(single.call_args.kwargs['token_data'], "eyJ.secret")
+        with open(os.path.join(self.storage, f"{job_id}.json")) as f:
+            self.assertNotIn("eyJ.secret", f.read())
+
+
+    def test_single_regeneration_writes_through_the_coordinator(self):
+        from utils import regeneration
+        from utils.repositories import readings_writer
+
+        cwd = os.getcwd()
+        os.chdir(self.storage)
+        self.addCleanup(os.chdir, cwd)
+        file_path = os.path.join("data", "readings", "P1", "A1_TEST_WATER_2024.csv")
+        os.makedirs(os.path.dirname(file_path))
+        with open(file_path, "w") as f:
+            f.write("date,consumption\n2024-01-01,Error\n2024-01-02,5\n2024-02-01,Error\n")
+
+        coordinator = readings_writer.ReadingsWriteCoordinator(sync_store=False)
+        with patch.object(regeneration, "get_readings_write_coordinator", return_value=coordinator), \
+             patch.object(readings_writer, "evaluate_readings_file"), \
+             patch.object(readings_writer, "record_readings_file") as record:
+            self.assertTrue(regeneration.regenerate_single_reading("A1", "Agua", 2024, 1, "P1", "token"))
+            self.assertTrue(regeneration.regenerate_single_reading("A1", "Agua", 2024, 3, "P1", "token",
+                                                                   only_errors=False))
+
+        # Cada escritura queda registrada en el catálogo de lecturas
+        self.assertEqual([c.args[0] for c in record.call_args_list], [file_path, file_path])
+        df = pd.read_csv(file_path)
+        self.assertEqual(list(df['consumption'][:3].astype(str)), ["0.0", "5", "Error"])
+        self.assertEqual(int((pd.to_datetime(df['date']).dt.month == 3).sum()), 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from utils.lock_inventory import LockInventoryService, normalize_asset_devices
+from tests.helpers.cases import QuietTestCase
+from tests.helpers.locks import FakeLocksApi
+
+PROJECT_ID = "PROJECT-LOCKS"
+
+
+class TestLockInventory(QuietTestCase):
+    def setUp(self):
+        super().setUp()
+        self.fake = FakeLocksApi(12, latency=0)
+        self.enter_context(self.fake.patched())
+
+    def test_cold_load(self):
+        service = LockInventoryService(ttl=60, max_workers=4)
+        devices = service.get_inventory(PROJECT_ID, "token")
+
+        # Cerraduras de los pisos en el orden de los assets y, al final, las puertas comunitarias
+        self.assertEqual([device["device_id"] for device in devices],
+                         [f"LOCK-ASSET{i:04d}" for i in range(12)] + ["DOOR0", "DOOR1"])
+        lock = devices[0]
+        self.assertEqual(lock["gateway_id"], "GW-ASSET0000")
+        self.assertEqual((lock["alias"], lock["connectivity"]), ("1ºA", "ONLINE"))
+        self.assertEqual((lock["staircase"], lock["apartment"]), ("1", "1A"))
+        self.assertEqual(lock["scope"], {"type": "Asset", "id": "ASSET0000", "name": "Piso 0"})
+        self.assertEqual(devices[-1]["scope"], {"type": "Project"})
+
+    def test_warm_load_and_delta_refresh(self):
+        service = LockInventoryService(ttl=60, max_workers=4)
+        devices = service.get_inventory(PROJECT_ID, "token")
+        # Las copias devueltas no modifican la caché
+        devices[0]["alias"] = "changed"
+
+        self.assertNotEqual(service.get_inventory(PROJECT_ID, "token")[0]["alias"], "changed")
+        self.assertEqual(self.fake.calls["get_asset_devices"], 12)
+        self.assertEqual(self.fake.calls["get_devices"], 1)
+
+        # Cambia una cerradura, se renombra un piso, aparece uno nuevo y se elimina otro
+        self.fake.connectivity["ASSET0003"] = "OFFLINE"
+        self.fake.assets[5]["alias"] = "Ático"
+        self.fake.assets.append({"id": "ASSET0099", "name": "Piso 99"})
+        self.fake.connectivity["ASSET0099"] = "ONLINE"
+        del self.fake.assets[0]
+
+        refreshed = service.get_inventory(PROJECT_ID, "token", refresh=True)
+        self.assertEqual(self.fake.calls["get_asset_devices"], 12 + 3)
+        self.assertEqual([device["device_id"] for device in refreshed],
+                         [f"LOCK-ASSET{i:04d}" for i in range(1, 12)] + ["LOCK-ASSET0099", "DOOR0", "DOOR1"])
+        by_id = {device["device_id"]: device for device in refreshed}
+        self.assertEqual(by_id["LOCK-ASSET0003"]["connectivity"], "OFFLINE")
+        self.assertEqual(by_id["LOCK-ASSET0005"]["alias"], "Ático")
+        self.assertEqual(by_id["LOCK-ASSET0099"]["scope"], {"type": "Asset", "id": "ASSET0099", "name": "Piso 99"})
+        self.assertEqual(service.stats()["delta_loads"], 1)
+
+        # Las entradas caducadas se vuelven a consultar
+        before = self.fake.calls["get_asset_devices"]
+        with patch("utils.lock_inventory.time.monotonic", return_value=time.monotonic() + 120):
+            service.get_inventory(PROJECT_ID, "token")
+        self.assertEqual(self.fake.calls["get_asset_devices"] - before, 12)
+
+    def test_inventory_is_scoped_to_the_session(self):
+        service = LockInventoryService(ttl=60, max_workers=4)
+        service.get_inventory(PROJECT_ID, "token-a")
+        service.get_inventory(PROJECT_ID, "token-a")
+        self.assertEqual(self.fake.calls["get_devices"], 1)
+
+        service.get_inventory(PROJECT_ID, "token-b")
+        self.assertEqual(self.fake.calls["get_devices"], 2)
+        self.assertEqual(service.stats()["projects"], 2)
+
+        service.invalidate(PROJECT_ID)
+        self.assertEqual(service.stats()["projects"], 0)
+
+    def test_expired_sessions_are_evicted(self):
+        service = LockInventoryService(ttl=60, max_workers=4)
+        for i in range(5):
+            service.get_inventory(PROJECT_ID, f"token-{i}")
+        self.assertEqual(service.stats()["projects"], 5)
+
+        with patch("utils.lock_inventory.time.monotonic", return_value=time.monotonic() + 120):
+            service.get_inventory(PROJECT_ID, "token-new")
+            self.assertEqual(service.stats()["projects"], 1)
+            self.assertEqual(len(service._project_locks), 1)
+
+    def test_missing_gateways_resolved_once_per_asset(self):
+        def get_asset_devices(asset_id, jwt_token=None, device_types=None):
+            return [{"device_id": f"{asset_id}-{i}", "sensors": [{"sensor_type": "LOCK"}]} for i in range(3)]
+
+        def get_nfc_passwords(asset_id, jwt_token=None):
+            nfc_calls.append(asset_id)
+            return {"data": {"devices": [{"device_id": f"{asset_id}-{i}", "gateway_id": "GW"} for i in range(2)]}}
+
+        nfc_calls = []
+        with patch("utils.api.get_asset_devices", get_asset_devices), \
+             patch("utils.api.get_nfc_passwords", get_nfc_passwords):
+            devices = LockInventoryService(ttl=60, max_workers=4).get_inventory(PROJECT_ID, "token")
+
+        self.assertEqual(sorted(nfc_calls), [asset["id"] for asset in self.fake.assets])
+        by_id = {device["device_id"]: device for device in devices}
+        self.assertEqual(by_id["ASSET0000-1"]["gateway_id"], "GW")
+        self.assertNotIn("gateway_id", by_id["ASSET0000-2"])
+
+    def test_normalize_asset_devices(self):
+        asset = {"id": "A", "name": "Piso", "staircase": "2"}
+        devices = normalize_asset_devices(asset, [
+            {"uuid": "GW1", "devices": [
+                {"device_id": "1", "lock_type": "nuki"},
+                {"device_id": "2", "device_type": "THERMOSTAT"},
+            ]},
+            {"device_id": "3", "uuid": "GW3", "device_type": "SMARTLOCK"},
+            {"device_id": "4", "device_type": "METER"},
+        ])
+
+        self.assertEqual([device["device_id"] for device in devices], ["1", "3"])
+        self.assertEqual([device["gateway_id"] for device in devices], ["GW1", "GW3"])
+        self.assertTrue(all(device["asset_id"] == "A" and device["staircase"] == "2" for device in devices))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import generate_monthly_readings_by_consumption_type
+from utils.metrics.data_processing import generate_monthly_consumption_summary, generate_monthly_readings_table
+from utils.metrics.monthly_readings import compute_monthly_readings
+
+TAG = "_TRANSVERSAL_CONSUMPTION_LIST_TAG_NAME_DOMESTIC_COLD_WATER"
+
+
+class TestMonthlyReadingsEngine(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'date': pd.to_datetime(['2024-01-20', '2024-01-01', '2024-01-31', '2024-02-01',
+                                    '2024-02-15', '2024-03-10', '2024-01-05']),
+            'asset_id': ['A', 'A', 'A', 'A', 'A', 'A', 'B'],
+            'tag': TAG,
+            'consumption_type': 'Agua fría',
+            'consumption': [15.0, 10.0, 20.0, 25.0, 3.0, 7.0, 100.0],
+        })
+
+    def test_first_last_and_counter_reset(self):
+        monthly = compute_monthly_readings(self.df).set_index(['asset_id', 'month'])
+
+        january = monthly.loc[('A', pd.Period('2024-01', 'M'))]
+        self.assertEqual((january['first_reading'], january['last_reading'], january['readings']), (10.0, 20.0, 3))
+        self.assertEqual(january['consumption'], 10.0)
+
+        # 25 -> 3: reinicio del contador, se usa la última lectura
+        february = monthly.loc[('A', pd.Period('2024-02', 'M'))]
+        self.assertEqual(february['delta'], -22.0)
+        self.assertEqual(february['consumption'], 3.0)
+
+        self.assertEqual(monthly.loc[('B', pd.Period('2024-01', 'M'))]['readings'], 1)
+
+    def test_tables_by_consumption_type(self):
+        tables = generate_monthly_readings_by_consumption_type(
+            self.df.copy(), [TAG, "_UNKNOWN_TAG"], datetime(2024, 1, 1), datetime(2024, 4, 30)
+        )
+
+        # Los tags sin lecturas no generan tabla; abril no tiene lecturas
+        expected = pd.DataFrame({
+            'Asset': ['A', 'B'],
+            'Jan 2024': [10.0, 100.0],
+            'Feb 2024': [3.0, np.nan],
+            'Mar 2024': [7.0, np.nan],
+            'Apr 2024': [np.nan, np.nan],
+        }, index=['A', 'B'])
+        self.assertEqual(list(tables), ['Agua fría sanitaria'])
+        pd.testing.assert_frame_equal(tables['Agua fría sanitaria'], expected)
+
+    def test_monthly_summary(self):
+        summary = generate_monthly_consumption_summary(self.df.copy())
+
+        self.assertEqual(summary['month'].tolist(), ['2024-01', '2024-02', '2024-03'])
+        self.assertEqual(summary['total_consumption'].tolist(), [10.0, 3.0, 0.0])
+        self.assertEqual(summary['asset_count'].tolist(), [2, 1, 1])
+
+    def test_monthly_readings_table(self):
+        table = generate_monthly_readings_table(self.df.copy())
+
+        self.assertEqual(table['Asset'].tolist(), ['A', 'B'])
+        self.assertEqual(table.columns[:2].tolist(), ['Asset', 'consumption_type'])
+        self.assertEqual(table.loc[0, 'January 2024'], 10.0)
+        self.assertEqual(table.loc[0, 'February 2024'], -22.0)
+        self.assertTrue(np.isnan(table.loc[1, 'March 2024']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+
+from utils.nfc_assignment import (
+    execute_plan, lock_result, plan_assignment, plan_summary, plan_unassignment
+)
+from utils.nfc_card_index import NfcCardIndex
+from tests.helpers.cases import QuietTestCase
+from tests.helpers.nfc import FakeNfcWriteApi, format_uid, make_project_nfc_data, make_selection
+
+
+class TestNfcAssignmentPlanner(QuietTestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = make_project_nfc_data(3, 2, 10, seed=7)
+        self.devices = make_selection(self.project)
+        self.cards = [format_uid(0xC0000000 + i) for i in range(3)]
+
+    def indexed(self, fake):
+        index = NfcCardIndex()
+        with fake.patched():
+            index.ensure_assets(fake.project, "token")
+        return index
+
+    def test_plan_is_computed_without_writing(self):
+        existing = self.project["ASSET0001"]["data"]["devices"][0]["sensor_9"]
+        empty = {"ASSET9999": {"data": {"devices": [
+            {"device_id": "Cerradura 0", "real_device_id": "1", "gateway_id": "GW-ASSET9999", "asset_id": "ASSET9999"}
+        ]}}}
+        devices = self.devices + make_selection(empty) + [{**self.devices[0], "gateway_id": None}]
+        fake = FakeNfcWriteApi({**self.project, **empty}, latency=0)
+        index = self.indexed(fake)
+
+        uuid_list = self.cards + [existing.replace(":", "").lower(), self.cards[0].replace(":", "-")]
+        plans = plan_assignment(devices, uuid_list, index)
+        self.assertEqual(fake.writes, 0)
+        self.assertEqual([op["slot"] for op in plans[0]["operations"]], ["17", "18", "19", "20"])
+        self.assertEqual([op["status"] for op in plans[2]["operations"]],
+                         ["pending", "pending", "pending", "already_assigned"])
+        self.assertEqual(plans[2]["operations"][3]["slot"], "9")
+        self.assertEqual(plans[2]["operations"][0]["value"], self.cards[0])
+
+        # Cerradura sin tarjetas: la primera ocupa el slot de la tarjeta maestra
+        self.assertEqual(plans[-2]["operations"][0]["slot"], "7")
+        self.assertTrue(plans[-2]["operations"][0]["master"])
+        self.assertIn("gateway", plans[-1]["error"])
+
+        summary = plan_summary(plans)
+        self.assertEqual(summary["pending"], 5 * 4 + 3 + 4)
+        self.assertEqual(summary["already_assigned"], 1)
+        self.assertEqual(summary["master_cards"], 1)
+        self.assertEqual(summary["gateways"], 4)
+
+        full = make_project_nfc_data(1, 1, 91)
+        full_index = NfcCardIndex()
+        full_index.index_asset("ASSET0000", full["ASSET0000"])
+        plan = plan_assignment(make_selection(full), self.cards, full_index)[0]
+        self.assertEqual(plan["operations"], [])
+        self.assertEqual(lock_result(plan), (False, "No hay suficientes slots disponibles. Necesarios: 3, Disponibles: 1", []))
+
+    def test_locks_of_unreadable_assets_are_not_planned(self):
+        fake = FakeNfcWriteApi(self.project, latency=0)
+        index = self.indexed(fake)
+        fake.unreadable.add("ASSET0001")
+        with fake.patched():
+            self.assertEqual(index.ensure_assets(fake.project, "token", refresh=True), ["ASSET0001"])
+
+        unreadable = [device["asset_id"] == "ASSET0001" for device in self.devices]
+        for plans in (plan_assignment(self.devices, self.cards, index),
+                      plan_unassignment(self.devices, [], index)):
+            for plan, failed in zip(plans, unreadable):
+                self.assertEqual(plan["error"] is not None, failed)
+                self.assertEqual(plan["operations"] == [], failed)
+            self.assertIn("No se pudieron leer", plans[unreadable.index(True)]["error"])
+
+    def test_execution_serializes_gateways_and_retries(self):
+        fake = FakeNfcWriteApi(self.project, latency=0.01, failures={("GW-ASSET0001", "2", "18")})
+        index = self.indexed(fake)
+        with fake.patched():
+            plans = execute_plan(plan_assignment(self.devices, self.cards, index), "token", retry_delay=0)
+
+        self.assertEqual(fake.max_per_gateway, 1)
+        # Los slots 7 a 16 están ocupados: las tarjetas van a los tres siguientes de cada cerradura
+        for device in self.devices:
+            slots = fake.device_slots(device["asset_id"], device["gateway_id"], device["real_device_id"])
+            self.assertEqual(len(slots), 13)
+            self.assertEqual([slots[slot] for slot in ("17", "18", "19")], self.cards)
+        self.assertEqual(fake.writes, len(self.devices) * len(self.cards) + 1)
+        self.assertEqual(plan_summary(plans)["retried"], 1)
+        self.assertEqual(lock_result(plans[3]), (True, "Todas las tarjetas (3) asignadas correctamente", [
+            {"uuid": card, "slot": slot, "status": "success", "message": f"Asignada al slot {slot}"}
+            for card, slot in zip(self.cards, ["17", "18", "19"])
+        ]))
+
+    def test_failures_and_auth_errors(self):
+        fake = FakeNfcWriteApi(self.project, latency=0)
+        index = self.indexed(fake)
+        plans = plan_assignment(self.devices[:2], self.cards, index)
+        fake.update_nfc_code_value = lambda *args, **kwargs: (False, "Error 500")
+        with fake.patched():
+            execute_plan(plans, "token", retries=1, retry_delay=0)
+        self.assertTrue(all(op["status"] == "failed" and op["attempts"] == 2
+                            for plan in plans for op in plan["operations"]))
+        self.assertEqual(lock_result(plans[0])[:2], (False, "No se pudo asignar ninguna tarjeta"))
+
+        calls = []
+
+        def expired(*args, **kwargs):
+            calls.append(args)
+            return False, "Token expirado"
+
+        plans = plan_assignment(self.devices, self.cards, index)
+        fake.update_nfc_code_value = expired
+        with fake.patched():
+            execute_plan(plans, "token", max_workers=1, retry_delay=0)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(plan_summary(plans)["auth_error"], len(self.devices) * len(self.cards))
+        self.assertEqual(lock_result(plans[0])[:2], (False, "Error de autenticación en 3 tarjetas"))
+
+    def test_unassignment_plan(self):
+        fake = FakeNfcWriteApi(self.project, latency=0)
+        index = self.indexed(fake)
+        card = self.project["ASSET0000"]["data"]["devices"][1]["sensor_12"]
+        fake.project["ASSET0000"]["data"]["devices"][1]["sensor_40"] = card
+        index.index_asset("ASSET0000", fake.project["ASSET0000"])
+
+        plans = plan_unassignment(self.devices[:2], [card.lower(), "11:22:33:44"], index)
+        self.assertEqual([(op["slot"], op["status"]) for op in plans[1]["operations"]],
+                         [("12", "pending"), ("40", "pending"), (None, "not_found")])
+        self.assertEqual(lock_result(plans[0])[1], "Ninguna de las tarjetas especificadas fue encontrada en el dispositivo.")
+
+        all_plans = plan_unassignment(self.devices[2:3], [], index)
+        self.assertEqual(len(all_plans[0]["operations"]), 10)
+        with fake.patched():
+            execute_plan(plans + all_plans, "token")
+        self.assertEqual(fake.device_slots("ASSET0001", "GW-ASSET0001", "1"), {})
+        remaining = fake.device_slots("ASSET0000", "GW-ASSET0000", "2")
+        self.assertNotIn("12", remaining)
+        self.assertNotIn("40", remaining)
+        self.assertEqual(len(remaining), 9)
+        self.assertTrue(lock_result(plans[1])[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from utils import api
+from utils.nfc_cache import NfcPasswordCache
+from tests.helpers.cases import QuietTestCase
+from tests.helpers.nfc import FakeNfcApi
+
+
+class TestNfcPasswordCache(QuietTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = NfcPasswordCache(ttl=60)
+        self.fake = FakeNfcApi(latency=0)
+        self.enter_context(patch("utils.api.get_nfc_password_cache", return_value=self.cache))
+        self.enter_context(patch.object(api.auth_service, "make_api_request", self.fake.make_api_request))
+
+    def test_cached_reads_and_copies(self):
+        first = api.get_nfc_passwords("ASSET1", "token")
+        devices = first["data"]["devices"]
+        self.assertEqual(len(devices), 2)
+        self.assertEqual(devices[0]["real_device_id"], "1")
+        self.assertEqual(devices[0]["sensor_3"], "ASSET1003")
+
+        devices[0]["sensor_3"] = "modified"
+        self.assertEqual(api.get_nfc_passwords("ASSET1", "token")["data"]["devices"][0]["sensor_3"], "ASSET1003")
+        self.assertEqual(self.fake.requests, 1)
+        api.get_nfc_passwords("ASSET1", "token", refresh=True)
+        self.assertEqual(self.fake.requests, 2)
+        self.assertEqual(self.cache.stats()["hit_rate"], 1 / 3)
+
+        with patch("utils.nfc_cache.time.monotonic", return_value=time.monotonic() + 120):
+            api.get_nfc_passwords("ASSET1", "token")
+        self.assertEqual(self.fake.requests, 3)
+        self.assertIsNone(api.get_nfc_passwords("ASSET1", None))
+
+    def test_entries_are_scoped_to_the_session(self):
+        api.get_nfc_passwords("ASSET1", "token-a")
+        api.get_nfc_passwords("ASSET1", "token-a")
+        self.assertEqual(self.fake.requests, 1)
+
+        # Otra sesión no recibe los datos cargados con el token de la primera
+        api.get_nfc_passwords("ASSET1", "token-b")
+        self.assertEqual(self.fake.requests, 2)
+
+        # Las escrituras se reflejan en las entradas de todas las sesiones
+        self.assertTrue(self.cache.apply_update("ASSET1", "1", "3", "NEW"))
+        for token in ("token-a", "token-b"):
+            self.assertEqual(api.get_nfc_passwords("ASSET1", token)["data"]["devices"][0]["sensor_3"], "NEW")
+        self.cache.invalidate("ASSET1")
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_expired_sessions_and_versions_are_pruned(self):
+        for i in range(3):
+            api.get_nfc_passwords(f"ASSET{i}", f"token-{i}")
+        self.cache.apply_update("ASSET0", "1", "3", "NEW")
+        self.cache.invalidate("ASSET1")
+        self.assertEqual(self.cache.stats()["entries"], 2)
+        self.assertEqual(self.cache._versions, {})
+
+        with patch("utils.nfc_cache.time.monotonic", return_value=time.monotonic() + 120):
+            api.get_nfc_passwords("ASSET9", "token-new")
+            self.assertEqual(len(self.cache._entries), 1)
+            self.assertEqual(self.cache.stats()["entries"], 1)
+
+    def test_concurrent_requests_are_coalesced(self):
+        calls = []
+        release = threading.Event()
+
+        def loader(asset_id):
+            calls.append(asset_id)
+            release.wait(2)
+            return {"data": {"devices": [{"real_device_id": "1", "sensor_1": "A"}]}}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get("ASSET1", loader))) for _ in range(6)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(calls, ["ASSET1"])
+        self.assertTrue(all(r["data"]["devices"][0]["sensor_1"] == "A" for r in results))
+        self.assertEqual(self.cache.stats()["coalesced"], 5)
+
+    def test_errors_and_empty_responses_are_not_cached(self):
+        responses = [None, {"data": {"devices": []}}, {"data": {"devices": [{"real_device_id": "1"}]}}]
+        loader = lambda asset_id: responses.pop(0)
+        self.assertIsNone(self.cache.get("ASSET1", loader))
+        self.assertEqual(self.cache.get("ASSET1", loader), {"data": {"devices": []}})
+        self.cache.get("ASSET1", loader)
+        self.assertEqual(self.cache.get("ASSET1", loader)["data"]["devices"], [{"real_device_id": "1"}])
+        self.assertEqual(self.cache.stats()["misses"], 3)
+
+    def test_update_is_written_through(self):
+        api.get_nfc_passwords("ASSET1", "token")
+        response = MagicMock(status_code=204)
+        with patch.object(api.auth_service, "make_authenticated_request_with_retry",
+                          return_value=(True, response)) as request:
+            success, _ = api.update_nfc_code_value("ASSET1", "2", "4", "CARD-UUID", "token", gateway_id="GW-ASSET1")
+            self.assertTrue(success)
+            request.return_value = (False, "Error 500")
+            api.update_nfc_code_value("ASSET1", "2", "5", "OTHER", "token", gateway_id="GW-ASSET1")
+
+        device = api.get_nfc_passwords("ASSET1", "token")["data"]["devices"][1]
+        self.assertEqual(device["sensor_4"], "CARD-UUID")
+        self.assertEqual(device["sensor_5"], "")
+        self.assertEqual(self.fake.requests, 1)
+
+        # Un dispositivo que no está en la caché invalida la entrada del asset
+        self.assertFalse(self.cache.apply_update("ASSET1", "99", "1", "X"))
+        api.get_nfc_passwords("ASSET1", "token")
+        self.assertEqual(self.fake.requests, 2)
+
+    def test_update_during_load_is_not_overwritten(self):
+        release = threading.Event()
+
+        def loader(asset_id):
+            release.wait(2)
+            return {"data": {"devices": [{"real_device_id": "1", "sensor_1": "OLD"}]}}
+
+        thread = threading.Thread(target=self.cache.get, args=("ASSET1", loader))
+        thread.start()
+        time.sleep(0.1)
+        self.cache.apply_update("ASSET1", "1", "1", "NEW")
+        release.set()
+        thread.join()
+
+        new_loader = lambda asset_id: {"data": {"devices": [{"real_device_id": "1", "sensor_1": "NEW"}]}}
+        self.assertEqual(self.cache.get("ASSET1", new_loader)["data"]["devices"][0]["sensor_1"], "NEW")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from utils import api
+from utils.nfc_card_index import NfcCardIndex
+from utils.nfc_helper import check_card_exists, normalize_card_uid
+from tests.helpers.cases import QuietTestCase
+from tests.helpers.nfc import make_project_nfc_data, to_sensor_devices
+
+
+class TestNfcCardIndex(QuietTestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = make_project_nfc_data(3, 2, 10, seed=4)
+        self.devices = to_sensor_devices(self.project)
+        self.index = NfcCardIndex()
+        for asset_id, nfc_data in self.project.items():
+            self.index.index_asset(asset_id, nfc_data)
+
+    def test_card_lookups(self):
+        # La tarjeta del slot 13 de la segunda cerradura de ASSET0000, en varios formatos
+        card = self.devices[1]["sensors"][12]["password"]
+        variants = [card, card.replace(":", ""), card.replace(":", "-").lower()]
+        for position, device in enumerate(self.devices):
+            for value in variants + [" 00:00:00:00 ", ""]:
+                with self.subTest(device=position, value=value):
+                    expected = (True, "13") if position == 1 and value in variants else (False, None)
+                    self.assertEqual(check_card_exists(device, value, self.index), expected)
+                    self.assertEqual(check_card_exists(device, value), expected)
+
+        self.assertEqual(self.index.find_card(card.lower()), [("ASSET0000", "GW-ASSET0000", "2", "13")])
+        self.assertEqual(self.index.find_card("11:22:33:44"), [])
+        self.assertEqual(self.index.stats(), {"assets": 3, "devices": 6, "cards": 60})
+        self.assertEqual(normalize_card_uid(" aa-bb:cc-dd "), "AABBCCDD")
+
+    def test_free_slots_and_incremental_updates(self):
+        device = self.devices[0]
+        self.assertEqual(self.index.free_slot_count(device), 92 - 10)
+        self.assertEqual(self.index.next_free_slot(device), "17")
+        self.assertEqual(self.index.next_free_slot(device, reserved=1 << 17), "18")
+
+        response = MagicMock(status_code=204)
+        with patch.object(api.auth_service, "make_authenticated_request_with_retry", return_value=(True, response)), \
+                patch("utils.nfc_card_index.get_nfc_card_index", return_value=self.index):
+            api.update_nfc_code_value("ASSET0000", "1", "17", "AA:BB:CC:DD", "token", gateway_id="GW-ASSET0000")
+            # Otra cerradura con el mismo ID en otro gateway no cambia
+            api.update_nfc_code_value("ASSET0000", "1", "18", "AA:BB:CC:EE", "token", gateway_id="OTHER")
+            api.update_nfc_code_value("ASSET0000", "1", "7", "", "token", gateway_id="GW-ASSET0000")
+
+        self.assertEqual(self.index.card_slot(device, "aabbccdd"), "17")
+        self.assertEqual(self.index.find_card("AA:BB:CC:EE"), [])
+        self.assertEqual(self.index.next_free_slot(device), "7")
+        self.assertEqual(self.index.free_slot_count(device), 92 - 10)
+        old_card = self.devices[0]["sensors"][6]["password"]
+        self.assertEqual(self.index.find_card(old_card), [])
+
+        # Un mismo UID en dos slots: al vaciar uno, sigue localizado en el otro
+        self.index.apply_update("ASSET0000", ["1"], None, "30", "AA:BB:CC:DD")
+        self.index.apply_update("ASSET0000", ["1"], None, "17", "")
+        self.assertEqual(self.index.card_slot(device, "AA:BB:CC:DD"), "30")
+
+        full = {"asset_id": "A", "gateway_id": "G", "real_device_id": "1"}
+        self.index.index_asset("A", {"data": {"devices": [
+            {**full, **{f"sensor_{slot}": f"{slot:08X}" for slot in range(1, 99)}}
+        ]}})
+        self.assertIsNone(self.index.next_free_slot(full))
+        self.assertEqual(self.index.free_slot_count(full), 0)
+
+    def test_ensure_assets_loads_missing_and_expired(self):
+        calls = []
+
+        def get_nfc_passwords(asset_id, jwt_token, refresh=False):
+            calls.append(asset_id)
+            return self.project.get(asset_id, {"data": {"devices": []}})
+
+        index = NfcCardIndex()
+        with patch.object(api, "get_nfc_passwords", get_nfc_passwords):
+            index.ensure_assets(["ASSET0000", "ASSET0001", None], "token")
+            index.ensure_assets(["ASSET0000", "ASSET0002"], "token")
+            self.assertEqual(sorted(calls), ["ASSET0000", "ASSET0001", "ASSET0002"])
+
+            with patch("utils.nfc_card_index.time.monotonic", return_value=time.monotonic() + 600):
+                index.ensure_assets(["ASSET0000"], "token")
+            self.assertEqual(calls.count("ASSET0000"), 2)
+
+            # Otra sesión vuelve a pedir los assets a la API antes de usar el índice
+            index.ensure_assets(["ASSET0000"], "other-token")
+            index.ensure_assets(["ASSET0000"], "other-token")
+            self.assertEqual(calls.count("ASSET0000"), 3)
+
+        self.assertTrue(index.has_device(self.devices[2]))
+        index.invalidate("ASSET0001")
+        self.assertFalse(index.has_device(self.devices[2]))
+        self.assertEqual(index.stats()["assets"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
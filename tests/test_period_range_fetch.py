@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+
+import utils.api as api
+
+TAG = {
+    "tag_name": "_TRANSVERSAL_CONSUMPTION_LIST_TAG_NAME_DOMESTIC_COLD_WATER",
+    "gateway_id": "GW1",
+    "device_id": "DEV1",
+    "sensor_id": "1",
+}
+
+
+def fake_time_series(url, params=None, headers=None):
+    """Devuelve una lectura diaria (a mediodía) para cada día del rango pedido."""
+    start = datetime.strptime(params["from"], "%m-%d-%Y")
+    end = datetime.strptime(params["until"], "%m-%d-%Y")
+    data = []
+    day = start
+    while day <= end:
+        ts = int((day + timedelta(hours=12)).timestamp())
+        data.append({"ts": ts, "v": float(day.timetuple().tm_yday)})
+        day += timedelta(days=1)
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"data": data}
+    return response
+
+
+class TestPeriodRangeFetch(unittest.TestCase):
+    def setUp(self):
+        self.project_folder = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.project_folder, f"daily_readings_ASSET1_{TAG['tag_name']}.csv")
+        self.patches = [
+            patch("utils.repositories.readings_writer.sync_readings_file"),
+            patch.object(api.auth_service, "get_user_data_from_token", return_value={}),
+            patch.object(api.auth_service, "get_auth_headers_from_token", return_value={}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        shutil.rmtree(self.project_folder, ignore_errors=True)
+
+    def _months(self, first, last):
+        return [str(p) for p in pd.period_range(first, last, freq="M")]
+
+    def test_full_year_is_one_request_and_one_write(self):
+        with patch.object(api.http_client, "get", side_effect=fake_time_series) as get, \
+             patch.object(pd.DataFrame, "to_csv", autospec=True, side_effect=pd.DataFrame.to_csv) as to_csv:
+            results = api.get_daily_readings_for_tag_period("ASSET1", TAG, self._months("2024-01", "2024-12"),
+                                                            self.project_folder, token="token")
+
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(to_csv.call_count, 1)
+        self.assertTrue(all(results.values()))
+        self.assertEqual(len(results), 12)
+        self.assertEqual(len(pd.read_csv(self.file_path)), 366)
+
+    def test_only_missing_and_error_months_are_fetched(self):
+        dates = pd.date_range("2024-01-01", "2024-04-30").strftime("%Y-%m-%d")
+        values = [str(i) for i in range(len(dates))]
+        values[40] = "Error"  # 2024-02-10
+        pd.DataFrame({"date": dates, "value": values, "timestamp": 0}).to_csv(self.file_path, index=False)
+
+        with patch.object(api.http_client, "get", side_effect=fake_time_series) as get:
+            results = api.get_daily_readings_for_tag_period("ASSET1", TAG, self._months("2024-01", "2024-06"),
+                                                            self.project_folder, token="token")
+
+        requested = [(c.kwargs["params"]["from"], c.kwargs["params"]["until"]) for c in get.call_args_list]
+        self.assertEqual(requested, [("02-01-2024", "02-29-2024"), ("05-01-2024", "06-30-2024")])
+        self.assertEqual(set(results), set(self._months("2024-01", "2024-06")))
+
+        data = pd.read_csv(self.file_path)
+        self.assertEqual(len(data), len(pd.date_range("2024-01-01", "2024-06-30")))
+        self.assertNotIn("Error", data["value"].astype(str).tolist())
+
+    def test_long_range_is_split_by_max_window(self):
+        with patch.object(api.http_client, "get", side_effect=fake_time_series) as get:
+            readings = api.get_daily_readings_with_sensor_params_range(
+                "ASSET1", "DEV1", "1", "GW1", datetime(2023, 1, 1), datetime(2024, 12, 31),
+                token="token", max_window_days=200
+            )
+
+        self.assertEqual(get.call_count, 4)
+        self.assertEqual(len(readings), 731)
+        self.assertTrue(readings["date"].is_monotonic_increasing)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import unittest
+
+import pandas as pd
+
+from utils.anomaly_experimental.project_scan import (
+    find_project_files, render_scan_plots, save_scan_results, scan_assets, scan_project
+)
+from tests.helpers.cases import QuietTestCase
+from tests.helpers.consumption import COLD_WATER_TAG as TAG, make_project_files
+
+PROJECT_ID = "test-project"
+TIMING_COLUMNS = ['load_seconds', 'detect_seconds', 'total_seconds']
+
+
+class TestProjectScan(QuietTestCase):
+    def setUp(self):
+        super().setUp()
+        self.base_path = self.make_temp_dir()
+        self.project_dir = make_project_files(self.base_path, PROJECT_ID, 6, 60, seed=4)
+
+    def test_pool_scan_reports_each_asset(self):
+        dates = pd.date_range('2024-01-01', periods=20).strftime('%Y-%m-%d')
+        series = {
+            'FLAT': [5.0] * 20,
+            'SPIKE': [5.0] * 10 + [80.0] + [5.0] * 9,
+            # Dos picos y una lectura no numérica, que se descarta
+            'TWO': [5.0] * 5 + [60.0] + [5.0] * 8 + ['Error', 90.0] + [5.0] * 4,
+        }
+        project_dir = os.path.join(self.base_path, "fixed")
+        os.makedirs(project_dir)
+        for asset_id, values in series.items():
+            pd.DataFrame({'date': dates, 'value': values}).to_csv(
+                os.path.join(project_dir, f"daily_readings_{asset_id}_{TAG}.csv"), index=False
+            )
+        tasks = find_project_files("fixed", base_path=self.base_path)
+        self.assertEqual(len(tasks), 3)
+        self.assertEqual(tasks[0]['consumption_type'], "Agua fría sanitaria")
+
+        # Lotes de 2 assets: dos tareas repartidas entre dos procesos
+        results = scan_assets(tasks, threshold_method="config", max_workers=2, chunk_size=2)
+
+        self.assertTrue(results['success'])
+        self.assertEqual(results['workers'], 2)
+        report = results['report'].set_index('asset_id')
+        self.assertEqual(report['total_records'].to_dict(), {'FLAT': 20, 'SPIKE': 20, 'TWO': 19})
+        self.assertEqual(report['anomaly_records'].to_dict(), {'FLAT': 0, 'SPIKE': 2, 'TWO': 4})
+        # Se marcan la subida y la vuelta al consumo normal
+        anomalies = results['anomalies']
+        self.assertEqual(anomalies['date'].dt.strftime('%Y-%m-%d').tolist(),
+                         ['2024-01-11', '2024-01-12', '2024-01-06', '2024-01-07', '2024-01-16', '2024-01-17'])
+        self.assertEqual(results['anomaly_records'], len(anomalies))
+        self.assertTrue((results['report'][TIMING_COLUMNS] >= 0).all().all())
+        self.assertTrue(results['report']['error'].isna().all())
+
+    def test_inline_scan_matches_pool_scan(self):
+        tasks = find_project_files(PROJECT_ID, base_path=self.base_path)
+        pooled = scan_assets(tasks, max_workers=2, chunk_size=1)
+        inline = scan_assets(tasks, max_workers=1)
+
+        self.assertEqual(inline['workers'], 1)
+        pd.testing.assert_frame_equal(pooled['report'].drop(columns=TIMING_COLUMNS),
+                                      inline['report'].drop(columns=TIMING_COLUMNS))
+        pd.testing.assert_frame_equal(pooled['anomalies'], inline['anomalies'])
+
+    def test_filters_files_and_reports_failed_assets(self):
+        pd.DataFrame({'value': [1, 2]}).to_csv(
+            os.path.join(self.project_dir, f"daily_readings_BROKEN_{TAG}.csv"), index=False
+        )
+        pd.DataFrame({'date': ['2024-01-01'], 'value': [1]}).to_csv(
+            os.path.join(self.project_dir, "daily_readings_ASSET9_DOMESTIC_ENERGY_GENERAL.csv"), index=False
+        )
+
+        self.assertEqual(len(find_project_files(PROJECT_ID, "DOMESTIC_COLD_WATER", self.base_path)), 7)
+        self.assertEqual(len(find_project_files(PROJECT_ID, "Energía general", self.base_path)), 1)
+        self.assertEqual(find_project_files("missing", base_path=self.base_path), [])
+
+        results = scan_project(PROJECT_ID, "DOMESTIC_COLD_WATER", max_workers=1, base_path=self.base_path)
+        self.assertEqual(results['assets'], 7)
+        self.assertEqual(results['failed_assets'], 1)
+        broken = results['report'].set_index('asset_id').loc['BROKEN']
+        self.assertIn('date', broken['error'])
+        self.assertEqual(broken['total_records'], 0)
+
+    def test_frame_source_and_separate_plot_stage(self):
+        df = pd.DataFrame({
+            'date': pd.date_range('2024-01-01', periods=20).tolist() * 2,
+            'asset_id': ['A'] * 20 + ['B'] * 20,
+            'consumption_type': 'Agua fría',
+            'consumption': [5.0] * 10 + [80.0] + [5.0] * 9 + [3.0] * 20,
+        })
+        results = scan_project(PROJECT_ID, data_source=df, max_workers=1)
+        report = results['report'].set_index('asset_id')
+        self.assertEqual(report.loc['A', 'source'], 'dataframe')
+        self.assertGreater(report.loc['A', 'anomaly_records'], 0)
+        self.assertEqual(set(results['anomalies']['asset_id']), {'A'})
+
+        output_dir = os.path.join(self.base_path, "results")
+        saved = save_scan_results(results, output_dir)
+        self.assertEqual(len(pd.read_csv(saved['report'])), 2)
+        plots = render_scan_plots(results, output_dir)
+        self.assertEqual(len(plots), 3)
+        self.assertTrue(all(os.path.exists(path) for path in plots))
+
+
+if __name__ == "__main__":
+    unittest.main()
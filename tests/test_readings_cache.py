@@ -0,0 +1,113 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+import pandas as pd
+
+import utils.data_loader as data_loader
+from utils.data_loader import ReadingsFileCache, load_all_csv_data
+from utils.repositories import readings_store
+from utils.repositories.readings_store import ReadingsStore
+
+PROJECT_ID = "7f81f1bd-0bc9-4802-a67c-265368c46399"
+COLD_WATER_TAG = "_TRANSVERSAL_CONSUMPTION_LIST_TAG_NAME_DOMESTIC_COLD_WATER"
+HOT_WATER_TAG = "_TRANSVERSAL_CONSUMPTION_LIST_TAG_NAME_DOMESTIC_HOT_WATER"
+
+
+class TestReadingsFileCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.data_path = os.path.join(self.temp_dir, "analyzed_data")
+        self.project_path = os.path.join(self.data_path, PROJECT_ID)
+        os.makedirs(self.project_path)
+
+        # Almacén columnar deshabilitado para medir solo la caché en memoria
+        store = ReadingsStore(os.path.join(self.temp_dir, "readings_store"))
+        self.patches = [
+            patch.object(readings_store, "_default_store", store),
+            patch.object(readings_store, "PYARROW_AVAILABLE", False),
+            patch.object(data_loader, "_READINGS_CACHE", ReadingsFileCache()),
+        ]
+        for p in self.patches:
+            p.start()
+
+        for asset_id in ("ASSET1", "ASSET2"):
+            for tag in (COLD_WATER_TAG, HOT_WATER_TAG):
+                self._write_csv(asset_id, tag, ["1.0", "2.0", "3.0"])
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write_csv(self, asset_id, tag, values):
+        path = os.path.join(self.project_path, f"daily_readings_{asset_id}_{tag}.csv")
+        dates = pd.date_range("2024-01-01", periods=len(values)).strftime("%Y-%m-%d")
+        pd.DataFrame({"date": dates, "value": values}).to_csv(path, index=False)
+        return path
+
+    def _load(self, tags):
+        with patch("utils.data_loader.load_csv_data", wraps=data_loader.load_csv_data) as parser:
+            df = load_all_csv_data(base_path=self.data_path, project_id=PROJECT_ID, consumption_tags=tags)
+        return df, parser.call_count
+
+    def test_tag_subset_is_served_from_cache(self):
+        _, parsed = self._load([COLD_WATER_TAG, HOT_WATER_TAG])
+        self.assertEqual(parsed, 4)
+
+        df, parsed = self._load([HOT_WATER_TAG])
+        self.assertEqual(parsed, 0)
+        self.assertEqual(set(df["tag"]), {HOT_WATER_TAG})
+        self.assertEqual(len(df), 6)
+
+        stats = data_loader.get_data_cache_stats()
+        self.assertEqual(stats["misses"], 4)
+        self.assertEqual(stats["hits"], 2)
+
+    def test_only_changed_files_are_reparsed(self):
+        self._load([COLD_WATER_TAG, HOT_WATER_TAG])
+        self._write_csv("ASSET1", COLD_WATER_TAG, ["1.0", "2.0", "3.0", "4.0"])
+
+        df, parsed = self._load([COLD_WATER_TAG, HOT_WATER_TAG])
+        self.assertEqual(parsed, 1)
+        self.assertEqual(len(df), 13)
+
+    def test_cache_hits_are_counted_explicitly(self):
+        tags = [COLD_WATER_TAG, HOT_WATER_TAG]
+        with patch.object(readings_store, "PYARROW_AVAILABLE", True):
+            # Convierte los archivos al almacén columnar
+            load_all_csv_data(base_path=self.data_path, project_id=PROJECT_ID, consumption_tags=tags)
+            # Fuera del rango de fechas del almacén las lecturas salen vacías: no son aciertos de caché
+            with patch.object(data_loader, "_READINGS_CACHE", ReadingsFileCache()):
+                for expected in ("0 archivos desde caché, 4 leídos de disco",
+                                 "4 archivos desde caché, 0 leídos de disco"):
+                    output = io.StringIO()
+                    with redirect_stdout(output):
+                        load_all_csv_data(base_path=self.data_path, project_id=PROJECT_ID,
+                                          consumption_tags=tags, start_date="2030-01-01")
+                    self.assertIn(expected, output.getvalue())
+
+    def test_memory_ceiling_evicts_least_recently_used(self):
+        frame = pd.DataFrame({"value": range(100)})
+        size = int(frame.memory_usage(deep=True).sum())
+        cache = ReadingsFileCache(max_bytes=size * 2)
+
+        cache.put("a.csv", (1, 1), frame)
+        cache.put("b.csv", (1, 1), frame)
+        self.assertIsNotNone(cache.get("a.csv", (1, 1)))
+        cache.put("c.csv", (1, 1), frame)
+
+        self.assertIsNone(cache.get("b.csv", (1, 1)))
+        self.assertIsNotNone(cache.get("a.csv", (1, 1)))
+        self.assertIsNone(cache.get("a.csv", (2, 1)))
+        stats = cache.stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertLessEqual(stats["bytes"], size * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
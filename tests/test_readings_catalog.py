@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from utils import data_loader
+from utils.repositories import readings_catalog
+from utils.repositories.reading_repository import ReadingRepository
+from utils.repositories.readings_catalog import ReadingsCatalog
+from utils.repositories.readings_writer import ReadingsWriteCoordinator
+
+PROJECT_A = "7f81f1bd-0bc9-4802-a67c-265368c46399"
+PROJECT_B = "0a2b3c4d-0000-4000-8000-000000000000"
+COLD_WATER_TAG = "_TRANSVERSAL_CONSUMPTION_LIST_TAG_NAME_DOMESTIC_COLD_WATER"
+ENERGY_TAG = "_TRANSVERSAL_CONSUMPTION_LIST_TAG_NAME_DOMESTIC_ENERGY_GENERAL"
+
+
+class TestReadingsCatalog(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.base_path = os.path.join(self.temp_dir, "analyzed_data")
+        self.catalog_path = os.path.join(self.temp_dir, "readings_catalog.json")
+        os.makedirs(os.path.join(self.base_path, PROJECT_A))
+        os.makedirs(os.path.join(self.base_path, PROJECT_B))
+        os.makedirs(os.path.join(self.base_path, "general"))
+
+        self._write(PROJECT_A, f"daily_readings_ASSET1_{COLD_WATER_TAG}.csv", ["2024-01-01", "2024-01-03"])
+        self._write(PROJECT_A, "daily_readings_ASSET1_DOMESTIC_COLD_WATER.csv", ["2024-01-02", "2024-01-05", "Error"])
+        self._write(PROJECT_A, "daily_readings_ASSET1_DOMESTIC_ENERGY_GENERAL.csv", ["2024-02-01"])
+        self._write(PROJECT_B, f"daily_readings_ASSET2_{COLD_WATER_TAG}.csv", ["2024-03-01"])
+        self._write("general", f"daily_readings_ASSET3_{COLD_WATER_TAG}.csv", ["2024-03-01"])
+        self.catalog = ReadingsCatalog(self.base_path, self.catalog_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, project_id, filename, dates):
+        path = os.path.join(self.base_path, project_id, filename)
+        pd.DataFrame({"date": dates, "value": range(len(dates))}).to_csv(path, index=False)
+        return path
+
+    def test_asset_lookup_prefers_consumption_type_and_single_format(self):
+        files = self.catalog.get_asset_files("ASSET1", "Agua fría sanitaria")
+        self.assertEqual([(f['format'], f['rows']) for f in files], [('single', 3), ('double', 2)])
+        self.assertEqual(files[0]['project_id'], PROJECT_A)
+        self.assertEqual((files[0]['start_date'], files[0]['end_date']), ("2024-01-02T00:00:00", "2024-01-05T00:00:00"))
+        self.assertEqual(self.catalog.get_asset_files("ASSET1", "Energía general")[0]['tag'], ENERGY_TAG)
+
+        self.assertEqual(self.catalog.get_project_for_asset("ASSET2"), PROJECT_B)
+        self.assertIsNone(self.catalog.get_project_for_asset("ASSET3", exclude=("general",)))
+        self.assertEqual(self.catalog.get_assets(PROJECT_A), ["ASSET1"])
+        self.assertEqual(self.catalog.get_projects(), sorted([PROJECT_A, PROJECT_B, "general"]))
+
+    def test_refresh_only_rescans_changed_directories(self):
+        self.catalog.get_assets()
+        self._write(PROJECT_B, "daily_readings_ASSET4_DOMESTIC_COLD_WATER.csv", ["2024-04-01"])
+        os.remove(os.path.join(self.base_path, PROJECT_A, "daily_readings_ASSET1_DOMESTIC_ENERGY_GENERAL.csv"))
+
+        with patch.object(ReadingsCatalog, "_scan_directory", wraps=self.catalog._scan_directory) as scan:
+            self.assertEqual(self.catalog.get_assets(PROJECT_B), ["ASSET2", "ASSET4"])
+            self.assertEqual(len(self.catalog.get_asset_files("ASSET1")), 2)
+            self.catalog.get_assets()
+        scanned = sorted(os.path.basename(call.args[0]) for call in scan.call_args_list)
+        self.assertEqual(scanned, sorted([PROJECT_A, PROJECT_B]))
+
+        shutil.rmtree(os.path.join(self.base_path, PROJECT_B))
+        self.assertIsNone(self.catalog.get_project_for_asset("ASSET2"))
+
+    def test_persisted_catalog_and_rebuild(self):
+        self.assertEqual(self.catalog.rebuild(), 5)
+
+        with patch("pandas.read_csv") as read_csv:
+            reloaded = ReadingsCatalog(self.base_path, self.catalog_path)
+            self.assertEqual(reloaded.get_project_for_asset("ASSET1"), PROJECT_A)
+        read_csv.assert_not_called()
+
+    def test_writer_and_loader_keep_catalog_current(self):
+        path = os.path.join(self.base_path, PROJECT_A, "daily_readings_ASSET1_DOMESTIC_COLD_WATER.csv")
+        self.catalog.get_assets()
+        with patch.dict(readings_catalog._catalogs, {os.path.abspath(self.base_path): self.catalog}):
+            ReadingsWriteCoordinator(sync_store=False).merge(
+                path, pd.DataFrame({"date": ["2024-01-10"], "value": [9.0]})
+            )
+        entry = self.catalog.get_asset_files("ASSET1", "Agua fría sanitaria")[0]
+        # La fila 'Error' se descarta al combinar
+        self.assertEqual((entry['rows'], entry['end_date']), (3, "2024-01-10T00:00:00"))
+
+        with patch.object(readings_catalog, "get_readings_catalog", return_value=self.catalog):
+            self.assertEqual(data_loader.get_project_for_asset("ASSET1"), PROJECT_A)
+            self.assertIsNone(data_loader.get_project_for_asset("ASSET3"))
+            self.assertEqual([p['id'] for p in data_loader.get_projects_with_data(None)],
+                             sorted([PROJECT_A, PROJECT_B, "general"]))
+            self.assertEqual([a['id'] for a in data_loader.get_assets_with_data(None, PROJECT_B)], ["ASSET2"])
+            self.assertEqual(len(data_loader.get_assets_with_data(None, "all")), 3)
+
+        with patch("utils.repositories.reading_repository.get_readings_catalog", return_value=self.catalog), \
+                patch("utils.repositories.reading_repository.AnomalyStore"):
+            readings = ReadingRepository().get_original_readings("ASSET1", "Energía general")
+        self.assertEqual(readings['date'].tolist(), [pd.Timestamp("2024-02-01")])
+
+
+if __name__ == "__main__":
+    unittest.main()
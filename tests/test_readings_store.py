@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from utils.data_loader import clear_data_cache, load_all_csv_data
+from utils.repositories import readings_store
+from utils.repositories.readings_store import ReadingsStore
+
+PROJECT_ID = "7f81f1bd-0bc9-4802-a67c-265368c46399"
+COLD_WATER_TAG = "_TRANSVERSAL_CONSUMPTION_LIST_TAG_NAME_DOMESTIC_COLD_WATER"
+HOT_WATER_TAG = "_TRANSVERSAL_CONSUMPTION_LIST_TAG_NAME_DOMESTIC_HOT_WATER"
+
+
+@unittest.skipUnless(readings_store.PYARROW_AVAILABLE, "pyarrow no está instalado")
+class TestReadingsStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.data_path = os.path.join(self.temp_dir, "analyzed_data")
+        self.project_path = os.path.join(self.data_path, PROJECT_ID)
+        os.makedirs(self.project_path)
+
+        self.store = ReadingsStore(os.path.join(self.temp_dir, "readings_store"))
+        self.store_patch = patch.object(readings_store, "_default_store", self.store)
+        self.store_patch.start()
+        clear_data_cache()
+
+        self._write_csv("ASSET1", COLD_WATER_TAG, ["2023-12-30", "2023-12-31", "2024-01-01", "2024-01-02"],
+                        ["10.0", "11.0", "Error", "13.0"])
+        self._write_csv("ASSET2", HOT_WATER_TAG, ["2024-01-01", "2024-01-02"], ["5.0", "6.5"])
+
+    def tearDown(self):
+        self.store_patch.stop()
+        clear_data_cache()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write_csv(self, asset_id, tag, dates, values):
+        path = os.path.join(self.project_path, f"daily_readings_{asset_id}_{tag}.csv")
+        pd.DataFrame({"date": dates, "value": values}).to_csv(path, index=False)
+        return path
+
+    def _load(self, **kwargs):
+        clear_data_cache()
+        df = load_all_csv_data(base_path=self.data_path, project_id=PROJECT_ID, **kwargs)
+        return df.sort_values(["asset_id", "date"]).reset_index(drop=True)
+
+    def test_fallback_converts_and_store_matches_csv(self):
+        from_csv = self._load()
+
+        manifest = self.store.load_manifest(PROJECT_ID)
+        self.assertEqual(len(manifest), 2)
+        self.assertTrue(os.path.exists(self.store.partition_path(PROJECT_ID, COLD_WATER_TAG, 2023, "ASSET1")))
+        self.assertTrue(os.path.exists(self.store.partition_path(PROJECT_ID, COLD_WATER_TAG, 2024, "ASSET1")))
+
+        with patch("utils.data_loader.load_csv_data") as mock_load_csv:
+            from_store = self._load()
+            mock_load_csv.assert_not_called()
+
+        columns = ["date", "asset_id", "tag", "consumption_type", "project_id", "consumption", "month"]
+        pd.testing.assert_frame_equal(from_store[columns], from_csv[columns])
+
+    def test_reads_only_selected_tags_columns_and_years(self):
+        self._load()
+
+        df = self._load(
+            consumption_tags=[COLD_WATER_TAG],
+            columns=["date", "asset_id", "consumption"],
+            start_date="2024-01-01",
+            end_date="2024-12-31",
+        )
+        self.assertEqual(list(df.columns), ["date", "asset_id", "consumption"])
+        self.assertEqual(set(df["asset_id"]), {"ASSET1"})
+        self.assertEqual(len(df), 2)
+
+    def test_projection_prunes_store_reads(self):
+        self._load()
+        reads = []
+        read_entries = self.store.read_entries
+
+        def tracking_read_entries(project_id, entries, columns=None, years=None):
+            reads.append((columns, years))
+            return read_entries(project_id, entries, columns=columns, years=years)
+
+        with patch.object(self.store, "read_entries", side_effect=tracking_read_entries):
+            df = self._load(columns=["asset_id", "consumption", "date"], start_date="2024-01-01", end_date="2024-06-30")
+            self.assertEqual(len(df), 4)
+            self.assertEqual(reads, [(["date", "asset_id", "consumption"], [2024])] * 2)
+
+            # Archivos sin particiones en el rango: no se lee nada
+            reads.clear()
+            self.assertTrue(load_all_csv_data(base_path=self.data_path, project_id=PROJECT_ID,
+                                              start_date="2025-01-01").empty)
+            self.assertEqual(reads, [])
+
+            # Una carga completa no se sirve con el DataFrame recortado de la caché
+            full = load_all_csv_data(base_path=self.data_path, project_id=PROJECT_ID)
+            self.assertEqual(len(full), 6)
+
+    def test_modified_csv_falls_back_to_csv(self):
+        self._load()
+        self._write_csv("ASSET2", HOT_WATER_TAG, ["2024-01-01", "2024-01-02", "2024-01-03"], ["5.0", "6.5", "7.0"])
+
+        df = self._load(consumption_tags=[HOT_WATER_TAG])
+        self.assertEqual(len(df), 3)
+        self.assertEqual(self.store.load_manifest(PROJECT_ID)[f"daily_readings_ASSET2_{HOT_WATER_TAG}.csv"]["rows"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pandas as pd
+
+import utils.api as api
+from utils.repositories import readings_writer
+from utils.repositories.readings_writer import ReadingsWriteCoordinator
+
+TAG = {
+    "tag_name": "_TRANSVERSAL_CONSUMPTION_LIST_TAG_NAME_DOMESTIC_COLD_WATER",
+    "gateway_id": "GW1",
+    "device_id": "DEV1",
+    "sensor_id": "1",
+}
+
+
+def month_readings(month):
+    dates = pd.date_range(f"{month}-01", periods=pd.Period(month).days_in_month, freq="D")
+    return pd.DataFrame({
+        "date": dates.strftime("%Y-%m-%d"),
+        "value": [float(d.dayofyear) for d in dates],
+        "timestamp": [int(d.timestamp()) for d in dates],
+    })
+
+
+class TestReadingsWriteCoordinator(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.temp_dir, "daily_readings_ASSET1_TAG.csv")
+        self.coordinator = ReadingsWriteCoordinator(sync_store=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_overlapping_updates_keep_every_row(self):
+        months = [str(p) for p in pd.period_range("2022-01", "2024-12", freq="M")]
+        # Cada mes se envía varias veces, como harían tareas solapadas
+        jobs = months * 4
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            results = list(executor.map(lambda m: self.coordinator.merge(self.file_path, month_readings(m)), jobs))
+
+        data = pd.read_csv(self.file_path)
+        expected_dates = pd.date_range("2022-01-01", "2024-12-31").strftime("%Y-%m-%d").tolist()
+        self.assertEqual(data["date"].tolist(), expected_dates)
+        self.assertEqual(len(results), len(jobs))
+        self.assertFalse([f for f in os.listdir(self.temp_dir) if f.endswith(".tmp")])
+
+    def test_updates_are_batched_while_a_write_is_in_progress(self):
+        writes = []
+        original_write = readings_writer.write_csv_atomic
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_write(df, file_path):
+            writes.append(len(df))
+            started.set()
+            release.wait(2)
+            original_write(df, file_path)
+
+        with patch.object(readings_writer, "write_csv_atomic", side_effect=slow_write):
+            first = threading.Thread(target=self.coordinator.merge, args=(self.file_path, month_readings("2024-01")))
+            first.start()
+            self.assertTrue(started.wait(5))
+            # Mientras se escribe enero, llegan el resto de meses
+            others = [threading.Thread(target=self.coordinator.merge, args=(self.file_path, month_readings(m)))
+                      for m in ("2024-02", "2024-03", "2024-04")]
+            for t in others:
+                t.start()
+            release.set()
+            for t in [first] + others:
+                t.join()
+
+        self.assertEqual(len(writes), 2)
+        self.assertEqual(len(pd.read_csv(self.file_path)), 31 + 29 + 31 + 30)
+
+    def test_concurrent_monthly_updates_of_one_sensor(self):
+        months = [str(p) for p in pd.period_range("2023-01", "2023-12", freq="M")]
+        with patch.object(readings_writer, "_default_coordinator", self.coordinator), \
+             patch.object(api, "get_daily_readings_with_sensor_params_monthly",
+                          side_effect=lambda asset_id, device_id, sensor_id, gateway_id, month, token: month_readings(month)):
+            with ThreadPoolExecutor(max_workers=12) as executor:
+                list(executor.map(
+                    lambda m: api.get_daily_readings_for_tag_monthly("ASSET1", TAG, m, self.temp_dir, "token"),
+                    months * 3
+                ))
+
+        file_path = os.path.join(self.temp_dir, f"daily_readings_ASSET1_{TAG['tag_name']}.csv")
+        data = pd.read_csv(file_path)
+        self.assertEqual(len(data), 365)
+        self.assertTrue(data["date"].is_monotonic_increasing)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import io
+import os
+import unittest
+
+import pandas as pd
+
+from utils.salto_export import SaltoAuthError, download_year, month_ranges
+from tests.helpers.cases import QuietTestCase
+from tests.helpers.salto import SALTO_COLUMNS, FakeSaltoServer, make_month_csv
+
+
+def read_export(path):
+    return pd.read_csv(path, sep=";", dtype=str, keep_default_na=False)
+
+
+class TestSaltoExport(QuietTestCase):
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = self.make_temp_dir()
+        self.output_path = os.path.join(self.temp_dir, "salto_2024.csv")
+
+    def test_months_are_downloaded_in_parallel_without_preflight(self):
+        server = FakeSaltoServer(2024, 50, latency=0.05, bandwidth_mb=None)
+        with server.patched():
+            result = download_year("site", 2024, "eyJ", self.output_path, max_workers=3, chunk_rows=7)
+
+        self.assertEqual(result, {"rows": 600, "months": list(range(1, 13)), "errors": {}})
+        self.assertEqual((server.options_requests, server.get_requests), (0, 12))
+        self.assertTrue(1 < server.max_active <= 3)
+
+        expected = pd.concat([pd.read_csv(io.BytesIO(server.months[month]), sep=";", dtype=str)
+                              for month in range(1, 13)], ignore_index=True)
+        pd.testing.assert_frame_equal(read_export(self.output_path), expected)
+
+    def test_fixed_schema_empty_and_failed_months(self):
+        january = make_month_csv(2024, 1, 5)
+        reordered = pd.read_csv(io.BytesIO(make_month_csv(2024, 2, 3)), sep=";", dtype=str)
+        reordered = reordered[list(reversed(SALTO_COLUMNS[1:]))].assign(Extra="x")
+        months = {
+            1: january,
+            2: reordered.to_csv(sep=";", index=False).encode("utf-8"),
+            3: b"",
+            4: (";".join(SALTO_COLUMNS) + "\n").encode("utf-8"),
+            6: make_month_csv(2024, 6, 2).replace(b";", b","),
+        }
+        server = FakeSaltoServer(2024, 0, latency=0, bandwidth_mb=None, months=months, statuses={5: 500})
+        with server.patched():
+            result = download_year("site", 2024, "eyJ", self.output_path)
+
+        self.assertEqual(result["rows"], 10)
+        self.assertEqual(result["months"], [1, 2, 6])
+        self.assertEqual(list(result["errors"]), [5])
+        output = read_export(self.output_path)
+        self.assertEqual(list(output.columns), SALTO_COLUMNS)
+        self.assertEqual(list(output.loc[5:7, "Local Time"]), ["", "", ""])
+        self.assertEqual(list(output.loc[5:7, "Lock Id"]), list(reordered["Lock Id"]))
+        self.assertTrue(output.loc[8:, "Local Time"].str.startswith("06/").all())
+
+    def test_unparseable_month_is_skipped(self):
+        months = {
+            1: make_month_csv(2024, 1, 4),
+            2: b"\n\n",
+            3: make_month_csv(2024, 3, 3) + b'"unterminated;quote\n',
+            4: make_month_csv(2024, 4, 2),
+        }
+        server = FakeSaltoServer(2024, 0, latency=0, bandwidth_mb=None, months=months)
+        with server.patched():
+            result = download_year("site", 2024, "eyJ", self.output_path, chunk_rows=2)
+
+        self.assertEqual(result["rows"], 6)
+        self.assertEqual(result["months"], [1, 4])
+        self.assertEqual(sorted(result["errors"]), [2, 3])
+        output = read_export(self.output_path)
+        self.assertEqual(list(output.columns), SALTO_COLUMNS)
+        self.assertEqual(len(output), 6)
+        self.assertTrue(output.loc[4:, "Local Time"].str.startswith("04/").all())
+
+    def test_invalid_token_aborts(self):
+        server = FakeSaltoServer(2024, 5, latency=0, bandwidth_mb=None, statuses={7: 401})
+        with server.patched(), self.assertRaises(SaltoAuthError):
+            download_year("site", 2024, "eyJ", self.output_path)
+
+    def test_month_ranges(self):
+        ranges = month_ranges(2024)
+        self.assertEqual(ranges[1][2].day, 29)
+        self.assertEqual((ranges[11][1].day, ranges[11][2].day), (1, 31))
+        self.assertEqual(month_ranges(2023)[1][2].day, 28)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import utils.api as api
+from utils import sensor_metadata
+from utils.sensor_metadata import SensorMetadataCache
+
+COLD_WATER_TAG = "_TRANSVERSAL_CONSUMPTION_LIST_TAG_NAME_DOMESTIC_COLD_WATER"
+HOT_WATER_TAG = "_TRANSVERSAL_CONSUMPTION_LIST_TAG_NAME_DOMESTIC_HOT_WATER"
+
+
+class TestSensorMetadataCache(unittest.TestCase):
+    def test_concurrent_requests_are_coalesced(self):
+        cache = SensorMetadataCache(ttl=60)
+        calls = []
+        release = threading.Event()
+
+        def loader(asset_id):
+            calls.append(asset_id)
+            release.wait(2)
+            return [{"tag_name": COLD_WATER_TAG}]
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get("ASSET1", loader))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(calls, ["ASSET1"])
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(r == [{"tag_name": COLD_WATER_TAG}] for r in results))
+        self.assertEqual(cache.stats()["coalesced"], 7)
+
+    def test_ttl_and_empty_results(self):
+        cache = SensorMetadataCache(ttl=60)
+        responses = [[], [{"tag_name": COLD_WATER_TAG}]]
+        loader = lambda asset_id: responses.pop(0)
+
+        self.assertEqual(cache.get("ASSET1", loader), [])
+        # Las respuestas vacías no se cachean
+        self.assertEqual(cache.get("ASSET1", loader), [{"tag_name": COLD_WATER_TAG}])
+        self.assertEqual(cache.get("ASSET1", loader), [{"tag_name": COLD_WATER_TAG}])
+        self.assertEqual(cache.stats()["hits"], 1)
+
+        with patch("utils.sensor_metadata.time.monotonic", return_value=time.monotonic() + 120):
+            self.assertEqual(cache.get("ASSET1", lambda asset_id: [{"tag_name": HOT_WATER_TAG}]),
+                             [{"tag_name": HOT_WATER_TAG}])
+
+
+class TestPeriodUpdateMetadata(unittest.TestCase):
+    def test_metadata_resolved_once_per_asset(self):
+        sensors = [
+            {"tag_name": COLD_WATER_TAG, "gateway_id": "G", "device_id": "D1", "sensor_id": "1"},
+            {"tag_name": HOT_WATER_TAG, "gateway_id": "G", "device_id": "D2", "sensor_id": "2"},
+        ]
+        with patch.object(sensor_metadata, "_sensor_metadata_cache", SensorMetadataCache(ttl=60)), \
+             patch.object(api, "ensure_project_folder_exists", return_value="/tmp/project"), \
+             patch.object(api, "get_asset_ids_from_project", return_value=["ASSET1", "ASSET2", "ASSET3"]), \
+             patch.object(api, "get_sensors_with_tags", return_value=sensors) as get_sensors, \
+             patch.object(api, "get_daily_readings_for_tag_period",
+                          side_effect=lambda asset_id, tag, months, *args: {m: True for m in months}) as fetch:
+            result = api.get_daily_readings_for_period_multiple_tags_project_parallel(
+                "PROJECT", [COLD_WATER_TAG, HOT_WATER_TAG], "2024-01-01", "2024-06-30", token="token"
+            )
+
+        self.assertEqual(get_sensors.call_count, 3)
+        self.assertEqual(fetch.call_count, 3 * 2)
+        self.assertEqual(result["success_count"], 36)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from utils.anomaly_experimental import threshold_store
+from utils.anomaly_experimental.contextual_detection import ContextualAnomalyDetector
+from utils.anomaly_experimental.threshold_calculator import ThresholdCalculator
+from utils.anomaly_experimental.threshold_store import ThresholdStore, compute_thresholds
+from tests.helpers.cases import QuietTestCase
+from tests.helpers.consumption import make_daily_consumption
+
+
+def _calculator_thresholds(df, method, percentile=95):
+    keys = df[['asset_id', 'consumption_type']].drop_duplicates().itertuples(index=False, name=None)
+    return {
+        key: ThresholdCalculator(*key).get_thresholds(df=df, method=method, percentile=percentile)
+        for key in keys
+    }
+
+
+def _assert_same_thresholds(test, actual, expected):
+    test.assertEqual(set(actual), set(expected))
+    for key, thresholds in expected.items():
+        test.assertEqual(set(actual[key]), set(thresholds), key)
+        for name, value in thresholds.items():
+            if isinstance(value, float):
+                np.testing.assert_allclose(actual[key][name], value, rtol=1e-9, err_msg=f"{key} {name}")
+            else:
+                test.assertEqual(actual[key][name], value, f"{key} {name}")
+
+
+class TestComputeThresholds(QuietTestCase):
+    def setUp(self):
+        super().setUp()
+        df = make_daily_consumption(8, 150, seed=5)
+        # Grupos con pocas lecturas, sin lecturas recientes y con lecturas no numéricas
+        few = df[(df['asset_id'] == "ASSET00001")].groupby('consumption_type').head(5)
+        old = df[df['asset_id'] == "ASSET00002"].assign(date=lambda d: d['date'] - pd.Timedelta(days=200))
+        rest = df[~df['asset_id'].isin(["ASSET00001", "ASSET00002"])].copy()
+        rest.loc[rest.index[:20], 'consumption'] = np.nan
+        self.df = pd.concat([rest, few, old], ignore_index=True)
+
+    def test_matches_threshold_calculator(self):
+        for method in ("std_dev", "percentile", "config"):
+            with self.subTest(method=method):
+                _assert_same_thresholds(
+                    self, compute_thresholds(self.df, method=method, percentile=90),
+                    _calculator_thresholds(self.df, method, percentile=90)
+                )
+
+    def test_uses_corrected_values(self):
+        df = self.df.assign(corrected_value=self.df['consumption'] * 2)
+        _assert_same_thresholds(self, compute_thresholds(df), _calculator_thresholds(df, "std_dev"))
+
+
+class TestThresholdStore(QuietTestCase):
+    def setUp(self):
+        super().setUp()
+        self.folder = self.make_temp_dir()
+        self.path = os.path.join(self.folder, "thresholds.db")
+        self.df = make_daily_consumption(5, 120, seed=2)
+
+    def test_build_persists_thresholds_and_window(self):
+        store = ThresholdStore(self.path)
+        self.assertEqual(store.build(self.df), 10)
+
+        reloaded = ThresholdStore(self.path)
+        key = ("ASSET00003", "Agua fría")
+        _assert_same_thresholds(self, {key: reloaded.get(*key)}, {key: compute_thresholds(self.df)[key]})
+        start, end = reloaded.get_window(*key)
+        self.assertEqual(end, self.df['date'].max())
+        self.assertGreaterEqual(start, self.df['date'].max() - pd.Timedelta(days=90))
+        self.assertIsNone(reloaded.get("UNKNOWN", "Agua fría"))
+
+        # Un método nuevo se calcula una vez para todos los grupos y se persiste
+        percentile = reloaded.get(*key, method="percentile", percentile=90)
+        self.assertEqual(percentile['method'], 'percentile')
+        with patch.object(threshold_store, "thresholds_from_window") as compute:
+            self.assertEqual(ThresholdStore(self.path).get(*key, method="percentile", percentile=90), percentile)
+        compute.assert_not_called()
+
+    def test_update_only_recomputes_groups_with_new_readings(self):
+        last_day = self.df['date'].max()
+        store = ThresholdStore(self.path)
+        store.build(self.df[self.df['date'] < last_day])
+        store.get("ASSET00000", "Agua fría", method="percentile")
+
+        # Solo ASSET00001 tiene lecturas del último día
+        df = self.df[(self.df['date'] < last_day) | (self.df['asset_id'] == "ASSET00001")]
+        with patch.object(threshold_store, "thresholds_from_window",
+                          wraps=threshold_store.thresholds_from_window) as compute, \
+                patch.object(store, "_write", wraps=store._write) as write:
+            self.assertEqual(store.update(df), 2)
+            self.assertEqual(store.update(df), 0)
+
+        # Solo se reescriben las filas de los grupos recalculados (ventana y umbrales de cada método)
+        group_rows, threshold_rows, rebuild = write.call_args.args
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual({row[:2] for row in group_rows}, {("ASSET00001", "Agua fría"), ("ASSET00001", "Energía general")})
+        self.assertEqual(len(threshold_rows), 4)
+        self.assertFalse(rebuild)
+        reloaded = ThresholdStore(self.path)
+        self.assertEqual(reloaded.get_window("ASSET00001", "Agua fría"), store.get_window("ASSET00001", "Agua fría"))
+        key = ("ASSET00000", "Agua fría")
+        _assert_same_thresholds(self, {key: reloaded.get(*key)}, {key: store.get(*key)})
+
+        # Una agregación por método guardado, solo con las ventanas de los grupos nuevos
+        self.assertEqual(compute.call_count, 2)
+        self.assertEqual(set(compute.call_args.args[0]['asset_id']), {"ASSET00001"})
+        self.assertEqual(store.get_window("ASSET00001", "Agua fría")[1], last_day)
+        self.assertLess(store.get_window("ASSET00000", "Agua fría")[1], last_day)
+
+        expected = compute_thresholds(df, method="percentile")
+        key = ("ASSET00001", "Energía general")
+        _assert_same_thresholds(self, {key: store.get(*key, method="percentile")}, {key: expected[key]})
+
+    def test_store_built_with_another_window_is_discarded(self):
+        ThresholdStore(self.path).build(self.df)
+        store = ThresholdStore(self.path, window_days=30)
+        self.assertIsNone(store.get("ASSET00000", "Agua fría"))
+        store.update(self.df[self.df['asset_id'] == "ASSET00000"])
+        reloaded = ThresholdStore(self.path, window_days=30)
+        self.assertIsNotNone(reloaded.get_window("ASSET00000", "Agua fría"))
+        self.assertIsNone(reloaded.get_window("ASSET00001", "Agua fría"))
+
+    def test_detector_and_calculator_read_from_store(self):
+        store = ThresholdStore(self.path)
+        result = ContextualAnomalyDetector(threshold_store=store).detect_anomalies(self.df)
+        expected = ContextualAnomalyDetector().detect_anomalies(self.df)
+        pd.testing.assert_frame_equal(result, expected)
+
+        with patch.object(threshold_store, "thresholds_from_window") as compute:
+            ContextualAnomalyDetector(threshold_store=store).detect_anomalies(self.df)
+            thresholds = ThresholdCalculator("ASSET00004", "Agua fría", threshold_store=store).get_thresholds()
+        compute.assert_not_called()
+        self.assertEqual(thresholds, store.get("ASSET00004", "Agua fría"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from utils.water_consumption.analysis import detect_anomalies_in_water_consumption, detect_water_anomalies
+from tests.helpers.cases import QuietTestCase
+
+METHODS = {'zscore': 3.0, 'iqr': 1.5, 'percentile': 99}
+
+
+def _series_with_outliers(spike_day=12, zero_day=20):
+    """30 días alternando 10 y 12, con un pico de 60 y un día sin consumo."""
+    consumption = np.tile([10.0, 12.0], 15)
+    consumption[spike_day] = 60.0
+    consumption[zero_day] = 0.0
+    return pd.DataFrame({'date': pd.date_range('2024-01-01', periods=30), 'consumption': consumption})
+
+
+class TestWaterAnomalies(QuietTestCase):
+    def test_single_series(self):
+        df = _series_with_outliers().sample(frac=1.0, random_state=3)
+
+        # Media 370/30, desviación típica 9.2786; mediana 12, Q1 10 y Q3 12
+        [spike] = detect_anomalies_in_water_consumption(df, method='zscore', threshold=3.0)
+        self.assertEqual(list(spike), ['date', 'value', 'zscore', 'direction', 'percentage', 'expected'])
+        self.assertEqual((spike['date'], spike['value'], spike['direction']),
+                         (pd.Timestamp('2024-01-13'), 60.0, 'superior'))
+        self.assertAlmostEqual(spike['zscore'], 5.137283, places=5)
+        self.assertAlmostEqual(spike['expected'], 370 / 30)
+        self.assertAlmostEqual(spike['percentage'], (60 - 370 / 30) / (370 / 30) * 100)
+
+        # El día sin consumo solo queda fuera de los límites por IQR y percentil
+        for method in ('iqr', 'percentile'):
+            with self.subTest(method=method):
+                anomalies = detect_anomalies_in_water_consumption(df, method=method, threshold=METHODS[method])
+                self.assertEqual([a['date'] for a in anomalies],
+                                 [pd.Timestamp('2024-01-13'), pd.Timestamp('2024-01-21')])
+                self.assertEqual([a['direction'] for a in anomalies], ['superior', 'inferior'])
+                self.assertEqual([a['percentage'] for a in anomalies], [400.0, 100.0])
+                self.assertEqual([a['expected'] for a in anomalies], [12.0, 12.0])
+
+    def test_many_assets_in_one_call(self):
+        df = pd.concat([
+            _series_with_outliers().assign(asset_id='A'),
+            _series_with_outliers(spike_day=17, zero_day=9).assign(asset_id='B'),
+            # Una serie demasiado corta y otra constante no dan anomalías
+            pd.DataFrame({'date': pd.date_range('2024-01-01', periods=5), 'asset_id': 'SHORT',
+                          'consumption': [1.0, 1.0, 1.0, 1.0, 90.0]}),
+            pd.DataFrame({'date': pd.date_range('2024-01-01', periods=30), 'asset_id': 'FLAT', 'consumption': 2.0}),
+        ], ignore_index=True).sample(frac=1.0, random_state=5)
+
+        expected_counts = {'zscore': {'A': 1, 'B': 1}, 'iqr': {'A': 2, 'B': 2}, 'percentile': {'A': 2, 'B': 2}}
+        for method, threshold in METHODS.items():
+            with self.subTest(method=method):
+                result = detect_water_anomalies(df, method=method, threshold=threshold)
+                self.assertEqual(result['asset_id'].value_counts().to_dict(), expected_counts[method])
+                self.assertTrue(result.groupby('asset_id')['date'].apply(lambda d: d.is_monotonic_increasing).all())
+
+        spikes = detect_water_anomalies(df, method='zscore', threshold=3.0).set_index('asset_id')['date']
+        self.assertEqual(spikes.to_dict(), {'A': pd.Timestamp('2024-01-13'), 'B': pd.Timestamp('2024-01-18')})
+
+        everything = detect_water_anomalies(df, anomalies_only=False)
+        self.assertEqual(len(everything), len(df))
+        self.assertEqual(everything['is_anomaly'].sum(), len(detect_water_anomalies(df)))
+
+    def test_rolling_baseline_follows_the_recent_level(self):
+        # Consumo que se duplica a mitad del periodo: con la línea base global, toda
+        # la segunda mitad es "superior"; con la móvil, solo el salto y la fuga final
+        consumption = np.r_[np.full(40, 10.0), np.full(40, 20.0), [60.0]] + np.tile([0.5, -0.5], 41)[:81]
+        df = pd.DataFrame({
+            'date': pd.date_range('2024-01-01', periods=81),
+            'asset_id': 'A',
+            'consumption': consumption,
+        })
+        global_result = detect_water_anomalies(df, method='iqr', threshold=1.5)
+        rolling = detect_water_anomalies(df, method='zscore', threshold=3.0, baseline='rolling', window=14)
+
+        self.assertEqual(len(global_result), 1)
+        self.assertIn(pd.Timestamp('2024-02-10'), set(rolling['date']))
+        self.assertEqual(rolling['date'].iloc[-1], pd.Timestamp('2024-03-21'))
+        self.assertEqual(rolling['direction'].iloc[-1], 'superior')
+        # La lectura anómala no forma parte de su propia línea base
+        self.assertAlmostEqual(rolling['expected'].iloc[-1], df['consumption'].iloc[-15:-1].mean())
+
+    def test_weekday_baseline(self):
+        dates = pd.date_range('2024-01-01', periods=56)
+        weekday = np.where(dates.dayofweek >= 5, 2.0, 20.0) + np.tile([0.0, 0.3, -0.3, 0.1], 14)
+        df = pd.DataFrame({'date': dates, 'asset_id': 'A', 'consumption': weekday})
+        # Un sábado con consumo de día laborable: normal para la serie, anómalo para un sábado
+        df.loc[df['date'] == pd.Timestamp('2024-02-17'), 'consumption'] = 20.0
+
+        self.assertTrue(detect_water_anomalies(df, method='zscore', threshold=2.0).empty)
+        result = detect_water_anomalies(df, method='zscore', threshold=2.0, baseline='weekday')
+        self.assertEqual(result['date'].tolist(), [pd.Timestamp('2024-02-17')])
+        self.assertEqual(result['direction'].iloc[0], 'superior')
+
+    def test_invalid_input(self):
+        self.assertEqual(detect_anomalies_in_water_consumption(pd.DataFrame()), [])
+        self.assertTrue(detect_water_anomalies(pd.DataFrame({'date': []})).empty)
+        df = _series_with_outliers().assign(asset_id='A')
+        self.assertTrue(detect_water_anomalies(df, method='unknown').empty)
+        self.assertTrue(detect_water_anomalies(df, baseline='monthly').empty)
+
+
+if __name__ == "__main__":
+    unittest.main()
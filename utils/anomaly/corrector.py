@@ -1,12 +1,50 @@
 # utils/anomaly/corrector.py
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
+SERIES_COLUMNS = ['asset_id', 'consumption_type']
+
+
+def _parse_anomaly_date(anomaly_date):
+    """Convierte la fecha de una anomalía a datetime; devuelve None si no se puede convertir"""
+    if not isinstance(anomaly_date, str):
+        return anomaly_date
+    try:
+        return datetime.fromisoformat(anomaly_date.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            return datetime.strptime(anomaly_date.split('T')[0], '%Y-%m-%d')
+        except ValueError:
+            print(f"No se pudo convertir la fecha de anomalía: {anomaly_date}")
+            return None
+
+
 class AnomalyCorrector:
     def __init__(self, repository=None):
         self.repository = repository
     
     def correct_counter_resets(self, readings, anomalies=None):
-        """Corrige reinicios de contadores en las lecturas"""
+        """
+        Corrige reinicios de contadores en las lecturas
+        
+        Cada reinicio se convierte en un salto de offset (valor anterior - valor en el reinicio)
+        sobre la serie (asset_id, consumption_type) ordenada por fecha, y todos los saltos se
+        aplican con una suma acumulada por serie en una sola pasada. La lectura del reinicio
+        y todas las posteriores de la serie quedan corregidas. Admite lecturas de varios
+        assets y tipos de consumo en la misma llamada.
+        
+        Args:
+            readings: DataFrame con lecturas ('date' y 'consumption' o 'value'; 'asset_id' y
+                'consumption_type' opcionales). Si ya tiene 'corrected_value', se corrige sobre él
+            anomalies: Lista de anomalías (diccionarios con 'type', 'date' y, opcionalmente,
+                'asset_id', 'consumption_type' y 'previous_value')
+        
+        Returns:
+            Copia de las lecturas, en el mismo orden, con 'corrected_value' e 'is_corrected'
+            (y 'correction_type', 'is_sensor_replacement' e 'is_last_before_replacement' cuando aplica)
+        """
         if readings is None or readings.empty or not anomalies:
             return readings
             
@@ -14,152 +52,121 @@ class AnomalyCorrector:
         corrected_readings = readings.copy()
         
         # Añadir columna para valores corregidos si no existe
+        value_col = 'consumption' if 'consumption' in corrected_readings.columns else 'value'
         if 'corrected_value' not in corrected_readings.columns:
-            value_col = 'consumption' if 'consumption' in corrected_readings.columns else 'value'
             corrected_readings['corrected_value'] = corrected_readings[value_col]
         
-        # Si no se proporcionaron anomalías y hay repositorio, intentar obtenerlas
-        if anomalies is None and self.repository:
-            asset_ids = corrected_readings['asset_id'].unique()
-            consumption_types = corrected_readings['consumption_type'].unique()
-            
-            all_anomalies = []
-            for asset_id in asset_ids:
-                for consumption_type in consumption_types:
-                    asset_anomalies = self.repository.get_anomalies(
-                        asset_id=asset_id,
-                        consumption_type=consumption_type
-                    )
-                    all_anomalies.extend(asset_anomalies)
-            
-            anomalies = all_anomalies
-        
-        # Ordenar anomalías por fecha
-        anomalies = sorted(anomalies, key=lambda x: x['date'])
-        
-        # Imprimir información de las anomalías para depuración
-        print(f"Aplicando correcciones para {len(anomalies)} anomalías:")
-        for i, anomaly in enumerate(anomalies):
-            print(f"  Anomalía {i+1}: tipo={anomaly['type']}, fecha={anomaly['date']}")
-        
-        # Procesar cada anomalía secuencialmente
-        for i, anomaly in enumerate(anomalies):
-            # Obtener fecha de la anomalía
-            anomaly_date = anomaly['date']
-            if isinstance(anomaly_date, str):
-                try:
-                    anomaly_date = datetime.fromisoformat(anomaly_date.replace('Z', '+00:00'))
-                except ValueError:
-                    try:
-                        anomaly_date = datetime.strptime(anomaly_date.split('T')[0], '%Y-%m-%d')
-                    except ValueError:
-                        print(f"No se pudo convertir la fecha de anomalía: {anomaly_date}")
-                        continue
-            
-            # Encontrar la fila exacta de la anomalía
-            anomaly_mask = corrected_readings['date'] == anomaly_date
-            if 'asset_id' in corrected_readings.columns and 'asset_id' in anomaly:
-                anomaly_mask &= corrected_readings['asset_id'] == anomaly['asset_id']
-            if 'consumption_type' in corrected_readings.columns and 'consumption_type' in anomaly:
-                anomaly_mask &= corrected_readings['consumption_type'] == anomaly['consumption_type']
-            
-            # Si no encontramos la fila exacta, continuar con la siguiente anomalía
-            if not anomaly_mask.any():
-                print(f"  No se encontró la fila para la anomalía en fecha {anomaly_date}")
-                continue
-            
-            # Obtener el índice de la fila de la anomalía
-            anomaly_idx = corrected_readings[anomaly_mask].index[0]
-            
-            # Tratar de manera diferente según el tipo de anomalía
-            if anomaly['type'] == 'counter_reset':
-                try:
-                    # Obtener el valor actual y anterior (posiblemente ya corregidos)
-                    value_col = 'corrected_value'  # Usar siempre corrected_value para considerar correcciones previas
-                    
-                    # Encontrar la fila anterior
-                    if anomaly_idx > 0:
-                        # Filtrar por asset_id y consumption_type si están disponibles
-                        prev_mask = corrected_readings.index < anomaly_idx
-                        if 'asset_id' in corrected_readings.columns and 'asset_id' in anomaly:
-                            prev_mask &= corrected_readings['asset_id'] == anomaly['asset_id']
-                        if 'consumption_type' in corrected_readings.columns and 'consumption_type' in anomaly:
-                            prev_mask &= corrected_readings['consumption_type'] == anomaly['consumption_type']
-                        
-                        if prev_mask.any():
-                            # Obtener la última fila anterior que cumple con los criterios
-                            prev_idx = corrected_readings[prev_mask].index[-1]
-                            previous_value = corrected_readings.loc[prev_idx, value_col]
-                        else:
-                            # Si no hay fila anterior, usar el valor de previous_value de la anomalía
-                            previous_value = float(anomaly['previous_value'])
-                    else:
-                        # Si es la primera fila, usar el valor de previous_value de la anomalía
-                        previous_value = float(anomaly['previous_value'])
-                    
-                    # Obtener el valor actual
-                    current_value = corrected_readings.loc[anomaly_idx, value_col]
-                    
-                    # Convertir a números si son strings
-                    if isinstance(previous_value, str):
-                        previous_value = float(previous_value)
-                    if isinstance(current_value, str):
-                        current_value = float(current_value)
-                    
-                    # Calcular el offset para esta anomalía
-                    offset = previous_value - current_value
-                    print(f"  Anomalía {i+1}: previous_value={previous_value}, current_value={current_value}, offset={offset}")
-                    
-                    # Filtrar las filas posteriores a esta anomalía
-                    mask = corrected_readings.index > anomaly_idx
-                    
-                    # Filtrar por asset_id y consumption_type si están disponibles
-                    if 'asset_id' in corrected_readings.columns and 'asset_id' in anomaly:
-                        mask &= corrected_readings['asset_id'] == anomaly['asset_id']
-                    if 'consumption_type' in corrected_readings.columns and 'consumption_type' in anomaly:
-                        mask &= corrected_readings['consumption_type'] == anomaly['consumption_type']
-                    
-                    # Aplicar el offset a las filas posteriores
-                    corrected_readings.loc[mask, 'corrected_value'] += offset
-                    
-                    # Marcar como corregidas
-                    corrected_readings.loc[mask, 'is_corrected'] = True
-                    corrected_readings.loc[mask, 'correction_type'] = 'counter_reset'
-                    
-                    print(f"  Aplicada corrección de tipo 'counter_reset' con offset {offset} a {mask.sum()} filas")
-                    
-                except (ValueError, TypeError) as e:
-                    print(f"  Error al procesar anomalía {i+1}: {str(e)}")
+        # Ordenar las lecturas por serie y fecha
+        series_columns = [column for column in SERIES_COLUMNS if column in corrected_readings.columns]
+        if series_columns:
+            series = corrected_readings.groupby(series_columns, sort=False, dropna=False).ngroup().to_numpy()
+        else:
+            series = np.zeros(len(corrected_readings), dtype=int)
+        dates = pd.to_datetime(corrected_readings['date'], errors='coerce').to_numpy()
+        sort_keys = pd.DataFrame({'series': series, 'date': dates})
+        order = sort_keys.sort_values(['series', 'date'], kind='mergesort').index.to_numpy()
+        rank = np.empty(len(order), dtype=int)
+        rank[order] = np.arange(len(order))
+        
+        base_values = pd.to_numeric(corrected_readings['corrected_value'], errors='coerce').to_numpy(dtype=float)
+        sorted_series = series[order]
+        sorted_values = base_values[order]
+        
+        # Localizar la fila de cada anomalía (fecha, asset_id y consumption_type)
+        positions, types, previous_values = self._locate_anomalies(corrected_readings, dates, series_columns, anomalies)
+        
+        # Fila anterior de la misma serie (en orden de fecha) para cada anomalía
+        anomaly_ranks = rank[positions]
+        has_previous = (anomaly_ranks > 0) & (sorted_series[np.maximum(anomaly_ranks - 1, 0)] == series[positions])
+        
+        # Saltos de offset de los reinicios: una sola vez por fila
+        is_reset = types == 'counter_reset'
+        reset_ranks, first = np.unique(anomaly_ranks[is_reset], return_index=True)
+        reset_has_previous = has_previous[is_reset][first]
+        reset_previous = np.where(
+            reset_has_previous,
+            sorted_values[np.maximum(reset_ranks - 1, 0)],
+            previous_values[is_reset][first]
+        )
+        steps = np.zeros(len(order))
+        steps[reset_ranks] = np.nan_to_num(reset_previous - sorted_values[reset_ranks])
+        reset_marks = np.zeros(len(order))
+        reset_marks[reset_ranks] = 1
+        
+        # Suma acumulada de los saltos dentro de cada serie
+        grouped = pd.DataFrame({'step': steps, 'mark': reset_marks}).groupby(sorted_series, sort=False)
+        cumulative = grouped.cumsum()
+        offsets = np.empty(len(order))
+        offsets[order] = cumulative['step'].to_numpy()
+        applied = np.zeros(len(order), dtype=bool)
+        applied[order] = cumulative['mark'].to_numpy() > 0
+        
+        corrected_readings['corrected_value'] = base_values + offsets
+        
+        if 'is_corrected' in corrected_readings.columns:
+            corrected_readings['is_corrected'] = corrected_readings['is_corrected'].eq(True).to_numpy() | applied
+        else:
+            corrected_readings['is_corrected'] = applied
+        
+        # Reemplazos de sensor: no se aplica offset, solo se marcan la lectura y la anterior
+        replacement_positions = positions[types == 'sensor_replacement']
+        replacement_ranks = rank[replacement_positions]
+        replacement_previous = replacement_ranks[has_previous[types == 'sensor_replacement']] - 1
+        if len(replacement_positions):
+            for column, rows in (('is_sensor_replacement', replacement_positions),
+                                 ('is_last_before_replacement', order[replacement_previous])):
+                if len(rows) == 0:
                     continue
-                    
-            elif anomaly['type'] == 'sensor_replacement':
-                # Para reemplazos de sensores, no aplicamos offset a las lecturas posteriores
-                # Solo marcamos la lectura como un reemplazo de sensor
-                try:
-                    # Marcar la fila de la anomalía como reemplazo de sensor
-                    corrected_readings.loc[anomaly_idx, 'is_sensor_replacement'] = True
-                    corrected_readings.loc[anomaly_idx, 'correction_type'] = 'sensor_replacement'
-                    
-                    # Opcionalmente, podríamos marcar el valor anterior como no válido
-                    # Encontrar la fila anterior
-                    if anomaly_idx > 0:
-                        prev_mask = corrected_readings.index < anomaly_idx
-                        if 'asset_id' in corrected_readings.columns and 'asset_id' in anomaly:
-                            prev_mask &= corrected_readings['asset_id'] == anomaly['asset_id']
-                        if 'consumption_type' in corrected_readings.columns and 'consumption_type' in anomaly:
-                            prev_mask &= corrected_readings['consumption_type'] == anomaly['consumption_type']
-                        
-                        if prev_mask.any():
-                            prev_idx = corrected_readings[prev_mask].index[-1]
-                            corrected_readings.loc[prev_idx, 'is_last_before_replacement'] = True
-                    
-                    print(f"  Aplicada corrección de tipo 'sensor_replacement' - No se aplica offset")
-                except Exception as e:
-                    print(f"  Error al procesar reemplazo de sensor: {str(e)}")
-        
-        # Añadir columna para indicar si el valor fue corregido si no existe
-        value_col = 'consumption' if 'consumption' in corrected_readings.columns else 'value'
-        if 'is_corrected' not in corrected_readings.columns:
-            corrected_readings['is_corrected'] = corrected_readings['corrected_value'] != corrected_readings[value_col]
+                flags = np.zeros(len(order), dtype=bool)
+                flags[rows] = True
+                if column in corrected_readings.columns:
+                    flags |= corrected_readings[column].eq(True).to_numpy()
+                corrected_readings[column] = flags
+        
+        if applied.any() or len(replacement_positions):
+            if 'correction_type' in corrected_readings.columns:
+                correction_type = corrected_readings['correction_type'].to_numpy(dtype=object)
+            else:
+                correction_type = np.full(len(order), np.nan, dtype=object)
+            correction_type[applied] = 'counter_reset'
+            correction_type[replacement_positions] = 'sensor_replacement'
+            corrected_readings['correction_type'] = correction_type
+        
+        print(f"Aplicadas correcciones para {len(positions)} de {len(anomalies)} anomalías "
+              f"({int(applied.sum())} lecturas corregidas)")
+        
+        return corrected_readings
+    
+    def _locate_anomalies(self, readings, dates, series_columns, anomalies):
+        """
+        Busca la fila de cada anomalía por fecha y serie
+        
+        Returns:
+            Tupla (posiciones, tipos, previous_value) con una entrada por anomalía encontrada
+        """
+        records = pd.DataFrame.from_records(list(anomalies))
+        # Las fechas con zona horaria no coinciden con las lecturas (sin zona horaria)
+        parsed = [_parse_anomaly_date(d) for d in records['date']]
+        records['date'] = pd.to_datetime(
+            pd.Series([d if getattr(d, 'tzinfo', None) is None else None for d in parsed], dtype=object),
+            errors='coerce'
+        )
+        if 'previous_value' not in records.columns:
+            records['previous_value'] = np.nan
+        records['previous_value'] = pd.to_numeric(records['previous_value'], errors='coerce')
+        
+        # Solo se filtra por las columnas de serie presentes en las lecturas y en las anomalías
+        keys = [column for column in series_columns if column in records.columns] + ['date']
+        rows = readings[keys[:-1]].assign(date=dates, _position=np.arange(len(readings)))
+        # Si hay varias lecturas con la misma clave, la anomalía corresponde a la primera
+        rows = rows.drop_duplicates(subset=keys, keep='first')
+        matched = records.merge(rows, on=keys, how='inner')
+        missing = len(records) - len(matched)
+        if missing:
+            print(f"  No se encontró la fila para {missing} anomalías")
         
-        return corrected_readings
\ No newline at end of file
+        return (
+            matched['_position'].to_numpy(dtype=int),
+            matched['type'].to_numpy(dtype=object),
+            matched['previous_value'].to_numpy(dtype=float),
+        )
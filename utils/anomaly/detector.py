@@ -1,6 +1,33 @@
 # utils/anomaly/detector.py
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
+# Una lectura por debajo del 80% de la anterior es un reinicio de contador
+RESET_RATIO = 0.8
+# Heurística de reemplazo de sensor: caída por debajo del 5% desde un valor mayor que 1000
+REPLACEMENT_RATIO = 0.05
+REPLACEMENT_MIN_PREVIOUS = 1000
+
+ANOMALY_COLUMNS = [
+    'type', 'date', 'previous_value', 'current_value',
+    'asset_id', 'consumption_type', 'detected_at', 'offset'
+]
+SERIES_COLUMNS = ['asset_id', 'consumption_type']
+
+
+def _reading_values(df):
+    """Valores de las lecturas ('consumption', si no 'value', si no 0) como floats; lo no numérico queda en NaN"""
+    if 'consumption' in df.columns:
+        values = df['consumption']
+    elif 'value' in df.columns:
+        values = df['value']
+    else:
+        return np.zeros(len(df))
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+
+
 class AnomalyDetector:
     def __init__(self, repository=None):
         self.repository = repository
@@ -12,65 +39,90 @@ class AnomalyDetector:
         Args:
             df: DataFrame con lecturas
             detect_sensor_replacements: Si es True, intenta distinguir entre reinicios de contador y reemplazos de sensores
+        
+        Returns:
+            Lista de anomalías (diccionarios), guardadas en el repositorio si hay uno configurado
+        """
+        anomalies = self.find_counter_resets(df, detect_sensor_replacements, persist=False).to_dict('records')
+        self.save_anomalies(anomalies)
+        return anomalies
+    
+    def find_counter_resets(self, df, detect_sensor_replacements=False, persist=True):
+        """
+        Detecta reinicios de contador y reemplazos de sensor en lecturas de varios assets y tipos de consumo
+        
+        Cada serie (asset_id, consumption_type) se ordena por fecha y cada lectura se compara
+        con la anterior de la misma serie en una sola operación sobre arrays desplazados.
+        
+        Args:
+            df: DataFrame con lecturas ('date' y 'consumption' o 'value'; 'asset_id' y
+                'consumption_type' opcionales)
+            detect_sensor_replacements: Si es True, intenta distinguir entre reinicios de contador y reemplazos de sensores
+            persist: Si es True y hay repositorio, guarda todas las anomalías en una sola llamada
+        
+        Returns:
+            DataFrame con una fila por anomalía (columnas ANOMALY_COLUMNS), ordenado por serie y fecha
         """
         if df is None or len(df) < 2:
-            return []
+            return pd.DataFrame(columns=ANOMALY_COLUMNS)
         
-        anomalies = []
+        # Asegurar que las lecturas estén ordenadas por serie y fecha
+        series_columns = [column for column in SERIES_COLUMNS if column in df.columns]
+        if series_columns:
+            series = df.groupby(series_columns, sort=False, dropna=False).ngroup().to_numpy()
+        else:
+            series = np.zeros(len(df), dtype=int)
+        sort_keys = pd.DataFrame({'series': series, 'date': df['date'].to_numpy()})
+        order = sort_keys.sort_values(['series', 'date'], kind='mergesort').index.to_numpy()
         
-        # Asegurar que las lecturas estén ordenadas por fecha
-        df = df.sort_values('date')
+        values = _reading_values(df)[order]
+        series = series[order]
+        previous_values = values[:-1]
+        current_values = values[1:]
         
-        # Iterar por las lecturas
-        for i in range(1, len(df)):
-            current = df.iloc[i]
-            previous = df.iloc[i-1]
-            
-            # Extraer valores (manejar diferentes nombres de columnas)
-            current_value = current.get('consumption', current.get('value', 0))
-            previous_value = previous.get('consumption', previous.get('value', 0))
-            
-            # Convertir a números si son strings
-            try:
-                if isinstance(current_value, str):
-                    current_value = float(current_value)
-                if isinstance(previous_value, str):
-                    previous_value = float(previous_value)
-            except (ValueError, TypeError) as e:
-                print(f"Error al convertir valores a números: {str(e)}")
-                continue
-            
-            # Detectar salto negativo significativo (reinicio de contador)
-            if current_value < previous_value * 0.8:  # Umbral del 80%
-                # Determinar si es un reemplazo de sensor o un reinicio de contador
-                anomaly_type = 'counter_reset'
-                
-                # Si se solicita detectar reemplazos de sensores, aplicar heurística
-                if detect_sensor_replacements:
-                    # Heurística: si el valor actual es muy pequeño en comparación con el anterior
-                    # y el valor anterior era muy grande, podría ser un reemplazo de sensor
-                    if current_value < previous_value * 0.05 and previous_value > 1000:
-                        anomaly_type = 'sensor_replacement'
-                
-                anomaly = {
-                    'type': anomaly_type,
-                    'date': current['date'].isoformat() if hasattr(current['date'], 'isoformat') else current['date'],
-                    'previous_value': previous_value,
-                    'current_value': current_value,
-                    'asset_id': current.get('asset_id'),
-                    'consumption_type': current.get('consumption_type'),
-                    'detected_at': datetime.now().isoformat(),
-                    'offset': previous_value - current_value
-                }
-                
-                anomalies.append(anomaly)
-                
-                # Guardar anomalía si hay repositorio configurado
-                if self.repository:
-                    self.repository.save_anomaly(anomaly)
+        # Detectar saltos negativos significativos dentro de cada serie
+        with np.errstate(invalid='ignore'):
+            is_reset = (series[1:] == series[:-1]) & (current_values < previous_values * RESET_RATIO)
+            is_replacement = is_reset & (
+                (current_values < previous_values * REPLACEMENT_RATIO) & (previous_values > REPLACEMENT_MIN_PREVIOUS)
+            )
+        if not detect_sensor_replacements:
+            is_replacement[:] = False
+        
+        positions = order[1:][is_reset]
+        rows = df.iloc[positions]
+        anomalies = pd.DataFrame({
+            'type': np.where(is_replacement[is_reset], 'sensor_replacement', 'counter_reset'),
+            'date': [d.isoformat() if hasattr(d, 'isoformat') else d for d in rows['date']],
+            'previous_value': previous_values[is_reset],
+            'current_value': current_values[is_reset],
+            'asset_id': rows['asset_id'].to_numpy() if 'asset_id' in df.columns else None,
+            'consumption_type': rows['consumption_type'].to_numpy() if 'consumption_type' in df.columns else None,
+            'detected_at': datetime.now().isoformat(),
+            'offset': previous_values[is_reset] - current_values[is_reset],
+        }, columns=ANOMALY_COLUMNS)
+        
+        if persist:
+            self.save_anomalies(anomalies.to_dict('records'))
         
         return anomalies
     
+    def save_anomalies(self, anomalies):
+        """
+        Guarda un lote de anomalías en el repositorio configurado
+        
+        Usa el guardado en bloque del repositorio si lo ofrece; si no, guarda una a una.
+        """
+        if not self.repository or not anomalies:
+            return
+        
+        save_anomalies = getattr(self.repository, 'save_anomalies', None)
+        if save_anomalies is not None:
+            save_anomalies(anomalies)
+        else:
+            for anomaly in anomalies:
+                self.repository.save_anomaly(anomaly)
+    
     def reclassify_anomaly(self, anomaly, new_type):
         """
         Reclasifica una anomalía existente a un nuevo tipo
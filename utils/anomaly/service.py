@@ -3,13 +3,15 @@ import pandas as pd
 from utils.repositories.reading_repository import ReadingRepository
 from utils.anomaly.detector import AnomalyDetector
 from utils.anomaly.corrector import AnomalyCorrector
+from utils.anomaly.streaming import get_streaming_evaluator
 
 class AnomalyService:
-    def __init__(self, repository=None, detector=None, corrector=None):
+    def __init__(self, repository=None, detector=None, corrector=None, streaming=None):
         # Crear componentes si no se proporcionan
         self.repository = repository or ReadingRepository()
         self.detector = detector or AnomalyDetector(self.repository)
         self.corrector = corrector or AnomalyCorrector(self.repository)
+        self.streaming = streaming
     
     def process_readings(self, asset_id, consumption_type, start_date=None, end_date=None, detect_only=False):
         """
@@ -58,4 +60,27 @@ class AnomalyService:
             'original': original_readings,
             'corrected': corrected_readings,
             'anomalies': anomalies
-        }
\ No newline at end of file
+        }
+    
+    def process_new_readings(self, readings):
+        """
+        Evalúa de forma incremental las lecturas añadidas desde la última evaluación
+        
+        Solo se puntúan las lecturas posteriores a la última evaluada de cada serie
+        (asset_id, consumption_type); el histórico no se vuelve a cargar ni a recorrer.
+        
+        Args:
+            readings: DataFrame con lecturas de uno o varios assets (puede incluir las ya evaluadas)
+            
+        Returns:
+            dict con las lecturas nuevas puntuadas y las alertas detectadas en ellas
+        """
+        if self.streaming is None:
+            # El mismo evaluador que usan los escritores de lecturas: un único estado por serie
+            self.streaming = get_streaming_evaluator()
+        
+        scored = self.streaming.evaluate(readings)
+        return {
+            'scored': scored,
+            'alerts': scored[scored['is_anomaly']].to_dict('records') if not scored.empty else []
+        }
@@ -0,0 +1,411 @@
+# utils/anomaly/streaming.py
+"""
+Evaluación incremental de anomalías sobre las lecturas recién añadidas.
+
+Para cada serie (asset_id, consumption_type) se guarda un estado acumulado:
+última fecha y último valor leídos, offset acumulado por reinicios de contador
+y media/varianza del consumo diario (algoritmo de Welford). Al evaluar un
+DataFrame solo se puntúan las lecturas posteriores a la última fecha de cada
+serie, y el estado se actualiza en O(lecturas nuevas), sin volver a recorrer el
+histórico.
+
+Cada lectura nueva se compara con la anterior de su serie:
+
+* reinicio de contador o reemplazo de sensor, con los mismos criterios que
+  AnomalyDetector; los reinicios suman su salto al offset acumulado, de modo
+  que ``corrected_value`` coincide con el de AnomalyCorrector;
+* pico o caída de consumo: consumo diario corregido a más de ``z_threshold``
+  desviaciones típicas de la media de la serie, cuando hay al menos
+  ``min_history`` consumos diarios previos.
+
+Los reinicios y reemplazos se guardan en el repositorio como el resto de
+anomalías; las últimas alertas de cada serie quedan en el estado
+(``get_alerts``).
+
+El estado se guarda en ``data/anomalies/stream_state.db`` (SQLite, una fila
+por serie). Solo se escriben las series que han cambiado desde el último
+guardado, de modo que guardar tras escribir un CSV cuesta O(series del CSV) y
+no O(todas las series). Un ``stream_state.json`` de versiones anteriores se
+importa la primera vez.
+
+Si llegan lecturas anteriores a la última evaluada de una serie (por ejemplo,
+al volver a descargar meses que faltaban o con errores), la serie se reinicia
+y se vuelve a puntuar entera con el histórico recibido.
+"""
+import os
+import json
+import math
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.anomaly.detector import (
+    ANOMALY_COLUMNS, REPLACEMENT_MIN_PREVIOUS, REPLACEMENT_RATIO, RESET_RATIO, SERIES_COLUMNS, _reading_values
+)
+
+STATE_PATH = "data/anomalies/stream_state.db"
+# Estado en JSON de versiones anteriores, que se importa si la base de datos está vacía
+LEGACY_STATE_PATH = "data/anomalies/stream_state.json"
+# Desviaciones típicas a partir de las que un consumo diario es una alerta
+Z_THRESHOLD = 4.0
+# Consumos diarios previos necesarios para evaluar picos
+MIN_HISTORY = 7
+# Alertas que se conservan por serie
+MAX_ALERTS_PER_SERIES = 20
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS series_state (
+    series_key TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+"""
+
+SCORED_COLUMNS = [
+    'date', 'asset_id', 'consumption_type', 'value', 'corrected_value',
+    'daily_consumption', 'z_score', 'is_anomaly', 'anomaly_type'
+]
+
+
+class SeriesState:
+    """Estado acumulado de una serie: última lectura, offset y estadísticos de Welford"""
+
+    __slots__ = ('last_date', 'last_value', 'offset', 'count', 'mean', 'm2', 'alerts', 'readings')
+
+    def __init__(self, last_date=None, last_value=None, offset=0.0, count=0, mean=0.0, m2=0.0, alerts=None,
+                 readings=None):
+        self.last_date = last_date
+        self.last_value = last_value
+        self.offset = offset
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.alerts = alerts or []
+        # Lecturas evaluadas hasta last_date (None en estados guardados por versiones anteriores)
+        self.readings = readings
+
+    @property
+    def last_corrected(self):
+        return None if self.last_value is None else self.last_value + self.offset
+
+    @property
+    def std(self):
+        """Desviación típica muestral de los consumos diarios"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def push(self, daily_consumption):
+        """Añade un consumo diario a la media y varianza (Welford)"""
+        self.count += 1
+        delta = daily_consumption - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (daily_consumption - self.mean)
+
+    def to_dict(self):
+        data = {slot: getattr(self, slot) for slot in self.__slots__}
+        data['last_date'] = self.last_date.isoformat() if self.last_date is not None else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        if data.get('last_date'):
+            data['last_date'] = pd.Timestamp(data['last_date'])
+        return cls(**data)
+
+
+def _series_key(asset_id, consumption_type):
+    return f"{asset_id}|{consumption_type}"
+
+
+class StreamingAnomalyEvaluator:
+    def __init__(self, repository=None, state_path=STATE_PATH, z_threshold=Z_THRESHOLD,
+                 min_history=MIN_HISTORY, detect_sensor_replacements=True, legacy_state_path=LEGACY_STATE_PATH):
+        self.repository = repository
+        self.state_path = state_path
+        self.legacy_state_path = legacy_state_path
+        self.z_threshold = z_threshold
+        self.min_history = min_history
+        self.detect_sensor_replacements = detect_sensor_replacements
+        self._lock = threading.RLock()
+        # Series modificadas y eliminadas desde el último guardado
+        self._dirty = set()
+        self._deleted = set()
+        self._cleared = False
+        self._states = self._load()
+
+    def _connect(self):
+        return sqlite3.connect(self.state_path, timeout=30)
+
+    def _load(self):
+        if not self.state_path:
+            return {}
+        try:
+            directory = os.path.dirname(self.state_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with closing(self._connect()) as conn:
+                conn.executescript(STATE_SCHEMA)
+                saved = conn.execute("SELECT series_key, state FROM series_state").fetchall()
+            states = {key: SeriesState.from_dict(json.loads(state)) for key, state in saved}
+        except (sqlite3.Error, OSError, ValueError, TypeError) as e:
+            print(f"Estado de evaluación incremental ilegible en {self.state_path}, se reinicia: {str(e)}")
+            return {}
+        if not states:
+            states = self._load_legacy()
+            self._dirty.update(states)
+        return states
+
+    def _load_legacy(self):
+        if not self.legacy_state_path or not os.path.exists(self.legacy_state_path):
+            return {}
+        try:
+            with open(self.legacy_state_path, 'r') as f:
+                saved = json.load(f)
+            print(f"Importando el estado de evaluación incremental de {self.legacy_state_path}")
+            return {key: SeriesState.from_dict(state) for key, state in saved.items()}
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Estado de evaluación incremental ilegible en {self.legacy_state_path}, se ignora: {str(e)}")
+            return {}
+
+    def save(self):
+        """Guarda las series modificadas desde el último guardado (en una transacción)"""
+        if not self.state_path:
+            return
+        with self._lock:
+            rows = [(key, json.dumps(self._states[key].to_dict(), default=str))
+                    for key in self._dirty if key in self._states]
+            deleted = [(key,) for key in self._deleted]
+            cleared = self._cleared
+            self._dirty = set()
+            self._deleted = set()
+            self._cleared = False
+            if not rows and not deleted and not cleared:
+                return
+            with closing(self._connect()) as conn, conn:
+                if cleared:
+                    conn.execute("DELETE FROM series_state")
+                conn.executemany("DELETE FROM series_state WHERE series_key = ?", deleted)
+                conn.executemany("INSERT OR REPLACE INTO series_state (series_key, state) VALUES (?, ?)", rows)
+
+    def get_state(self, asset_id, consumption_type):
+        """Estado de una serie, o None si aún no se ha evaluado"""
+        with self._lock:
+            return self._states.get(_series_key(asset_id, consumption_type))
+
+    def get_alerts(self, asset_id=None, consumption_type=None):
+        """Últimas alertas guardadas, opcionalmente de un asset y tipo de consumo, ordenadas por fecha"""
+        with self._lock:
+            alerts = [
+                alert
+                for state in self._states.values()
+                for alert in state.alerts
+                if (not asset_id or alert['asset_id'] == asset_id)
+                and (not consumption_type or alert['consumption_type'] == consumption_type)
+            ]
+        return sorted(alerts, key=lambda alert: alert['date'])
+
+    def reset(self, asset_id=None, consumption_type=None):
+        """Olvida el estado de una serie (o de todas) para volver a evaluarla desde el principio"""
+        with self._lock:
+            if asset_id is None and consumption_type is None:
+                self._states = {}
+                self._dirty = set()
+                self._deleted = set()
+                self._cleared = True
+            else:
+                key = _series_key(asset_id, consumption_type)
+                self._states.pop(key, None)
+                self._dirty.discard(key)
+                self._deleted.add(key)
+
+    def evaluate(self, df, persist=True):
+        """
+        Puntúa las lecturas posteriores a la última evaluada de cada serie y actualiza el estado
+
+        Args:
+            df: DataFrame con lecturas ('date' y 'consumption' o 'value'; 'asset_id' y
+                'consumption_type' opcionales). Puede contener el histórico completo:
+                las lecturas ya evaluadas se ignoran
+            persist: Si es True, guarda el estado y las anomalías en el repositorio
+
+        Returns:
+            DataFrame con una fila por lectura nueva (columnas SCORED_COLUMNS),
+            ordenado por serie y fecha
+        """
+        if df is None or df.empty:
+            return pd.DataFrame(columns=SCORED_COLUMNS)
+
+        asset_ids = df['asset_id'].to_numpy() if 'asset_id' in df.columns else np.full(len(df), None)
+        consumption_types = (
+            df['consumption_type'].to_numpy() if 'consumption_type' in df.columns else np.full(len(df), None)
+        )
+        readings = pd.DataFrame({
+            'date': pd.to_datetime(df['date'], errors='coerce').to_numpy(),
+            'asset_id': asset_ids,
+            'consumption_type': consumption_types,
+            'value': _reading_values(df),
+        }).dropna(subset=['date', 'value'])
+        readings = readings.sort_values(SERIES_COLUMNS + ['date'], kind='mergesort', na_position='first')
+
+        scored = []
+        anomalies = []
+        detected_at = datetime.now().isoformat()
+        with self._lock:
+            for (asset_id, consumption_type), series in readings.groupby(SERIES_COLUMNS, sort=False, dropna=False):
+                key = _series_key(asset_id, consumption_type)
+                state = self._states.get(key)
+                if state is None:
+                    state = self._states[key] = SeriesState()
+
+                # Solo la cola: lecturas posteriores a la última evaluada (la serie está ordenada por fecha)
+                seen = 0
+                if state.last_date is not None:
+                    seen = int(series['date'].searchsorted(state.last_date, side='right'))
+                    if state.readings is not None and seen > state.readings:
+                        # Lecturas añadidas antes de last_date: la cola no basta, se puntúa la serie entera
+                        print(f"Evaluación incremental: {seen - state.readings} lecturas anteriores al "
+                              f"{state.last_date.date()} en {asset_id} ({consumption_type}), se reinicia la serie")
+                        state = self._states[key] = SeriesState()
+                        seen = 0
+                    else:
+                        series = series.iloc[seen:]
+                if series.empty:
+                    continue
+
+                rows = self._score_series(state, series, detected_at, anomalies)
+                state.readings = max(state.readings or 0, seen) + len(series)
+                self._dirty.add(key)
+                scored.append(rows)
+
+        if persist:
+            self.save()
+            if self.repository and anomalies:
+                self.repository.save_anomalies(anomalies)
+
+        if not scored:
+            return pd.DataFrame(columns=SCORED_COLUMNS)
+
+        result = pd.concat(scored, ignore_index=True)[SCORED_COLUMNS]
+        print(f"Evaluación incremental: {len(result)} lecturas nuevas en {len(scored)} series, "
+              f"{int(result['is_anomaly'].sum())} alertas")
+        return result
+
+    def _score_series(self, state, series, detected_at, anomalies):
+        """Puntúa la cola de una serie en orden de fecha, actualizando su estado"""
+        asset_id = series['asset_id'].iloc[0]
+        consumption_type = series['consumption_type'].iloc[0]
+        dates = series['date'].tolist()
+        values = series['value'].to_numpy(dtype=float)
+        n = len(values)
+
+        corrected = np.empty(n)
+        daily = np.full(n, np.nan)
+        z_scores = np.full(n, np.nan)
+        anomaly_types = [None] * n
+
+        for i in range(n):
+            value = float(values[i])
+            previous = state.last_value
+            previous_corrected = state.last_corrected
+
+            if previous is not None and value < previous * RESET_RATIO:
+                anomaly_type = 'counter_reset'
+                if (self.detect_sensor_replacements and value < previous * REPLACEMENT_RATIO
+                        and previous > REPLACEMENT_MIN_PREVIOUS):
+                    anomaly_type = 'sensor_replacement'
+                anomaly_types[i] = anomaly_type
+                anomalies.append(dict(zip(ANOMALY_COLUMNS, (
+                    anomaly_type, dates[i].isoformat(), previous, value,
+                    asset_id, consumption_type, detected_at, previous - value
+                ))))
+                if anomaly_type == 'counter_reset':
+                    state.offset += previous - value
+
+            corrected[i] = value + state.offset
+            state.last_value = value
+            state.last_date = dates[i]
+
+            # Consumo diario corregido; un reemplazo de sensor no es consumo real
+            if previous_corrected is None or anomaly_types[i] == 'sensor_replacement':
+                continue
+            daily[i] = corrected[i] - previous_corrected
+            if state.count >= self.min_history and state.std > 0:
+                z_scores[i] = (daily[i] - state.mean) / state.std
+                if anomaly_types[i] is None and abs(z_scores[i]) > self.z_threshold:
+                    anomaly_types[i] = 'consumption_spike' if z_scores[i] > 0 else 'consumption_drop'
+            state.push(daily[i])
+
+        for i, anomaly_type in enumerate(anomaly_types):
+            if anomaly_type is not None:
+                state.alerts.append({
+                    'type': anomaly_type,
+                    'date': dates[i].isoformat(),
+                    'asset_id': asset_id,
+                    'consumption_type': consumption_type,
+                    'value': float(values[i]),
+                    'daily_consumption': None if np.isnan(daily[i]) else float(daily[i]),
+                    'z_score': None if np.isnan(z_scores[i]) else float(z_scores[i]),
+                })
+        del state.alerts[:-MAX_ALERTS_PER_SERIES]
+
+        return pd.DataFrame({
+            'date': series['date'].to_numpy(),
+            'asset_id': asset_id,
+            'consumption_type': consumption_type,
+            'value': values,
+            'corrected_value': corrected,
+            'daily_consumption': daily,
+            'z_score': z_scores,
+            'is_anomaly': [anomaly_type is not None for anomaly_type in anomaly_types],
+            'anomaly_type': anomaly_types,
+        })
+
+
+_default_evaluator = None
+_default_evaluator_guard = threading.Lock()
+
+
+def get_streaming_evaluator():
+    """Devuelve el evaluador compartido, que guarda las anomalías en el ReadingRepository"""
+    global _default_evaluator
+    with _default_evaluator_guard:
+        if _default_evaluator is None:
+            from utils.repositories.reading_repository import ReadingRepository
+            _default_evaluator = StreamingAnomalyEvaluator(ReadingRepository())
+        return _default_evaluator
+
+
+def evaluate_readings_file(file_path, data):
+    """
+    Evalúa las lecturas nuevas de un CSV recién escrito por los escritores de lecturas
+
+    Solo actúa si la detección de anomalías está habilitada (feature flag
+    'enable_anomaly_detection'). Los errores se registran pero no se propagan.
+
+    Args:
+        file_path: Ruta del CSV daily_readings_* (de su nombre se obtienen asset y tag)
+        data: Contenido completo del CSV tras la escritura
+    """
+    try:
+        from config.feature_flags import is_feature_enabled
+        if not is_feature_enabled('enable_anomaly_detection') or data is None or data.empty:
+            return None
+
+        from utils.data_loader import TAGS_TO_CONSUMPTION_TYPE, extract_asset_and_tag
+        asset_id, tag = extract_asset_and_tag(file_path)
+        if not asset_id:
+            return None
+
+        readings = pd.DataFrame({
+            'date': data['date'],
+            'asset_id': asset_id,
+            'consumption_type': TAGS_TO_CONSUMPTION_TYPE.get(tag, tag),
+            'value': data['value'],
+        })
+        return get_streaming_evaluator().evaluate(readings)
+    except Exception as e:
+        print(f"Error en la evaluación incremental de {file_path}: {str(e)}")
+        return None
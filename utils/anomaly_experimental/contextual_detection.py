@@ -10,6 +10,7 @@ import logging
 
 # Import the threshold calculator
 from utils.anomaly_experimental.threshold_calculator import ThresholdCalculator
+from utils.anomaly_experimental.threshold_store import compute_thresholds
 from utils.anomaly_experimental.config_loader import get_config_for_consumption_type
 
 # Set up logging
@@ -20,16 +21,20 @@ class ContextualAnomalyDetector:
     Detect contextual anomalies in consumption data based on asset-specific patterns.
     """
     
-    def __init__(self, asset_id=None, consumption_type=None):
+    def __init__(self, asset_id=None, consumption_type=None, threshold_store=None):
         """
         Initialize the contextual anomaly detector.
         
         Args:
             asset_id (str, optional): The ID of the asset
             consumption_type (str, optional): The type of consumption
+            threshold_store (ThresholdStore, optional): Store to read thresholds from
+                (it is updated with the readings being analyzed). Without a store,
+                thresholds are computed from the DataFrame passed to detect_anomalies.
         """
         self.asset_id = asset_id
         self.consumption_type = consumption_type
+        self.threshold_store = threshold_store
         self.threshold_calculator = None
         
         if asset_id and consumption_type:
@@ -43,6 +48,10 @@ class ContextualAnomalyDetector:
         """
         Detect contextual anomalies in consumption data.
         
+        All (asset_id, consumption_type) groups are scored together with array
+        operations: readings are sorted by group and date once, and the
+        day-to-day changes and confidence rules are evaluated column-wise.
+        
         Args:
             df (pd.DataFrame): DataFrame with consumption data
             threshold_method (str): Method to use for threshold calculation
@@ -64,61 +73,38 @@ class ContextualAnomalyDetector:
                 result_df['date'] = pd.to_datetime(result_df['date'])
             
             # If asset_id and consumption_type were not provided at initialization,
-            # we need to process each asset and consumption type separately
+            # every asset and consumption type gets its own thresholds
             if self.asset_id is None or self.consumption_type is None:
-                # Initialize columns for anomaly detection results
-                result_df['is_contextual_anomaly'] = False
-                result_df['contextual_anomaly_confidence'] = 0.0
-                result_df['contextual_anomaly_type'] = None
-                result_df['contextual_anomaly_threshold'] = None
-                
-                # Group by asset_id and consumption_type
-                for (asset_id, consumption_type), group in result_df.groupby(['asset_id', 'consumption_type']):
-                    # Create a threshold calculator for this asset and consumption type
-                    calculator = ThresholdCalculator(asset_id, consumption_type)
-                    
-                    # Get thresholds
-                    thresholds = calculator.get_thresholds(df=result_df, method=threshold_method, percentile=percentile)
-                    
-                    if thresholds:
-                        # Process this group
-                        processed_group = self._process_group(group, thresholds)
-                        
-                        # Update the result DataFrame
-                        for idx in processed_group.index:
-                            result_df.loc[idx, 'is_contextual_anomaly'] = processed_group.loc[idx, 'is_contextual_anomaly']
-                            result_df.loc[idx, 'contextual_anomaly_confidence'] = processed_group.loc[idx, 'contextual_anomaly_confidence']
-                            result_df.loc[idx, 'contextual_anomaly_type'] = processed_group.loc[idx, 'contextual_anomaly_type']
-                            result_df.loc[idx, 'contextual_anomaly_threshold'] = processed_group.loc[idx, 'contextual_anomaly_threshold']
+                grouped = result_df.groupby(['asset_id', 'consumption_type'], sort=False)
+                codes = np.full(len(result_df), -1)
+                keys = []
+                for code, (key, positions) in enumerate(grouped.indices.items()):
+                    codes[positions] = code
+                    keys.append(key)
+                thresholds_by_group = self._get_group_thresholds(result_df, keys, threshold_method, percentile)
             else:
                 # Process a single asset and consumption type
-                # Filter for the specified asset and consumption type
-                filtered_df = result_df[
-                    (result_df['asset_id'] == self.asset_id) & 
-                    (result_df['consumption_type'] == self.consumption_type)
-                ]
+                mask = ((result_df['asset_id'] == self.asset_id) &
+                        (result_df['consumption_type'] == self.consumption_type)).to_numpy()
+                if not mask.any():
+                    return result_df
                 
-                if not filtered_df.empty:
-                    # Get thresholds
-                    thresholds = self.threshold_calculator.get_thresholds(df=result_df, method=threshold_method, percentile=percentile)
-                    
-                    if thresholds:
-                        # Process this filtered DataFrame
-                        processed_df = self._process_group(filtered_df, thresholds)
-                        
-                        # Initialize columns for anomaly detection results
-                        result_df['is_contextual_anomaly'] = False
-                        result_df['contextual_anomaly_confidence'] = 0.0
-                        result_df['contextual_anomaly_type'] = None
-                        result_df['contextual_anomaly_threshold'] = None
-                        
-                        # Update the result DataFrame
-                        for idx in processed_df.index:
-                            result_df.loc[idx, 'is_contextual_anomaly'] = processed_df.loc[idx, 'is_contextual_anomaly']
-                            result_df.loc[idx, 'contextual_anomaly_confidence'] = processed_df.loc[idx, 'contextual_anomaly_confidence']
-                            result_df.loc[idx, 'contextual_anomaly_type'] = processed_df.loc[idx, 'contextual_anomaly_type']
-                            result_df.loc[idx, 'contextual_anomaly_threshold'] = processed_df.loc[idx, 'contextual_anomaly_threshold']
+                thresholds_by_group = self._get_group_thresholds(
+                    result_df[mask], [(self.asset_id, self.consumption_type)], threshold_method, percentile
+                )
+                if not thresholds_by_group[0]:
+                    return result_df
+                codes = np.where(mask, 0, -1)
+            
+            flags, confidence, anomaly_type, threshold = _score_contextual_changes(
+                _consumption_values(result_df), result_df['date'], codes, thresholds_by_group
+            )
+            result_df['is_contextual_anomaly'] = flags
+            result_df['contextual_anomaly_confidence'] = confidence
+            result_df['contextual_anomaly_type'] = anomaly_type
+            result_df['contextual_anomaly_threshold'] = threshold
             
+            logger.info(f"Detected {int(flags.sum())} contextual anomalies in {len(thresholds_by_group)} groups")
             return result_df
             
         except Exception as e:
@@ -127,131 +113,149 @@ class ContextualAnomalyDetector:
             logger.error(traceback.format_exc())
             return df
     
-    def _process_group(self, group_df, thresholds):
+    def _get_group_thresholds(self, df, keys, threshold_method, percentile):
         """
-        Process a group of data for a single asset and consumption type.
+        Get the thresholds of each (asset_id, consumption_type) in keys.
+        
+        Thresholds for all groups come from one grouped aggregation (or from
+        the threshold store, after adding the new readings of df to it).
         
-        Args:
-            group_df (pd.DataFrame): DataFrame for a single asset and consumption type
-            thresholds (dict): Thresholds for this asset
-            
         Returns:
-            pd.DataFrame: Processed DataFrame with anomaly flags
+            list: Thresholds dict (or None) for each key, in the same order
         """
-        try:
-            # Sort by date
-            group_df = group_df.sort_values('date')
-            
-            # Determine consumption column
-            consumption_col = 'consumption'
-            if 'corrected_value' in group_df.columns:
-                consumption_col = 'corrected_value'
-            
-            # Calculate day-to-day changes
-            group_df['daily_change'] = group_df[consumption_col].diff()
-            group_df['daily_change_pct'] = group_df[consumption_col].pct_change() * 100
-            
-            # Initialize anomaly columns
-            group_df['is_contextual_anomaly'] = False
-            group_df['contextual_anomaly_confidence'] = 0.0
-            group_df['contextual_anomaly_type'] = None
-            group_df['contextual_anomaly_threshold'] = None
-            
-            # Get configuration values if available
-            daily_max = thresholds.get('daily_max', 10.0)
-            sudden_increase = thresholds.get('sudden_increase', 5.0)
-            
-            # Check for anomalies
-            for idx, row in group_df.iterrows():
-                if pd.isna(row['daily_change']) or pd.isna(row['daily_change_pct']):
-                    continue
-                
-                # Check absolute change
-                abs_change = abs(row['daily_change'])
-                if abs_change > thresholds['high_threshold']:
-                    group_df.at[idx, 'is_contextual_anomaly'] = True
-                    
-                    # Calculate confidence based on how much the change exceeds the threshold
-                    excess_ratio = abs_change / thresholds['high_threshold']
-                    confidence = min(0.9, 0.5 + (excess_ratio - 1) * 0.1)
-                    group_df.at[idx, 'contextual_anomaly_confidence'] = confidence
-                    group_df.at[idx, 'contextual_anomaly_type'] = 'absolute_change'
-                    group_df.at[idx, 'contextual_anomaly_threshold'] = thresholds['high_threshold']
-                    
-                    logger.info(f"Detected absolute change anomaly: {row['date']} - {abs_change} > {thresholds['high_threshold']}")
-                elif abs_change > thresholds['medium_threshold']:
-                    group_df.at[idx, 'is_contextual_anomaly'] = True
-                    
-                    # Medium confidence for medium threshold
-                    excess_ratio = abs_change / thresholds['medium_threshold']
-                    confidence = min(0.7, 0.3 + (excess_ratio - 1) * 0.1)
-                    group_df.at[idx, 'contextual_anomaly_confidence'] = confidence
-                    group_df.at[idx, 'contextual_anomaly_type'] = 'absolute_change'
-                    group_df.at[idx, 'contextual_anomaly_threshold'] = thresholds['medium_threshold']
-                    
-                    logger.info(f"Detected medium absolute change anomaly: {row['date']} - {abs_change} > {thresholds['medium_threshold']}")
-                
-                # Check percentage change
-                abs_change_pct = abs(row['daily_change_pct'])
-                
-                # Use sudden_increase from config if available
-                high_pct_threshold = thresholds.get('high_threshold_pct', sudden_increase * 2)
-                medium_pct_threshold = thresholds.get('medium_threshold_pct', sudden_increase)
-                
-                if abs_change_pct > high_pct_threshold:
-                    # If already flagged as anomaly, keep the higher confidence
-                    if group_df.at[idx, 'is_contextual_anomaly']:
-                        excess_ratio = abs_change_pct / high_pct_threshold
-                        new_confidence = min(0.95, 0.6 + (excess_ratio - 1) * 0.1)
-                        if new_confidence > group_df.at[idx, 'contextual_anomaly_confidence']:
-                            group_df.at[idx, 'contextual_anomaly_confidence'] = new_confidence
-                            group_df.at[idx, 'contextual_anomaly_type'] = 'percentage_change'
-                            group_df.at[idx, 'contextual_anomaly_threshold'] = high_pct_threshold
-                    else:
-                        group_df.at[idx, 'is_contextual_anomaly'] = True
-                        excess_ratio = abs_change_pct / high_pct_threshold
-                        confidence = min(0.95, 0.6 + (excess_ratio - 1) * 0.1)
-                        group_df.at[idx, 'contextual_anomaly_confidence'] = confidence
-                        group_df.at[idx, 'contextual_anomaly_type'] = 'percentage_change'
-                        group_df.at[idx, 'contextual_anomaly_threshold'] = high_pct_threshold
-                        
-                        logger.info(f"Detected percentage change anomaly: {row['date']} - {abs_change_pct}% > {high_pct_threshold}%")
-                elif abs_change_pct > medium_pct_threshold:
-                    # If already flagged as anomaly, only update if current confidence is low
-                    if group_df.at[idx, 'is_contextual_anomaly'] and group_df.at[idx, 'contextual_anomaly_confidence'] < 0.5:
-                        excess_ratio = abs_change_pct / medium_pct_threshold
-                        new_confidence = min(0.7, 0.4 + (excess_ratio - 1) * 0.1)
-                        if new_confidence > group_df.at[idx, 'contextual_anomaly_confidence']:
-                            group_df.at[idx, 'contextual_anomaly_confidence'] = new_confidence
-                            group_df.at[idx, 'contextual_anomaly_type'] = 'percentage_change'
-                            group_df.at[idx, 'contextual_anomaly_threshold'] = medium_pct_threshold
-                    elif not group_df.at[idx, 'is_contextual_anomaly']:
-                        group_df.at[idx, 'is_contextual_anomaly'] = True
-                        excess_ratio = abs_change_pct / medium_pct_threshold
-                        confidence = min(0.7, 0.4 + (excess_ratio - 1) * 0.1)
-                        group_df.at[idx, 'contextual_anomaly_confidence'] = confidence
-                        group_df.at[idx, 'contextual_anomaly_type'] = 'percentage_change'
-                        group_df.at[idx, 'contextual_anomaly_threshold'] = medium_pct_threshold
-                        
-                        logger.info(f"Detected medium percentage change anomaly: {row['date']} - {abs_change_pct}% > {medium_pct_threshold}%")
-                
-                # Check for daily max from config
-                if consumption_col in row and row[consumption_col] > daily_max:
-                    # If not already flagged as high confidence anomaly
-                    if not group_df.at[idx, 'is_contextual_anomaly'] or group_df.at[idx, 'contextual_anomaly_confidence'] < 0.8:
-                        group_df.at[idx, 'is_contextual_anomaly'] = True
-                        excess_ratio = row[consumption_col] / daily_max
-                        confidence = min(0.9, 0.5 + (excess_ratio - 1) * 0.1)
-                        group_df.at[idx, 'contextual_anomaly_confidence'] = confidence
-                        group_df.at[idx, 'contextual_anomaly_type'] = 'daily_max_exceeded'
-                        group_df.at[idx, 'contextual_anomaly_threshold'] = daily_max
-                        
-                        logger.info(f"Detected daily max exceeded: {row['date']} - {row[consumption_col]} > {daily_max}")
-            
-            return group_df
-            
-        except Exception as e:
-            logger.error(f"Error processing group: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return group_df 
\ No newline at end of file
+        if self.threshold_store is not None:
+            self.threshold_store.update(df)
+            table = self.threshold_store.get_many(keys, method=threshold_method, percentile=percentile)
+        else:
+            table = compute_thresholds(df, method=threshold_method, percentile=percentile)
+        return [table.get(key) for key in keys]
+
+
+ANOMALY_TYPES = np.array([None, 'absolute_change', 'percentage_change', 'daily_max_exceeded'], dtype=object)
+_ABSOLUTE, _PERCENTAGE, _DAILY_MAX = 1, 2, 3
+
+
+def _consumption_values(df):
+    """Values used for the day-to-day changes: corrected_value if present, consumption otherwise."""
+    consumption_col = 'corrected_value' if 'corrected_value' in df.columns else 'consumption'
+    return pd.to_numeric(df[consumption_col], errors='coerce').to_numpy(dtype=float)
+
+
+def _threshold_arrays(thresholds_by_group):
+    """Per-group threshold arrays (NaN for groups without thresholds, which are never flagged)."""
+    def value(thresholds, key, default=np.nan):
+        result = thresholds.get(key, default)
+        return np.nan if result is None else float(result)
+    
+    n_groups = len(thresholds_by_group)
+    arrays = {key: np.full(n_groups, np.nan) for key in
+              ('high', 'medium', 'high_pct', 'medium_pct', 'daily_max')}
+    for code, thresholds in enumerate(thresholds_by_group):
+        if not thresholds:
+            continue
+        sudden_increase = value(thresholds, 'sudden_increase', 5.0)
+        arrays['high'][code] = value(thresholds, 'high_threshold')
+        arrays['medium'][code] = value(thresholds, 'medium_threshold')
+        arrays['high_pct'][code] = value(thresholds, 'high_threshold_pct', sudden_increase * 2)
+        arrays['medium_pct'][code] = value(thresholds, 'medium_threshold_pct', sudden_increase)
+        arrays['daily_max'][code] = value(thresholds, 'daily_max', 10.0)
+    return arrays
+
+
+def _score_contextual_changes(values, dates, codes, thresholds_by_group):
+    """
+    Score day-to-day changes of every group at once.
+    
+    Within each group (``codes``, -1 = not scored) readings are ordered by
+    date. A reading is evaluated when both its change and its percentage
+    change with respect to the previous reading of the group are defined.
+    The rules are applied in order, each one possibly overriding the previous:
+    
+    1. Absolute change above high_threshold (confidence 0.5-0.9) or above
+       medium_threshold (0.3-0.7).
+    2. Percentage change above high_threshold_pct (0.6-0.95), kept if the
+       reading was not flagged or the confidence increases; or above
+       medium_threshold_pct (0.4-0.7), applied if the reading was not
+       flagged, or was flagged with confidence < 0.5 and it increases.
+    3. Value above daily_max (0.5-0.9), applied unless the reading already
+       has confidence >= 0.8.
+    
+    Returns:
+        tuple: (flags, confidence, anomaly_type, threshold) aligned with the input rows
+    """
+    n_rows = len(values)
+    flags_out = np.zeros(n_rows, dtype=bool)
+    confidence_out = np.zeros(n_rows)
+    type_out = np.zeros(n_rows, dtype=np.int8)
+    threshold_out = np.full(n_rows, np.nan)
+    
+    scored = np.flatnonzero(codes >= 0)
+    if len(scored) < 2:
+        return flags_out, confidence_out, ANOMALY_TYPES[type_out], np.full(n_rows, None, dtype=object)
+    
+    # Sort by group and date (missing dates last, ties keep their original order)
+    date_keys = pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[ns]').view('i8')[scored]
+    date_keys = np.where(date_keys == np.iinfo('i8').min, np.iinfo('i8').max, date_keys)
+    order = scored[np.lexsort((date_keys, codes[scored]))]
+    group = codes[order]
+    current = values[order]
+    
+    previous = np.empty_like(current)
+    previous[0] = np.nan
+    previous[1:] = current[:-1]
+    previous[np.r_[True, group[1:] != group[:-1]]] = np.nan
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = current - previous
+        change_pct = (current / previous - 1) * 100
+    evaluated = ~(np.isnan(change) | np.isnan(change_pct))
+    
+    thresholds = _threshold_arrays(thresholds_by_group)
+    high = thresholds['high'][group]
+    medium = thresholds['medium'][group]
+    high_pct = thresholds['high_pct'][group]
+    medium_pct = thresholds['medium_pct'][group]
+    daily_max = thresholds['daily_max'][group]
+    
+    flags = np.zeros(len(order), dtype=bool)
+    confidence = np.zeros(len(order))
+    anomaly_type = np.zeros(len(order), dtype=np.int8)
+    threshold = np.full(len(order), np.nan)
+    
+    def apply(mask, new_confidence, new_type, new_threshold):
+        flags[mask] = True
+        confidence[mask] = new_confidence[mask]
+        anomaly_type[mask] = new_type
+        threshold[mask] = new_threshold[mask]
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 1. Absolute change
+        abs_change = np.abs(change)
+        above_high = evaluated & (abs_change > high)
+        apply(above_high, np.fmin(0.9, 0.5 + (abs_change / high - 1) * 0.1), _ABSOLUTE, high)
+        above_medium = evaluated & ~above_high & (abs_change > medium)
+        apply(above_medium, np.fmin(0.7, 0.3 + (abs_change / medium - 1) * 0.1), _ABSOLUTE, medium)
+        
+        # 2. Percentage change
+        abs_change_pct = np.abs(change_pct)
+        above_high_pct = evaluated & (abs_change_pct > high_pct)
+        high_pct_confidence = np.fmin(0.95, 0.6 + (abs_change_pct / high_pct - 1) * 0.1)
+        apply(above_high_pct & (~flags | (high_pct_confidence > confidence)),
+              high_pct_confidence, _PERCENTAGE, high_pct)
+        above_medium_pct = evaluated & ~above_high_pct & (abs_change_pct > medium_pct)
+        medium_pct_confidence = np.fmin(0.7, 0.4 + (abs_change_pct / medium_pct - 1) * 0.1)
+        apply(above_medium_pct & (~flags | ((confidence < 0.5) & (medium_pct_confidence > confidence))),
+              medium_pct_confidence, _PERCENTAGE, medium_pct)
+        
+        # 3. Daily maximum from the configuration
+        above_daily_max = evaluated & (current > daily_max) & (~flags | (confidence < 0.8))
+        apply(above_daily_max, np.fmin(0.9, 0.5 + (current / daily_max - 1) * 0.1), _DAILY_MAX, daily_max)
+    
+    flags_out[order] = flags
+    confidence_out[order] = confidence
+    type_out[order] = anomaly_type
+    threshold_out[order] = threshold
+    
+    threshold_values = threshold_out.astype(object)
+    threshold_values[type_out == 0] = None
+    return flags_out, confidence_out, ANOMALY_TYPES[type_out], threshold_values
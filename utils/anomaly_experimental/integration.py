@@ -10,6 +10,7 @@ import logging
 from utils.anomaly_experimental.contextual_detection import ContextualAnomalyDetector
 from utils.anomaly_experimental.threshold_calculator import ThresholdCalculator
 from utils.anomaly_experimental.config_loader import load_anomaly_config, get_config_for_consumption_type
+from utils.anomaly_experimental.threshold_store import get_threshold_store
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -29,8 +30,8 @@ def detect_contextual_anomalies(df, threshold_method="std_dev", percentile=95, u
         pd.DataFrame: DataFrame with anomaly flags and confidence levels
     """
     try:
-        # Create detector
-        detector = ContextualAnomalyDetector()
+        # Create detector (thresholds are kept in the shared threshold store)
+        detector = ContextualAnomalyDetector(threshold_store=get_threshold_store())
         
         # If using configuration, override threshold_method
         if use_config:
@@ -204,14 +205,18 @@ def get_asset_thresholds(asset_id, consumption_type, df=None, threshold_method="
     """
     try:
         # Create threshold calculator
-        calculator = ThresholdCalculator(asset_id, consumption_type)
+        calculator = ThresholdCalculator(asset_id, consumption_type, threshold_store=get_threshold_store())
         
         # If using configuration, override threshold_method
         if use_config:
             threshold_method = "config"
         
-        # If no DataFrame is provided, try to load data
+        # If no DataFrame is provided, use the stored thresholds or try to load data
         if df is None:
+            thresholds = calculator.get_stored_thresholds(method=threshold_method, percentile=percentile)
+            if thresholds is not None:
+                return thresholds
+            
             try:
                 from utils.data_loader import load_all_csv_data
                 
@@ -229,6 +234,10 @@ def get_asset_thresholds(asset_id, consumption_type, df=None, threshold_method="
                     jwt_token=token
                 )
                 
+                # Keep the store up to date with the loaded readings
+                if df is not None and not df.empty:
+                    calculator.threshold_store.update(df)
+                
                 # Filter for this asset
                 df = df[df['asset_id'] == asset_id]
                 
@@ -0,0 +1,355 @@
+"""
+Parallel project-wide scan for the experimental contextual anomaly detection system.
+
+Assets of a project are split into shards that are submitted, one task per
+shard, to a process pool. Each worker loads the readings of its assets,
+runs the contextual detector on them and returns one summary row per asset
+(with its load and detection times) plus the anomalous readings. The results
+are merged into a single report frame; plots are rendered afterwards, in a
+separate optional stage, from the merged results.
+"""
+
+import os
+import json
+import math
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.anomaly_experimental.contextual_detection import ContextualAnomalyDetector
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_PATH = "data/analyzed_data"
+# Shards per worker: enough to balance uneven assets without paying a task per asset
+SHARDS_PER_WORKER = 4
+MAX_CHUNK_SIZE = 100
+
+REPORT_COLUMNS = [
+    'asset_id', 'consumption_type', 'source', 'total_records', 'anomaly_records',
+    'anomaly_percentage', 'high_confidence', 'medium_confidence', 'low_confidence',
+    'absolute_change', 'percentage_change', 'daily_max_exceeded',
+    'load_seconds', 'detect_seconds', 'total_seconds', 'error'
+]
+ANOMALY_COLUMNS = [
+    'asset_id', 'consumption_type', 'date', 'consumption', 'contextual_anomaly_confidence',
+    'contextual_anomaly_type', 'contextual_anomaly_threshold'
+]
+TOTAL_COLUMNS = [
+    'total_records', 'anomaly_records', 'high_confidence', 'medium_confidence', 'low_confidence',
+    'absolute_change', 'percentage_change'
+]
+
+
+def find_project_files(project_id, consumption_type=None, base_path=DEFAULT_BASE_PATH):
+    """
+    Find the readings files of a project using the readings catalog.
+
+    Args:
+        project_id (str): Project ID (folder under base_path)
+        consumption_type (str, optional): Consumption type or tag to keep. A file
+            matches if its consumption type or tag equals it, or if its tag contains it.
+        base_path (str): Folder with the analyzed readings
+
+    Returns:
+        list: One task dict per file ('asset_id', 'consumption_type', 'path')
+    """
+    from utils.repositories.readings_catalog import get_readings_catalog
+
+    tasks = []
+    for entry in get_readings_catalog(base_path).get_project_files(project_id):
+        tag = entry.get('tag') or ''
+        if consumption_type and consumption_type not in (entry.get('consumption_type'), tag) \
+                and consumption_type not in tag:
+            continue
+        tasks.append({
+            'asset_id': entry['asset_id'],
+            'consumption_type': entry.get('consumption_type') or tag,
+            'path': entry['path'],
+        })
+    return tasks
+
+
+def tasks_from_frame(df):
+    """Split a DataFrame of readings into one task per (asset_id, consumption_type)."""
+    if df is None or df.empty:
+        return []
+    return [
+        {'asset_id': asset_id, 'consumption_type': consumption_type, 'data': group}
+        for (asset_id, consumption_type), group in df.groupby(['asset_id', 'consumption_type'], sort=True)
+    ]
+
+
+def _load_task_readings(task):
+    """Readings of one task as a frame with date, consumption, asset_id and consumption_type."""
+    if 'data' in task:
+        df = task['data'].copy()
+    else:
+        df = pd.read_csv(task['path'])
+
+    if 'consumption' not in df.columns and 'value' in df.columns:
+        df = df.rename(columns={'value': 'consumption'})
+    df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    df['consumption'] = pd.to_numeric(df['consumption'], errors='coerce')
+    df = df.dropna(subset=['date', 'consumption'])
+    df['asset_id'] = task['asset_id']
+    df['consumption_type'] = task['consumption_type']
+    return df
+
+
+def _scan_asset(task, threshold_method, percentile):
+    """Scan one asset; returns its report row and its anomalous readings."""
+    row = dict.fromkeys(REPORT_COLUMNS, 0)
+    row.update(asset_id=task['asset_id'], consumption_type=task['consumption_type'],
+               source=task.get('path', 'dataframe'), error=None)
+
+    start = time.perf_counter()
+    try:
+        df = _load_task_readings(task)
+        loaded = time.perf_counter()
+        result_df = ContextualAnomalyDetector().detect_anomalies(
+            df, threshold_method=threshold_method, percentile=percentile
+        )
+        detected = time.perf_counter()
+    except Exception as e:
+        row['error'] = str(e)
+        row['total_seconds'] = time.perf_counter() - start
+        return row, None
+
+    row['load_seconds'] = loaded - start
+    row['detect_seconds'] = detected - loaded
+    row['total_seconds'] = detected - start
+    row['total_records'] = len(result_df)
+    if result_df.empty or 'is_contextual_anomaly' not in result_df.columns:
+        return row, None
+
+    flags = result_df['is_contextual_anomaly'].to_numpy(dtype=bool)
+    confidence = result_df['contextual_anomaly_confidence'].to_numpy(dtype=float)
+    anomaly_type = result_df['contextual_anomaly_type'].to_numpy()
+    row['anomaly_records'] = int(flags.sum())
+    row['anomaly_percentage'] = row['anomaly_records'] / len(result_df) * 100
+    row['high_confidence'] = int((confidence >= 0.7).sum())
+    row['medium_confidence'] = int(((confidence >= 0.4) & (confidence < 0.7)).sum())
+    row['low_confidence'] = int(((confidence > 0) & (confidence < 0.4)).sum())
+    row['absolute_change'] = int((anomaly_type == 'absolute_change').sum())
+    row['percentage_change'] = int((anomaly_type == 'percentage_change').sum())
+    row['daily_max_exceeded'] = int((anomaly_type == 'daily_max_exceeded').sum())
+
+    anomalies = result_df.loc[flags, ANOMALY_COLUMNS] if flags.any() else None
+    return row, anomalies
+
+
+def _init_worker():
+    """Process pool initializer."""
+    # Per-asset detector logs would flood the output of every worker
+    logging.getLogger('utils.anomaly_experimental.contextual_detection').setLevel(logging.WARNING)
+
+
+def _scan_shard(tasks, threshold_method, percentile):
+    """Worker entry point: scan every asset of a shard."""
+    rows, anomalies = [], []
+    for task in tasks:
+        row, asset_anomalies = _scan_asset(task, threshold_method, percentile)
+        rows.append(row)
+        if asset_anomalies is not None:
+            anomalies.append(asset_anomalies)
+    return rows, anomalies
+
+
+def _default_workers():
+    return max(1, min(os.cpu_count() or 1, 32))
+
+
+def scan_assets(tasks, threshold_method="std_dev", percentile=95, max_workers=None, chunk_size=None):
+    """
+    Scan a list of asset tasks, sharded across a process pool.
+
+    Args:
+        tasks (list): Task dicts from find_project_files or tasks_from_frame
+        threshold_method (str): Method to use for threshold calculation
+        percentile (float): Percentile to use if method is "percentile"
+        max_workers (int, optional): Worker processes (default: CPU count). With
+            one worker, or a single shard, the scan runs in the current process.
+        chunk_size (int, optional): Assets per submitted task (default: enough
+            for SHARDS_PER_WORKER shards per worker, at most MAX_CHUNK_SIZE)
+
+    Returns:
+        dict: 'success', 'report' (one row per asset), 'anomalies' (anomalous
+            readings of every asset), totals with the same keys as
+            AnomalyTestHarness.run_test, and the scan parameters
+    """
+    start = time.perf_counter()
+    workers = max_workers or _default_workers()
+    if chunk_size is None:
+        chunk_size = max(1, min(MAX_CHUNK_SIZE, math.ceil(len(tasks) / (workers * SHARDS_PER_WORKER))))
+    shards = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+
+    rows, anomalies = [], []
+    if workers == 1 or len(shards) <= 1:
+        for shard in shards:
+            shard_rows, shard_anomalies = _scan_shard(shard, threshold_method, percentile)
+            rows.extend(shard_rows)
+            anomalies.extend(shard_anomalies)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards)), initializer=_init_worker) as executor:
+            futures = [executor.submit(_scan_shard, shard, threshold_method, percentile) for shard in shards]
+            for done, future in enumerate(as_completed(futures), start=1):
+                shard_rows, shard_anomalies = future.result()
+                rows.extend(shard_rows)
+                anomalies.extend(shard_anomalies)
+                logger.debug(f"Shard {done}/{len(shards)} done")
+
+    report = pd.DataFrame(rows, columns=REPORT_COLUMNS)
+    report = report.sort_values(['asset_id', 'consumption_type'], kind='mergesort').reset_index(drop=True)
+    if anomalies:
+        anomalies_df = pd.concat(anomalies, ignore_index=True)
+        anomalies_df = anomalies_df.sort_values(['asset_id', 'consumption_type', 'date'], kind='mergesort')
+        anomalies_df = anomalies_df.reset_index(drop=True)
+    else:
+        anomalies_df = pd.DataFrame(columns=ANOMALY_COLUMNS)
+
+    results = {"success": not report.empty}
+    if report.empty:
+        results["message"] = "No assets to scan"
+    results.update({column: int(report[column].sum()) for column in TOTAL_COLUMNS})
+    results["anomaly_percentage"] = (
+        results["anomaly_records"] / results["total_records"] * 100 if results["total_records"] > 0 else 0
+    )
+    results.update({
+        "assets": len(report),
+        "failed_assets": int(report['error'].notna().sum()),
+        "processing_time": time.perf_counter() - start,
+        "asset_time": float(report['total_seconds'].sum()),
+        "workers": workers if len(shards) > 1 else 1,
+        "chunk_size": chunk_size,
+        "threshold_method": threshold_method,
+        "percentile": percentile,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "report": report,
+        "anomalies": anomalies_df,
+    })
+
+    logger.info(
+        f"Scanned {results['assets']} assets in {results['processing_time']:.2f} s "
+        f"({results['workers']} workers, {len(shards)} shards): {results['anomaly_records']} anomalies, "
+        f"{results['failed_assets']} failed"
+    )
+    return results
+
+
+def scan_project(project_id, consumption_type=None, data_source=None, threshold_method="std_dev",
+                 percentile=95, max_workers=None, chunk_size=None, base_path=DEFAULT_BASE_PATH):
+    """
+    Scan every asset of a project for contextual anomalies in parallel.
+
+    Args:
+        project_id (str): Project ID
+        consumption_type (str, optional): Consumption type (or tag) to scan
+        data_source (pd.DataFrame, optional): Readings to scan instead of the
+            project files (must have asset_id and consumption_type columns)
+        threshold_method (str): Method to use for threshold calculation
+        percentile (float): Percentile to use if method is "percentile"
+        max_workers (int, optional): Worker processes
+        chunk_size (int, optional): Assets per submitted task
+        base_path (str): Folder with the analyzed readings
+
+    Returns:
+        dict: Scan results (see scan_assets)
+    """
+    if isinstance(data_source, pd.DataFrame):
+        tasks = tasks_from_frame(data_source)
+    else:
+        tasks = find_project_files(project_id, consumption_type, base_path)
+
+    if not tasks:
+        return {"success": False, "message": f"No data found for project {project_id}"}
+
+    logger.info(f"Scanning {len(tasks)} assets of project {project_id}")
+    return scan_assets(tasks, threshold_method=threshold_method, percentile=percentile,
+                       max_workers=max_workers, chunk_size=chunk_size)
+
+
+def save_scan_results(results, output_dir):
+    """
+    Save the report, the anomalies and the totals of a scan.
+
+    Returns:
+        dict: Paths of the saved files
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    paths = {
+        "report": os.path.join(output_dir, f"scan_report_{timestamp}.csv"),
+        "anomalies": os.path.join(output_dir, f"scan_anomalies_{timestamp}.csv"),
+        "stats": os.path.join(output_dir, f"scan_stats_{timestamp}.json"),
+    }
+    results['report'].to_csv(paths["report"], index=False)
+    results['anomalies'].to_csv(paths["anomalies"], index=False)
+    stats = {key: value for key, value in results.items() if not isinstance(value, pd.DataFrame)}
+    with open(paths["stats"], 'w') as f:
+        json.dump(stats, f, indent=4, default=str)
+    logger.info(f"Saved scan results to {output_dir}")
+    return paths
+
+
+def render_scan_plots(results, output_dir, top_n=20):
+    """
+    Render the plots of a scan (optional stage, run after the scan).
+
+    Plots: anomalies of the top_n assets, confidence distribution of all
+    anomalies and scan time per asset against its number of readings.
+
+    Returns:
+        list: Paths of the saved images
+    """
+    import matplotlib.pyplot as plt
+
+    os.makedirs(output_dir, exist_ok=True)
+    report = results['report']
+    anomalies = results['anomalies']
+    paths = []
+
+    try:
+        top = report[report['anomaly_records'] > 0].nlargest(top_n, 'anomaly_records')
+        if not top.empty:
+            labels = top['asset_id'].astype(str) + ' · ' + top['consumption_type'].astype(str)
+            fig, ax = plt.subplots(figsize=(12, max(4, 0.35 * len(top))))
+            ax.barh(labels[::-1], top['anomaly_records'][::-1], color='tab:red')
+            ax.set_title(f'Assets with most anomalies (top {len(top)})')
+            ax.set_xlabel('Anomalies')
+            fig.tight_layout()
+            paths.append(os.path.join(output_dir, "scan_top_assets.png"))
+            fig.savefig(paths[-1])
+            plt.close(fig)
+
+        if not anomalies.empty:
+            fig, ax = plt.subplots(figsize=(10, 6))
+            ax.hist(anomalies['contextual_anomaly_confidence'].astype(float), bins=np.linspace(0, 1, 21))
+            ax.set_title('Anomaly confidence distribution')
+            ax.set_xlabel('Confidence')
+            ax.set_ylabel('Anomalies')
+            fig.tight_layout()
+            paths.append(os.path.join(output_dir, "scan_confidence.png"))
+            fig.savefig(paths[-1])
+            plt.close(fig)
+
+        if not report.empty:
+            fig, ax = plt.subplots(figsize=(10, 6))
+            ax.scatter(report['total_records'], report['total_seconds'], s=8, alpha=0.6)
+            ax.set_title('Scan time per asset')
+            ax.set_xlabel('Readings')
+            ax.set_ylabel('Seconds')
+            fig.tight_layout()
+            paths.append(os.path.join(output_dir, "scan_timings.png"))
+            fig.savefig(paths[-1])
+            plt.close(fig)
+    except Exception as e:
+        logger.error(f"Error generating scan visualizations: {str(e)}")
+        plt.close('all')
+
+    return paths
@@ -63,6 +63,14 @@ def parse_arguments():
     parser.add_argument('--output-dir', default=None,
                         help='Directory to save test results')
     
+    # Project scan
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes for project tests (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='Assets per task submitted to the worker pool')
+    parser.add_argument('--no-plots', action='store_true',
+                        help='Do not render plots for project tests')
+    
     return parser.parse_args()
 
 def main():
@@ -104,7 +112,10 @@ def main():
                 consumption_type=args.consumption_type,
                 data_source=args.data_source,
                 threshold_method=args.threshold_method,
-                percentile=args.percentile
+                percentile=args.percentile,
+                max_workers=args.workers,
+                chunk_size=args.chunk_size,
+                render_plots=not args.no_plots
             )
         elif args.type == 'specific':
             if not args.date:
@@ -179,6 +190,12 @@ def main():
                 print(f"Absolute change anomalies: {result['absolute_change']}")
                 print(f"Percentage change anomalies: {result['percentage_change']}")
                 print(f"Processing time: {result['processing_time']:.2f} seconds")
+                
+                if args.type == 'project':
+                    print(f"Assets scanned: {result['assets']} ({result['failed_assets']} failed, {result['workers']} workers)")
+                    print("\nSlowest assets:")
+                    for row in result['report'].nlargest(5, 'total_seconds').itertuples():
+                        print(f"  {row.asset_id} ({row.consumption_type}): {row.total_seconds:.3f} s, {row.total_records} records")
         else:
             print(f"Error: {result['message']}")
         
@@ -456,35 +456,59 @@ def run_test_for_asset(asset_id, consumption_type, data_source=None, threshold_m
     # Run test
     return harness.run_test(test_data, threshold_method=threshold_method, percentile=percentile)
 
-def run_test_for_project(project_id, consumption_type=None, data_source=None, threshold_method="std_dev", percentile=95):
+def run_test_for_project(project_id, consumption_type=None, data_source=None, threshold_method="std_dev", percentile=95,
+                         max_workers=None, chunk_size=None, render_plots=True):
     """
     Run a test for all assets in a project.
     
+    Assets are scanned in parallel (see project_scan.scan_project): the project
+    files are sharded across a process pool and the per-asset results are merged
+    into one report. Plots are rendered afterwards, only if render_plots is True.
+    
     Args:
         project_id (str): Project ID
         consumption_type (str, optional): Consumption type
-        data_source (str or pd.DataFrame, optional): Data source
+        data_source (str or pd.DataFrame, optional): Data source. Without one, the
+            project files listed in the readings catalog are scanned.
         threshold_method (str): Method to use for threshold calculation
         percentile (float): Percentile to use if method is "percentile"
+        max_workers (int, optional): Worker processes (default: CPU count)
+        chunk_size (int, optional): Assets per task submitted to the pool
+        render_plots (bool): Whether to render the scan plots
         
     Returns:
-        dict: Test results
+        dict: Test results, with the per-asset 'report' and the 'anomalies' frames
     """
+    from utils.anomaly_experimental.project_scan import scan_project, save_scan_results, render_scan_plots
+    
     # Create test harness
     harness = AnomalyTestHarness(output_dir=f"test_results/project_{project_id}")
+    scan_options = dict(threshold_method=threshold_method, percentile=percentile,
+                        max_workers=max_workers, chunk_size=chunk_size)
     
-    # Load test data
-    test_data = harness.load_test_data(
-        data_source=data_source,
-        project_id=project_id,
-        consumption_type=consumption_type
-    )
+    results = None
+    if data_source is None:
+        results = scan_project(project_id, consumption_type, **scan_options)
     
-    if test_data is None or test_data.empty:
-        return {"success": False, "message": f"No data found for project {project_id}"}
+    if results is None or not results['success']:
+        # Load test data
+        test_data = harness.load_test_data(
+            data_source=data_source,
+            project_id=project_id,
+            consumption_type=consumption_type
+        )
+        
+        if test_data is None or test_data.empty:
+            return {"success": False, "message": f"No data found for project {project_id}"}
+        
+        results = scan_project(project_id, consumption_type, data_source=test_data, **scan_options)
     
-    # Run test
-    return harness.run_test(test_data, threshold_method=threshold_method, percentile=percentile)
+    if results['success']:
+        save_scan_results(results, harness.output_dir)
+        if render_plots:
+            render_scan_plots(results, harness.output_dir)
+    
+    return results
 
 def analyze_specific_anomaly(asset_id, date, consumption_type=None, data_source=None, days_context=30):
     """
@@ -227,16 +227,31 @@ def analyze_asset(asset_id, consumption_type, use_config=True, output_dir=None):
         traceback.print_exc()
         return None
 
-def analyze_project(project_id, consumption_type, use_config=True, output_dir=None):
+def analyze_project(project_id, consumption_type, use_config=True, output_dir=None, max_workers=None,
+                    chunk_size=None, render_plots=True):
     """
     Analyze all assets in a project for anomalies.
     
+    The assets are scanned in parallel by a process pool (project_scan.scan_project);
+    the per-asset report, the anomalies and the plots are saved to output_dir.
+    
     Args:
         project_id (str): The project ID to analyze
         consumption_type (str): The consumption type to analyze
         use_config (bool): Whether to use the configuration file
         output_dir (str): The output directory for results
+        max_workers (int): Worker processes (default: CPU count)
+        chunk_size (int): Assets per task submitted to the pool
+        render_plots (bool): Whether to render the plots after the scan
+        
+    Returns:
+        dict: Scan results (see project_scan.scan_assets)
     """
+    from utils.anomaly_experimental.project_scan import (
+        DEFAULT_BASE_PATH, find_project_files, scan_assets, save_scan_results, render_scan_plots
+    )
+    from utils.repositories.readings_catalog import ROOT_PROJECT
+    
     logger.info(f"Analyzing project {project_id} for consumption type {consumption_type}")
     
     # Create output directory if it doesn't exist
@@ -245,50 +260,36 @@ def analyze_project(project_id, consumption_type, use_config=True, output_dir=No
     
     os.makedirs(output_dir, exist_ok=True)
     
-    # Get the project directory
-    project_dir = os.path.join(os.getcwd(), "data", "analyzed_data", project_id)
+    # Find the project files that match the consumption type
+    tasks = find_project_files(project_id, consumption_type)
     
-    # If the project directory doesn't exist, try using the general data directory
-    if not os.path.exists(project_dir):
-        logger.info(f"Project directory {project_dir} not found, using general data directory")
-        project_dir = os.path.join(os.getcwd(), "data", "analyzed_data")
+    # If the project has no files, try using the general data directory
+    if not tasks:
+        logger.info(f"No files found for project {project_id}, using general data directory")
+        tasks = find_project_files(ROOT_PROJECT, consumption_type)
     
-    # Find all CSV files that match the consumption type
-    file_pattern = f"{project_dir}/*daily_readings_*{consumption_type}*.csv"
-    files = glob.glob(file_pattern)
+    if not tasks:
+        logger.error(f"No files found in {DEFAULT_BASE_PATH} for project {project_id} and consumption type {consumption_type}")
+        return None
     
-    if not files:
-        logger.error(f"No files found matching pattern: {file_pattern}")
-        # List files in the directory for debugging
-        if os.path.exists(project_dir):
-            logger.info("Files in directory:")
-            for file in os.listdir(project_dir):
-                logger.info(f"  {file}")
-        return
+    logger.info(f"Found {len(tasks)} files matching consumption type {consumption_type}")
     
-    logger.info(f"Found {len(files)} files matching consumption type {consumption_type}")
+    results = scan_assets(
+        tasks,
+        threshold_method="config" if use_config else "std_dev",
+        max_workers=max_workers,
+        chunk_size=chunk_size
+    )
+    save_scan_results(results, output_dir)
     
-    # Limit to 10 files for initial testing
-    if len(files) > 10:
-        logger.info(f"Limiting to 10 files for initial testing")
-        files = files[:10]
+    for row in results['report'][results['report']['error'].notna()].itertuples():
+        logger.error(f"Error processing file {row.source}: {row.error}")
     
-    # Process each file
-    for file_path in files:
-        try:
-            # Extract asset ID from filename
-            filename = os.path.basename(file_path)
-            asset_id = filename.split('_')[2].split('__')[0]
-            
-            logger.info(f"Processing asset {asset_id} from file {filename}")
-            
-            # Analyze the asset
-            analyze_asset(asset_id, consumption_type, use_config, output_dir)
-        except Exception as e:
-            logger.error(f"Error processing file {file_path}: {str(e)}")
-            traceback.print_exc()
+    if render_plots:
+        render_scan_plots(results, output_dir)
     
     logger.info(f"Project analysis complete. Results saved to {output_dir}")
+    return results
 
 def main():
     """
@@ -300,6 +301,9 @@ def main():
     parser.add_argument('--consumption-type', required=True, help='Consumption type to analyze')
     parser.add_argument('--output-dir', help='Output directory')
     parser.add_argument('--use-config', action='store_true', default=True, help='Use anomaly_config.json')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for project analysis')
+    parser.add_argument('--chunk-size', type=int, default=None, help='Assets per task submitted to the worker pool')
+    parser.add_argument('--no-plots', action='store_true', help='Do not render plots for project analysis')
     
     args = parser.parse_args()
     
@@ -324,7 +328,10 @@ def main():
             project_id=args.id,
             consumption_type=args.consumption_type,
             use_config=args.use_config,
-            output_dir=args.output_dir
+            output_dir=args.output_dir,
+            max_workers=args.workers,
+            chunk_size=args.chunk_size,
+            render_plots=not args.no_plots
         )
 
 if __name__ == "__main__":
@@ -19,16 +19,19 @@ class ThresholdCalculator:
     Calculate asset-specific thresholds for detecting abnormal consumption changes.
     """
     
-    def __init__(self, asset_id, consumption_type):
+    def __init__(self, asset_id, consumption_type, threshold_store=None):
         """
         Initialize the threshold calculator.
         
         Args:
             asset_id (str): The ID of the asset
             consumption_type (str): The type of consumption (e.g., ENERGY_ACTIVE)
+            threshold_store (ThresholdStore, optional): Precomputed thresholds used
+                when no DataFrame is provided
         """
         self.asset_id = asset_id
         self.consumption_type = consumption_type
+        self.threshold_store = threshold_store
         self.historical_data = None
         self.thresholds = None
         
@@ -201,6 +204,25 @@ class ThresholdCalculator:
             logger.error(traceback.format_exc())
             return None
     
+    def get_stored_thresholds(self, method="std_dev", percentile=95):
+        """
+        Get the thresholds of this asset from the threshold store.
+        
+        Args:
+            method (str): Method used to calculate the thresholds
+            percentile (float): Percentile used if method is "percentile"
+            
+        Returns:
+            dict: Stored thresholds, or None if there is no store or it has no data for this asset
+        """
+        if self.threshold_store is None:
+            return None
+        
+        thresholds = self.threshold_store.get(self.asset_id, self.consumption_type, method=method, percentile=percentile)
+        if thresholds is not None:
+            self.thresholds = thresholds
+        return thresholds
+    
     def get_thresholds(self, df=None, recalculate=False, method="std_dev", percentile=95):
         """
         Get thresholds for this asset, calculating them if necessary.
@@ -214,6 +236,12 @@ class ThresholdCalculator:
         Returns:
             dict: Dictionary with threshold values
         """
+        # Without data, use the precomputed thresholds if the store has them
+        if df is None and self.historical_data is None and not recalculate:
+            stored = self.get_stored_thresholds(method=method, percentile=percentile)
+            if stored is not None:
+                return stored
+        
         # Load data if provided or if we don't have historical data
         if df is not None or self.historical_data is None:
             self.load_historical_data(df)
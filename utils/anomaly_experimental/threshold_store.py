@@ -0,0 +1,558 @@
+"""
+Persisted threshold table for contextual anomaly detection.
+
+Thresholds are computed from the same window as ThresholdCalculator (the last
+90 days of readings of each asset and consumption type), but for all groups in
+one grouped aggregation instead of filtering the whole DataFrame once per
+asset. ThresholdStore keeps the window readings and the resulting thresholds
+in a SQLite database, one row per group and per group and method, so lookups
+are dictionary reads and new readings only recompute and rewrite the groups
+they belong to.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import logging
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.anomaly_experimental.config_loader import (
+    load_anomaly_config, get_config_for_consumption_type, convert_config_to_thresholds
+)
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = "data/analyzed_data/contextual_thresholds.db"
+DEFAULT_WINDOW_DAYS = 90
+MIN_DATA_POINTS = 10
+GROUP_KEYS = ['asset_id', 'consumption_type']
+CONFIG_METHODS = ("config", "config_only")
+
+GroupKey = Tuple[str, str]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS threshold_groups (
+    asset_id TEXT NOT NULL,
+    consumption_type TEXT NOT NULL,
+    window_start TEXT,
+    window_end TEXT,
+    dates TEXT NOT NULL,
+    window_values TEXT NOT NULL,
+    PRIMARY KEY (asset_id, consumption_type)
+);
+CREATE TABLE IF NOT EXISTS thresholds (
+    method TEXT NOT NULL,
+    percentile REAL NOT NULL,
+    asset_id TEXT NOT NULL,
+    consumption_type TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (method, percentile, asset_id, consumption_type)
+);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+# Stored percentile of the tables of methods that do not use one (NULL is not unique in a key)
+NO_PERCENTILE = -1.0
+
+
+def window_readings(df: pd.DataFrame, days: int = DEFAULT_WINDOW_DAYS, now: Optional[datetime] = None) -> pd.DataFrame:
+    """
+    Reduce consumption data to the readings used for thresholds.
+
+    Args:
+        df (pd.DataFrame): DataFrame with asset_id, consumption_type, date and consumption
+            (or corrected_value) columns
+        days (int): Size of the window in days (0 keeps every reading)
+        now (datetime, optional): End of the window, defaults to the current time
+
+    Returns:
+        pd.DataFrame: asset_id, consumption_type, date and value, sorted by group and date
+    """
+    value_col = 'corrected_value' if 'corrected_value' in df.columns else 'consumption'
+    window = pd.DataFrame({
+        'asset_id': df['asset_id'].to_numpy(),
+        'consumption_type': df['consumption_type'].to_numpy(),
+        'date': pd.to_datetime(df['date']).to_numpy(),
+        'value': pd.to_numeric(df[value_col], errors='coerce').to_numpy(dtype=float),
+    })
+    if days > 0:
+        cutoff = (now or datetime.now()) - timedelta(days=days)
+        window = window[window['date'] >= cutoff]
+    window = window.dropna(subset=GROUP_KEYS)
+    return window.sort_values(GROUP_KEYS + ['date'], kind='mergesort').reset_index(drop=True)
+
+
+def _group_quantiles(codes, values, n_groups, quantiles):
+    """
+    Linear quantiles of the non-NaN values of each group.
+
+    Uses the same arithmetic as numpy's percentile (and therefore
+    Series.quantile), including how infinite values are interpolated.
+    """
+    result = np.full((n_groups, len(quantiles)), np.nan)
+    valid = ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = counts > 0
+    counts, starts = counts[present], starts[present]
+
+    with np.errstate(invalid='ignore'):
+        for column, q in enumerate(quantiles):
+            # Series.quantile goes through np.percentile (q * 100, then / 100)
+            q = (q * 100.0) / 100
+            virtual = (counts - 1) * q
+            previous = np.floor(virtual)
+            gamma = virtual - previous
+            previous = previous.astype(int)
+            a = values[starts + previous]
+            b = values[starts + np.minimum(previous + 1, counts - 1)]
+            diff_b_a = b - a
+            lerp = a + diff_b_a * gamma
+            upper = gamma >= 0.5
+            lerp[upper] = (b - diff_b_a * (1 - gamma))[upper]
+            result[present, column] = lerp
+    return result
+
+
+def _group_statistics(window: pd.DataFrame, method: str, percentile: float) -> pd.DataFrame:
+    """
+    Day-to-day change statistics of every group of a window (see window_readings).
+
+    Changes are computed like ThresholdCalculator: diff() of the values and
+    pct_change() with missing values forward-filled, restarting at each group.
+    """
+    n_rows = len(window)
+    assets = window['asset_id'].to_numpy()
+    types = window['consumption_type'].to_numpy()
+    values = window['value'].to_numpy(dtype=float)
+
+    starts = np.ones(n_rows, dtype=bool)
+    starts[1:] = (assets[1:] != assets[:-1]) | (types[1:] != types[:-1])
+    codes = np.cumsum(starts) - 1
+    n_groups = int(starts.sum())
+
+    def previous(array):
+        shifted = np.empty_like(array)
+        if n_rows:
+            shifted[0] = np.nan
+            shifted[1:] = array[:-1]
+        shifted[starts] = np.nan
+        return shifted
+
+    filled = pd.Series(values).groupby(codes).ffill().to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = values - previous(values)
+        change_pct = (filled / previous(filled) - 1) * 100
+
+    changes = pd.DataFrame({'change': change, 'change_pct': change_pct}).groupby(codes)
+    stats = pd.DataFrame({
+        'asset_id': assets[starts],
+        'consumption_type': types[starts],
+        'rows': np.bincount(codes, minlength=n_groups),
+        'data_points': changes['change'].count().to_numpy(),
+        'mean_change': changes['change'].mean().to_numpy(),
+        'std_change': changes['change'].std().to_numpy(),
+        'mean_change_pct': changes['change_pct'].mean().to_numpy(),
+        'std_change_pct': changes['change_pct'].std().to_numpy(),
+    })
+
+    if method == "percentile":
+        quantiles = [max(50, percentile - 10) / 100, percentile / 100, min(99, percentile + 5) / 100]
+        for suffix, column_values in (('', change), ('_pct', change_pct)):
+            levels = _group_quantiles(codes, np.abs(column_values), n_groups, quantiles)
+            for column, level in enumerate(('low', 'medium', 'high')):
+                stats[f'{level}_quantile{suffix}'] = levels[:, column]
+    return stats
+
+
+def _thresholds_from_statistics(stats, config, method, percentile):
+    """Build the thresholds dict of one group, with the same rules and fallbacks as ThresholdCalculator."""
+    rows = stats['rows']
+    data_points = int(stats['data_points'])
+
+    if rows < MIN_DATA_POINTS and (method in CONFIG_METHODS or rows < 2):
+        return convert_config_to_thresholds(config)
+    if data_points < MIN_DATA_POINTS and method not in CONFIG_METHODS and data_points < 2:
+        return convert_config_to_thresholds(config)
+
+    mean_change = float(stats['mean_change'])
+    std_change = float(stats['std_change'])
+    mean_change_pct = float(stats['mean_change_pct'])
+    std_change_pct = float(stats['std_change_pct'])
+
+    if method in CONFIG_METHODS:
+        thresholds = convert_config_to_thresholds(config, {
+            'mean_change': mean_change,
+            'std_change': std_change,
+            'mean_change_pct': mean_change_pct,
+            'std_change_pct': std_change_pct,
+            'data_points': data_points
+        })
+    elif method == "std_dev":
+        thresholds = {
+            'low_threshold': abs(mean_change) + 2 * std_change,
+            'medium_threshold': abs(mean_change) + 3 * std_change,
+            'high_threshold': abs(mean_change) + 4 * std_change,
+            'low_threshold_pct': abs(mean_change_pct) + 2 * std_change_pct,
+            'medium_threshold_pct': abs(mean_change_pct) + 3 * std_change_pct,
+            'high_threshold_pct': abs(mean_change_pct) + 4 * std_change_pct,
+            'method': 'std_dev',
+            'data_points': data_points,
+            'mean_change': mean_change,
+            'std_change': std_change,
+            'std_multiplier': config.get('std_multiplier', 3.0)
+        }
+    elif method == "percentile":
+        thresholds = {
+            'low_threshold': float(stats['low_quantile']),
+            'medium_threshold': float(stats['medium_quantile']),
+            'high_threshold': float(stats['high_quantile']),
+            'low_threshold_pct': float(stats['low_quantile_pct']),
+            'medium_threshold_pct': float(stats['medium_quantile_pct']),
+            'high_threshold_pct': float(stats['high_quantile_pct']),
+            'method': 'percentile',
+            'data_points': data_points,
+            'percentile_used': percentile
+        }
+    else:
+        logger.error(f"Unknown threshold calculation method: {method}")
+        return convert_config_to_thresholds(config)
+
+    thresholds['daily_max'] = config.get('daily_max', 10.0)
+    thresholds['monthly_max'] = config.get('monthly_max', 200.0)
+    thresholds['sudden_increase'] = config.get('sudden_increase', 5.0)
+    return thresholds
+
+
+def thresholds_from_window(window: pd.DataFrame, method: str = "std_dev", percentile: float = 95,
+                           keys: Optional[Iterable[GroupKey]] = None) -> Dict[GroupKey, dict]:
+    """
+    Compute the thresholds of every group of a window in one aggregation.
+
+    Args:
+        window (pd.DataFrame): Readings as returned by window_readings
+        method (str): "std_dev", "percentile" or "config"
+        percentile (float): Percentile to use if method is "percentile"
+        keys (iterable, optional): Groups to return even if they have no readings
+            in the window (they get the configuration thresholds)
+
+    Returns:
+        dict: Thresholds by (asset_id, consumption_type)
+    """
+    anomaly_config = load_anomaly_config()
+    configs = {}
+
+    def config_for(consumption_type):
+        if consumption_type not in configs:
+            configs[consumption_type] = get_config_for_consumption_type(consumption_type, anomaly_config)
+        return configs[consumption_type]
+
+    table = {}
+    for stats in _group_statistics(window, method, percentile).to_dict('records'):
+        key = (stats['asset_id'], stats['consumption_type'])
+        table[key] = _thresholds_from_statistics(stats, config_for(key[1]), method, percentile)
+    for key in keys or ():
+        if key not in table:
+            table[key] = convert_config_to_thresholds(config_for(key[1]))
+    return table
+
+
+def compute_thresholds(df: pd.DataFrame, method: str = "std_dev", percentile: float = 95,
+                       days: int = DEFAULT_WINDOW_DAYS, now: Optional[datetime] = None) -> Dict[GroupKey, dict]:
+    """
+    Thresholds for every (asset_id, consumption_type) of a DataFrame.
+
+    Equivalent to one ThresholdCalculator(asset_id, consumption_type).get_thresholds(df=df)
+    per group, computed in a single pass over the DataFrame.
+
+    Returns:
+        dict: Thresholds by (asset_id, consumption_type)
+    """
+    keys = df[GROUP_KEYS].dropna().drop_duplicates().itertuples(index=False, name=None)
+    return thresholds_from_window(window_readings(df, days, now), method, percentile, keys=keys)
+
+
+def _table_key(method, percentile):
+    return (method, float(percentile) if method == "percentile" else None)
+
+
+def _date_string(value):
+    return None if pd.isna(value) else pd.Timestamp(value).isoformat()
+
+
+class ThresholdStore:
+    """
+    Per-asset thresholds persisted together with the readings window they were built from.
+
+    The store keeps, for each (asset_id, consumption_type), the readings of its
+    window and one thresholds table per method. ``update`` appends readings
+    newer than a group's window, trims the window and recomputes only the
+    groups that changed; ``get`` is a dictionary lookup.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, window_days: int = DEFAULT_WINDOW_DAYS):
+        """
+        Initialize the threshold store.
+
+        Args:
+            path (str): SQLite database where the store is persisted (None keeps it in memory)
+            window_days (int): Size of the readings window in days
+        """
+        self.path = path
+        self.window_days = window_days
+        self.updated_at = None
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._window = window_readings(pd.DataFrame(columns=GROUP_KEYS + ['date', 'consumption']), days=0)
+        self._groups = {}
+        self._tables = {}
+
+    def build(self, df: pd.DataFrame, now: Optional[datetime] = None) -> int:
+        """
+        Replace the store with the window of the given consumption data.
+
+        Returns:
+            int: Number of groups in the store
+        """
+        with self._lock:
+            self._loaded = True
+            self._window = window_readings(df, self.window_days, now)
+            keys = list(df[GROUP_KEYS].dropna().drop_duplicates().itertuples(index=False, name=None))
+            self._groups = {key: (None, None) for key in keys}
+            self._groups.update(self._window_bounds(self._window))
+            tables = list(self._tables) or [_table_key("std_dev", 95)]
+            self._tables = {
+                (method, percentile): thresholds_from_window(self._window, method, percentile or 95, keys=keys)
+                for method, percentile in tables
+            }
+            self._save_groups(rebuild=True)
+            logger.info(f"Built thresholds for {len(self._groups)} groups")
+            return len(self._groups)
+
+    def update(self, df: pd.DataFrame, now: Optional[datetime] = None) -> int:
+        """
+        Add new readings and recompute the thresholds of the groups they belong to.
+
+        Readings are new when they are later than the end of their group's
+        window (or belong to a group the store does not know yet). Older
+        readings are ignored; use build() to replace the store.
+
+        Returns:
+            int: Number of groups that were recomputed
+        """
+        with self._lock:
+            self._ensure_loaded()
+            readings = window_readings(df, self.window_days, now)
+            if self._groups:
+                ends = pd.Series([end for _, end in self._groups.values()], dtype='datetime64[ns]',
+                                 index=pd.MultiIndex.from_tuples(list(self._groups), names=GROUP_KEYS))
+                window_end = ends.reindex(pd.MultiIndex.from_frame(readings[GROUP_KEYS])).to_numpy()
+                readings = readings[pd.isna(window_end) | (readings['date'].to_numpy() > window_end)]
+
+            keys = set(df[GROUP_KEYS].dropna().drop_duplicates().itertuples(index=False, name=None))
+            touched = set(readings[GROUP_KEYS].drop_duplicates().itertuples(index=False, name=None))
+            touched |= keys - set(self._groups)
+            if not touched:
+                return 0
+
+            # Trim the windows of the touched groups and append the new readings
+            cutoff = (now or datetime.now()) - timedelta(days=self.window_days)
+            in_touched = pd.MultiIndex.from_frame(self._window[GROUP_KEYS]).isin(list(touched))
+            stale = in_touched & (self._window['date'] < cutoff).to_numpy()
+            self._window = pd.concat([self._window[~stale], readings], ignore_index=True)
+            self._window = self._window.sort_values(GROUP_KEYS + ['date'], kind='mergesort').reset_index(drop=True)
+
+            touched_window = self._window[pd.MultiIndex.from_frame(self._window[GROUP_KEYS]).isin(list(touched))]
+            for key in touched:
+                self._groups[key] = (None, None)
+            self._groups.update(self._window_bounds(touched_window))
+            for (method, percentile), table in self._tables.items():
+                table.update(thresholds_from_window(touched_window, method, percentile or 95, keys=touched))
+            self._save_groups(touched, touched_window)
+            logger.info(f"Updated thresholds for {len(touched)} groups")
+            return len(touched)
+
+    def get(self, asset_id, consumption_type, method: str = "std_dev", percentile: float = 95) -> Optional[dict]:
+        """
+        Get the stored thresholds of an asset and consumption type.
+
+        Returns:
+            dict: Thresholds, or None if the store has no data for the group
+        """
+        thresholds = self._table(method, percentile).get((asset_id, consumption_type))
+        return dict(thresholds) if thresholds is not None else None
+
+    def get_many(self, keys: Iterable[GroupKey], method: str = "std_dev", percentile: float = 95) -> Dict[GroupKey, dict]:
+        """Get the stored thresholds of several (asset_id, consumption_type) groups."""
+        table = self._table(method, percentile)
+        return {key: table[key] for key in keys if key in table}
+
+    def get_window(self, asset_id, consumption_type) -> Optional[Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]]:
+        """First and last reading date of the window a group's thresholds were built from."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._groups.get((asset_id, consumption_type))
+
+    def _table(self, method, percentile):
+        table_key = _table_key(method, percentile)
+        with self._lock:
+            self._ensure_loaded()
+            table = self._tables.get(table_key)
+            if table is None:
+                # First request for this method: one aggregation over the stored windows
+                table = thresholds_from_window(self._window, method, percentile, keys=self._groups)
+                self._tables[table_key] = table
+                self._save_table(table_key)
+            return table
+
+    @staticmethod
+    def _window_bounds(window):
+        bounds = window.groupby(GROUP_KEYS, sort=False)['date'].agg(['min', 'max'])
+        return {key: (row['min'], row['max']) for key, row in bounds.iterrows()}
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with closing(self._connect()) as conn:
+                meta = dict(conn.execute("SELECT key, value FROM store_meta").fetchall())
+                if meta.get('window_days') not in (None, str(self.window_days)):
+                    logger.warning(f"Discarding threshold store {self.path}: built with a different window")
+                    with conn:
+                        conn.execute("DELETE FROM threshold_groups")
+                        conn.execute("DELETE FROM thresholds")
+                    return
+                groups = conn.execute(
+                    "SELECT asset_id, consumption_type, window_start, window_end, dates, window_values "
+                    "FROM threshold_groups"
+                ).fetchall()
+                rows = conn.execute(
+                    "SELECT method, percentile, asset_id, consumption_type, payload FROM thresholds"
+                ).fetchall()
+            dates = [json.loads(group[4]) for group in groups]
+            values = [json.loads(group[5]) for group in groups]
+            sizes = [len(group_dates) for group_dates in dates]
+            self._window = pd.DataFrame({
+                'asset_id': np.repeat([group[0] for group in groups], sizes).astype(object),
+                'consumption_type': np.repeat([group[1] for group in groups], sizes).astype(object),
+                'date': pd.to_datetime([date for group_dates in dates for date in group_dates]),
+                'value': np.array([value for group_values in values for value in group_values], dtype=float),
+            })
+            self._groups = {
+                (asset_id, consumption_type): (
+                    pd.Timestamp(start) if start else None,
+                    pd.Timestamp(end) if end else None,
+                )
+                for asset_id, consumption_type, start, end, _, _ in groups
+            }
+            self._tables = {}
+            for method, percentile, asset_id, consumption_type, payload in rows:
+                table_key = _table_key(method, None if percentile == NO_PERCENTILE else percentile)
+                self._tables.setdefault(table_key, {})[(asset_id, consumption_type)] = json.loads(payload)
+            self.updated_at = meta.get('updated_at')
+            logger.info(f"Loaded thresholds for {len(self._groups)} groups from {self.path}")
+        except Exception as e:
+            logger.error(f"Error loading threshold store: {str(e)}")
+
+    def _save_groups(self, keys: Optional[Iterable[GroupKey]] = None, window: Optional[pd.DataFrame] = None,
+                     rebuild: bool = False):
+        """
+        Persist the window and thresholds (of every method) of some groups.
+
+        Args:
+            keys: Groups to write (None writes all of them)
+            window: Readings that contain at least those groups' windows (defaults to the whole store)
+            rebuild: Replace the persisted store instead of updating it
+        """
+        keys = list(self._groups if keys is None else keys)
+        window = self._window if window is None else window
+        positions = window.groupby(GROUP_KEYS, sort=False).indices
+        dates = window['date'].dt.strftime('%Y-%m-%dT%H:%M:%S').to_numpy()
+        values = window['value'].to_numpy()
+        group_rows = []
+        for key in keys:
+            start, end = self._groups[key]
+            rows = positions.get(key, np.array([], dtype=int))
+            group_rows.append((
+                key[0], key[1], _date_string(start), _date_string(end),
+                json.dumps(dates[rows].tolist()), json.dumps(values[rows].tolist()),
+            ))
+        threshold_rows = [
+            row for table_key in self._tables for row in self._threshold_rows(table_key, keys)
+        ]
+        self._write(group_rows, threshold_rows, rebuild)
+
+    def _save_table(self, table_key):
+        """Persist the thresholds of one method for every group."""
+        self._write([], self._threshold_rows(table_key, self._tables[table_key]), False)
+
+    def _threshold_rows(self, table_key, keys):
+        method, percentile = table_key
+        table = self._tables[table_key]
+        stored_percentile = NO_PERCENTILE if percentile is None else percentile
+        return [
+            (method, stored_percentile, key[0], key[1], json.dumps(table[key]))
+            for key in keys if key in table
+        ]
+
+    def _write(self, group_rows, threshold_rows, rebuild):
+        self.updated_at = datetime.now().isoformat()
+        if not self.path:
+            return
+        try:
+            with closing(self._connect()) as conn, conn:
+                if rebuild:
+                    conn.execute("DELETE FROM threshold_groups")
+                    conn.execute("DELETE FROM thresholds")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO threshold_groups "
+                    "(asset_id, consumption_type, window_start, window_end, dates, window_values) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", group_rows
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO thresholds (method, percentile, asset_id, consumption_type, payload) "
+                    "VALUES (?, ?, ?, ?, ?)", threshold_rows
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)",
+                    [('window_days', str(self.window_days)), ('updated_at', self.updated_at)]
+                )
+        except Exception as e:
+            logger.error(f"Error saving threshold store: {str(e)}")
+
+
+_threshold_store = None
+_threshold_store_lock = threading.Lock()
+
+
+def get_threshold_store() -> ThresholdStore:
+    """Shared threshold store of the application."""
+    global _threshold_store
+    with _threshold_store_lock:
+        if _threshold_store is None:
+            _threshold_store = ThresholdStore()
+        return _threshold_store
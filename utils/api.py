@@ -1,7 +1,10 @@
-import requests
 import json
 from utils.logging import get_logger
-from utils.auth import auth_service, AuthService
+from utils.auth import auth_service, AuthService, token_identity
+from utils.http_client import http_client
+from utils.repositories.readings_writer import get_readings_write_coordinator
+from utils.nfc_cache import get_nfc_password_cache
+from utils.sensor_metadata import get_sensor_metadata_cache
 import os
 import concurrent.futures
 from datetime import datetime, timedelta
@@ -24,6 +27,9 @@ PROJECTS_ENDPOINT = f"{BASE_URL}/projects"
 ASSETS_ENDPOINT = f"{BASE_URL}/assets"
 DEVICES_ENDPOINT = f"{BASE_URL}/devices"
 
+# Máximo de días que se piden a /data/assets/time-series en una sola petición
+READINGS_MAX_WINDOW_DAYS = int(os.environ.get("READINGS_MAX_WINDOW_DAYS", "366"))
+
 # Función para obtener los headers de autenticación
 def get_auth_headers(jwt_token=None):
     """
@@ -580,7 +586,7 @@ def get_project_assets(project_id, jwt_token=None):
         # Realizar la solicitud a la API
         headers = get_auth_headers(token)
         logger.info(f"Solicitando assets para el proyecto {project_id}")
-        response = requests.get(url, headers=headers, params=params)
+        response = http_client.get(url, headers=headers, params=params)
         
         # Verificar si la respuesta es exitosa
         if response.status_code == 200:
@@ -636,7 +642,7 @@ def get_sensors_with_tags(asset_id, token=None):
     
     try:
         logger.debug(f"[DEBUG] get_sensors_with_tags - URL: {url}, Params: {params}")
-        response = requests.get(url, headers=headers, params=params)
+        response = http_client.get(url, headers=headers, params=params)
         
         logger.debug(f"[DEBUG] get_sensors_with_tags - Status Code: {response.status_code}")
         
@@ -700,6 +706,27 @@ def get_sensors_with_tags(asset_id, token=None):
         logger.error(f"[ERROR] get_sensors_with_tags - Traceback: {traceback.format_exc()}")
         return []
 
+def get_sensors_with_tags_cached(asset_id, token=None, refresh=False):
+    """
+    Versión cacheada de get_sensors_with_tags.
+    
+    Reutiliza los metadatos del asset durante SENSOR_METADATA_TTL segundos y
+    agrupa las peticiones concurrentes del mismo asset en una sola llamada.
+    
+    Args:
+        asset_id (str): ID del asset
+        token (str, optional): Token JWT para autenticación
+        refresh (bool): Ignorar la caché y volver a consultar la API
+        
+    Returns:
+        list: Lista de sensores con sus tags
+    """
+    return get_sensor_metadata_cache().get(
+        asset_id,
+        lambda asset: get_sensors_with_tags(asset, token),
+        refresh=refresh
+    )
+
 def get_asset_water_sensors(asset_id, jwt_token=None):
     """
     Obtiene los sensores de agua disponibles para un activo específico.
@@ -798,7 +825,7 @@ def get_asset_all_sensors(asset_id, jwt_token=None):
         headers = get_auth_headers(token)
         logger.debug(f"Solicitando sensores para el activo {asset_id} - URL: {url}")
         
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         
         # Verificar si la respuesta es exitosa
         if response.status_code == 200:
@@ -973,7 +1000,7 @@ def get_daily_readings_for_tag(asset_id, tag_name, project_folder, token=None):
             # Llamar a la API para obtener los sensores disponibles
             url = f'{BASE_URL}/data/assets/{asset_id}/available-utilities-sensors'
             headers = get_auth_headers(token)
-            response = requests.get(url, headers=headers)
+            response = http_client.get(url, headers=headers)
             
             if response.status_code == 200:
                 api_sensors = response.json().get('data', [])
@@ -1066,13 +1093,11 @@ def get_daily_readings_with_sensor_params(asset_id, gateway_id, device_id, senso
                 # Guardar las fechas con errores para intentar actualizarlas
                 error_dates = error_rows['date'].tolist()
                 
-                # Eliminar los registros con errores
-                existing_data = existing_data[existing_data['value'] != 'Error']
-                logger.info(f"Se eliminaron los registros con errores. Quedan {len(existing_data)} registros válidos.")
-                
-                # Guardar el archivo limpio
-                existing_data.to_csv(file_path, index=False)
-                logger.info(f"Se guardó el archivo limpio: {file_path}")
+                # Eliminar los registros con errores y guardar el archivo limpio
+                existing_data = get_readings_write_coordinator().update(
+                    file_path, lambda data: data[data['value'] != 'Error'] if data is not None else None
+                )
+                logger.info(f"Se guardó el archivo limpio: {file_path}. Quedan {len(existing_data)} registros válidos.")
             
             # Convertir la columna de fecha a datetime
             existing_data["date"] = pd.to_datetime(existing_data["date"], errors='coerce')
@@ -1156,7 +1181,7 @@ def get_daily_readings_with_sensor_params(asset_id, gateway_id, device_id, senso
         logger.info(f"Solicitando datos a la API para el período {from_date} a {until_date}")
         logger.debug(f"URL: {url}")
         logger.debug(f"Parámetros completos: {params}")
-        response = requests.get(url, headers=headers, params=params)
+        response = http_client.get(url, headers=headers, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -1192,17 +1217,9 @@ def get_daily_readings_with_sensor_params(asset_id, gateway_id, device_id, senso
             # Agrupar por fecha y tomar el último valor de cada día
             new_data = new_data.sort_values("timestamp").groupby("date").last().reset_index()
             
-            # Combinar con datos existentes si los hay
-            if existing_data is not None and not existing_data.empty:
-                # Eliminar fechas duplicadas (preferir nuevas lecturas)
-                existing_data = existing_data[~existing_data["date"].isin(new_data["date"])]
-                combined_data = pd.concat([existing_data, new_data], ignore_index=True)
-                combined_data = combined_data.sort_values("date")
-            else:
-                combined_data = new_data
-            
-            # Guardar los datos combinados
-            combined_data.to_csv(file_path, index=False)
+            # Combinar con los datos del archivo (preferir nuevas lecturas) y guardarlos
+            combined_data = get_readings_write_coordinator().merge(file_path, new_data)
+            combined_data["date"] = pd.to_datetime(combined_data["date"])
             logger.info(f"Lecturas guardadas en {file_path}. Total de registros: {len(combined_data)}")
             
             # Verificar si se actualizaron las fechas con errores
@@ -1236,26 +1253,28 @@ def clean_readings_file_errors(file_path):
         return None, []
     
     try:
-        # Cargar el archivo
-        data = pd.read_csv(file_path)
+        error_dates = []
         
-        # Verificar si hay registros con errores
-        error_rows = data[data['value'] == 'Error']
-        if error_rows.empty:
+        def remove_errors(data):
+            # Verificar si hay registros con errores
+            if data is None:
+                return None
+            error_rows = data[data['value'] == 'Error']
+            if error_rows.empty:
+                return None
+            
+            # Guardar las fechas con errores y eliminar los registros
+            error_dates.extend(error_rows['date'].tolist())
+            return data[data['value'] != 'Error']
+        
+        # La lectura, limpieza y escritura se hacen bajo el coordinador del archivo
+        clean_data = get_readings_write_coordinator().update(file_path, remove_errors)
+        if not error_dates:
             logger.info(f"No se encontraron registros con errores en el archivo {file_path}.")
-            return data, []
+            return clean_data, []
         
-        # Guardar las fechas con errores
-        error_dates = error_rows['date'].tolist()
         logger.info(f"Se encontraron {len(error_dates)} registros con errores en el archivo {file_path}.")
-        
-        # Eliminar los registros con errores
-        clean_data = data[data['value'] != 'Error']
-        logger.info(f"Se eliminaron los registros con errores. Quedan {len(clean_data)} registros válidos.")
-        
-        # Guardar el archivo limpio
-        clean_data.to_csv(file_path, index=False)
-        logger.info(f"Se guardó el archivo limpio: {file_path}")
+        logger.info(f"Se guardó el archivo limpio: {file_path}. Quedan {len(clean_data)} registros válidos.")
         
         return clean_data, error_dates
     
@@ -1300,7 +1319,7 @@ def get_sensor_uuid(gateway_id, device_id, sensor_id, token=None):
     }
 
     logger.debug(f"Obteniendo UUID para sensor {sensor_id} en dispositivo {device_id} con token: {token[:10]}...")
-    response = requests.get(url, headers=headers, params=params)
+    response = http_client.get(url, headers=headers, params=params)
     if response.status_code == 200:
         devices = response.json().get('data', [])
         for device in devices:
@@ -1376,7 +1395,7 @@ def get_daily_readings_for_year_multiple_tags_project_parallel(project_id, tags,
         logger.error(message)
         return {"success": False, "message": message}
 
-def get_daily_readings_for_period_multiple_tags_project_parallel(project_id, tags, start_date, end_date, token=None):
+def get_daily_readings_for_period_multiple_tags_project_parallel(project_id, tags, start_date, end_date, token=None, range_fetch=True):
     """
     Obtiene lecturas diarias para múltiples tags durante un período específico para todos los assets de un proyecto.
     Procesa el rango por meses y actualiza solo los meses dentro del período seleccionado.
@@ -1387,6 +1406,9 @@ def get_daily_readings_for_period_multiple_tags_project_parallel(project_id, tag
         start_date (str o datetime): Fecha de inicio del período en formato YYYY-MM-DD
         end_date (str o datetime): Fecha de fin del período en formato YYYY-MM-DD
         token (str, optional): Token JWT para autenticación
+        range_fetch (bool): Si es True, cada sensor se actualiza con una petición por rango
+            de meses pendientes (ver get_daily_readings_for_tag_period). Si es False, se
+            hace una petición y una escritura del CSV por mes.
         
     Returns:
         dict: Resultado de la operación con mensaje de éxito o error
@@ -1399,15 +1421,7 @@ def get_daily_readings_for_period_multiple_tags_project_parallel(project_id, tag
             end_date = datetime.strptime(end_date, "%Y-%m-%d")
             
         # Generar lista de meses (YYYY-MM) entre start_date y end_date
-        months_to_process = []
-        current_month = datetime(start_date.year, start_date.month, 1)
-        while current_month <= end_date:
-            months_to_process.append(current_month.strftime("%Y-%m"))
-            # Avanzar al siguiente mes
-            if current_month.month == 12:
-                current_month = datetime(current_month.year + 1, 1, 1)
-            else:
-                current_month = datetime(current_month.year, current_month.month + 1, 1)
+        months_to_process = months_in_period(start_date, end_date)
         
         logger.info(f"Procesando lecturas para los meses: {months_to_process}")
         
@@ -1421,67 +1435,35 @@ def get_daily_readings_for_period_multiple_tags_project_parallel(project_id, tag
             logger.error(message)
             return {"success": False, "message": message}
         
+        # Resolver los metadatos de sensores una sola vez por asset
+        def resolve_asset_sensors(asset_id):
+            sensors = get_sensors_with_tags_cached(asset_id, token)
+            if not sensors:
+                logger.warning(f"[WARNING] resolve_asset_sensors - No se encontraron sensores para el asset {asset_id}")
+            
+            tag_data_by_name = {}
+            for sensor in sensors:
+                if isinstance(sensor, dict) and sensor.get('tag_name') in tags:
+                    tag_data_by_name.setdefault(sensor['tag_name'], sensor)
+            return tag_data_by_name
+        
+        sensors_by_asset = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
+            future_to_asset = {executor.submit(resolve_asset_sensors, asset_id): asset_id for asset_id in asset_ids}
+            for future in concurrent.futures.as_completed(future_to_asset):
+                asset_id = future_to_asset[future]
+                try:
+                    sensors_by_asset[asset_id] = future.result()
+                except Exception as e:
+                    logger.error(f"[ERROR] resolve_asset_sensors - Error obteniendo sensores del asset {asset_id}: {str(e)}")
+                    sensors_by_asset[asset_id] = {}
+        
+        logger.info(f"Metadatos de sensores resueltos para {len(sensors_by_asset)} assets. Caché: {get_sensor_metadata_cache().stats()}")
+        
         # Crear una función de procesamiento para cada combinación de asset, tag y mes
         def process_asset_tag_month(asset_id, tag_name, month):
             try:
-                # Obtener sensor con parámetros para el tag
-                sensors = get_sensors_with_tags(asset_id, token)
-                logger.debug(f"[DEBUG] process_asset_tag_month - Sensores obtenidos para {asset_id}: {sensors}")
-                
-                # Mejorar la verificación del tag en los sensores
-                if not sensors:
-                    logger.warning(f"[WARNING] process_asset_tag_month - No se encontraron sensores para el asset {asset_id}")
-                    return False
-                
-                # Verificar si el tag existe en los sensores
-                # La función get_sensors_with_tags devuelve una lista de diccionarios
-                tag_data = None
-                
-                # Buscar el tag_name en la lista de sensores
-                for sensor in sensors:
-                    if isinstance(sensor, dict) and sensor.get('tag_name') == tag_name:
-                        tag_data = sensor
-                        logger.debug(f"[DEBUG] process_asset_tag_month - Tag {tag_name} encontrado en sensor: {sensor}")
-                        break
-                
-                if not tag_data:
-                    # Registrar más información para depuración
-                    logger.warning(f"[WARNING] process_asset_tag_month - No se encontró el tag {tag_name} para el asset {asset_id}")
-                    logger.debug(f"[DEBUG] process_asset_tag_month - Tags disponibles: {[s.get('tag_name') for s in sensors if isinstance(s, dict)]}")
-                    
-                    # Verificar en la API directamente
-                    import requests
-                    url = f"{BASE_URL}/data/assets/{asset_id}/available-utilities-sensors"
-                    headers = get_auth_headers(token)
-                    params = {
-                        "include_details": True,
-                        "active_only": True
-                    }
-                    
-                    try:
-                        response = requests.get(url, headers=headers, params=params)
-                        logger.debug(f"[DEBUG] process_asset_tag_month - API response status: {response.status_code}")
-                        
-                        if response.status_code == 200:
-                            data = response.json().get('data', [])
-                            logger.debug(f"[DEBUG] process_asset_tag_month - Sensores desde API directa: {data}")
-                            
-                            # Buscar el tag en los datos de la API
-                            for sensor in data:
-                                if sensor.get('tag_name') == tag_name:
-                                    # Crear la estructura que espera get_daily_readings_for_tag_monthly
-                                    tag_data = {
-                                        "gateway_id": sensor.get('gateway_id'),
-                                        "device_id": sensor.get('device_id'),
-                                        "sensor_id": sensor.get('sensor_id'),
-                                        "tag_name": sensor.get('tag_name'),
-                                        "sensor_type": sensor.get('sensor_type')
-                                    }
-                                    logger.info(f"[INFO] process_asset_tag_month - Tag {tag_name} encontrado a través de consulta directa a la API")
-                                    break
-                    except Exception as e:
-                        logger.error(f"[ERROR] process_asset_tag_month - Error al consultar la API directamente: {str(e)}")
-                
+                tag_data = sensors_by_asset.get(asset_id, {}).get(tag_name)
                 if not tag_data:
                     logger.warning(f"[WARNING] process_asset_tag_month - No se pudo encontrar información para el tag {tag_name} en el asset {asset_id}")
                     return False
@@ -1507,6 +1489,14 @@ def get_daily_readings_for_period_multiple_tags_project_parallel(project_id, tag
                 logger.error(f"[ERROR] process_asset_tag_month - Traceback: {traceback.format_exc()}")
                 return False
         
+        # Actualizar todos los meses de un sensor de una vez
+        def process_asset_tag(asset_id, tag_name):
+            tag_data = sensors_by_asset.get(asset_id, {}).get(tag_name)
+            if not tag_data:
+                logger.warning(f"[WARNING] process_asset_tag - No se pudo encontrar información para el tag {tag_name} en el asset {asset_id}")
+                return {month: False for month in months_to_process}
+            return get_daily_readings_for_tag_period(asset_id, tag_data, months_to_process, project_folder, token)
+        
         # Crear todas las tareas para procesar
         tasks = []
         for asset_id in asset_ids:
@@ -1521,27 +1511,38 @@ def get_daily_readings_for_period_multiple_tags_project_parallel(project_id, tag
         error_count = 0
         
         with concurrent.futures.ThreadPoolExecutor(max_workers=50) as executor:
-            future_to_task = {
-                executor.submit(process_asset_tag_month, asset_id, tag_name, month): (asset_id, tag_name, month)
-                for asset_id, tag_name, month in tasks
-            }
+            if range_fetch:
+                future_to_task = {
+                    executor.submit(process_asset_tag, asset_id, tag_name): (asset_id, tag_name)
+                    for asset_id in asset_ids
+                    for tag_name in tags
+                }
+            else:
+                future_to_task = {
+                    executor.submit(process_asset_tag_month, asset_id, tag_name, month): (asset_id, tag_name, month)
+                    for asset_id, tag_name, month in tasks
+                }
             
             for future in concurrent.futures.as_completed(future_to_task):
-                asset_id, tag_name, month = future_to_task[future]
+                task = future_to_task[future]
                 try:
-                    success = future.result()
-                    if success:
-                        success_count += 1
-                        logger.debug(f"Procesado con éxito: asset {asset_id}, tag {tag_name}, mes {month}")
-                    else:
-                        error_count += 1
-                        logger.warning(f"Error en: asset {asset_id}, tag {tag_name}, mes {month}")
+                    result = future.result()
+                    # En modo rango cada tarea devuelve el resultado de todos sus meses
+                    month_results = result if range_fetch else {task[2]: result}
+                    for month, success in month_results.items():
+                        if success:
+                            success_count += 1
+                            logger.debug(f"Procesado con éxito: asset {task[0]}, tag {task[1]}, mes {month}")
+                        else:
+                            error_count += 1
+                            logger.warning(f"Error en: asset {task[0]}, tag {task[1]}, mes {month}")
                 except Exception as e:
-                    error_count += 1
-                    logger.error(f"Excepción en: asset {asset_id}, tag {tag_name}, mes {month}: {str(e)}")
+                    error_count += len(months_to_process) if range_fetch else 1
+                    logger.error(f"Excepción en: {task}: {str(e)}")
         
         message = f"Lecturas actualizadas para el período {start_date.strftime('%Y-%m-%d')} a {end_date.strftime('%Y-%m-%d')}. {success_count} procesos exitosos, {error_count} con errores."
         logger.info(message)
+        logger.info(f"Métricas HTTP por endpoint: {http_client.get_stats()}")
         
         return {
             "success": True,
@@ -1617,7 +1618,7 @@ def migrate_readings_file_if_needed(asset_id, tag_name, project_id="general"):
                     combined_data['date'] = combined_data['date'].dt.strftime('%Y-%m-%d')
                 
                 # Guardar en nueva ubicación
-                combined_data.to_csv(new_file_path, index=False)
+                get_readings_write_coordinator().update(new_file_path, lambda _: combined_data)
                 logger.info(f"Archivo combinado guardado en nueva estructura: {new_file_path}")
             else:
                 # Si solo hay un archivo, moverlo directamente
@@ -1629,6 +1630,41 @@ def migrate_readings_file_if_needed(asset_id, tag_name, project_id="general"):
     
     return False
 
+def _prepare_readings_file(asset_id, tag_name, project_folder):
+    """
+    Devuelve la ruta del CSV de lecturas de un sensor, migrándolo antes si
+    solo existe con el formato de nombre antiguo o en la estructura antigua.
+    """
+    project_id = os.path.basename(project_folder)
+    
+    # Nombre del archivo donde se guardan las lecturas (usando el formato según PROJECT_CONTEXT.md)
+    file_name = f"daily_readings_{asset_id}_{tag_name}.csv"
+    file_path = os.path.join(project_folder, file_name)
+    
+    logger.debug(f"[DEBUG] _prepare_readings_file - Archivo a procesar: {file_path}")
+    
+    # Verificar si existe archivo con formato antiguo (doble guion bajo)
+    old_format_file_name = f"daily_readings_{asset_id}__{tag_name}.csv"
+    old_format_file_path = os.path.join(project_folder, old_format_file_name)
+    
+    # Si existe el archivo con formato antiguo pero no el nuevo, migrar
+    if os.path.exists(old_format_file_path) and not os.path.exists(file_path):
+        try:
+            import shutil
+            shutil.copy2(old_format_file_path, file_path)
+            logger.info(f"[INFO] _prepare_readings_file - Archivo migrado de formato antiguo a nuevo: {old_format_file_path} -> {file_path}")
+        except Exception as e:
+            logger.error(f"[ERROR] _prepare_readings_file - Error al migrar archivo de formato antiguo a nuevo: {str(e)}")
+    
+    # Si el archivo no existe en ningún formato, intentar migrarlo desde la antigua estructura de carpetas
+    if not os.path.exists(file_path):
+        logger.debug(f"[DEBUG] _prepare_readings_file - Archivo {file_path} no encontrado. Verificando estructura antigua...")
+        was_migrated = migrate_readings_file_if_needed(asset_id, tag_name, project_id)
+        if was_migrated:
+            logger.info(f"[INFO] _prepare_readings_file - Archivo migrado desde estructura antigua para {asset_id}/{tag_name}")
+    
+    return file_path
+
 def get_daily_readings_for_tag_monthly(asset_id, tag, month, project_folder, token=None):
     """
     Obtiene lecturas diarias para un tag y mes específico utilizando los parámetros del sensor.
@@ -1688,30 +1724,8 @@ def get_daily_readings_for_tag_monthly(asset_id, tag, month, project_folder, tok
         logger.error(f"[ERROR] get_daily_readings_for_tag_monthly - Traceback: {traceback.format_exc()}")
     
     # Nombre del archivo donde se guardan las lecturas (usando el formato según PROJECT_CONTEXT.md)
-    file_name = f"daily_readings_{asset_id}_{tag_name}.csv"
-    file_path = os.path.join(project_folder, file_name)
-    
-    logger.debug(f"[DEBUG] get_daily_readings_for_tag_monthly - Archivo a procesar: {file_path}")
-    
-    # Verificar si existe archivo con formato antiguo (doble guion bajo)
-    old_format_file_name = f"daily_readings_{asset_id}__{tag_name}.csv"
-    old_format_file_path = os.path.join(project_folder, old_format_file_name)
-    
-    # Si existe el archivo con formato antiguo pero no el nuevo, migrar
-    if os.path.exists(old_format_file_path) and not os.path.exists(file_path):
-        try:
-            import shutil
-            shutil.copy2(old_format_file_path, file_path)
-            logger.info(f"[INFO] get_daily_readings_for_tag_monthly - Archivo migrado de formato antiguo a nuevo: {old_format_file_path} -> {file_path}")
-        except Exception as e:
-            logger.error(f"[ERROR] get_daily_readings_for_tag_monthly - Error al migrar archivo de formato antiguo a nuevo: {str(e)}")
-    
-    # Si el archivo no existe en ningún formato, intentar migrarlo desde la antigua estructura de carpetas
-    if not os.path.exists(file_path):
-        logger.debug(f"[DEBUG] get_daily_readings_for_tag_monthly - Archivo {file_path} no encontrado. Verificando estructura antigua...")
-        was_migrated = migrate_readings_file_if_needed(asset_id, tag_name, project_id)
-        if was_migrated:
-            logger.info(f"[INFO] get_daily_readings_for_tag_monthly - Archivo migrado desde estructura antigua para {asset_id}/{tag_name}")
+    file_path = _prepare_readings_file(asset_id, tag_name, project_folder)
+    file_name = os.path.basename(file_path)
     
     # Verificar si el archivo existe y limpiar errores si es necesario
     if os.path.exists(file_path):
@@ -1782,41 +1796,13 @@ def get_daily_readings_for_tag_monthly(asset_id, tag, month, project_folder, tok
                 if pd.api.types.is_datetime64_any_dtype(readings_df['date']):
                     readings_df['date'] = readings_df['date'].dt.strftime('%Y-%m-%d')
             
-            # Si hay datos existentes, combinarlos con los nuevos
-            if os.path.exists(file_path):
-                try:
-                    existing_data = pd.read_csv(file_path)
-                    logger.debug(f"[DEBUG] get_daily_readings_for_tag_monthly - Combinando datos existentes ({len(existing_data)} registros) con nuevos datos ({len(readings_df)} registros)")
-                    
-                    # Convertir las fechas a datetime para comparación
-                    if 'date' in existing_data.columns and 'date' in readings_df.columns:
-                        existing_data['date'] = pd.to_datetime(existing_data['date'])
-                        readings_df['date'] = pd.to_datetime(readings_df['date'])
-                        
-                        # Eliminar fechas duplicadas (preferir nuevas lecturas)
-                        existing_data = existing_data[~existing_data['date'].isin(readings_df['date'])]
-                        
-                        # Combinar y ordenar por fecha
-                        combined_data = pd.concat([existing_data, readings_df], ignore_index=True)
-                        combined_data = combined_data.sort_values('date')
-                        
-                        # Convertir las fechas de nuevo a string
-                        combined_data['date'] = combined_data['date'].dt.strftime('%Y-%m-%d')
-                        
-                        # Guardar los datos combinados
-                        combined_data.to_csv(file_path, index=False)
-                        logger.info(f"[INFO] get_daily_readings_for_tag_monthly - Datos actualizados guardados en {file_path}. Total: {len(combined_data)} registros.")
-                        
-                        # Devolver los datos combinados
-                        return combined_data
-                except Exception as e:
-                    logger.error(f"[ERROR] get_daily_readings_for_tag_monthly - Error al combinar datos existentes con nuevos datos: {str(e)}")
-                    import traceback
-                    logger.error(f"[ERROR] get_daily_readings_for_tag_monthly - Traceback: {traceback.format_exc()}")
+            # Combinar con los datos existentes (preferir nuevas lecturas). Las
+            # actualizaciones concurrentes del mismo archivo se agrupan en una escritura
+            combined_data = get_readings_write_coordinator().merge(file_path, readings_df)
+            logger.info(f"[INFO] get_daily_readings_for_tag_monthly - Datos actualizados guardados en {file_path}. Total: {len(combined_data)} registros.")
             
-            # Si no hay datos existentes o hubo error en la combinación, guardar solo los nuevos datos
-            readings_df.to_csv(file_path, index=False)
-            logger.info(f"[INFO] get_daily_readings_for_tag_monthly - Datos actualizados guardados en {file_path}. Total: {len(readings_df)} registros.")
+            # Devolver los datos combinados
+            return combined_data
         except Exception as e:
             logger.error(f"[ERROR] get_daily_readings_for_tag_monthly - Error al guardar datos en {file_path}: {str(e)}")
             import traceback
@@ -1844,6 +1830,161 @@ def get_daily_readings_for_tag_monthly(asset_id, tag, month, project_folder, tok
     logger.debug(f"[DEBUG] get_daily_readings_for_tag_monthly - Finalizando función, retornando dataframe con {len(readings_df) if readings_df is not None else 0} registros")
     return readings_df
 
+def months_in_period(start_date, end_date):
+    """
+    Devuelve los meses (YYYY-MM) comprendidos entre dos fechas, ambos incluidos.
+    """
+    months = []
+    current_month = datetime(start_date.year, start_date.month, 1)
+    while current_month <= end_date:
+        months.append(current_month.strftime("%Y-%m"))
+        # Avanzar al siguiente mes
+        if current_month.month == 12:
+            current_month = datetime(current_month.year + 1, 1, 1)
+        else:
+            current_month = datetime(current_month.year, current_month.month + 1, 1)
+    return months
+
+def plan_tag_period_update(asset_id, tag, months, project_folder):
+    """
+    Decide qué meses de un sensor hay que pedir a la API.
+    
+    Se piden los meses que faltan en el CSV, los que tienen lecturas con
+    error y el mes actual si no está al día, agrupados en rangos de meses
+    consecutivos.
+    
+    Args:
+        asset_id (str): ID del asset
+        tag (dict): Diccionario con las propiedades device_id, sensor_id y gateway_id del sensor
+        months (list): Meses a actualizar en formato YYYY-MM
+        project_folder (str): Carpeta del proyecto donde se guardan los datos
+        
+    Returns:
+        tuple: (file_path, results, spans). results contiene los meses que no hay
+            que pedir (True si están al día, False si el sensor no es válido) y
+            spans es una lista de rangos, cada uno una lista de pd.Period consecutivos.
+    """
+    device_id = tag.get('device_id')
+    sensor_id = tag.get('sensor_id')
+    gateway_id = tag.get('gateway_id')
+    tag_name = tag.get('tag_name', f"{device_id}_{sensor_id}_{gateway_id}")
+    
+    months = sorted({month for month in months if month and re.match(r'^\d{4}-\d{2}$', month)})
+    if not all([device_id, sensor_id, gateway_id]):
+        logger.error(f"[ERROR] plan_tag_period_update - Parámetros de sensor incompletos: device_id={device_id}, sensor_id={sensor_id}, gateway_id={gateway_id}")
+        return None, {month: False for month in months}, []
+    
+    file_path = _prepare_readings_file(asset_id, tag_name, project_folder)
+    
+    # Meses ya presentes en el CSV y meses con lecturas erróneas
+    existing_data = None
+    error_dates = []
+    if os.path.exists(file_path):
+        existing_data, error_dates = clean_readings_file_errors(file_path)
+    
+    existing_months = set()
+    latest_date = None
+    if existing_data is not None and not existing_data.empty and 'date' in existing_data.columns:
+        existing_dates = pd.to_datetime(existing_data['date'], errors='coerce').dropna()
+        existing_months = set(existing_dates.dt.strftime('%Y-%m'))
+        latest_date = existing_dates.max() if not existing_dates.empty else None
+    error_months = set(pd.to_datetime(pd.Series(error_dates), errors='coerce').dropna().dt.strftime('%Y-%m'))
+    
+    current_date = datetime.now()
+    current_month = current_date.strftime('%Y-%m')
+    today = pd.Timestamp(current_date.date())
+    
+    results = {}
+    months_to_fetch = []
+    for month in months:
+        if month > current_month:
+            # Mes futuro: no hay datos que obtener
+            results[month] = True
+        elif month in error_months or month not in existing_months:
+            months_to_fetch.append(month)
+        elif month == current_month and (latest_date is None or latest_date < today):
+            months_to_fetch.append(month)
+        else:
+            results[month] = True
+    
+    if not months_to_fetch:
+        logger.debug(f"[DEBUG] plan_tag_period_update - {file_path} ya está al día para {months}")
+        return file_path, results, []
+    
+    # Agrupar los meses a pedir en rangos de meses consecutivos
+    spans = []
+    for month in months_to_fetch:
+        period = pd.Period(month, freq='M')
+        if spans and spans[-1][-1] + 1 == period:
+            spans[-1].append(period)
+        else:
+            spans.append([period])
+    
+    return file_path, results, spans
+
+def get_daily_readings_for_tag_period(asset_id, tag, months, project_folder, token=None, max_window_days=None):
+    """
+    Actualiza las lecturas diarias de un sensor para varios meses de una vez.
+    
+    Solo se piden a la API los meses que faltan en el CSV, los que tienen
+    lecturas con error y el mes actual si no está al día. Los meses a pedir se
+    agrupan en rangos consecutivos y cada rango se obtiene con una única
+    petición (dividida solo si supera max_window_days). Las lecturas nuevas se
+    combinan con las existentes y el CSV se escribe una sola vez.
+    
+    Args:
+        asset_id (str): ID del asset
+        tag (dict): Diccionario con las propiedades device_id, sensor_id y gateway_id del sensor
+        months (list): Meses a actualizar en formato YYYY-MM
+        project_folder (str): Carpeta del proyecto donde se guardan los datos
+        token (str, opcional): Token JWT para autenticación
+        max_window_days (int, opcional): Días máximos por petición (por defecto READINGS_MAX_WINDOW_DAYS)
+        
+    Returns:
+        dict: Para cada mes, True si está actualizado o se obtuvo correctamente, False si falló
+    """
+    device_id = tag.get('device_id')
+    sensor_id = tag.get('sensor_id')
+    gateway_id = tag.get('gateway_id')
+    tag_name = tag.get('tag_name', f"{device_id}_{sensor_id}_{gateway_id}")
+    
+    file_path, results, spans = plan_tag_period_update(asset_id, tag, months, project_folder)
+    if not spans:
+        return results
+    months_to_fetch = [str(period) for span in spans for period in span]
+    
+    logger.info(f"[INFO] get_daily_readings_for_tag_period - {asset_id}/{tag_name}: {len(months_to_fetch)} meses a actualizar en {len(spans)} rangos")
+    
+    new_frames = []
+    for span in spans:
+        span_start = span[0].start_time.to_pydatetime()
+        span_end = span[-1].end_time.normalize().to_pydatetime()
+        readings_df = get_daily_readings_with_sensor_params_range(
+            asset_id, device_id, sensor_id, gateway_id, span_start, span_end, token, max_window_days
+        )
+        success = readings_df is not None
+        for period in span:
+            results[str(period)] = success
+        if success and not readings_df.empty:
+            new_frames.append(readings_df)
+    
+    if not new_frames:
+        return results
+    
+    # Combinar con los datos existentes y escribir el CSV una sola vez
+    try:
+        new_data = pd.concat(new_frames, ignore_index=True)
+        combined_data = get_readings_write_coordinator().merge(file_path, new_data)
+        logger.info(f"[INFO] get_daily_readings_for_tag_period - Datos actualizados guardados en {file_path}. Total: {len(combined_data)} registros.")
+    except Exception as e:
+        logger.error(f"[ERROR] get_daily_readings_for_tag_period - Error al guardar datos en {file_path}: {str(e)}")
+        import traceback
+        logger.error(f"[ERROR] get_daily_readings_for_tag_period - Traceback: {traceback.format_exc()}")
+        for month in months_to_fetch:
+            results[month] = False
+    
+    return results
+
 def get_daily_readings_with_sensor_params_monthly(asset_id, device_id, sensor_id, gateway_id, month, token=None):
     """
     Obtiene lecturas diarias para un sensor específico limitado a un mes concreto.
@@ -1861,14 +2002,6 @@ def get_daily_readings_with_sensor_params_monthly(asset_id, device_id, sensor_id
     Returns:
         pandas.DataFrame: DataFrame con los datos de lecturas diarias o None si hay un error
     """
-    # Obtener el token si no se proporciona
-    if not token:
-        token = auth_service.get_token()
-        
-    if not token:
-        logger.error("No se pudo obtener un token JWT válido para consultar datos")
-        return None
-    
     # Extraer el año y mes del parámetro month (formato YYYY-MM)
     try:
         year, month_num = month.split('-')
@@ -1904,6 +2037,72 @@ def get_daily_readings_with_sensor_params_monthly(asset_id, device_id, sensor_id
         logger.warning(f"Se solicitaron datos para un mes futuro: {month}. No hay datos disponibles.")
         return pd.DataFrame(columns=['date', 'value', 'timestamp'])
     
+    return get_daily_readings_with_sensor_params_range(
+        asset_id, device_id, sensor_id, gateway_id, start_date, end_date, token
+    )
+
+def get_daily_readings_with_sensor_params_range(asset_id, device_id, sensor_id, gateway_id, start_date, end_date, token=None, max_window_days=None):
+    """
+    Obtiene lecturas diarias de un sensor para un rango de fechas arbitrario.
+    
+    El rango se pide a la API en una sola petición, salvo que supere
+    max_window_days: en ese caso se divide en ventanas consecutivas. La fecha
+    final nunca supera el día actual.
+    
+    Args:
+        asset_id (str): ID del asset
+        device_id (str): ID del dispositivo
+        sensor_id (str): ID del sensor
+        gateway_id (str): ID del gateway
+        start_date (datetime): Primer día del rango
+        end_date (datetime): Último día del rango
+        token (str, opcional): Token JWT para autenticación
+        max_window_days (int, opcional): Días máximos por petición (por defecto READINGS_MAX_WINDOW_DAYS)
+        
+    Returns:
+        pandas.DataFrame: DataFrame con las lecturas diarias (date, value, timestamp) o None si hay un error
+    """
+    # Obtener el token si no se proporciona
+    if not token:
+        token = auth_service.get_token()
+        
+    if not token:
+        logger.error("No se pudo obtener un token JWT válido para consultar datos")
+        return None
+    
+    windows = split_date_range(start_date, end_date, max_window_days)
+    if not windows:
+        logger.warning(f"Se solicitaron datos para un período futuro ({start_date.strftime('%Y-%m-%d')}). No hay datos disponibles.")
+        return pd.DataFrame(columns=['date', 'value', 'timestamp'])
+    end_date = windows[-1][1]
+    
+    frames = []
+    for window_start, window_end in windows:
+        window_df = _fetch_sensor_time_series(
+            asset_id, device_id, sensor_id, gateway_id, window_start, window_end, token
+        )
+        if window_df is None:
+            return None
+        if not window_df.empty:
+            frames.append(window_df)
+    
+    if not frames:
+        return pd.DataFrame(columns=['date', 'value', 'timestamp'])
+    
+    readings_df = pd.concat(frames, ignore_index=True)
+    # Las ventanas no se solapan, pero por seguridad quedarse con la última lectura de cada día
+    readings_df = readings_df.sort_values("timestamp").groupby("date").last().reset_index()
+    
+    logger.info(f"Se obtuvieron {len(readings_df)} lecturas para el sensor (device_id: {device_id}, sensor_id: {sensor_id}) en el período {start_date.strftime('%Y-%m-%d')} a {end_date.strftime('%Y-%m-%d')} ({len(frames)} peticiones con datos)")
+    return readings_df
+
+def build_time_series_request(asset_id, device_id, sensor_id, gateway_id, start_date, end_date, token, base_url=BASE_URL):
+    """
+    Construye la URL, los parámetros y los headers de una petición a /data/assets/time-series.
+    
+    Returns:
+        tuple: (url, params, headers)
+    """
     # Formatear las fechas en el formato esperado por la API (MM-DD-YYYY)
     from_date = start_date.strftime("%m-%d-%Y")
     until_date = end_date.strftime("%m-%d-%Y")
@@ -1911,7 +2110,7 @@ def get_daily_readings_with_sensor_params_monthly(asset_id, device_id, sensor_id
     logger.debug(f"Obteniendo lecturas para el período: {from_date} hasta {until_date}")
     
     # URL para la API
-    url = f'{BASE_URL}/data/assets/time-series/{asset_id}'
+    url = f'{base_url}/data/assets/time-series/{asset_id}'
     
     # Parámetros para la solicitud
     params = {
@@ -1940,10 +2139,81 @@ def get_daily_readings_with_sensor_params_monthly(asset_id, device_id, sensor_id
     
     # Obtener los encabezados de autenticación
     headers = get_auth_headers(token)
+    return url, params, headers
+
+def parse_time_series_readings(data):
+    """
+    Convierte la lista de lecturas de /data/assets/time-series en lecturas diarias.
+    
+    Args:
+        data (list): Lecturas con las claves 'ts' (segundos) y 'v'
+        
+    Returns:
+        pandas.DataFrame: Última lectura de cada día (date, value, timestamp)
+    """
+    # Procesar las lecturas de manera similar a get_daily_readings_with_sensor_params
+    processed_readings = []
+    for reading in data or []:
+        timestamp = reading.get("ts")
+        value = reading.get("v")
+        
+        if timestamp and value is not None:
+            # Convertir el timestamp (segundos) a fecha, igual que en get_daily_readings_with_sensor_params
+            date = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+            processed_readings.append({
+                "date": date,
+                "value": value,
+                "timestamp": timestamp
+            })
+    
+    # Crear DataFrame con las lecturas procesadas
+    readings_df = pd.DataFrame(processed_readings)
+    if readings_df.empty:
+        return pd.DataFrame(columns=['date', 'value', 'timestamp'])
+    
+    # Convertir la columna de fecha a datetime
+    readings_df["date"] = pd.to_datetime(readings_df["date"])
+    
+    # Agrupar por fecha y tomar el último valor de cada día
+    return readings_df.sort_values("timestamp").groupby("date").last().reset_index()
+
+def split_date_range(start_date, end_date, max_window_days=None):
+    """
+    Divide un rango de fechas en ventanas consecutivas de como máximo max_window_days días.
+    La fecha final nunca supera el momento actual.
+    
+    Returns:
+        list: Lista de tuplas (inicio, fin); vacía si el rango empieza en el futuro
+    """
+    current_date = datetime.now()
+    if start_date > current_date:
+        return []
+    end_date = min(end_date, current_date)
+    max_window_days = max(1, max_window_days or READINGS_MAX_WINDOW_DAYS)
+    
+    windows = []
+    window_start = start_date
+    while window_start <= end_date:
+        window_end = min(window_start + timedelta(days=max_window_days - 1), end_date)
+        windows.append((window_start, window_end))
+        window_start = datetime(window_end.year, window_end.month, window_end.day) + timedelta(days=1)
+    return windows
+
+def _fetch_sensor_time_series(asset_id, device_id, sensor_id, gateway_id, start_date, end_date, token):
+    """
+    Realiza una petición a /data/assets/time-series para un sensor y rango de fechas.
+    
+    Returns:
+        pandas.DataFrame: Última lectura de cada día (date, value, timestamp) o None si hay un error
+    """
+    url, params, headers = build_time_series_request(
+        asset_id, device_id, sensor_id, gateway_id, start_date, end_date, token
+    )
+    from_date, until_date = params['from'], params['until']
     
     try:
         # Hacer la solicitud a la API
-        response = requests.get(url, params=params, headers=headers)
+        response = http_client.get(url, params=params, headers=headers)
         
         # Verificar si la solicitud fue exitosa
         if response.status_code == 200:
@@ -1953,34 +2223,12 @@ def get_daily_readings_with_sensor_params_monthly(asset_id, device_id, sensor_id
                 logger.warning(f"No se encontraron datos para el sensor (device_id: {device_id}, sensor_id: {sensor_id}) en el período {from_date} a {until_date}")
                 return pd.DataFrame(columns=['date', 'value', 'timestamp'])
             
-            # Procesar las lecturas de manera similar a get_daily_readings_with_sensor_params
-            processed_readings = []
-            for reading in data:
-                timestamp = reading.get("ts")
-                value = reading.get("v")
-                
-                if timestamp and value is not None:
-                    # Convertir el timestamp (segundos) a fecha, igual que en get_daily_readings_with_sensor_params
-                    date = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
-                    processed_readings.append({
-                        "date": date,
-                        "value": value,
-                        "timestamp": timestamp
-                    })
-            
-            # Crear DataFrame con las lecturas procesadas
-            readings_df = pd.DataFrame(processed_readings)
+            readings_df = parse_time_series_readings(data)
             if readings_df.empty:
                 logger.warning("No se pudieron procesar las lecturas obtenidas")
-                return pd.DataFrame(columns=['date', 'value', 'timestamp'])
-            
-            # Convertir la columna de fecha a datetime
-            readings_df["date"] = pd.to_datetime(readings_df["date"])
-            
-            # Agrupar por fecha y tomar el último valor de cada día
-            readings_df = readings_df.sort_values("timestamp").groupby("date").last().reset_index()
+                return readings_df
             
-            logger.info(f"Se obtuvieron {len(readings_df)} lecturas para el sensor (device_id: {device_id}, sensor_id: {sensor_id}) en el período {from_date} a {until_date}")
+            logger.debug(f"Se obtuvieron {len(readings_df)} lecturas para el sensor (device_id: {device_id}, sensor_id: {sensor_id}) en el período {from_date} a {until_date}")
             return readings_df
         else:
             # Manejar error
@@ -2644,7 +2892,7 @@ def get_nfc_code_value(device_id, sensor_id, jwt_token=None, gateway_id=None, as
         logger.debug(f"URL para obtener código NFC: {url} (original device_id: {original_device_id})")
         
         # Hacer solicitud a la API
-        response = requests.get(url, headers=headers, timeout=10)
+        response = http_client.get(url, headers=headers, timeout=10)
         
         # Verificar si la respuesta es exitosa
         if response.status_code != 200:
@@ -2678,7 +2926,7 @@ def update_nfc_code_value(asset_id, device_id, sensor_id, new_value, jwt_token=N
     Actualiza el valor de un código NFC
     
     Args:
-        asset_id: ID del asset (opcional, usado solo para logs)
+        asset_id: ID del asset (opcional, usado para logs y para actualizar la caché de códigos NFC)
         device_id: ID del dispositivo (debe ser el ID canónico)
         sensor_id: ID del sensor
         new_value: Nuevo valor del código NFC
@@ -2755,20 +3003,28 @@ def update_nfc_code_value(asset_id, device_id, sensor_id, new_value, jwt_token=N
         # Preparar headers adicionales
         additional_headers = {'Content-Type': 'application/json'}
         
-        # Usar el nuevo método con reintentos automáticos y manejo de token expirado
+        # Usar el método con renovación automática del token expirado
         logger.info(f"Iniciando actualización de código NFC con manejo automático de token")
         success, response = auth_service.make_authenticated_request_with_retry(
             token=jwt_token,
             method="POST",
             url=url,
             data=data,
-            headers=additional_headers,
-            max_retries=2
+            headers=additional_headers
         )
         
         if success:
                     logger.info(f"Actualización exitosa de código NFC para device_id={device_id}, sensor_id={sensor_id}, status={response.status_code}")
                     
+                    # Reflejar el nuevo código en la caché de códigos NFC y en el índice de tarjetas
+                    get_nfc_password_cache().apply_update(
+                        asset_id, [original_device_id, device_id_for_url], sensor_id, new_value, gateway_id
+                    )
+                    from utils.nfc_card_index import get_nfc_card_index
+                    get_nfc_card_index().apply_update(
+                        asset_id, [original_device_id, device_id_for_url], gateway_id, sensor_id, new_value
+                    )
+                    
             # Manejar diferentes códigos de respuesta exitosos
                     if response.status_code == 204:
                         return True, "OK (No Content)"
@@ -2800,7 +3056,37 @@ def update_nfc_code_value(asset_id, device_id, sensor_id, new_value, jwt_token=N
         logger.error(f"Error al actualizar código NFC: {str(e)}")
         return False, str(e)
 
-def get_nfc_passwords(asset_id, jwt_token):
+def get_nfc_passwords(asset_id, jwt_token, refresh=False):
+    """
+    Obtiene los códigos NFC de un asset a través de la caché compartida.
+    
+    Reutiliza los datos del asset durante NFC_PASSWORDS_TTL segundos, agrupa
+    las peticiones concurrentes del mismo asset y refleja los códigos escritos
+    con update_nfc_code_value sin volver a consultar la API. Solo se reutilizan
+    datos cargados con un token de la misma sesión.
+    
+    Args:
+        asset_id: ID del asset
+        jwt_token: Token JWT para autenticación
+        refresh (bool): Ignorar la caché y volver a consultar la API
+        
+    Returns:
+        dict: {'data': {'devices': [...]}} (ver get_nfc_passwords_uncached) o None si hay error.
+    """
+    if not jwt_token:
+        logger.error("Token JWT no disponible para get_nfc_passwords.")
+        return None
+    if not asset_id:
+        logger.error("Asset ID no proporcionado para get_nfc_passwords.")
+        return None
+    return get_nfc_password_cache().get(
+        asset_id,
+        lambda asset: get_nfc_passwords_uncached(asset, jwt_token),
+        refresh=refresh,
+        scope=token_identity(jwt_token)
+    )
+
+def get_nfc_passwords_uncached(asset_id, jwt_token):
     """
     Obtiene todos los códigos NFC de un asset específico usando el endpoint /sensor-passwords/deployment/{asset_id}.
     
@@ -3237,7 +3523,7 @@ def get_device_sensors(asset_id, device_id, jwt_token=None, gateway_id=None):
             headers = get_auth_headers(jwt_token)
             
             # Hacer la solicitud GET a la API
-            response = requests.get(url, headers=headers)
+            response = http_client.get(url, headers=headers)
             logger.debug(f"Respuesta de la API para obtener dispositivo: {response.status_code}")
             
             # Verificar la respuesta
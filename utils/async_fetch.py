@@ -0,0 +1,384 @@
+"""
+Motor asíncrono de descarga de lecturas diarias.
+
+Alternativa a ``get_daily_readings_for_period_multiple_tags_project_parallel``
+para proyectos grandes: en lugar de un hilo por combinación de asset y tag,
+todas las peticiones a ``/data/assets/time-series`` se lanzan desde un único
+event loop con ``aiohttp``, limitadas a ``ASYNC_FETCH_CONCURRENCY`` peticiones
+simultáneas.
+
+Las lecturas de cada sensor se envían a la etapa de escritura en cuanto
+llegan (``asyncio.Queue``), de modo que los CSV se van guardando mientras
+siguen en curso el resto de descargas. La escritura pasa por el coordinador
+de ``utils.repositories.readings_writer``.
+
+``aiohttp`` es una dependencia opcional: si no está instalada se usa la
+versión con hilos.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from utils import api
+from utils.auth import token_identity
+from utils.http_client import HTTP_DEFAULT_TIMEOUT, HTTP_MAX_RETRIES, RETRY_STATUS_CODES, backoff_delay
+from utils.jobs import get_job_manager, register_job_handler
+from utils.logging import get_logger
+from utils.repositories.readings_writer import get_readings_write_coordinator
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+logger = get_logger(__name__)
+
+# Peticiones simultáneas a la API desde el event loop
+ASYNC_FETCH_CONCURRENCY = int(os.environ.get("ASYNC_FETCH_CONCURRENCY", "100"))
+# Tareas que guardan CSV en paralelo (cada una en un hilo del executor)
+ASYNC_FETCH_WRITERS = int(os.environ.get("ASYNC_FETCH_WRITERS", "4"))
+
+_DONE = object()
+
+
+class _FetchStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.written_files = 0
+
+
+async def _fetch_window(session, semaphore, url, params, headers, stats, max_retries=HTTP_MAX_RETRIES,
+                        cancelled=None):
+    """
+    Pide una ventana de lecturas reintentando 429/5xx y errores de conexión.
+
+    Returns:
+        list: Lecturas ``[{ts, v}]`` de la respuesta, o None si la petición falló
+            o se canceló antes de enviarla
+    """
+    attempt = 0
+    while True:
+        retry_after = None
+        async with semaphore:
+            # Las tareas ya lanzadas esperan aquí: se comprueba justo antes de cada petición
+            if cancelled is not None and cancelled():
+                return None
+            stats.requests += 1
+            try:
+                async with session.get(url, params=params, headers=headers) as response:
+                    if response.status == 200:
+                        payload = await response.json(content_type=None)
+                        return (payload or {}).get('data', []) or []
+                    reason = response.status
+                    retryable = response.status in RETRY_STATUS_CODES
+                    if retryable and response.headers.get('Retry-After'):
+                        try:
+                            retry_after = max(0.0, float(response.headers['Retry-After']))
+                        except ValueError:
+                            retry_after = None
+                    if not retryable:
+                        body = await response.text()
+                        logger.error(f"Error al obtener lecturas: {response.status} - {body[:500]}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                reason = type(e).__name__
+                retryable = True
+
+        if not retryable or attempt >= max_retries:
+            stats.errors += 1
+            if retryable:
+                logger.error(f"Error al obtener lecturas de {url}: {reason} tras {attempt} reintentos")
+            return None
+
+        delay = backoff_delay(attempt, retry_after)
+        logger.warning(f"{url}: {reason}, reintento {attempt + 1}/{max_retries} en {delay:.2f}s")
+        await asyncio.sleep(delay)
+        attempt += 1
+        stats.retries += 1
+
+
+async def _fetch_tag(session, semaphore, queue, asset_id, tag_data, months, project_folder,
+                     token, base_url, stats, max_window_days=None, cancelled=None):
+    """
+    Descarga los meses pendientes de un sensor y los encola para escribirlos.
+
+    Si ``cancelled()`` devuelve True, no se lanzan más peticiones ni se encola
+    la escritura; los meses no guardados quedan como fallidos.
+    """
+    loop = asyncio.get_running_loop()
+    # La planificación lee el CSV existente: se hace fuera del event loop
+    file_path, results, spans = await loop.run_in_executor(
+        None, api.plan_tag_period_update, asset_id, tag_data, months, project_folder
+    )
+    if not spans:
+        return results
+
+    device_id = tag_data.get('device_id')
+    sensor_id = tag_data.get('sensor_id')
+    gateway_id = tag_data.get('gateway_id')
+
+    async def fetch_span(span):
+        span_start = span[0].start_time.to_pydatetime()
+        span_end = span[-1].end_time.normalize().to_pydatetime()
+        windows = api.split_date_range(span_start, span_end, max_window_days)
+        data = []
+        for window_start, window_end in windows:
+            url, params, headers = api.build_time_series_request(
+                asset_id, device_id, sensor_id, gateway_id, window_start, window_end, token, base_url=base_url
+            )
+            params = {key: str(value) for key, value in params.items()}
+            window_data = await _fetch_window(session, semaphore, url, params, headers, stats,
+                                              cancelled=cancelled)
+            if window_data is None:
+                return span, None
+            data.extend(window_data)
+        return span, data
+
+    frames = []
+    fetched_months = []
+    for span, data in await asyncio.gather(*(fetch_span(span) for span in spans)):
+        success = data is not None
+        for period in span:
+            results[str(period)] = success
+        if success:
+            fetched_months.extend(str(period) for period in span)
+            if data:
+                frames.append(api.parse_time_series_readings(data))
+
+    if cancelled is not None and cancelled():
+        for month in fetched_months:
+            results[month] = False
+        return results
+
+    frames = [frame for frame in frames if not frame.empty]
+    if frames:
+        await queue.put((file_path, pd.concat(frames, ignore_index=True), fetched_months, results))
+    return results
+
+
+async def _write_readings(queue, stats):
+    """Etapa de escritura: guarda cada resultado en cuanto llega a la cola."""
+    loop = asyncio.get_running_loop()
+    coordinator = get_readings_write_coordinator()
+    while True:
+        item = await queue.get()
+        try:
+            if item is _DONE:
+                return
+            file_path, new_data, fetched_months, results = item
+            try:
+                combined = await loop.run_in_executor(None, coordinator.merge, file_path, new_data)
+                stats.written_files += 1
+                logger.debug(f"{file_path} actualizado: {len(combined)} registros")
+            except Exception as e:
+                logger.error(f"Error al guardar datos en {file_path}: {str(e)}")
+                for month in fetched_months:
+                    results[month] = False
+        finally:
+            queue.task_done()
+
+
+async def _resolve_sensors(asset_ids, tags, token):
+    """Obtiene los sensores de cada asset (con la caché de metadatos) fuera del event loop."""
+    loop = asyncio.get_running_loop()
+
+    def resolve(asset_id):
+        tag_data_by_name = {}
+        try:
+            sensors = api.get_sensors_with_tags_cached(asset_id, token)
+        except Exception as e:
+            logger.error(f"Error obteniendo sensores del asset {asset_id}: {str(e)}")
+            return tag_data_by_name
+        if not sensors:
+            logger.warning(f"No se encontraron sensores para el asset {asset_id}")
+        for sensor in sensors or []:
+            if isinstance(sensor, dict) and sensor.get('tag_name') in tags:
+                tag_data_by_name.setdefault(sensor['tag_name'], sensor)
+        return tag_data_by_name
+
+    resolved = await asyncio.gather(*(loop.run_in_executor(None, resolve, asset_id) for asset_id in asset_ids))
+    return dict(zip(asset_ids, resolved))
+
+
+async def fetch_period_readings(asset_ids, tags, months, project_folder, token=None,
+                                concurrency=None, base_url=None, max_window_days=None, job=None):
+    """
+    Descarga y guarda las lecturas de todos los (asset, tag) para los meses indicados.
+
+    Si se indica ``job`` (un ``utils.jobs.JobContext``), se informa del progreso
+    por mes y, en cuanto se cancela el trabajo, no se envían más peticiones ni
+    se encolan más escrituras.
+
+    Returns:
+        tuple: (resultados, estadísticas). resultados es un dict
+            ``{(asset_id, tag_name): {mes: bool}}``.
+    """
+    concurrency = max(1, concurrency or ASYNC_FETCH_CONCURRENCY)
+    base_url = base_url or api.BASE_URL
+    stats = _FetchStats()
+    cancelled = job.is_cancelled if job is not None else None
+
+    sensors_by_asset = await _resolve_sensors(asset_ids, tags, token)
+    logger.info(f"Metadatos de sensores resueltos para {len(sensors_by_asset)} assets")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    writers = [asyncio.create_task(_write_readings(queue, stats)) for _ in range(max(1, ASYNC_FETCH_WRITERS))]
+
+    connect_timeout, read_timeout = HTTP_DEFAULT_TIMEOUT
+    timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async def fetch_task(asset_id, tag_name, session):
+        tag_data = sensors_by_asset.get(asset_id, {}).get(tag_name)
+        if not tag_data:
+            logger.warning(f"No se pudo encontrar información para el tag {tag_name} en el asset {asset_id}")
+            return {month: False for month in months}
+        try:
+            return await _fetch_tag(session, semaphore, queue, asset_id, tag_data, months, project_folder,
+                                    token, base_url, stats, max_window_days, cancelled)
+        except Exception as e:
+            logger.error(f"Error procesando asset {asset_id}, tag {tag_name}: {str(e)}")
+            return {month: False for month in months}
+
+    async def run_task(asset_id, tag_name, session):
+        if job is not None and job.is_cancelled():
+            return {}
+        month_results = await fetch_task(asset_id, tag_name, session)
+        if job is not None:
+            succeeded = sum(1 for success in month_results.values() if success)
+            job.advance(success=True, count=succeeded)
+            job.advance(success=False, count=len(month_results) - succeeded)
+        return month_results
+
+    keys = [(asset_id, tag_name) for asset_id in asset_ids for tag_name in tags]
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            task_results = await asyncio.gather(*(run_task(asset_id, tag_name, session)
+                                                  for asset_id, tag_name in keys))
+    finally:
+        for _ in writers:
+            await queue.put(_DONE)
+        await asyncio.gather(*writers)
+
+    # Los resultados se completan en la etapa de escritura si falla el guardado
+    return dict(zip(keys, task_results)), stats
+
+
+def get_daily_readings_for_period_multiple_tags_project_async(project_id, tags, start_date, end_date,
+                                                              token=None, concurrency=None, base_url=None, job=None):
+    """
+    Versión asíncrona de ``get_daily_readings_for_period_multiple_tags_project_parallel``.
+
+    Acepta los mismos parámetros y devuelve el mismo diccionario de resultado.
+
+    Args:
+        project_id (str): ID del proyecto
+        tags (list): Lista de tags de consumo
+        start_date (str o datetime): Fecha de inicio del período en formato YYYY-MM-DD
+        end_date (str o datetime): Fecha de fin del período en formato YYYY-MM-DD
+        token (str, optional): Token JWT para autenticación
+        concurrency (int, optional): Peticiones simultáneas (por defecto ASYNC_FETCH_CONCURRENCY)
+        base_url (str, optional): URL base de la API (para pruebas)
+        job (JobContext, optional): Trabajo en segundo plano al que informar del progreso
+
+    Returns:
+        dict: Resultado de la operación con mensaje de éxito o error
+    """
+    if not AIOHTTP_AVAILABLE:
+        logger.warning("aiohttp no está instalado: se usa la actualización con hilos")
+        return api.get_daily_readings_for_period_multiple_tags_project_parallel(
+            project_id, tags, start_date, end_date, token
+        )
+
+    try:
+        if isinstance(start_date, str):
+            start_date = datetime.strptime(start_date, "%Y-%m-%d")
+        if isinstance(end_date, str):
+            end_date = datetime.strptime(end_date, "%Y-%m-%d")
+
+        months_to_process = api.months_in_period(start_date, end_date)
+        logger.info(f"Procesando lecturas para los meses: {months_to_process}")
+
+        project_folder = api.ensure_project_folder_exists(project_id)
+        asset_ids = api.get_asset_ids_from_project(project_id, token)
+        if not asset_ids:
+            message = f"No se encontraron assets para el proyecto {project_id}."
+            logger.error(message)
+            return {"success": False, "message": message}
+
+        if job is not None:
+            job.set_total(len(asset_ids) * len(tags) * len(months_to_process))
+
+        started = time.monotonic()
+        results, stats = asyncio.run(fetch_period_readings(
+            asset_ids, tags, months_to_process, project_folder, token,
+            concurrency=concurrency, base_url=base_url, job=job
+        ))
+
+        success_count = 0
+        error_count = 0
+        for (asset_id, tag_name), month_results in results.items():
+            for month, success in month_results.items():
+                if success:
+                    success_count += 1
+                else:
+                    error_count += 1
+                    logger.warning(f"Error en: asset {asset_id}, tag {tag_name}, mes {month}")
+
+        message = f"Lecturas actualizadas para el período {start_date.strftime('%Y-%m-%d')} a {end_date.strftime('%Y-%m-%d')}. {success_count} procesos exitosos, {error_count} con errores."
+        logger.info(message)
+        logger.info(f"Descarga asíncrona: {stats.requests} peticiones, {stats.retries} reintentos, "
+                    f"{stats.errors} errores, {stats.written_files} archivos guardados en {time.monotonic() - started:.1f}s")
+
+        return {
+            "success": True,
+            "message": message,
+            "total_tasks": len(asset_ids) * len(tags) * len(months_to_process),
+            "success_count": success_count,
+            "error_count": error_count,
+            "months_processed": months_to_process
+        }
+
+    except Exception as e:
+        message = f"Error al procesar lecturas para el período: {str(e)}"
+        logger.error(message)
+        import traceback
+        logger.error(traceback.format_exc())
+        return {"success": False, "message": message}
+
+
+READINGS_UPDATE_JOB = "readings_update"
+
+
+def _run_readings_update_job(job, project_id, tags, start_date, end_date, token=None):
+    result = get_daily_readings_for_period_multiple_tags_project_async(
+        project_id, tags, start_date, end_date, token=token, job=job
+    )
+    job.set_message(result.get("message", ""))
+    if not result.get("success", False):
+        raise RuntimeError(result.get("message", "Error al actualizar lecturas"))
+    return result
+
+
+register_job_handler(READINGS_UPDATE_JOB, _run_readings_update_job)
+
+
+def submit_readings_update(project_id, tags, start_date, end_date, token=None):
+    """
+    Encola la actualización de lecturas de un proyecto como trabajo en segundo plano.
+
+    Returns:
+        str: ID del trabajo (ver ``utils.jobs.get_job_manager().get``)
+    """
+    return get_job_manager().submit(READINGS_UPDATE_JOB, {
+        'project_id': project_id,
+        'tags': list(tags),
+        'start_date': start_date,
+        'end_date': end_date,
+    }, secrets={'token': token}, owner=token_identity(token))
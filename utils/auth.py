@@ -1,4 +1,4 @@
-import requests
+import hashlib
 import json
 import os
 import time
@@ -18,11 +18,37 @@ AUTH_ENDPOINT = "/users/login"
 JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "alfred-dashboard-secret-key")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_DELTA = timedelta(hours=24)
+# Reintentos de make_authenticated_request_with_retry además de los del cliente HTTP
+AUTH_REQUEST_RETRIES = int(os.environ.get("AUTH_REQUEST_RETRIES", "1"))
 
 # Configuración de logging
 from utils.logging import get_logger
+from utils.http_client import IDEMPOTENT_METHODS, RETRY_STATUS_CODES, backoff_delay, http_client
 logger = get_logger(__name__)
 
+def token_identity(token):
+    """
+    Identidad de la sesión de un token JWT, para separar por usuario las cachés compartidas
+    
+    Es un hash del token de la API incluido en el JWT (o del propio token si no
+    se puede decodificar): dos tokens de la misma sesión comparten identidad y
+    el token nunca se guarda en claro.
+    
+    Args:
+        token: Token JWT
+        
+    Returns:
+        str: Identidad de la sesión, o None si no hay token
+    """
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, options={"verify_signature": False, "verify_exp": False})
+        source = payload.get('api_token') or token
+    except Exception:
+        source = token
+    return hashlib.sha256(str(source).encode('utf-8')).hexdigest()[:32]
+
 class AuthService:
     """Servicio para manejar la autenticación con la API de Alfred Smart usando JWT"""
     
@@ -106,7 +132,7 @@ class AuthService:
                 "User-Agent": "Alfred Dashboard/1.0"
             }
             
-            response = requests.post(url, json=payload, headers=headers)
+            response = http_client.post(url, json=payload, headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
@@ -278,9 +304,15 @@ class AuthService:
             logger.error(f"Error al verificar expiración del token: {str(e)}")
             return False, f"Error al verificar token: {str(e)}"
     
-    def make_authenticated_request_with_retry(self, token, method, url, data=None, headers=None, max_retries=2):
+    def make_authenticated_request_with_retry(self, token, method, url, data=None, headers=None):
         """
-        Realiza una solicitud HTTP con reintentos automáticos en caso de token expirado
+        Realiza una solicitud HTTP renovando antes el token si ha expirado
+
+        El cliente HTTP compartido ya repite con backoff los 429 y, en los
+        métodos idempotentes, los 5xx y los errores de red. Aquí se repite la
+        solicitud una sola vez más cuando el cliente no lo ha hecho:
+        - ante un 401, tras volver a comprobar (y renovar) el token;
+        - en un POST, ante un 5xx, un timeout o un error de conexión.
         
         Args:
             token: Token JWT para autenticación
@@ -288,7 +320,6 @@ class AuthService:
             url: URL completa para la solicitud
             data: Datos para enviar (para POST/PUT)
             headers: Headers adicionales
-            max_retries: Máximo número de reintentos
             
         Returns:
             tuple: (success, response_or_error)
@@ -297,12 +328,21 @@ class AuthService:
         """
         import requests
         
-        for attempt in range(max_retries + 1):
+        method = method.upper()
+        if method not in ("GET", "POST", "PUT", "DELETE"):
+            return False, f"Método HTTP no soportado: {method}"
+        # Fallos que el cliente HTTP no ha repetido por ser un método no idempotente
+        client_retried = method in IDEMPOTENT_METHODS
+        
+        for attempt in range(AUTH_REQUEST_RETRIES + 1):
+            can_retry = attempt < AUTH_REQUEST_RETRIES
+            if attempt:
+                time.sleep(backoff_delay(attempt - 1))
             try:
                 # Verificar y potencialmente renovar el token
                 is_valid, token_result = self.check_token_expiry_and_renew(token)
                 if not is_valid:
-                    logger.error(f"Token inválido en intento {attempt + 1}: {token_result}")
+                    logger.error(f"Token inválido: {token_result}")
                     return False, f"Token JWT expirado"
                 
                 # Usar el token (renovado o original)
@@ -321,50 +361,41 @@ class AuthService:
                 # Realizar la solicitud
                 logger.info(f"Realizando solicitud {method} a {url} (intento {attempt + 1})")
                 
-                if method.upper() == "GET":
-                    response = requests.get(url, headers=final_headers, timeout=10)
-                elif method.upper() == "POST":
-                    response = requests.post(url, headers=final_headers, json=data, timeout=10)
-                elif method.upper() == "PUT":
-                    response = requests.put(url, headers=final_headers, json=data, timeout=10)
-                elif method.upper() == "DELETE":
-                    response = requests.delete(url, headers=final_headers, timeout=10)
+                if method in ("POST", "PUT"):
+                    response = http_client.request(method, url, headers=final_headers, json=data, timeout=10)
                 else:
-                    return False, f"Método HTTP no soportado: {method}"
+                    response = http_client.request(method, url, headers=final_headers, timeout=10)
                 
                 # Verificar respuesta
                 if response.status_code == 401:
                     logger.warning(f"Error 401 en intento {attempt + 1}, token posiblemente expirado")
-                    if attempt < max_retries:
-                        logger.info(f"Reintentando... (intento {attempt + 2}/{max_retries + 1})")
+                    if can_retry:
                         continue
-                    else:
-                        return False, "Token JWT expirado"
+                    return False, "Token JWT expirado"
                 elif 200 <= response.status_code < 300:
                     logger.info(f"Solicitud exitosa: HTTP {response.status_code}")
                     return True, response
+                elif response.status_code in RETRY_STATUS_CODES and not client_retried and can_retry:
+                    logger.warning(f"Error HTTP {response.status_code} en intento {attempt + 1}, reintentando")
+                    continue
                 else:
                     # Otros errores HTTP no relacionados con autenticación
                     logger.error(f"Error HTTP {response.status_code}: {response.text}")
                     return False, f"Error HTTP {response.status_code}: {response.text}"
                     
             except requests.exceptions.Timeout:
-                logger.warning(f"Timeout en intento {attempt + 1}")
-                if attempt < max_retries:
+                logger.warning(f"Timeout en solicitud {method} a {url} (intento {attempt + 1})")
+                if not client_retried and can_retry:
                     continue
                 return False, "Timeout al realizar la solicitud"
             except requests.exceptions.ConnectionError:
-                logger.warning(f"Error de conexión en intento {attempt + 1}")
-                if attempt < max_retries:
+                logger.warning(f"Error de conexión en solicitud {method} a {url} (intento {attempt + 1})")
+                if not client_retried and can_retry:
                     continue
                 return False, "Error de conexión"
             except Exception as e:
-                logger.error(f"Error inesperado en intento {attempt + 1}: {str(e)}")
-                if attempt < max_retries:
-                    continue
+                logger.error(f"Error inesperado: {str(e)}")
                 return False, f"Error inesperado: {str(e)}"
-        
-        return False, "Se agotaron los reintentos"
     
     def has_permission(self, token, permission):
         """
@@ -475,13 +506,13 @@ class AuthService:
             
             # Realizar la solicitud HTTP real
             if method.upper() == "GET":
-                response = requests.get(url, headers=headers, params=params)
+                response = http_client.get(url, headers=headers, params=params)
             elif method.upper() == "POST":
-                response = requests.post(url, headers=headers, json=data, params=params)
+                response = http_client.post(url, headers=headers, json=data, params=params)
             elif method.upper() == "PUT":
-                response = requests.put(url, headers=headers, json=data, params=params)
+                response = http_client.put(url, headers=headers, json=data, params=params)
             elif method.upper() == "DELETE":
-                response = requests.delete(url, headers=headers, params=params)
+                response = http_client.delete(url, headers=headers, params=params)
             else:
                 if debug_mode:
                     print(f"[DEBUG AUTH] make_api_request - Método no soportado: {method}")
@@ -2,18 +2,33 @@ import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from utils.logging import get_logger
+from utils.carbon_footprint.emissions import (
+    EMISSION_FACTORS,
+    compare_emission_totals,
+    emission_anomaly_mask,
+    emission_factor
+)
+
+__all__ = [
+    # Reexportado para los módulos que importaban los factores desde aquí
+    'EMISSION_FACTORS',
+    'calculate_carbon_emissions',
+    'calculate_total_emissions',
+    'calculate_average_emissions',
+    'detect_emission_anomalies',
+    'compare_emission_periods',
+    'estimate_annual_emissions',
+    'calculate_emission_reduction_targets',
+]
 
 logger = get_logger(__name__)
 
-# Factores de emisión (kg CO2 por kWh) para diferentes fuentes de energía
-# Estos valores pueden variar según país y año, y deberían ser actualizados regularmente
-EMISSION_FACTORS = {
-    "electricity": 0.108,          # kg CO2 por kWh de electricidad (mix España 2024) - Actualizado en Mar 2024
-    "natural_gas": 0.20,           # kg CO2 por kWh de gas natural
-    "heating_oil": 0.27,           # kg CO2 por kWh de gasóleo de calefacción
-    "thermal_energy_heat": 0.18,   # kg CO2 por kWh de energía térmica de calor
-    "thermal_energy_cooling": 0.15 # kg CO2 por kWh de energía térmica de refrigeración
-}
+def _consumption_array(consumption_data):
+    """Convierte datos de consumo a un array de floats; los valores no numéricos quedan en 0"""
+    consumption_data = np.asarray(consumption_data)
+    if consumption_data.dtype.kind in 'biuf':
+        return consumption_data.astype(float)
+    return pd.to_numeric(pd.Series(consumption_data.ravel()), errors='coerce').fillna(0.0).to_numpy()
 
 def calculate_carbon_emissions(energy_consumption, energy_type="electricity"):
     """
@@ -26,33 +41,17 @@ def calculate_carbon_emissions(energy_consumption, energy_type="electricity"):
     Returns:
         float or array-like: Emisiones de CO2 en kg
     """
-    if energy_type not in EMISSION_FACTORS:
-        logger.warning(f"Tipo de energía '{energy_type}' no reconocido, utilizando factor de electricidad por defecto")
-        energy_type = "electricity"
+    factor = emission_factor(energy_type)
     
-    emission_factor = EMISSION_FACTORS[energy_type]
+    # Comprobar si es un valor escalar (int o float)
+    if isinstance(energy_consumption, (int, float)):
+        return float(energy_consumption) * factor
     
+    # Si es iterable (lista, array, etc.), convertir a numpy array
     try:
-        # Comprobar si es un valor escalar (int o float)
-        if isinstance(energy_consumption, (int, float)):
-            logger.debug(f"Calculando emisiones para valor escalar: {energy_consumption} kWh, factor: {emission_factor}")
-            result = float(energy_consumption) * emission_factor
-            logger.debug(f"Resultado emisiones: {result} kg CO2")
-            return result
-        
-        # Si es iterable (lista, array, etc.), convertir a numpy array
-        try:
-            logger.debug(f"Calculando emisiones para array de longitud {len(energy_consumption) if hasattr(energy_consumption, '__len__') else 'desconocida'}")
-            energy_consumption_array = np.array(energy_consumption, dtype=float)
-            result = energy_consumption_array * emission_factor
-            logger.debug(f"Resultado emisiones: primeros 3 valores: {result[:3] if len(result) > 3 else result}")
-            return result
-        except (ValueError, TypeError) as e:
-            logger.error(f"Error al convertir datos de consumo a valores numéricos: {str(e)}")
-            return 0
-    except Exception as e:
-        logger.error(f"Error al calcular emisiones: {str(e)}")
-        # Si hay error en la conversión o multiplicación, devolver 0
+        return np.asarray(energy_consumption, dtype=float) * factor
+    except (ValueError, TypeError) as e:
+        logger.error(f"Error al convertir datos de consumo a valores numéricos: {str(e)}")
         return 0
 
 def calculate_total_emissions(consumption_data, energy_type="electricity"):
@@ -66,46 +65,23 @@ def calculate_total_emissions(consumption_data, energy_type="electricity"):
     Returns:
         float: Total de emisiones de CO2 en kg
     """
-    try:
-        if consumption_data is None or (isinstance(consumption_data, (list, np.ndarray, pd.Series)) and len(consumption_data) == 0):
-            logger.warning("No hay datos de consumo para calcular emisiones totales")
-            return 0
-            
-        if not isinstance(consumption_data, (list, np.ndarray, pd.Series)):
-            logger.warning(f"Los datos de consumo deben ser un array, no {type(consumption_data)}")
-            # Intentar convertir a lista si es posible
-            try:
-                consumption_data = [float(consumption_data)]
-            except (ValueError, TypeError):
-                logger.error("No se pudo convertir el valor a un número")
-                return 0
-        
-        # Registrar información sobre los datos de entrada
-        logger.debug(f"Calculando emisiones totales para {len(consumption_data)} valores de consumo")
-        logger.debug(f"Tipo de datos de consumo: {type(consumption_data)}")
-        logger.debug(f"Primeros 5 valores de consumo: {consumption_data[:5] if len(consumption_data) >= 5 else consumption_data}")
-        
-        # Asegurarse de que los datos son numéricos
+    if consumption_data is None or (isinstance(consumption_data, (list, np.ndarray, pd.Series)) and len(consumption_data) == 0):
+        logger.warning("No hay datos de consumo para calcular emisiones totales")
+        return 0
+    
+    if not isinstance(consumption_data, (list, np.ndarray, pd.Series)):
+        logger.warning(f"Los datos de consumo deben ser un array, no {type(consumption_data)}")
+        # Intentar convertir a lista si es posible
         try:
-            consumption_data = np.array(consumption_data, dtype=float)
-        except (ValueError, TypeError) as e:
-            logger.error(f"Error al convertir datos de consumo a valores numéricos: {str(e)}")
+            consumption_data = [float(consumption_data)]
+        except (ValueError, TypeError):
+            logger.error("No se pudo convertir el valor a un número")
             return 0
-        
-        # Calcular emisiones y sumarlas
-        emissions = calculate_carbon_emissions(consumption_data, energy_type)
-        
-        # Si emissions es un escalar, devolverlo directamente
-        if isinstance(emissions, (int, float)):
-            logger.debug(f"Emisiones totales (escalar): {emissions}")
-            return emissions
-            
-        total = float(np.sum(emissions))
-        logger.debug(f"Emisiones totales (suma de array): {total}")
-        return total
-    except Exception as e:
-        logger.error(f"Error al calcular emisiones totales: {str(e)}")
-        return 0
+    
+    emissions = calculate_carbon_emissions(consumption_data, energy_type)
+    if isinstance(emissions, (int, float)):
+        return emissions
+    return float(np.sum(emissions))
 
 def calculate_average_emissions(consumption_data, energy_type="electricity"):
     """
@@ -128,6 +104,9 @@ def detect_emission_anomalies(consumption_data, energy_type="electricity", thres
     """
     Detecta anomalías en las emisiones de CO2 basadas en desviaciones estándar.
     
+    Para varios assets o tipos de energía a la vez, ver
+    utils.carbon_footprint.emissions.emission_anomaly_mask.
+    
     Args:
         consumption_data (list or numpy.ndarray): Datos de consumo de energía
         energy_type (str): Tipo de energía (electricity, natural_gas, etc.)
@@ -151,32 +130,10 @@ def detect_emission_anomalies(consumption_data, energy_type="electricity", thres
                 logger.error(f"Error al convertir datos de consumo a array NumPy: {str(e)}")
                 return np.array([]), 0
         
-        # Calcular emisiones para cada punto de consumo
-        emissions = []
-        for consumption_point in consumption_data:
-            # Asegurar que cada punto es un valor numérico antes de calcular emisiones
-            try:
-                value = float(consumption_point)
-                emission = calculate_carbon_emissions(value, energy_type)
-                emissions.append(emission)
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Punto de consumo inválido ignorado: {str(e)}")
-                emissions.append(0)  # Usar 0 para puntos inválidos
-        
-        # Convertir lista de emisiones a array de NumPy
-        emissions_array = np.array(emissions)
-        
-        # Calcular estadísticas
-        mean_emission = np.mean(emissions_array)
-        std_emission = np.std(emissions_array)
-        
-        # Establecer umbral
-        threshold = mean_emission + (threshold_multiplier * std_emission)
-        
-        # Identificar anomalías (como máscara booleana)
-        anomalies = emissions_array > threshold
-        
-        return anomalies, threshold
+        # Emisiones de todos los puntos a la vez (los puntos inválidos cuentan como 0)
+        emissions = pd.DataFrame({'emissions': _consumption_array(consumption_data) * emission_factor(energy_type)})
+        anomalies, thresholds = emission_anomaly_mask(emissions, threshold_multiplier, group_columns=[])
+        return anomalies, thresholds[0]
         
     except Exception as e:
         logger.error(f"Error durante la detección de anomalías: {str(e)}")
@@ -186,6 +143,9 @@ def compare_emission_periods(current_data, previous_data=None, energy_type="elec
     """
     Compara las emisiones entre dos períodos de tiempo y calcula la variación porcentual.
     
+    Para varios assets o tipos de energía a la vez, ver
+    utils.carbon_footprint.emissions.compare_periods.
+    
     Args:
         current_data (array-like): Datos de consumo actuales
         previous_data (array-like): Datos de consumo del período anterior
@@ -194,72 +154,44 @@ def compare_emission_periods(current_data, previous_data=None, energy_type="elec
     Returns:
         dict: Resultados de la comparación entre períodos
     """
+    empty_result = {
+        "current_total": 0,
+        "previous_total": 0,
+        "change_percentage": 0,
+        "is_improved": False,
+        "is_simulated": True
+    }
     try:
         # Asegurar que los datos son arrays NumPy
-        if not isinstance(current_data, np.ndarray):
-            current_data = np.array(current_data, dtype=float)
+        current_data = np.asarray(current_data, dtype=float)
             
-        # Si no hay datos previos, retornamos un diccionario con valores por defecto
+        # Si no hay datos previos, generar datos simulados para comparación
         if previous_data is None or len(previous_data) == 0:
-            # Generar datos simulados para comparación
-            previous_length = len(current_data)
             previous_data = np.random.uniform(
                 low=0.8 * np.mean(current_data),
                 high=1.2 * np.mean(current_data),
-                size=previous_length
+                size=len(current_data)
             )
             is_simulated = True
         else:
-            if not isinstance(previous_data, np.ndarray):
-                previous_data = np.array(previous_data, dtype=float)
+            previous_data = np.asarray(previous_data, dtype=float)
             is_simulated = False
         
-        # Calcular emisiones para ambos períodos
-        current_emissions = calculate_carbon_emissions(current_data, energy_type)
-        previous_emissions = calculate_carbon_emissions(previous_data, energy_type)
-        
-        # Si alguno de los valores es 0 debido a errores, devolver 0
-        if (isinstance(current_emissions, (int, float)) and current_emissions == 0) or \
-           (isinstance(previous_emissions, (int, float)) and previous_emissions == 0):
-            logger.warning("No se pudieron calcular emisiones para la comparación de períodos")
-            return {
-                "current_total": 0,
-                "previous_total": 0,
-                "change_percentage": 0,
-                "is_improved": False,
-                "is_simulated": is_simulated
-            }
-        
-        # Calcular total de emisiones para cada período
-        total_current = np.sum(current_emissions)
-        total_previous = np.sum(previous_emissions)
-        
-        # Evitar división por cero
-        if total_previous == 0:
-            change_percentage = 100.0 if total_current > 0 else 0.0
-        else:
-            # Calcular variación porcentual
-            change_percentage = ((total_current - total_previous) / total_previous) * 100
-        
-        # Determinar si hay mejora (reducción de emisiones)
-        is_improved = change_percentage < 0
+        factor = emission_factor(energy_type)
+        total_current = float(np.sum(current_data * factor))
+        total_previous = float(np.sum(previous_data * factor))
+        change_percentage, is_improved = compare_emission_totals([total_current], [total_previous])
         
         return {
-            "current_total": float(total_current),
-            "previous_total": float(total_previous),
-            "change_percentage": float(change_percentage),
-            "is_improved": is_improved,
+            "current_total": total_current,
+            "previous_total": total_previous,
+            "change_percentage": float(change_percentage[0]),
+            "is_improved": bool(is_improved[0]),
             "is_simulated": is_simulated
         }
     except Exception as e:
         logger.error(f"Error al comparar períodos de emisión: {str(e)}")
-        return {
-            "current_total": 0,
-            "previous_total": 0,
-            "change_percentage": 0,
-            "is_improved": False,
-            "is_simulated": True
-        }
+        return empty_result
 
 def estimate_annual_emissions(consumption_data, days_covered, energy_type="electricity"):
     """
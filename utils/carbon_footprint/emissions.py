@@ -0,0 +1,272 @@
+"""
+Motor vectorizado de emisiones de CO2.
+
+Trabaja sobre un DataFrame con lecturas de varios assets y tipos de energía:
+los factores de EMISSION_FACTORS (o factores mensuales, si se proporcionan) se
+asignan a todas las filas de una vez y los totales, promedios, comparaciones
+de períodos, proyecciones anuales y máscaras de anomalías se calculan con
+operaciones agrupadas sobre arrays.
+
+Las funciones de utils.carbon_footprint.analysis usan este módulo y mantienen
+su interfaz para una sola serie.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Factores de emisión (kg CO2 por kWh) para diferentes fuentes de energía
+# Estos valores pueden variar según país y año, y deberían ser actualizados regularmente
+EMISSION_FACTORS = {
+    "electricity": 0.108,          # kg CO2 por kWh de electricidad (mix España 2024) - Actualizado en Mar 2024
+    "natural_gas": 0.20,           # kg CO2 por kWh de gas natural
+    "heating_oil": 0.27,           # kg CO2 por kWh de gasóleo de calefacción
+    "thermal_energy_heat": 0.18,   # kg CO2 por kWh de energía térmica de calor
+    "thermal_energy_cooling": 0.15 # kg CO2 por kWh de energía térmica de refrigeración
+}
+DEFAULT_ENERGY_TYPE = "electricity"
+GROUP_COLUMNS = ['asset_id', 'energy_type']
+MONTHLY_FACTOR_COLUMNS = ['energy_type', 'month', 'factor']
+
+
+def emission_factor(energy_type=DEFAULT_ENERGY_TYPE, factors=None):
+    """Factor de emisión de un tipo de energía; los tipos no reconocidos usan el de electricidad"""
+    factors = factors or EMISSION_FACTORS
+    if energy_type not in factors:
+        logger.warning(f"Tipo de energía '{energy_type}' no reconocido, utilizando factor de electricidad por defecto")
+        energy_type = DEFAULT_ENERGY_TYPE
+    return factors[energy_type]
+
+
+def normalize_monthly_factors(monthly_factors):
+    """
+    Convierte factores de emisión mensuales a un DataFrame (energy_type, month, factor)
+
+    Args:
+        monthly_factors: DataFrame con esas columnas, o diccionario
+            {energy_type: {'YYYY-MM': factor}}
+
+    Returns:
+        pd.DataFrame con 'month' como texto 'YYYY-MM'
+    """
+    if isinstance(monthly_factors, pd.DataFrame):
+        table = monthly_factors[MONTHLY_FACTOR_COLUMNS].copy()
+    else:
+        table = pd.DataFrame(
+            [(energy_type, month, factor)
+             for energy_type, months in (monthly_factors or {}).items()
+             for month, factor in months.items()],
+            columns=MONTHLY_FACTOR_COLUMNS
+        )
+    table['month'] = pd.PeriodIndex(pd.to_datetime(table['month'].astype(str)), freq='M').astype(str)
+    table['factor'] = table['factor'].astype(float)
+    return table
+
+
+def _month_keys(type_codes, dates):
+    """Clave entera de (código de tipo de energía, mes) para cada lectura"""
+    months = dates.to_numpy().astype('datetime64[M]').astype(np.int64)
+    return np.asarray(type_codes, dtype=np.int64) * (1 << 32) + months
+
+
+def resolve_emission_factors(energy_types, dates=None, factors=None, monthly_factors=None):
+    """
+    Factor de emisión de cada lectura
+
+    Args:
+        energy_types (array-like): Tipo de energía de cada lectura
+        dates (array-like, optional): Fecha de cada lectura (necesaria con factores mensuales)
+        factors (dict, optional): Factores fijos por tipo de energía (por defecto EMISSION_FACTORS)
+        monthly_factors (optional): Factores mensuales (ver normalize_monthly_factors); los
+            meses o tipos sin factor mensual usan el factor fijo
+
+    Returns:
+        np.ndarray con un factor por lectura
+    """
+    factors = factors or EMISSION_FACTORS
+    energy_types = pd.Series(np.asarray(energy_types, dtype=object))
+    unknown = ~energy_types.isin(list(factors))
+    if unknown.any():
+        logger.warning(f"Tipos de energía no reconocidos {sorted(map(str, energy_types[unknown].unique()))}, "
+                       f"utilizando factor de electricidad por defecto")
+    result = energy_types.map(factors).fillna(factors[DEFAULT_ENERGY_TYPE]).to_numpy(dtype=float)
+
+    if monthly_factors is not None and dates is not None:
+        table = normalize_monthly_factors(monthly_factors)
+        type_codes, type_uniques = pd.factorize(energy_types)
+        table_types = pd.Index(type_uniques).get_indexer(table['energy_type'])
+        table = table[table_types >= 0]
+        if not table.empty:
+            # Clave entera (tipo de energía, mes) para buscar todas las lecturas de una vez
+            keys = pd.Index(_month_keys(table_types[table_types >= 0], pd.to_datetime(table['month'])))
+            table_factors = table['factor'].to_numpy()[~keys.duplicated(keep='last')]
+            keys = keys[~keys.duplicated(keep='last')]
+            positions = keys.get_indexer(_month_keys(type_codes, pd.to_datetime(pd.Series(dates))))
+            found = positions >= 0
+            result[found] = table_factors[positions[found]]
+    return result
+
+
+def compute_emissions(df, factors=None, monthly_factors=None, value_column='consumption',
+                      default_energy_type=DEFAULT_ENERGY_TYPE):
+    """
+    Añade a un DataFrame de consumos el factor de emisión y las emisiones de cada lectura
+
+    Args:
+        df: DataFrame con la columna de consumo (kWh) y, opcionalmente, 'energy_type',
+            'date' (necesaria para factores mensuales) y 'asset_id'
+        factors (dict, optional): Factores fijos por tipo de energía
+        monthly_factors (optional): Factores mensuales por tipo de energía
+        value_column (str): Columna con el consumo
+        default_energy_type (str): Tipo de energía de las filas sin 'energy_type'
+
+    Returns:
+        Copia de df con las columnas 'emission_factor' y 'emissions' (kg CO2); los
+        consumos no numéricos cuentan como 0
+    """
+    result = df.copy()
+    if 'energy_type' not in result.columns:
+        result['energy_type'] = default_energy_type
+    result[value_column] = pd.to_numeric(result[value_column], errors='coerce').fillna(0.0)
+    result['emission_factor'] = resolve_emission_factors(
+        result['energy_type'].to_numpy(),
+        result['date'].to_numpy() if 'date' in result.columns else None,
+        factors, monthly_factors
+    )
+    result['emissions'] = result[value_column].to_numpy(dtype=float) * result['emission_factor'].to_numpy()
+    return result
+
+
+def _group_keys(df, group_columns):
+    group_columns = [column for column in group_columns if column in df.columns]
+    if group_columns:
+        return group_columns, df.groupby(group_columns, sort=False, dropna=False).ngroup().to_numpy()
+    return group_columns, np.zeros(len(df), dtype=int)
+
+
+def emission_anomaly_mask(emissions_df, threshold_multiplier=2.0, group_columns=GROUP_COLUMNS):
+    """
+    Marca las lecturas cuyas emisiones superan la media de su grupo más threshold_multiplier desviaciones
+
+    Args:
+        emissions_df: DataFrame devuelto por compute_emissions
+        threshold_multiplier (float): Multiplicador de la desviación estándar (poblacional)
+        group_columns (list): Columnas que definen cada serie (las que no existan se ignoran)
+
+    Returns:
+        tuple: (máscara booleana, umbral de cada lectura) como arrays alineados con emissions_df
+    """
+    _, keys = _group_keys(emissions_df, group_columns)
+    emissions = emissions_df['emissions'].to_numpy(dtype=float)
+    counts = np.bincount(keys)
+    sums = np.bincount(keys, weights=emissions)
+    means = sums / counts
+    deviations = emissions - means[keys]
+    stds = np.sqrt(np.bincount(keys, weights=deviations ** 2) / counts)
+    thresholds = (means + threshold_multiplier * stds)[keys]
+    return emissions > thresholds, thresholds
+
+
+def summarize_emissions(emissions_df, group_columns=GROUP_COLUMNS, days_covered=None, value_column='consumption'):
+    """
+    Totales, promedios y proyección anual de emisiones por grupo
+
+    Args:
+        emissions_df: DataFrame devuelto por compute_emissions
+        group_columns (list): Columnas de agrupación (las que no existan se ignoran)
+        days_covered (int, optional): Días cubiertos por los datos; si no se indica, se
+            calcula por grupo a partir de las fechas (o del número de lecturas si no hay fechas)
+        value_column (str): Columna con el consumo
+
+    Returns:
+        pd.DataFrame con una fila por grupo: total_consumption, total_emissions,
+        readings, average_emissions (por lectura), days_covered y annual_emissions
+    """
+    group_columns = [column for column in group_columns if column in emissions_df.columns]
+    aggregations = {
+        'total_consumption': (value_column, 'sum'),
+        'total_emissions': ('emissions', 'sum'),
+        'readings': ('emissions', 'size'),
+    }
+    has_dates = days_covered is None and 'date' in emissions_df.columns
+    frame = emissions_df
+    if has_dates:
+        frame = emissions_df.assign(date=pd.to_datetime(emissions_df['date']))
+        aggregations.update(first_date=('date', 'min'), last_date=('date', 'max'))
+
+    if group_columns:
+        summary = frame.groupby(group_columns, sort=True, dropna=False).agg(**aggregations).reset_index()
+    else:
+        summary = pd.DataFrame({name: [frame[column].agg(func)] for name, (column, func) in aggregations.items()})
+
+    summary['average_emissions'] = summary['total_emissions'] / summary['readings']
+    if days_covered is not None:
+        summary['days_covered'] = float(days_covered)
+    elif has_dates:
+        summary['days_covered'] = ((summary['last_date'] - summary['first_date']).dt.days + 1).astype(float)
+        summary = summary.drop(columns=['first_date', 'last_date'])
+    else:
+        summary['days_covered'] = summary['readings'].astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        summary['annual_emissions'] = np.where(
+            summary['days_covered'] > 0, summary['total_emissions'] * 365.0 / summary['days_covered'], 0.0
+        )
+    return summary
+
+
+def compare_emission_totals(current_totals, previous_totals):
+    """
+    Variación porcentual entre los totales de dos períodos (arrays alineados)
+
+    Returns:
+        tuple: (change_percentage, is_improved) como arrays
+    """
+    current_totals = np.asarray(current_totals, dtype=float)
+    previous_totals = np.asarray(previous_totals, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.where(
+            previous_totals == 0,
+            np.where(current_totals > 0, 100.0, 0.0),
+            (current_totals - previous_totals) / previous_totals * 100
+        )
+    return change, change < 0
+
+
+def compare_periods(emissions_df, current_start, current_end, previous_start=None, previous_end=None,
+                    group_columns=GROUP_COLUMNS):
+    """
+    Compara las emisiones de dos períodos para cada grupo
+
+    Si no se indica el período anterior, se usa uno de la misma duración
+    inmediatamente anterior al actual.
+
+    Returns:
+        pd.DataFrame con una fila por grupo: current_total, previous_total,
+        change_percentage e is_improved
+    """
+    current_start, current_end = pd.to_datetime(current_start), pd.to_datetime(current_end)
+    if previous_start is None or previous_end is None:
+        duration = current_end - current_start
+        previous_end = current_start - pd.Timedelta(days=1)
+        previous_start = previous_end - duration
+    previous_start, previous_end = pd.to_datetime(previous_start), pd.to_datetime(previous_end)
+
+    dates = pd.to_datetime(emissions_df['date'])
+    emissions = emissions_df['emissions'].to_numpy(dtype=float)
+    periods = emissions_df.assign(
+        current_total=np.where((dates >= current_start) & (dates <= current_end), emissions, 0.0),
+        previous_total=np.where((dates >= previous_start) & (dates <= previous_end), emissions, 0.0),
+    )
+    group_columns = [column for column in group_columns if column in emissions_df.columns]
+    if group_columns:
+        comparison = periods.groupby(group_columns, sort=True, dropna=False)[['current_total', 'previous_total']].sum()
+        comparison = comparison.reset_index()
+    else:
+        comparison = periods[['current_total', 'previous_total']].sum().to_frame().T
+
+    comparison['change_percentage'], comparison['is_improved'] = compare_emission_totals(
+        comparison['current_total'], comparison['previous_total']
+    )
+    return comparison
@@ -6,9 +6,12 @@ from typing import Dict, List, Optional, Tuple, Union
 import logging
 import numpy as np
 from datetime import datetime, timedelta
-import time
+import threading
+from collections import OrderedDict
 from functools import lru_cache
 
+from utils.metrics.monthly_readings import compute_monthly_readings
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 
@@ -16,10 +19,8 @@ logger = logging.getLogger(__name__)
 _DEBUG_MODE = None
 _DEBUG_CHECKED = False
 
-# Global cache dictionary and timestamp for in-memory caching
-_CSV_DATA_CACHE = {}
-_CACHE_TIMESTAMP = {}
-_CACHE_EXPIRY = 60 * 5  # Cache expiry in seconds (5 minutes)
+# Memory ceiling for the per-file readings cache (see ReadingsFileCache)
+_CACHE_MAX_BYTES = int(os.environ.get("READINGS_CACHE_MAX_MB", "512")) * 1024 * 1024
 
 # Función para verificar si estamos en modo debug
 def is_debug_mode():
@@ -499,59 +500,235 @@ def load_csv_data(file_path: str) -> Optional[pd.DataFrame]:
         print(f"Error al cargar el archivo {file_path}: {str(e)}")
         return None
 
-# Create a helper function for caching with a custom key
-def get_cache_key(base_path, consumption_tags, project_id):
+class ReadingsFileCache:
+    """
+    In-memory LRU cache of parsed readings, one entry per daily_readings file.
+    
+    Entries are keyed by path and validated against the file's (mtime, size),
+    so a load only re-parses the files that changed on disk and any tag subset
+    can be assembled from frames that are already cached. Frames read from the
+    columnar store with a column/year projection are cached under
+    (path, projection) instead, so they never stand in for the full file.
+    The total memory
+    used by the cached frames is capped at max_bytes; the least recently used
+    entries are evicted first.
+    """
+    
+    def __init__(self, max_bytes: int = _CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, file_path, signature: Tuple[int, int], count_miss: bool = True) -> Optional[pd.DataFrame]:
+        """Return the cached frame for file_path if it still matches signature."""
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is None or entry[0] != signature:
+                if count_miss:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(file_path)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, file_path, signature: Tuple[int, int], df: pd.DataFrame) -> None:
+        """Store the parsed frame for file_path, evicting LRU entries if needed."""
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            previous = self._entries.pop(file_path, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            if size > self.max_bytes:
+                return
+            self._entries[file_path] = (signature, df, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self) -> Dict[str, Union[int, float]]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+_READINGS_CACHE = ReadingsFileCache()
+
+def _file_signature(file_path: str) -> Optional[Tuple[int, int]]:
+    """Return (mtime_ns, size) for file_path, or None if it cannot be read."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _store_projection(columns: Optional[List[str]], start_date, end_date) -> Optional[Tuple]:
+    """
+    Columns and year range to read from the columnar store for a load.
+    
+    Returns None when the whole file is needed. 'date' is always read: the
+    date filter and the derived 'month' column depend on it.
+    """
+    from utils.repositories.readings_store import STORE_COLUMNS
+    
+    store_columns = None
+    if columns:
+        store_columns = tuple(['date'] + [col for col in columns if col in STORE_COLUMNS and col != 'date'])
+    min_year = pd.to_datetime(start_date).year if start_date is not None else None
+    max_year = pd.to_datetime(end_date).year if end_date is not None else None
+    if store_columns is None and min_year is None and max_year is None:
+        return None
+    return store_columns, min_year, max_year
+
+def _parse_readings_file(file_path: str, project_id: str, signature: Tuple[int, int], store, manifest, projection=None) -> Tuple[Optional[pd.DataFrame], bool]:
+    """
+    Parse one readings file, preferring the columnar store over the CSV.
+    
+    From the store only the projection's columns and year partitions are
+    read. Files read from CSV are converted to the store on the way, so the
+    next parse of the same file no longer needs load_csv_data.
+    
+    Returns:
+        (DataFrame or None, True if the frame is limited to the projection)
     """
-    Generate a cache key based on function parameters.
+    from utils.repositories.readings_store import normalize_readings_frame
+    
+    if store.available and store.is_fresh(file_path, manifest):
+        try:
+            entry = manifest[os.path.basename(file_path)]
+            columns, years = None, None
+            if projection is not None:
+                columns, min_year, max_year = projection
+                years = [year for year in entry.get('years', [])
+                         if (min_year is None or year >= min_year) and (max_year is None or year <= max_year)]
+                if not years:
+                    # Ninguna partición del archivo cae en el rango de fechas
+                    return pd.DataFrame(columns=list(columns or [])), True
+            df = store.read_entries(project_id, [entry], columns=list(columns) if columns else None, years=years)
+            if not df.empty:
+                return df, projection is not None
+        except Exception as e:
+            # Si el almacén está dañado, volver a leer el archivo desde CSV
+            print(f"[WARN] load_all_csv_data - Error leyendo {file_path} del almacén columnar: {str(e)}")
+    
+    df = load_csv_data(file_path)
+    if df is None:
+        return None, False
+    # Ensure the DataFrame has project_id
+    if 'project_id' not in df.columns:
+        df['project_id'] = project_id
+    df = normalize_readings_frame(df)
+    
+    if store.available:
+        try:
+            store.write_frame(
+                file_path, df, project_id=project_id,
+                signature={'mtime_ns': signature[0], 'size': signature[1]}
+            )
+        except Exception as e:
+            print(f"[WARN] load_all_csv_data - No se pudo convertir {file_path} al almacén columnar: {str(e)}")
+    return df, False
+
+def _load_project_readings(project_id: str, csv_files: List[str], projection=None) -> List[pd.DataFrame]:
+    """
+    Carga las lecturas de los archivos indicados de un proyecto.
+    
+    Cada archivo se sirve desde la caché en memoria si no ha cambiado en disco;
+    si no, desde el almacén columnar (solo las columnas y años de la
+    proyección) y, para los archivos que aún no se han convertido (o han
+    cambiado), desde el CSV.
     
     Args:
-        base_path: Base path for CSV files
-        consumption_tags: List of consumption tags to filter by
-        project_id: Project ID to filter by
+        project_id: ID del proyecto (nombre de la carpeta)
+        csv_files: Archivos CSV seleccionados del proyecto
+        projection: Columnas y rango de años a leer (ver _store_projection)
         
     Returns:
-        String cache key
+        Lista de DataFrames con las lecturas
     """
-    # Sort consumption tags to ensure consistent keys
-    tag_str = ",".join(sorted(consumption_tags)) if consumption_tags else "None"
-    proj_str = project_id if project_id else "None"
-    return f"{base_path}|{tag_str}|{proj_str}"
-    
-def load_all_csv_data(base_path: str = "data/analyzed_data", minimal: bool = False, consumption_tags: Optional[List[str]] = None, project_id: Optional[str] = None, jwt_token: Optional[str] = None) -> pd.DataFrame:
+    from utils.repositories.readings_catalog import record_readings_file
+    from utils.repositories.readings_store import get_readings_store
+    
+    store = get_readings_store()
+    manifest = None
+    frames = []
+    cached_count = 0
+    parsed_count = 0
+    
+    for file_path in csv_files:
+        signature = _file_signature(file_path)
+        if signature is None:
+            continue
+        
+        # El archivo completo sirve para cualquier proyección
+        df = _READINGS_CACHE.get(file_path, signature, count_miss=projection is None)
+        if df is None and projection is not None:
+            df = _READINGS_CACHE.get((file_path, projection), signature)
+        if df is not None:
+            cached_count += 1
+        else:
+            if manifest is None:
+                manifest = store.load_manifest(project_id) if store.available else {}
+            df, projected = _parse_readings_file(file_path, project_id, signature, store, manifest, projection)
+            if df is None:
+                continue
+            if projected:
+                _READINGS_CACHE.put((file_path, projection), signature, df)
+            else:
+                _READINGS_CACHE.put(file_path, signature, df)
+                record_readings_file(file_path, df)
+            parsed_count += 1
+        if not df.empty:
+            frames.append(df)
+    
+    print(f"[INFO METRICS] load_all_csv_data - {project_id}: {cached_count} archivos desde caché, {parsed_count} leídos de disco")
+    return frames
+
+def load_all_csv_data(base_path: str = "data/analyzed_data", minimal: bool = False, consumption_tags: Optional[List[str]] = None, project_id: Optional[str] = None, jwt_token: Optional[str] = None, columns: Optional[List[str]] = None, start_date=None, end_date=None) -> pd.DataFrame:
     """
     Carga todos los archivos CSV de consumo en un único DataFrame.
     
+    Cada archivo se sirve desde la caché por archivo (ReadingsFileCache) si no
+    ha cambiado en disco; si no, desde el almacén columnar
+    (utils/repositories/readings_store.py) o, si aún no se ha convertido,
+    desde CSV.
+    
     Args:
         base_path: Ruta base donde buscar los archivos CSV
         minimal: Si es True, solo carga información mínima para obtener la estructura (proyectos/assets)
         consumption_tags: Lista de tags de consumo para filtrar los archivos a cargar (opcional)
         project_id: ID del proyecto para filtrar los archivos a cargar (opcional)
         jwt_token: Token JWT para autenticación con la API (opcional)
+        columns: Columnas a devolver (opcional, por defecto todas)
+        start_date: Fecha de inicio para filtrar las lecturas (opcional, inclusiva)
+        end_date: Fecha de fin para filtrar las lecturas (opcional, inclusiva)
         
     Returns:
         DataFrame combinado con todos los datos
     """
-    # Skip caching for minimal=True since it's used for structure only
-    if not minimal:
-        # Generate a cache key based on the function parameters
-        cache_key = get_cache_key(base_path, consumption_tags, project_id)
-        
-        # Check if we have a valid cache entry
-        current_time = time.time()
-        if cache_key in _CSV_DATA_CACHE and cache_key in _CACHE_TIMESTAMP:
-            # Check if the cache is still valid (not expired)
-            if current_time - _CACHE_TIMESTAMP[cache_key] < _CACHE_EXPIRY:
-                debug_log(f"[INFO] load_all_csv_data - Using cached data for key: {cache_key}")
-                print(f"[INFO METRICS] load_all_csv_data - Using cached data (saved {_CACHE_EXPIRY} seconds ago)")
-                return _CSV_DATA_CACHE[cache_key].copy()
-            else:
-                debug_log(f"[INFO] load_all_csv_data - Cache expired for key: {cache_key}")
-                print(f"[INFO METRICS] load_all_csv_data - Cache expired, reloading data")
-    
     # Log detallado para verificar el valor exacto de project_id
     debug_log(f"[DEBUG CRÍTICO] load_all_csv_data - Valor exacto de project_id recibido: '{project_id}', tipo: {type(project_id)}")
     
     all_data = []
+    # Columnas y años que hay que leer del almacén columnar
+    projection = _store_projection(columns, start_date, end_date)
     
     # Si hay tags de consumo, registrarlos para depuración
     if consumption_tags:
@@ -585,6 +762,7 @@ def load_all_csv_data(base_path: str = "data/analyzed_data", minimal: bool = Fal
         print(f"[INFO METRICS] load_all_csv_data - Encontrados {len(csv_files)} archivos CSV en {base_path}")
         
         # Process each CSV file found in the base path
+        selected_files = []
         for file_path in csv_files:
             # Extraer asset_id y tag para filtrar
             asset_id, tag = extract_asset_and_tag(file_path)
@@ -608,9 +786,10 @@ def load_all_csv_data(base_path: str = "data/analyzed_data", minimal: bool = Fal
                 except Exception as e:
                     debug_log(f"Error al cargar datos mínimos de {file_path}: {str(e)}")
             else:
-                df = load_csv_data(file_path)
-                if df is not None:
-                    all_data.append(df)
+                selected_files.append(file_path)
+        
+        if selected_files:
+            all_data.extend(_load_project_readings('default', selected_files, projection))
     else:
         # Buscar archivos CSV en cada directorio de proyecto
         for project_dir in project_dirs:
@@ -637,6 +816,7 @@ def load_all_csv_data(base_path: str = "data/analyzed_data", minimal: bool = Fal
                 except Exception as e:
                     debug_log(f"Error al cargar datos mínimos de {csv_files[0]}: {str(e)}")
             else:
+                selected_files = []
                 for file_path in csv_files:
                     # Extraer asset_id y tag para filtrar
                     asset_id, tag = extract_asset_and_tag(file_path)
@@ -651,26 +831,36 @@ def load_all_csv_data(base_path: str = "data/analyzed_data", minimal: bool = Fal
                         else:
                             debug_log(f"[DEBUG DETALLADO] load_all_csv_data - Procesando archivo {file_path} que coincide con los tags seleccionados")
                     
-                    df = load_csv_data(file_path)
-                    if df is not None:
-                        # Ensure the DataFrame has project_id
-                        if 'project_id' not in df.columns:
-                            df['project_id'] = current_project_id
-                        all_data.append(df)
+                    selected_files.append(file_path)
+                
+                all_data.extend(_load_project_readings(current_project_id, selected_files, projection))
     
     # Combinar todos los DataFrames
     if all_data:
         print(f"[INFO METRICS] load_all_csv_data - Combinando {len(all_data)} DataFrames")
         combined_df = pd.concat(all_data, ignore_index=True)
+        
+        if not minimal:
+            # 'month' no se guarda en caché ni en el almacén: derivarlo una sola vez
+            if 'date' in combined_df.columns and (not columns or 'month' in columns):
+                combined_df['month'] = combined_df['date'].dt.to_period('M')
+            
+            if start_date is not None and 'date' in combined_df.columns:
+                combined_df = combined_df[combined_df['date'] >= pd.to_datetime(start_date)]
+            if end_date is not None and 'date' in combined_df.columns:
+                combined_df = combined_df[combined_df['date'] <= pd.to_datetime(end_date)]
+            
+            if columns:
+                combined_df = combined_df[[col for col in columns if col in combined_df.columns]]
+            
+            combined_df = combined_df.reset_index(drop=True)
+        
         print(f"[INFO METRICS] load_all_csv_data - DataFrame combinado tiene {len(combined_df)} filas")
         
-        # Store the result in cache if not in minimal mode
         if not minimal:
-            cache_key = get_cache_key(base_path, consumption_tags, project_id)
-            _CSV_DATA_CACHE[cache_key] = combined_df.copy()
-            _CACHE_TIMESTAMP[cache_key] = time.time()
-            debug_log(f"[INFO] load_all_csv_data - Data cached with key: {cache_key}")
-            print(f"[INFO METRICS] load_all_csv_data - Data cached successfully ({len(combined_df)} rows)")
+            stats = _READINGS_CACHE.stats()
+            print(f"[INFO METRICS] load_all_csv_data - Caché: {stats['entries']} archivos, {stats['bytes'] / (1024 * 1024):.1f} MB, "
+                  f"{stats['hits']} aciertos / {stats['misses']} fallos")
             
         return combined_df
     else:
@@ -682,33 +872,25 @@ def get_projects_with_data(df: Optional[pd.DataFrame]) -> List[Dict]:
     Obtiene la lista de proyectos que tienen datos.
     
     Args:
-        df: DataFrame con los datos combinados o None para escanear directorios
+        df: DataFrame con los datos combinados o None para consultar el catálogo de archivos
         
     Returns:
         Lista de diccionarios con información de los proyectos
     """
     if df is None:
-        # Si no se proporciona DataFrame, escanear directorios directamente
-        base_path = "data/analyzed_data"
-        project_dirs = [d for d in glob.glob(os.path.join(base_path, "*")) if os.path.isdir(d)]
-        
-        if not project_dirs:
-            # Si no hay directorios de proyecto, verificar si hay archivos CSV en la raíz
-            csv_files = glob.glob(os.path.join(base_path, "daily_readings_*.csv"))
-            if csv_files:
+        # Sin DataFrame, consultar el catálogo de archivos de lecturas (sin cargar lecturas)
+        from utils.repositories.readings_catalog import ROOT_PROJECT, get_readings_catalog
+        
+        project_ids = get_readings_catalog().get_projects()
+        named_projects = [project_id for project_id in project_ids if project_id != ROOT_PROJECT]
+        
+        if not named_projects:
+            # Si no hay proyectos con archivos, verificar si hay archivos CSV en la raíz
+            if ROOT_PROJECT in project_ids:
                 return [{'id': 'default', 'nombre': "Proyecto default"}]
             return []
         
-        # Extraer los IDs de proyecto de los nombres de directorio
-        projects = []
-        for project_dir in project_dirs:
-            project_id = os.path.basename(project_dir)
-            # Verificar si hay archivos CSV en este directorio
-            csv_files = glob.glob(os.path.join(project_dir, "daily_readings_*.csv"))
-            if csv_files:
-                projects.append({'id': project_id, 'nombre': f"Proyecto {project_id}"})
-        
-        return projects
+        return [{'id': project_id, 'nombre': f"Proyecto {project_id}"} for project_id in named_projects]
     
     if df.empty:
         return []
@@ -718,7 +900,7 @@ def get_projects_with_data(df: Optional[pd.DataFrame]) -> List[Dict]:
 
 def get_project_for_asset(asset_id: str) -> Optional[str]:
     """
-    Busca a qué proyecto pertenece un asset específico examinando los archivos CSV existentes.
+    Busca a qué proyecto pertenece un asset específico en el catálogo de archivos CSV.
     
     Args:
         asset_id (str): ID del asset a buscar
@@ -726,35 +908,18 @@ def get_project_for_asset(asset_id: str) -> Optional[str]:
     Returns:
         str: ID del proyecto al que pertenece el asset, o None si no se encuentra
     """
-    debug_log(f"[DEBUG] get_project_for_asset - Buscando proyecto para el asset {asset_id}")
-    base_path = "data/analyzed_data"
-    
-    # Verificar que el directorio base existe
-    if not os.path.exists(base_path):
-        debug_log(f"[DEBUG] get_project_for_asset - Directorio base {base_path} no existe")
-        return None
+    from utils.repositories.readings_catalog import ROOT_PROJECT, get_readings_catalog
     
-    # Buscar en cada directorio de proyecto
-    project_dirs = [d for d in glob.glob(os.path.join(base_path, "*")) if os.path.isdir(d)]
-    debug_log(f"[DEBUG] get_project_for_asset - Encontrados {len(project_dirs)} directorios de proyecto")
+    debug_log(f"[DEBUG] get_project_for_asset - Buscando proyecto para el asset {asset_id}")
     
-    for project_dir in project_dirs:
-        project_id = os.path.basename(project_dir)
-        
-        # Saltar el directorio "general" si existe
-        if project_id == "general":
-            continue
-            
-        # Buscar archivos que contengan el asset_id
-        asset_files = glob.glob(os.path.join(project_dir, f"daily_readings_{asset_id}__*.csv"))
-        
-        if asset_files:
-            debug_log(f"[DEBUG] get_project_for_asset - Encontrados {len(asset_files)} archivos para el asset {asset_id} en el proyecto {project_id}")
-            return project_id
+    # Saltar el directorio "general" y los archivos sueltos en la carpeta base
+    project_id = get_readings_catalog().get_project_for_asset(asset_id, exclude=("general", ROOT_PROJECT))
     
-    # Si llegamos aquí, no encontramos el asset en ningún proyecto
-    debug_log(f"[DEBUG] get_project_for_asset - No se encontró ningún proyecto para el asset {asset_id}")
-    return None
+    if project_id:
+        debug_log(f"[DEBUG] get_project_for_asset - Encontrado el asset {asset_id} en el proyecto {project_id}")
+    else:
+        debug_log(f"[DEBUG] get_project_for_asset - No se encontró ningún proyecto para el asset {asset_id}")
+    return project_id
 
 def get_asset_metadata(asset_id: str, project_id: Optional[str] = None, jwt_token: Optional[str] = None) -> Dict[str, str]:
     """
@@ -816,17 +981,24 @@ def get_asset_metadata(asset_id: str, project_id: Optional[str] = None, jwt_toke
     
     return metadata
 
-def get_assets_with_data(df: pd.DataFrame, project_id: Optional[str] = None) -> List[Dict]:
+def get_assets_with_data(df: Optional[pd.DataFrame], project_id: Optional[str] = None) -> List[Dict]:
     """
     Obtiene la lista de assets que tienen datos, opcionalmente filtrados por proyecto.
     
     Args:
-        df: DataFrame con los datos combinados
+        df: DataFrame con los datos combinados o None para consultar el catálogo de archivos
         project_id: ID del proyecto para filtrar (opcional)
         
     Returns:
         Lista de diccionarios con información de los assets
     """
+    if df is None:
+        from utils.repositories.readings_catalog import get_readings_catalog
+        
+        catalog_project = project_id if project_id and project_id != "all" else None
+        assets = get_readings_catalog().get_assets(catalog_project)
+        return [{'id': asset, 'nombre': f"Asset {asset}"} for asset in assets]
+    
     if df.empty:
         return []
     
@@ -1194,23 +1366,27 @@ def generate_monthly_readings_by_consumption_type(df: pd.DataFrame, consumption_
     # Crear un diccionario para almacenar las tablas por tipo de consumo
     tables_by_consumption_type = {}
     
-    # Generar una lista de meses entre start_date y end_date
-    months = []
-    current_date = start_date.replace(day=1)
-    while current_date <= end_date:
-        months.append(current_date)
-        # Avanzar al siguiente mes
-        if current_date.month == 12:
-            current_date = current_date.replace(year=current_date.year + 1, month=1)
-        else:
-            current_date = current_date.replace(month=current_date.month + 1)
+    # Generar la lista de meses entre start_date y end_date
+    months = pd.period_range(start_date.replace(day=1), end_date, freq='M')
+    month_names = [month.strftime("%b %Y") for month in months]
+    
+    debug_log(f"[DEBUG] generate_monthly_readings_by_consumption_type - Meses a procesar: {month_names}")
+    
+    # Primera y última lectura por (tag, asset, mes) en una sola pasada
+    tag_rows = df[df['tag'].isin(consumption_tags)]
+    monthly = compute_monthly_readings(tag_rows, group_columns=('tag', 'asset_id'))
+    monthly = monthly[monthly['month'].isin(months)]
     
-    debug_log(f"[DEBUG] generate_monthly_readings_by_consumption_type - Meses a procesar: {[m.strftime('%b %Y') for m in months]}")
+    # Con una sola lectura no hay diferencia que calcular: se usa esa lectura
+    monthly = monthly.assign(value=monthly['consumption'].where(monthly['readings'] > 1, monthly['first_reading']))
+    
+    resets = int(((monthly['readings'] > 1) & (monthly['delta'] < 0)).sum())
+    if resets:
+        debug_log(f"[WARNING] generate_monthly_readings_by_consumption_type - {resets} meses con consumo negativo (posible reinicio del contador). Se usa la última lectura")
     
     # Procesar cada tag de consumo
     for tag in consumption_tags:
-        # Filtrar datos por tag
-        tag_df = df[df['tag'] == tag].copy()
+        tag_df = tag_rows[tag_rows['tag'] == tag]
         
         debug_log(f"[DEBUG] generate_monthly_readings_by_consumption_type - Tag: {tag}, Filas: {len(tag_df)}")
         
@@ -1221,96 +1397,21 @@ def generate_monthly_readings_by_consumption_type(df: pd.DataFrame, consumption_
         # Obtener el nombre legible del tipo de consumo
         consumption_type = TAGS_TO_CONSUMPTION_TYPE.get(tag, tag)
         
-        # Crear un DataFrame para la tabla de este tipo de consumo
+        # Assets en orden de aparición, con su nombre si está disponible
         assets = tag_df['asset_id'].unique()
-        debug_log(f"[DEBUG] generate_monthly_readings_by_consumption_type - Assets para {tag}: {len(assets)}")
-        
-        # Crear un DataFrame vacío con los assets como índice
         table_df = pd.DataFrame(index=assets)
+        if 'asset_name' in tag_df.columns:
+            asset_names = tag_df.drop_duplicates('asset_id').set_index('asset_id')['asset_name']
+            table_df['Asset'] = asset_names.reindex(assets).values
+        else:
+            table_df['Asset'] = assets
         
-        # Añadir una columna para el nombre del asset
-        asset_names = {}
-        for asset_id in assets:
-            # Buscar el nombre del asset en el DataFrame
-            asset_rows = tag_df[tag_df['asset_id'] == asset_id]
-            if not asset_rows.empty and 'asset_name' in asset_rows.columns:
-                asset_names[asset_id] = asset_rows['asset_name'].iloc[0]
-            else:
-                asset_names[asset_id] = asset_id
-        
-        table_df['Asset'] = [asset_names.get(asset_id, asset_id) for asset_id in assets]
-        
-        # Para cada mes, calcular el consumo como la diferencia entre la lectura final e inicial
-        for month_start in months:
-            # Calcular el final del mes
-            if month_start.month == 12:
-                month_end = month_start.replace(year=month_start.year + 1, month=1, day=1) - pd.Timedelta(days=1)
-            else:
-                month_end = month_start.replace(month=month_start.month + 1, day=1) - pd.Timedelta(days=1)
-            
-            # Formatear el nombre de la columna como "MMM YYYY" (ej: "Ene 2024")
-            month_name = month_start.strftime("%b %Y")
-            
-            debug_log(f"[DEBUG] generate_monthly_readings_by_consumption_type - Procesando mes: {month_name}")
-            
-            # Inicializar la columna con valores NaN
-            # Usamos un objeto para almacenar los valores, que luego convertiremos a la columna final
-            # Esto evita problemas de tipo de datos
-            month_values = {}
-            
-            # Para cada asset, calcular el consumo del mes
-            for asset_id in assets:
-                # Filtrar por asset y rango de fechas del mes
-                asset_month_data = tag_df[
-                    (tag_df['asset_id'] == asset_id) & 
-                    (tag_df['date'] >= month_start) & 
-                    (tag_df['date'] <= month_end)
-                ]
-                
-                if not asset_month_data.empty and len(asset_month_data) >= 2:
-                    # Ordenar por fecha
-                    asset_month_data = asset_month_data.sort_values('date')
-                    
-                    # Obtener la primera y última lectura del mes
-                    first_reading = asset_month_data.iloc[0]['consumption']
-                    last_reading = asset_month_data.iloc[-1]['consumption']
-                    
-                    # Calcular el consumo como la diferencia entre la última y la primera lectura
-                    try:
-                        # Convertir a números si son strings
-                        if isinstance(first_reading, str):
-                            first_reading = float(first_reading)
-                        if isinstance(last_reading, str):
-                            last_reading = float(last_reading)
-                            
-                        # Calcular la diferencia
-                        consumption_value = last_reading - first_reading
-                        
-                        # Si el valor es negativo (posible error o reinicio del contador), usar el último valor
-                        if consumption_value < 0:
-                            debug_log(f"[WARNING] generate_monthly_readings_by_consumption_type - Consumo negativo para asset {asset_id}, mes {month_name}: {consumption_value}. Usando último valor: {last_reading}")
-                            consumption_value = last_reading
-                    except (ValueError, TypeError) as e:
-                        debug_log(f"[ERROR] generate_monthly_readings_by_consumption_type - Error al calcular consumo para asset {asset_id}, mes {month_name}: {str(e)}")
-                        consumption_value = np.nan
-                    
-                    month_values[asset_id] = consumption_value
-                    debug_log(f"[DEBUG] generate_monthly_readings_by_consumption_type - Asset {asset_id}, Mes {month_name}, Consumo calculado: {consumption_value}")
-                elif not asset_month_data.empty and len(asset_month_data) == 1:
-                    # Si solo hay una lectura en el mes, usar ese valor (no podemos calcular diferencia)
-                    consumption_value = asset_month_data.iloc[0]['consumption']
-                    month_values[asset_id] = consumption_value
-                    debug_log(f"[DEBUG] generate_monthly_readings_by_consumption_type - Asset {asset_id}, Mes {month_name}, Solo una lectura disponible: {consumption_value}")
-                else:
-                    # Si no hay datos, almacenar NaN
-                    month_values[asset_id] = np.nan
-                    debug_log(f"[DEBUG] generate_monthly_readings_by_consumption_type - Asset {asset_id}, Mes {month_name}, Sin datos")
-            
-            # Añadir la columna al DataFrame
-            table_df[month_name] = pd.Series(month_values)
-            
-            # Verificar los valores de la columna
-            debug_log(f"[DEBUG] generate_monthly_readings_by_consumption_type - Columna {month_name}, Valores: {table_df[month_name].tolist()}")
+        # Tabla asset × mes; los meses sin lecturas quedan como NaN
+        tag_monthly = monthly[monthly['tag'] == tag]
+        values = tag_monthly.pivot(index='asset_id', columns='month', values='value')
+        values = values.reindex(index=assets, columns=months)
+        values.columns = month_names
+        table_df = pd.concat([table_df, values.astype(float)], axis=1)
         
         # Guardar la tabla en el diccionario
         tables_by_consumption_type[consumption_type] = table_df
@@ -1350,7 +1451,9 @@ def load_asset_detail_data(project_id, asset_id, consumption_tags, month, jwt_to
         all_data = load_all_csv_data(
             project_id=project_id,
             consumption_tags=consumption_tags,
-            jwt_token=jwt_token
+            jwt_token=jwt_token,
+            start_date=start_date,
+            end_date=end_date
         )
         
         # Filtrar por asset_id y rango de fechas
@@ -1391,14 +1494,24 @@ def load_asset_detail_data(project_id, asset_id, consumption_tags, month, jwt_to
 # Add a new function to manually clear the cache when needed
 def clear_data_cache():
     """
-    Clear the CSV data cache.
+    Clear the per-file readings cache.
+    
+    Not needed to pick up new data: entries are validated against the file's
+    mtime and size on every load.
     """
-    global _CSV_DATA_CACHE, _CACHE_TIMESTAMP
-    _CSV_DATA_CACHE = {}
-    _CACHE_TIMESTAMP = {}
+    _READINGS_CACHE.clear()
     print("[INFO METRICS] clear_data_cache - Data cache cleared")
     return True
 
+def get_data_cache_stats() -> Dict[str, Union[int, float]]:
+    """
+    Return the per-file readings cache counters.
+    
+    Returns:
+        Dict with entries, bytes, max_bytes, hits, misses, evictions and hit_rate
+    """
+    return _READINGS_CACHE.stats()
+
 def clear_all_caches():
     """Clear all data caches in the system."""
     # Clear the CSV data cache
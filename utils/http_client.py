@@ -0,0 +1,250 @@
+"""
+Cliente HTTP compartido para las llamadas a la API de Alfred Smart.
+
+Todas las peticiones de ``utils/api.py`` y ``AuthService`` pasan por una
+única ``requests.Session`` con un pool de conexiones keep-alive dimensionado
+para los ejecutores en paralelo (50 hilos en la actualización de lecturas),
+de modo que las conexiones TCP+TLS se reutilizan entre peticiones.
+
+Además, el cliente:
+
+- limita las peticiones simultáneas por host (``HTTP_MAX_PER_HOST``);
+- limita el ritmo de peticiones por host con un token bucket
+  (``HTTP_RATE_LIMIT`` peticiones/s con ráfagas de ``HTTP_RATE_BURST``);
+- reintenta con backoff exponencial y jitter las respuestas 429/5xx y los
+  errores de conexión (respetando ``Retry-After``);
+- aplica un timeout por defecto si la llamada no indica ninguno;
+- acumula métricas por endpoint: peticiones, errores, reintentos y latencia.
+"""
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "64"))
+HTTP_MAX_PER_HOST = int(os.environ.get("HTTP_MAX_PER_HOST", "50"))
+HTTP_RATE_LIMIT = float(os.environ.get("HTTP_RATE_LIMIT", "100"))
+HTTP_RATE_BURST = int(os.environ.get("HTTP_RATE_BURST", "100"))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.environ.get("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", "10"))
+HTTP_DEFAULT_TIMEOUT = (
+    float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5")),
+    float(os.environ.get("HTTP_READ_TIMEOUT", "60")),
+)
+
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+# Métodos que se pueden repetir sin riesgo ante un 5xx o un error de conexión.
+# Un POST solo se repite ante un 429, porque el servidor no lo ha procesado.
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+# Segmentos de ruta variables (UUIDs, números, identificadores largos) que se
+# agrupan en las métricas para no tener un endpoint por asset
+_ID_SEGMENT = re.compile(r"^(?:\d+|(?=[^/]*\d)[A-Za-z0-9_-]{8,})$")
+
+
+class TokenBucket:
+    """Limitador de ritmo: ``rate`` fichas por segundo con capacidad ``capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloquea hasta disponer de una ficha."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _EndpointStats:
+    __slots__ = ("requests", "errors", "retries", "total_latency", "max_latency")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+
+def endpoint_key(method, url):
+    """Clave de métricas: método, host y ruta con los identificadores agrupados."""
+    parts = urlsplit(url)
+    segments = ["{id}" if _ID_SEGMENT.match(segment) else segment for segment in parts.path.split("/")]
+    return f"{method.upper()} {parts.netloc}{'/'.join(segments)}"
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Espera antes del reintento ``attempt`` (0, 1, ...): exponencial con jitter completo."""
+    if retry_after is not None:
+        return min(HTTP_BACKOFF_MAX, retry_after)
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_after_seconds(response):
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class HttpClient:
+    """Cliente HTTP con pool de conexiones, límites por host, reintentos y métricas."""
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, max_per_host=HTTP_MAX_PER_HOST,
+                 rate_limit=HTTP_RATE_LIMIT, rate_burst=HTTP_RATE_BURST,
+                 max_retries=HTTP_MAX_RETRIES, timeout=HTTP_DEFAULT_TIMEOUT):
+        self.max_per_host = max_per_host
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._host_limits = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _limits_for(self, host):
+        with self._lock:
+            limits = self._host_limits.get(host)
+            if limits is None:
+                limits = (threading.BoundedSemaphore(self.max_per_host),
+                          TokenBucket(self.rate_limit, self.rate_burst))
+                self._host_limits[host] = limits
+            return limits
+
+    def _record(self, key, latency, error, retries):
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _EndpointStats()
+            stats.requests += 1
+            stats.retries += retries
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+            if error:
+                stats.errors += 1
+
+    def request(self, method, url, **kwargs):
+        """
+        Realiza una petición HTTP con la misma firma que ``requests.request``.
+
+        Devuelve la última respuesta obtenida (aunque sea un error HTTP) y solo
+        propaga la excepción de ``requests`` si el último intento no obtuvo
+        respuesta.
+        """
+        method = method.upper()
+        kwargs.setdefault("timeout", self.timeout)
+        key = endpoint_key(method, url)
+        semaphore, bucket = self._limits_for(urlsplit(url).netloc)
+
+        start = time.monotonic()
+        retries = 0
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            bucket.acquire()
+            with semaphore:
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    error = e
+
+            if response is not None:
+                retryable = response.status_code in RETRY_STATUS_CODES and (
+                    method in IDEMPOTENT_METHODS or response.status_code == 429
+                )
+            else:
+                retryable = method in IDEMPOTENT_METHODS
+
+            if not retryable or attempt >= self.max_retries:
+                break
+
+            delay = backoff_delay(attempt, _retry_after_seconds(response))
+            reason = response.status_code if response is not None else type(error).__name__
+            logger.warning(f"{key}: {reason}, reintento {attempt + 1}/{self.max_retries} en {delay:.2f}s")
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+            retries += 1
+
+        failed = response is None or response.status_code >= 400
+        self._record(key, time.monotonic() - start, failed, retries)
+        if response is None:
+            raise error
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def get_stats(self):
+        """
+        Devuelve las métricas acumuladas por endpoint.
+
+        Returns:
+            dict: Para cada endpoint, requests, errors, retries, avg_latency y max_latency (segundos)
+        """
+        with self._lock:
+            return {
+                key: {
+                    "requests": stats.requests,
+                    "errors": stats.errors,
+                    "retries": stats.retries,
+                    "avg_latency": stats.total_latency / stats.requests if stats.requests else 0.0,
+                    "max_latency": stats.max_latency,
+                }
+                for key, stats in self._stats.items()
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+
+http_client = HttpClient()
+
+
+def get_http_client():
+    """Devuelve el cliente HTTP compartido."""
+    return http_client
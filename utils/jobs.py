@@ -0,0 +1,482 @@
+"""
+Trabajos en segundo plano.
+
+Las operaciones largas (actualización de lecturas de un proyecto,
+regeneración masiva) se encolan como trabajos en lugar de ejecutarse dentro
+del callback: el callback recibe un ``job_id`` al instante y los componentes
+de progreso consultan el estado del trabajo con ``dcc.Interval``.
+
+- Cada tipo de trabajo tiene un handler registrado con
+  ``register_job_handler(kind, handler)``. El handler recibe un
+  ``JobContext`` y los parámetros del trabajo.
+- Los trabajos se ejecutan en un pool de ``JOB_WORKERS`` hilos; los que no
+  caben esperan en la cola del pool.
+- El progreso (total, procesados, éxitos, fallos) se guarda en memoria, de
+  modo que consultarlo no toca el disco.
+- Cada trabajo se persiste en ``JOBS_PATH/<job_id>.json`` al cambiar de
+  estado y, como mucho, cada ``JOB_PERSIST_INTERVAL`` segundos mientras
+  avanza. Al arrancar, los trabajos que quedaron en cola o en curso se
+  vuelven a encolar en cuanto su handler está registrado.
+- Las credenciales (el token del usuario) se pasan aparte como ``secrets``:
+  solo se guardan en memoria y nunca se escriben en disco. Un trabajo
+  interrumpido que las necesitaba queda aparcado como ``awaiting_auth``
+  hasta que su usuario (``owner``, la identidad de la sesión, nunca el
+  token) vuelve a autenticarse: ``resume_awaiting_auth`` le entrega las
+  credenciales de la nueva sesión y lo vuelve a encolar.
+
+El gestor se crea de forma perezosa en el primer uso, para que con
+``gunicorn --preload`` los hilos se creen en el worker y no en el proceso
+maestro.
+"""
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+JOBS_PATH = os.path.join("data", "jobs")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_PERSIST_INTERVAL = float(os.environ.get("JOB_PERSIST_INTERVAL", "2"))
+JOB_HISTORY_LIMIT = int(os.environ.get("JOB_HISTORY_LIMIT", "200"))
+
+# Estados de un trabajo. 'in_progress' es el mismo valor que usaba el archivo
+# de estado de la regeneración, para que los componentes de progreso no cambien.
+JOB_QUEUED = "queued"
+JOB_RUNNING = "in_progress"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+# Interrumpido por un reinicio, a la espera de las credenciales de su usuario
+JOB_AWAITING_AUTH = "awaiting_auth"
+ACTIVE_STATES = frozenset([JOB_QUEUED, JOB_RUNNING, JOB_AWAITING_AUTH])
+
+_handlers = {}
+_handlers_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Lo lanza ``JobContext.check_cancelled`` cuando se ha pedido cancelar el trabajo."""
+
+
+class Job:
+    """Estado de un trabajo."""
+
+    def __init__(self, kind, params=None, job_id=None, secrets=None, owner=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.owner = owner
+        # Solo en memoria: to_record guarda los nombres, nunca los valores
+        self.secrets = dict(secrets or {})
+        self.requires_auth = any(value is not None for value in self.secrets.values())
+        self.status = JOB_QUEUED
+        self.total = 0
+        self.processed = 0
+        self.success = 0
+        self.failed = 0
+        self.message = ""
+        self.details = []
+        self.result = None
+        self.created_at = datetime.now().isoformat()
+        self.start_time = None
+        self.end_time = None
+        self.resumed = 0
+        self.cancel_event = threading.Event()
+        self.last_persist = 0.0
+        self.scheduled = False
+
+    def snapshot(self, include_details=True):
+        """Devuelve el estado del trabajo como diccionario (sin los parámetros)."""
+        data = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'success': self.success,
+            'failed': self.failed,
+            'message': self.message,
+            'created_at': self.created_at,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'resumed': self.resumed,
+            'cancel_requested': self.cancel_event.is_set(),
+        }
+        if include_details:
+            data['details'] = list(self.details)
+            data['result'] = self.result
+        return data
+
+    def to_record(self):
+        record = self.snapshot()
+        record['params'] = self.params
+        record['secret_params'] = sorted(self.secrets)
+        record['requires_auth'] = self.requires_auth
+        record['owner'] = self.owner
+        return record
+
+    @classmethod
+    def from_record(cls, record):
+        job = cls(record['kind'], record.get('params'), job_id=record['job_id'], owner=record.get('owner'))
+        for key in ('status', 'total', 'processed', 'success', 'failed', 'message',
+                    'created_at', 'start_time', 'end_time', 'resumed', 'result'):
+            if key in record:
+                setattr(job, key, record[key])
+        job.details = list(record.get('details') or [])
+        # Las credenciales no se persisten: se recuperan vacías
+        job.secrets = {key: None for key in record.get('secret_params') or []}
+        job.requires_auth = bool(record.get('requires_auth'))
+        if record.get('cancel_requested'):
+            job.cancel_event.set()
+        return job
+
+
+class JobContext:
+    """Interfaz que recibe el handler para informar del progreso y atender cancelaciones."""
+
+    def __init__(self, manager, job):
+        self._manager = manager
+        self._job = job
+
+    @property
+    def job_id(self):
+        return self._job.id
+
+    @property
+    def details(self):
+        """Detalle registrado hasta ahora (persistido: sirve para reanudar tras un reinicio)."""
+        with self._manager._lock:
+            return list(self._job.details)
+
+    @property
+    def resumed(self):
+        """True si el trabajo se reanudó tras un reinicio."""
+        return self._job.resumed > 0
+
+    def set_total(self, total):
+        with self._manager._lock:
+            self._job.total = int(total)
+        self._manager._persist(self._job)
+
+    def set_message(self, message):
+        with self._manager._lock:
+            self._job.message = message
+        self._manager._persist(self._job)
+
+    def advance(self, success=True, detail=None, count=1):
+        """Cuenta ``count`` unidades procesadas (con éxito o con fallo)."""
+        with self._manager._lock:
+            self._job.processed += count
+            if success:
+                self._job.success += count
+            else:
+                self._job.failed += count
+            if detail is not None:
+                self._job.details.append(detail)
+        self._manager._persist(self._job)
+
+    def is_cancelled(self):
+        return self._job.cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.is_cancelled():
+            raise JobCancelled(self._job.id)
+
+
+def register_job_handler(kind, handler):
+    """
+    Registra el handler de un tipo de trabajo.
+
+    Args:
+        kind (str): Tipo de trabajo
+        handler (callable): ``handler(context, **params)``; su valor de retorno
+            se guarda como resultado del trabajo
+    """
+    with _handlers_lock:
+        _handlers[kind] = handler
+    if _manager is not None:
+        _manager.resume_pending(kind)
+
+
+def _get_handler(kind):
+    with _handlers_lock:
+        return _handlers.get(kind)
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    # Solo legible por el propietario (los parámetros incluyen IDs de proyecto y assets)
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class JobManager:
+    """Cola de trabajos con pool de hilos, cancelación e historial persistido."""
+
+    def __init__(self, storage_path=JOBS_PATH, max_workers=JOB_WORKERS,
+                 persist_interval=JOB_PERSIST_INTERVAL, history_limit=JOB_HISTORY_LIMIT):
+        self.storage_path = storage_path
+        self.persist_interval = persist_interval
+        self.history_limit = history_limit
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._persist_lock = threading.Lock()
+        self._load_history()
+
+    # --- Persistencia ---------------------------------------------------------
+
+    def _path(self, job_id):
+        return os.path.join(self.storage_path, f"{job_id}.json")
+
+    def _persist(self, job, force=False):
+        now = time.monotonic()
+        if not force and now - job.last_persist < self.persist_interval:
+            return
+        try:
+            # El registro se toma dentro del lock de escritura para que una
+            # escritura antigua nunca sustituya a una más reciente
+            with self._persist_lock:
+                with self._lock:
+                    record = job.to_record()
+                    job.last_persist = now
+                os.makedirs(self.storage_path, exist_ok=True)
+                _write_json_atomic(self._path(job.id), record)
+        except Exception as e:
+            logger.error(f"No se pudo guardar el trabajo {job.id}: {str(e)}")
+
+    def _load_history(self):
+        if not os.path.isdir(self.storage_path):
+            return
+        for name in os.listdir(self.storage_path):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.storage_path, name)) as f:
+                    job = Job.from_record(json.load(f))
+            except Exception as e:
+                logger.warning(f"Se ignora el trabajo guardado {name}: {str(e)}")
+                continue
+            interrupted = job.status in ACTIVE_STATES
+            if interrupted and job.requires_auth:
+                # Su token no se guardó: espera a que su usuario vuelva a autenticarse
+                job.status = JOB_AWAITING_AUTH
+                job.start_time = None
+                job.message = "Interrumpido por un reinicio: se reanudará cuando el usuario vuelva a autenticarse"
+            elif interrupted:
+                # Interrumpido por un reinicio: vuelve a la cola
+                job.status = JOB_QUEUED
+                job.resumed += 1
+                job.start_time = None
+            self._jobs[job.id] = job
+            if interrupted and job.status == JOB_AWAITING_AUTH:
+                logger.warning(f"El trabajo {job.id} ({job.kind}) espera a que su usuario vuelva a autenticarse")
+                self._persist(job, force=True)
+
+        for kind in {job.kind for job in self._jobs.values() if job.status == JOB_QUEUED}:
+            self.resume_pending(kind)
+
+    def _prune_history(self):
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.status not in ACTIVE_STATES),
+                key=lambda job: job.created_at
+            )
+            expired = finished[:max(0, len(finished) - self.history_limit)]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            try:
+                os.remove(self._path(job.id))
+            except OSError:
+                pass
+
+    # --- Ejecución ------------------------------------------------------------
+
+    def resume_pending(self, kind):
+        """Encola los trabajos recuperados de ``kind`` que esperan a su handler."""
+        if _get_handler(kind) is None:
+            return
+        with self._lock:
+            pending = [job for job in self._jobs.values()
+                       if job.kind == kind and job.status == JOB_QUEUED and job.resumed and not job.scheduled]
+            for job in pending:
+                job.scheduled = True
+        for job in pending:
+            logger.info(f"Reanudando el trabajo {job.id} ({kind}) tras un reinicio")
+            self._executor.submit(self._run, job)
+
+    def resume_awaiting_auth(self, owner, secrets):
+        """
+        Vuelve a encolar los trabajos de ``owner`` aparcados a la espera de credenciales.
+
+        Args:
+            owner (str): Identidad de la sesión (ver ``utils.auth.token_identity``)
+            secrets (dict): Credenciales de la nueva sesión por nombre; solo se
+                reanudan los trabajos cuyas credenciales están todas disponibles
+
+        Returns:
+            list: IDs de los trabajos reanudados
+        """
+        if not owner:
+            return []
+        with self._lock:
+            parked = [job for job in self._jobs.values()
+                      if job.status == JOB_AWAITING_AUTH and job.owner == owner
+                      and all(secrets.get(name) is not None for name in job.secrets)]
+            for job in parked:
+                job.secrets = {name: secrets[name] for name in job.secrets}
+                job.status = JOB_QUEUED
+                job.resumed += 1
+                job.message = ""
+        for job in parked:
+            self._persist(job, force=True)
+        for kind in {job.kind for job in parked}:
+            self.resume_pending(kind)
+        return [job.id for job in parked]
+
+    def submit(self, kind, params=None, total=0, secrets=None, owner=None):
+        """
+        Encola un trabajo.
+
+        Args:
+            kind (str): Tipo de trabajo (con un handler registrado)
+            params (dict): Parámetros del handler (deben ser serializables en JSON)
+            total (int): Unidades de trabajo previstas, si se conocen de antemano
+            secrets (dict): Parámetros del handler que no se escriben en disco
+                (p. ej. el token JWT del usuario)
+            owner (str): Identidad de la sesión que lanza el trabajo; permite
+                reanudarlo con sus nuevas credenciales tras un reinicio
+
+        Returns:
+            str: ID del trabajo
+        """
+        if _get_handler(kind) is None:
+            raise ValueError(f"No hay ningún handler registrado para los trabajos '{kind}'")
+        job = Job(kind, params, secrets=secrets, owner=owner)
+        job.total = total
+        job.scheduled = True
+        with self._lock:
+            self._jobs[job.id] = job
+        self._persist(job, force=True)
+        self._executor.submit(self._run, job)
+        logger.info(f"Trabajo {job.id} ({kind}) encolado")
+        return job.id
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            self._finish(job, JOB_CANCELLED, "Cancelado antes de empezar")
+            return
+
+        handler = _get_handler(job.kind)
+        with self._lock:
+            job.status = JOB_RUNNING
+            job.start_time = datetime.now().isoformat()
+        self._persist(job, force=True)
+
+        try:
+            result = handler(JobContext(self, job), **job.params, **job.secrets)
+        except JobCancelled:
+            self._finish(job, JOB_CANCELLED, "Cancelado")
+        except Exception as e:
+            logger.error(f"Error en el trabajo {job.id} ({job.kind}): {str(e)}")
+            logger.error(traceback.format_exc())
+            self._finish(job, JOB_FAILED, str(e))
+        else:
+            with self._lock:
+                job.result = result
+            status = JOB_CANCELLED if job.cancel_event.is_set() else JOB_COMPLETED
+            self._finish(job, status)
+
+    def _finish(self, job, status, message=None):
+        with self._lock:
+            job.status = status
+            job.end_time = datetime.now().isoformat()
+            if message is not None:
+                job.message = message
+        self._persist(job, force=True)
+        logger.info(f"Trabajo {job.id} ({job.kind}) finalizado: {status}")
+        self._prune_history()
+
+    # --- Consulta y control ---------------------------------------------------
+
+    def get(self, job_id, include_details=True):
+        """Devuelve el estado de un trabajo o None si no existe."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.snapshot(include_details) if job is not None else None
+
+    def list_jobs(self, kind=None, active_only=False):
+        """Devuelve los trabajos (más recientes primero), sin el detalle."""
+        with self._lock:
+            jobs = [job.snapshot(include_details=False) for job in self._jobs.values()
+                    if (kind is None or job.kind == kind)
+                    and (not active_only or job.status in ACTIVE_STATES)]
+        return sorted(jobs, key=lambda job: job['created_at'], reverse=True)
+
+    def find_active(self, kind):
+        """Devuelve el trabajo activo (en cola, en curso o esperando credenciales) más reciente de ``kind``, o None."""
+        jobs = self.list_jobs(kind, active_only=True)
+        return jobs[0] if jobs else None
+
+    def cancel(self, job_id):
+        """
+        Pide la cancelación de un trabajo. Si aún está en cola no llega a
+        ejecutarse; si está en curso se detiene en su siguiente comprobación;
+        si espera credenciales se cancela en el acto.
+
+        Returns:
+            bool: False si el trabajo no existe o ya ha terminado
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ACTIVE_STATES:
+                return False
+            job.cancel_event.set()
+            parked = job.status == JOB_AWAITING_AUTH
+        if parked:
+            self._finish(job, JOB_CANCELLED, "Cancelado")
+            return True
+        self._persist(job, force=True)
+        logger.info(f"Cancelación solicitada para el trabajo {job_id}")
+        return True
+
+    def wait(self, job_id, timeout=None):
+        """Espera a que termine un trabajo (pensado para scripts y pruebas)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id, include_details=False)
+            if job is None or job['status'] not in ACTIVE_STATES:
+                return self.get(job_id)
+            if deadline is not None and time.monotonic() > deadline:
+                return job
+            time.sleep(0.05)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """Devuelve el gestor de trabajos del proceso, creándolo en el primer uso."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
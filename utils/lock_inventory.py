@@ -0,0 +1,351 @@
+"""
+Inventario de cerraduras por proyecto para la página de Smart Locks.
+
+Construir el inventario requiere la lista de dispositivos del proyecto, la
+lista de assets y una petición ``/assets/{id}/devices`` por asset. Este módulo
+lanza las peticiones por asset en paralelo (``LOCK_INVENTORY_CONCURRENCY``
+hilos, que pasan por el cliente HTTP compartido) y guarda el inventario
+normalizado de cada proyecto durante ``LOCK_INVENTORY_TTL`` segundos.
+
+El botón de actualizar hace un refresco incremental: vuelve a pedir la lista
+de dispositivos y de assets del proyecto, pero solo consulta los dispositivos
+de los assets nuevos, de los que han cambiado (alias, escalera, piso o sus
+dispositivos en el listado del proyecto) o de los que llevan en caché más de
+``LOCK_INVENTORY_TTL`` segundos.
+
+El inventario se guarda por sesión (identidad del token) y proyecto: cada
+usuario recibe solo lo que la API le ha devuelto a él. Los inventarios
+caducados se descartan en cada consulta, para que las sesiones que no
+vuelven no se acumulen en memoria.
+"""
+import copy
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import api
+from utils.auth import token_identity
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Segundos que se reutiliza el inventario de un proyecto (0 = sin caché)
+LOCK_INVENTORY_TTL = int(os.environ.get("LOCK_INVENTORY_TTL", "300"))
+# Peticiones simultáneas de dispositivos por asset
+LOCK_INVENTORY_CONCURRENCY = int(os.environ.get("LOCK_INVENTORY_CONCURRENCY", "16"))
+
+PROJECT_LOCK_TYPES = ["lock", "qr_lock"]
+ASSET_LOCK_TYPE = "lock"
+# Campos del listado de dispositivos del proyecto que identifican un cambio en un asset
+DEVICE_SIGNATURE_FIELDS = ("device_id", "device_type", "connectivity", "enabled")
+
+
+def _asset_id(asset):
+    return asset.get("id") or asset.get("asset_id")
+
+
+def _asset_fingerprint(asset):
+    """Datos del asset que se copian a sus cerraduras."""
+    return (
+        asset.get("name") or asset.get("nombre"),
+        asset.get("alias", ""),
+        asset.get("staircase", ""),
+        asset.get("apartment", ""),
+    )
+
+
+def is_project_lock_device(device):
+    """Dispositivo del listado del proyecto con sensor LOCK o de puerta comunitaria."""
+    return any(
+        sensor.get("sensor_type") == "LOCK" or sensor.get("usage") == "CommunityDoor"
+        for sensor in device.get("sensors", [])
+    )
+
+
+def _has_lock_sensor(device):
+    for sensor in device.get("sensors", []):
+        if (sensor.get("sensor_type", "").upper() == "LOCK" or
+            sensor.get("type", "").upper() == "LOCK" or
+            sensor.get("usage") == "CommunityDoor" or
+            "lock" in str(sensor.get("sensor_type", "")).lower()):
+            return True
+    device_type = str(device.get("device_type", "")).lower()
+    return "lock" in device_type or "cerradura" in device_type
+
+
+def normalize_asset_devices(asset, asset_devices):
+    """
+    Extrae las cerraduras de la respuesta de ``get_asset_devices`` para un asset
+
+    Los dispositivos pueden venir directamente o anidados en un contenedor
+    (gateway) con su propia lista ``devices``; en ese caso el ``uuid`` del
+    contenedor es el gateway_id de sus dispositivos.
+
+    Args:
+        asset (dict): Asset del proyecto
+        asset_devices (list): Dispositivos devueltos por la API para el asset
+
+    Returns:
+        list: Cerraduras con asset_id, gateway_id, alias, staircase, apartment y scope
+    """
+    asset_id = _asset_id(asset)
+    asset_name, alias, staircase, apartment = _asset_fingerprint(asset)
+    scope = {"type": "Asset", "id": asset_id, "name": asset_name}
+
+    locks = []
+    for device_container in asset_devices or []:
+        if not isinstance(device_container, dict):
+            continue
+
+        if isinstance(device_container.get("devices"), list):
+            container_gateway_id = device_container.get("uuid")
+            container_asset_id = device_container.get("asset_id")
+            for nested_device in device_container["devices"]:
+                nested_device["alias"] = alias
+                nested_device["staircase"] = staircase
+                nested_device["apartment"] = apartment
+                if "asset_id" not in nested_device:
+                    nested_device["asset_id"] = container_asset_id or asset_id
+                if container_gateway_id and "gateway_id" not in nested_device:
+                    nested_device["gateway_id"] = container_gateway_id
+
+                if _has_lock_sensor(nested_device) or nested_device.get("lock_type"):
+                    nested_device["scope"] = dict(scope)
+                    locks.append(nested_device)
+        else:
+            device_container["alias"] = alias
+            device_container["staircase"] = staircase
+            device_container["apartment"] = apartment
+            if "asset_id" not in device_container and asset_id:
+                device_container["asset_id"] = asset_id
+            if "uuid" in device_container and "gateway_id" not in device_container:
+                device_container["gateway_id"] = device_container.get("uuid")
+
+            if _has_lock_sensor(device_container):
+                device_container["scope"] = dict(scope)
+                locks.append(device_container)
+            else:
+                logger.debug(f"Dispositivo {device_container.get('device_id', 'desconocido')} NO reconocido como cerradura")
+    return locks
+
+
+def consolidate_lock_devices(asset_locks, project_locks):
+    """Cerraduras de los assets seguidas de las del proyecto que no aparecen en ningún asset."""
+    consolidated = list(asset_locks)
+    device_keys = {device.get("device_id", "") for device in asset_locks}
+    consolidated.extend(device for device in project_locks if device.get("device_id", "") not in device_keys)
+    return consolidated
+
+
+def _device_signatures(project_devices):
+    """Firma por asset de los dispositivos que aparecen en el listado del proyecto."""
+    signatures = {}
+    for device in project_devices:
+        asset_id = device.get("asset_id")
+        if asset_id:
+            signatures.setdefault(asset_id, []).append(
+                tuple(str(device.get(field, "")) for field in DEVICE_SIGNATURE_FIELDS)
+            )
+    return {asset_id: tuple(sorted(values)) for asset_id, values in signatures.items()}
+
+
+class _AssetEntry:
+    def __init__(self, fingerprint, signature, locks):
+        self.fingerprint = fingerprint
+        self.signature = signature
+        self.locks = locks
+        self.loaded_at = time.monotonic()
+
+
+class _ProjectInventory:
+    def __init__(self):
+        self.loaded_at = 0.0
+        self.project_locks = []
+        self.assets = {}
+        self.asset_order = []
+        self.devices = []
+
+
+class LockInventoryService:
+    """Inventario de cerraduras por proyecto, con caché TTL y refresco incremental."""
+
+    def __init__(self, ttl=LOCK_INVENTORY_TTL, max_workers=LOCK_INVENTORY_CONCURRENCY):
+        self.ttl = ttl
+        self.max_workers = max(1, max_workers)
+        self._projects = {}
+        self._project_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.full_loads = 0
+        self.delta_loads = 0
+        self.asset_requests = 0
+
+    def _project_lock(self, key):
+        with self._lock:
+            self._evict_expired()
+            return self._project_locks.setdefault(key, threading.Lock())
+
+    def _evict_expired(self):
+        # Se llama con self._lock tomado
+        now = time.monotonic()
+        for key in [key for key, inventory in self._projects.items() if now - inventory.loaded_at > self.ttl]:
+            del self._projects[key]
+        for key in [key for key, lock in self._project_locks.items()
+                    if key not in self._projects and not lock.locked()]:
+            del self._project_locks[key]
+
+    def _is_fresh(self, inventory):
+        return inventory is not None and time.monotonic() - inventory.loaded_at <= self.ttl
+
+    def get_inventory(self, project_id, jwt_token, refresh=False):
+        """
+        Devuelve las cerraduras de un proyecto
+
+        Args:
+            project_id (str): ID del proyecto
+            jwt_token (str): Token JWT para la API
+            refresh (bool): Refrescar el inventario aunque esté en caché; si ya
+                existe, solo se vuelven a consultar los assets que han cambiado
+
+        Returns:
+            list: Copia de las cerraduras consolidadas (asset y proyecto)
+        """
+        # Cada sesión tiene su propio inventario: la API comprueba el acceso de cada usuario
+        key = (token_identity(jwt_token), project_id)
+        # Las peticiones simultáneas del mismo proyecto y sesión esperan a la primera carga
+        with self._project_lock(key):
+            with self._lock:
+                inventory = self._projects.get(key)
+            if not refresh and self._is_fresh(inventory):
+                self.hits += 1
+                return copy.deepcopy(inventory.devices)
+
+            inventory = self._load(project_id, jwt_token, inventory if refresh else None)
+            if self.ttl > 0:
+                with self._lock:
+                    self._projects[key] = inventory
+            return copy.deepcopy(inventory.devices)
+
+    def _load(self, project_id, jwt_token, previous=None):
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            project_future = executor.submit(
+                api.get_devices, project_id=project_id, jwt_token=jwt_token, device_types=PROJECT_LOCK_TYPES
+            )
+            assets_future = executor.submit(api.get_project_assets, project_id, jwt_token)
+            project_devices = project_future.result() or []
+            assets = assets_future.result() or []
+
+            signatures = _device_signatures(project_devices)
+            now = time.monotonic()
+            inventory = _ProjectInventory()
+            inventory.project_locks = [device for device in project_devices if is_project_lock_device(device)]
+            for device in inventory.project_locks:
+                device["scope"] = {"type": "Project"}
+
+            pending = {}
+            for asset in assets:
+                asset_id = _asset_id(asset)
+                if not asset_id:
+                    logger.warning(f"No se pudo determinar el ID del asset: {asset}")
+                    continue
+                if asset_id in inventory.assets or asset_id in pending:
+                    continue
+                inventory.asset_order.append(asset_id)
+                fingerprint = _asset_fingerprint(asset)
+                signature = signatures.get(asset_id, ())
+                cached = previous.assets.get(asset_id) if previous else None
+                if (cached is not None and cached.fingerprint == fingerprint and cached.signature == signature
+                        and now - cached.loaded_at <= self.ttl):
+                    inventory.assets[asset_id] = cached
+                else:
+                    pending[asset_id] = (asset, executor.submit(
+                        api.get_asset_devices, asset_id=asset_id, jwt_token=jwt_token, device_types=ASSET_LOCK_TYPE
+                    ))
+
+            for asset_id, (asset, future) in pending.items():
+                try:
+                    asset_devices = future.result()
+                except Exception as e:
+                    logger.error(f"Error al obtener los dispositivos del asset {asset_id}: {str(e)}")
+                    asset_devices = []
+                inventory.assets[asset_id] = _AssetEntry(
+                    _asset_fingerprint(asset), signatures.get(asset_id, ()), normalize_asset_devices(asset, asset_devices)
+                )
+            self.asset_requests += len(pending)
+
+            asset_locks = [device for asset_id in inventory.asset_order for device in inventory.assets[asset_id].locks]
+            inventory.devices = consolidate_lock_devices(asset_locks, inventory.project_locks)
+            self._fill_missing_gateways(inventory.devices, jwt_token, executor)
+
+        inventory.loaded_at = time.monotonic()
+        if previous is None:
+            self.full_loads += 1
+        else:
+            self.delta_loads += 1
+        logger.info(f"Inventario de cerraduras del proyecto {project_id}: {len(inventory.devices)} cerraduras, "
+                    f"{len(pending)} de {len(inventory.asset_order)} assets consultados en "
+                    f"{time.perf_counter() - t0:.2f} s")
+        return inventory
+
+    def _fill_missing_gateways(self, devices, jwt_token, executor):
+        """Completa el gateway_id que falte con los passwords NFC del asset (una petición por asset)."""
+        missing = {}
+        for device in devices:
+            if not device.get("gateway_id") and device.get("asset_id"):
+                missing.setdefault(device["asset_id"], []).append(device)
+        if not missing:
+            return
+        logger.warning(f"Se encontraron {sum(map(len, missing.values()))} dispositivos sin gateway_id")
+
+        futures = {asset_id: executor.submit(api.get_nfc_passwords, asset_id, jwt_token) for asset_id in missing}
+        for asset_id, future in futures.items():
+            try:
+                nfc_data = future.result()
+            except Exception as e:
+                logger.error(f"Error al obtener gateway_id para los dispositivos del asset {asset_id}: {str(e)}")
+                continue
+            data_section = nfc_data.get("data") if isinstance(nfc_data, dict) else None
+            if not isinstance(data_section, dict):
+                continue
+            gateways = {
+                nfc_device.get("device_id"): nfc_device["gateway_id"]
+                for nfc_device in data_section.get("devices", []) if "gateway_id" in nfc_device
+            }
+            for device in missing[asset_id]:
+                if device.get("device_id") in gateways:
+                    device["gateway_id"] = gateways[device["device_id"]]
+
+        still_missing = [device.get("device_id") for device in devices if not device.get("gateway_id")]
+        if still_missing:
+            logger.warning(f"Después de intentar obtener los gateway_id, estos dispositivos aún no tienen uno: {still_missing}")
+
+    def invalidate(self, project_id=None):
+        """Elimina el inventario de un proyecto (de todas las sesiones), o todos si no se indica ninguno."""
+        with self._lock:
+            if project_id is None:
+                self._projects.clear()
+            else:
+                for key in [key for key in self._projects if key[1] == project_id]:
+                    del self._projects[key]
+
+    def stats(self):
+        """Devuelve contadores de uso del servicio."""
+        with self._lock:
+            self._evict_expired()
+            return {
+                'projects': len(self._projects),
+                'hits': self.hits,
+                'full_loads': self.full_loads,
+                'delta_loads': self.delta_loads,
+                'asset_requests': self.asset_requests,
+            }
+
+
+_lock_inventory_service = LockInventoryService()
+
+
+def get_lock_inventory_service():
+    """Devuelve la instancia compartida del servicio."""
+    return _lock_inventory_service
@@ -3,6 +3,7 @@ from datetime import datetime
 from config.metrics_config import DATA_PROCESSING
 from constants.metrics import CONSUMPTION_TAGS_MAPPING
 from utils.adapters.anomaly_adapter import AnomalyAdapter
+from utils.metrics.monthly_readings import compute_monthly_readings
 from utils.logging import get_logger
 import time
 from functools import lru_cache
@@ -183,47 +184,16 @@ def generate_monthly_readings_by_consumption_type(df, consumption_tags, start_da
         print(f"Filtered data for tag {tag}: {len(tag_data)} rows")
         
         if not tag_data.empty:
-            # Group by asset_id and month
-            tag_data['year_month'] = tag_data['date'].dt.strftime('%Y-%m')
-            monthly_data = {}
-            
-            # Process each asset
-            for asset_id, asset_group in tag_data.groupby('asset_id'):
-                print(f"Processing asset_id: {asset_id}, group size: {len(asset_group)}")
-                
-                # Initialize a dictionary to store monthly readings
-                asset_monthly_readings = {}
-                
-                # Process each month for this asset
-                for month, month_group in asset_group.groupby('year_month'):
-                    try:
-                        # Sort by date to ensure correct order
-                        month_group = month_group.sort_values('date')
-                        
-                        # Get first and last reading of the month
-                        first_reading = month_group['consumption'].iloc[0]
-                        last_reading = month_group['consumption'].iloc[-1]
-                        
-                        # Calculate monthly consumption (last reading - first reading)
-                        monthly_consumption = last_reading - first_reading
-                        
-                        # Store the last reading as the monthly reading
-                        # This represents the accumulated reading at the end of the month
-                        asset_monthly_readings[month] = last_reading
-                        
-                        print(f"Month {month}, Asset {asset_id}: First reading = {first_reading}, Last reading = {last_reading}, Monthly consumption = {monthly_consumption}")
-                    except Exception as e:
-                        print(f"Error processing month {month} for asset {asset_id}: {str(e)}")
-                        import traceback
-                        print(traceback.format_exc())
-                
-                if asset_monthly_readings:
-                    monthly_data[asset_id] = pd.Series(asset_monthly_readings)
+            # Last reading of each asset and month, computed in one pass.
+            # It represents the accumulated reading at the end of the month
+            monthly = compute_monthly_readings(tag_data)
             
             # Create a new DataFrame from the monthly data
-            if monthly_data:
-                # Convert the dictionary to a DataFrame
-                pivot = pd.DataFrame(monthly_data).T
+            if not monthly.empty:
+                # Assets as rows and months ('YYYY-MM') as columns
+                pivot = monthly.pivot(index='asset_id', columns='month', values='last_reading')
+                pivot.columns = [str(month) for month in pivot.columns]
+                pivot.index.name = None
                 
                 # Sort columns chronologically
                 sorted_columns = sorted(pivot.columns)
@@ -341,62 +311,15 @@ def generate_monthly_consumption_summary(df, start_date=None, end_date=None):
     
     # Agrupar por mes y calcular estadísticas
     try:
-        # Crear un DataFrame para almacenar los consumos reales mensuales
-        monthly_consumption_df = pd.DataFrame()
+        # Primera y última lectura de cada activo y mes en una sola pasada.
+        # Si el consumo es negativo (posible error o reinicio), se usa la última lectura
+        monthly_consumption_df = compute_monthly_readings(df, value_column=consumption_column)
+        monthly_consumption_df = monthly_consumption_df.rename(columns={'consumption': 'real_consumption'})
+        monthly_consumption_df['month'] = monthly_consumption_df['month'].astype(str)
         
-        # Procesar cada activo por separado
-        for asset_id, asset_group in df.groupby('asset_id'):
-            print(f"[INFO] Processing asset_id: {asset_id}")
-            
-            # Ordenar por fecha para asegurar el cálculo correcto
-            asset_group = asset_group.sort_values('date')
-            
-            # Procesar cada mes para este activo
-            monthly_consumptions = []
-            
-            for month, month_group in asset_group.groupby('month'):
-                print(f"[INFO] Processing month: {month} for asset_id: {asset_id}")
-                
-                # Ordenar por fecha dentro del mes
-                month_group = month_group.sort_values('date')
-                
-                # Obtener primera y última lectura del mes
-                first_reading = month_group[consumption_column].iloc[0]
-                last_reading = month_group[consumption_column].iloc[-1]
-                
-                # Calcular consumo mensual (última lectura - primera lectura)
-                try:
-                    # Convertir a números si son strings
-                    if isinstance(first_reading, str):
-                        first_reading = float(first_reading)
-                    if isinstance(last_reading, str):
-                        last_reading = float(last_reading)
-                    
-                    # Calcular el consumo real
-                    real_consumption = last_reading - first_reading
-                    
-                    # Si el consumo es negativo (posible error o reinicio), usar el último valor
-                    if real_consumption < 0:
-                        print(f"[WARNING] Negative consumption detected for asset {asset_id}, month {month}: {real_consumption}. Using last reading: {last_reading}")
-                        real_consumption = last_reading
-                    
-                    # Guardar el resultado
-                    monthly_consumptions.append({
-                        'asset_id': asset_id,
-                        'month': month,
-                        'real_consumption': real_consumption,
-                        'first_reading': first_reading,
-                        'last_reading': last_reading
-                    })
-                    
-                    print(f"[INFO] Asset: {asset_id}, Month: {month}, First reading: {first_reading}, Last reading: {last_reading}, Consumption: {real_consumption}")
-                except (ValueError, TypeError) as e:
-                    print(f"[ERROR] Error calculating consumption for asset {asset_id}, month {month}: {str(e)}")
-            
-            # Añadir los consumos mensuales de este activo al DataFrame de consumos reales
-            if monthly_consumptions:
-                asset_consumption_df = pd.DataFrame(monthly_consumptions)
-                monthly_consumption_df = pd.concat([monthly_consumption_df, asset_consumption_df])
+        resets = int((monthly_consumption_df['delta'] < 0).sum())
+        if resets:
+            print(f"[WARNING] Negative consumption detected in {resets} asset-months. Using last reading")
         
         # Verificar si hay consumos reales calculados
         if monthly_consumption_df.empty:
@@ -677,70 +600,29 @@ def generate_monthly_readings_table(df, start_date=None, end_date=None):
             end_date = pd.to_datetime(end_date)
             df = df[df['date'] <= end_date]
         
-        # Process each asset
-        asset_readings = {}
-        for asset_id, asset_group in df.groupby('asset_id'):
-            print(f"[DEBUG TABLA MENSUAL] Procesando asset {asset_id}")
-            
-            # Get consumption type for this asset
-            if 'consumption_type' in asset_group.columns:
-                consumption_type = asset_group['consumption_type'].mode().iloc[0] if not asset_group['consumption_type'].empty else "Desconocido"
-                print(f"[DEBUG TABLA MENSUAL] Asset {asset_id}: consumption_type = {consumption_type}")
-                unique_types = asset_group['consumption_type'].unique()
-                print(f"[DEBUG TABLA MENSUAL] Asset {asset_id}: consumptions_types únicos = {unique_types}")
-            else:
-                print(f"[DEBUG TABLA MENSUAL] Asset {asset_id}: No hay columna consumption_type")
-                consumption_type = "Desconocido"
-
-            # Process each month
-            monthly_readings = {}
-            for month, month_group in asset_group.groupby('month'):
-                try:
-                    # Sort by date
-                    month_group = month_group.sort_values('date')
-                    
-                    # Get first and last readings
-                    first_reading = month_group['consumption'].iloc[0]
-                    last_reading = month_group['consumption'].iloc[-1]
-                    
-                    # Calculate monthly consumption
-                    monthly_consumption = last_reading - first_reading
-                    
-                    # Store in dict
-                    month_name = pd.to_datetime(str(month)).strftime('%B %Y')
-                    monthly_readings[month_name] = {
-                        'first_reading': first_reading,
-                        'last_reading': last_reading,
-                        'consumption': monthly_consumption
-                    }
-                except Exception as e:
-                    print(f"Error processing month {month} for asset {asset_id}: {str(e)}")
-            
-            # Store asset data
-            asset_readings[asset_id] = {
-                'consumption_type': consumption_type,
-                'monthly_readings': monthly_readings
-            }
-        
-        # Create pivot table
-        rows = []
-        for asset_id, asset_data in asset_readings.items():
-            consumption_type = asset_data['consumption_type']
-            row = {'Asset': asset_id, 'consumption_type': consumption_type}
-            
-            # Add monthly readings
-            for month, readings in asset_data['monthly_readings'].items():
-                row[month] = readings['consumption']
-            
-            rows.append(row)
+        # Monthly consumption (last reading - first reading) per asset
+        monthly = compute_monthly_readings(df)
         
         # If no rows, return empty DataFrame
-        if not rows:
+        if monthly.empty:
             print("No rows generated for monthly readings table")
             return pd.DataFrame()
         
-        # Create DataFrame
-        pivot = pd.DataFrame(rows)
+        # Predominant consumption type of each asset
+        if 'consumption_type' in df.columns:
+            type_counts = df.groupby(['asset_id', 'consumption_type']).size().reset_index(name='count')
+            type_counts = type_counts.sort_values(['asset_id', 'count', 'consumption_type'],
+                                                  ascending=[True, False, True])
+            consumption_types = type_counts.drop_duplicates('asset_id').set_index('asset_id')['consumption_type']
+        else:
+            print("[DEBUG TABLA MENSUAL] No hay columna consumption_type")
+            consumption_types = pd.Series(dtype=object)
+        
+        # Create pivot table
+        pivot = monthly.pivot(index='asset_id', columns='month', values='delta')
+        pivot.columns = [month.strftime('%B %Y') for month in pivot.columns]
+        pivot.insert(0, 'consumption_type', consumption_types.reindex(pivot.index).fillna("Desconocido").values)
+        pivot = pivot.reset_index().rename(columns={'asset_id': 'Asset'})
         
         # Print the DataFrame for debugging
         print(f"[DEBUG TABLA MENSUAL] DataFrame final generado: {pivot.shape}")
@@ -0,0 +1,145 @@
+import os
+import re
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Server-side storage for the dataset behind "metrics-data-store".
+#
+# The browser store only receives a small handle
+#     {"dataset_id": "<uuid hex>", "rows": 12345, "columns": [...]}
+# while the DataFrame itself stays on the server: in memory (LRU) and spilled
+# to disk so a restart or another worker process can still resolve the handle.
+DATASET_CACHE_SIZE = int(os.environ.get("METRICS_DATASET_CACHE_SIZE", "8"))
+DATASET_SPILL_PATH = os.path.join("data", "cache", "metrics_datasets")
+DATASET_TTL = 60 * 60 * 12  # seconds a spilled dataset is kept on disk
+
+_DATASET_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+_datasets = OrderedDict()
+_datasets_lock = threading.Lock()
+
+
+def _spill_path(dataset_id):
+    return os.path.join(DATASET_SPILL_PATH, f"{dataset_id}.pkl")
+
+
+def _remember(dataset_id, df):
+    with _datasets_lock:
+        _datasets[dataset_id] = df
+        _datasets.move_to_end(dataset_id)
+        while len(_datasets) > DATASET_CACHE_SIZE:
+            _datasets.popitem(last=False)
+
+
+def _purge_expired_spills():
+    """Remove spilled datasets older than DATASET_TTL."""
+    if not os.path.isdir(DATASET_SPILL_PATH):
+        return
+    cutoff = time.time() - DATASET_TTL
+    for name in os.listdir(DATASET_SPILL_PATH):
+        path = os.path.join(DATASET_SPILL_PATH, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def put_metrics_dataset(df):
+    """
+    Store a metrics DataFrame server-side and return the handle for the browser store.
+
+    Args:
+        df: DataFrame to publish (it must not be modified afterwards)
+
+    Returns:
+        dict: Handle with dataset_id, rows and columns
+    """
+    dataset_id = uuid.uuid4().hex
+    _remember(dataset_id, df)
+
+    try:
+        os.makedirs(DATASET_SPILL_PATH, exist_ok=True)
+        tmp_path = f"{_spill_path(dataset_id)}.tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, _spill_path(dataset_id))
+        _purge_expired_spills()
+    except Exception as e:
+        # The in-memory copy is enough for the current worker
+        logger.warning(f"Could not spill metrics dataset {dataset_id} to disk: {str(e)}")
+
+    return {"dataset_id": dataset_id, "rows": int(len(df)), "columns": list(df.columns)}
+
+
+def _resolve(dataset_id):
+    with _datasets_lock:
+        df = _datasets.get(dataset_id)
+        if df is not None:
+            _datasets.move_to_end(dataset_id)
+            return df
+
+    path = _spill_path(dataset_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_pickle(path)
+    except Exception as e:
+        logger.error(f"Could not read spilled metrics dataset {dataset_id}: {str(e)}")
+        return None
+    _remember(dataset_id, df)
+    return df
+
+
+def has_metrics_data(store_data):
+    """Return True if the metrics-data-store value refers to a non-empty dataset."""
+    if not store_data or store_data == "[]":
+        return False
+    if isinstance(store_data, dict):
+        return bool(store_data.get("dataset_id")) and store_data.get("rows", 0) > 0
+    return True
+
+
+def get_metrics_dataframe(store_data):
+    """
+    Resolve the value of metrics-data-store into a DataFrame.
+
+    Accepts a dataset handle as well as the legacy JSON list of records.
+    The result is a copy, so callers are free to modify it.
+
+    Args:
+        store_data: Value of metrics-data-store
+
+    Returns:
+        pd.DataFrame: The dataset, or an empty DataFrame if it cannot be resolved
+    """
+    if not has_metrics_data(store_data):
+        return pd.DataFrame()
+
+    if isinstance(store_data, dict):
+        dataset_id = store_data.get("dataset_id", "")
+        if not _DATASET_ID_PATTERN.match(dataset_id):
+            logger.warning(f"Invalid metrics dataset id: {dataset_id!r}")
+            return pd.DataFrame()
+        df = _resolve(dataset_id)
+        if df is None:
+            logger.warning(f"Metrics dataset {dataset_id} expired or not found")
+            return pd.DataFrame()
+        return df.copy()
+
+    # Legacy format: JSON-encoded list of records
+    import json
+    data = json.loads(store_data) if isinstance(store_data, str) else store_data
+    return pd.DataFrame(data)
+
+
+def clear_metrics_datasets():
+    """Drop the in-memory datasets (spilled copies expire on their own)."""
+    with _datasets_lock:
+        _datasets.clear()
@@ -0,0 +1,63 @@
+"""
+Monthly readings engine.
+
+Computes, in a single pass, the first and last reading of every
+(group, month) cell of a readings DataFrame. The monthly tables in
+utils/data_loader.py and utils/metrics/data_processing.py are built on top
+of this instead of filtering the DataFrame once per asset and month.
+"""
+import numpy as np
+import pandas as pd
+
+
+def compute_monthly_readings(df, value_column='consumption', group_columns=('asset_id',)):
+    """
+    Compute first/last reading and consumption per group and month.
+
+    Readings are ordered by date inside each group. The consumption of a
+    month is the difference between its last and first reading; a negative
+    difference is treated as a counter reset and the last reading is used
+    instead.
+
+    Args:
+        df (pd.DataFrame): Readings with a 'date' column, the value column and
+            the group columns
+        value_column (str): Column holding the cumulative readings
+        group_columns (tuple): Columns identifying a series (e.g. asset_id, tag)
+
+    Returns:
+        pd.DataFrame: One row per (group..., month) with the columns
+            first_reading, last_reading, readings (number of readings),
+            delta (last - first) and consumption (delta with the counter
+            reset fallback). 'month' is a monthly Period.
+    """
+    group_columns = list(group_columns)
+    result_columns = group_columns + ['month', 'first_reading', 'last_reading', 'readings', 'delta', 'consumption']
+    if df is None or df.empty:
+        return pd.DataFrame(columns=result_columns)
+
+    frame = df[group_columns].copy()
+    frame['date'] = pd.to_datetime(df['date'], errors='coerce')
+    frame['value'] = pd.to_numeric(df[value_column], errors='coerce')
+    frame = frame.dropna(subset=['date'])
+    if frame.empty:
+        return pd.DataFrame(columns=result_columns)
+    frame['month'] = frame['date'].dt.to_period('M')
+
+    keys = group_columns + ['month']
+    # Stable sort so that readings with the same date keep their original order
+    frame = frame.sort_values(keys + ['date'], kind='mergesort')
+
+    # After sorting every (group, month) cell is a contiguous block of rows
+    codes = frame.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)] - 1
+
+    values = frame['value'].to_numpy()
+    result = frame.iloc[starts][keys].reset_index(drop=True)
+    result['first_reading'] = values[starts]
+    result['last_reading'] = values[ends]
+    result['readings'] = ends - starts + 1
+    result['delta'] = result['last_reading'] - result['first_reading']
+    result['consumption'] = result['delta'].where(~(result['delta'] < 0), result['last_reading'])
+    return result
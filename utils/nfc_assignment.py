@@ -0,0 +1,340 @@
+"""
+Planificador de asignaciones y desasignaciones masivas de tarjetas NFC.
+
+A partir de una única instantánea de los códigos NFC de los assets
+seleccionados (el índice de tarjetas del proyecto) se calcula de antemano el
+plan completo de cada cerradura: el slot de cada tarjeta, las tarjetas que ya
+estaban asignadas o que no se encuentran, las cerraduras sin slots
+suficientes y qué tarjeta ocupará el slot de la tarjeta maestra. El plan se
+puede previsualizar antes de ejecutarlo.
+
+Al ejecutarlo, las escrituras se lanzan en paralelo entre gateways
+(``NFC_ASSIGN_CONCURRENCY`` hilos) pero en serie dentro de cada gateway, y
+los slots que fallan se reintentan hasta ``NFC_ASSIGN_RETRIES`` veces. Tras un
+error de autenticación no se lanzan más escrituras.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import api
+from utils.logging import get_logger
+from utils.nfc_helper import FIRST_CARD_SLOT, normalize_card_uid
+
+logger = get_logger(__name__)
+
+# Gateways que reciben escrituras a la vez (por debajo de HTTP_MAX_PER_HOST del cliente HTTP)
+NFC_ASSIGN_CONCURRENCY = int(os.environ.get("NFC_ASSIGN_CONCURRENCY", "32"))
+# Reintentos de un slot cuya escritura falla (los errores de autenticación no se reintentan)
+NFC_ASSIGN_RETRIES = int(os.environ.get("NFC_ASSIGN_RETRIES", "2"))
+# Espera antes del primer reintento; se dobla en cada reintento
+NFC_ASSIGN_RETRY_DELAY = float(os.environ.get("NFC_ASSIGN_RETRY_DELAY", "0.5"))
+
+MASTER_CARD_SLOT = str(FIRST_CARD_SLOT)
+
+_SUCCESS_MESSAGES = {"assign": "Asignada al slot {slot}", "unassign": "Desasignada del slot {slot}"}
+_PENDING_MESSAGES = {"assign": "Se asignará al slot {slot}", "unassign": "Se desasignará del slot {slot}"}
+
+
+def lock_device_id(device):
+    """ID numérico de la cerradura para la API: real_device_id o, si es numérico, device_id."""
+    device_id = device.get("real_device_id")
+    if device_id:
+        return str(device_id)
+    device_id = device.get("device_id")
+    return str(device_id) if device_id is not None and str(device_id).isdigit() else None
+
+
+def format_card_value(card_value):
+    """Formato con el que se escribe una tarjeta: AABBCCDD → AA:BB:CC:DD."""
+    if ":" not in card_value and "-" not in card_value and len(card_value) == 8:
+        return ":".join(card_value[i:i + 2] for i in range(0, 8, 2))
+    return card_value
+
+
+def _is_auth_error(message):
+    return ("Token expirado" in message or "Token JWT expirado" in message or "401" in message
+            or "unauthorized" in message.lower())
+
+
+def _lock_plan(device, action, card_count):
+    return {
+        "action": action,
+        "name": device.get("display_name") or device.get("lock_name") or device.get("name") or "Cerradura desconocida",
+        "asset_id": device.get("asset_id"),
+        "gateway_id": device.get("gateway_id"),
+        "device_id": lock_device_id(device),
+        "cards": card_count,
+        "error": None,
+        "operations": [],
+    }
+
+
+def _add_operation(lock_plan, uuid_value, slot, value=None, status="pending", message=None):
+    action = lock_plan["action"]
+    if message is None:
+        message = _PENDING_MESSAGES[action].format(slot=slot)
+    lock_plan["operations"].append({
+        "action": action,
+        "asset_id": lock_plan["asset_id"],
+        "gateway_id": lock_plan["gateway_id"],
+        "device_id": lock_plan["device_id"],
+        "uuid": uuid_value,
+        "slot": slot,
+        "value": value,
+        "master": slot == MASTER_CARD_SLOT,
+        "status": status,
+        "message": message,
+        "attempts": 0,
+    })
+
+
+def _check_lock(lock_plan):
+    if not lock_plan["device_id"]:
+        lock_plan["error"] = "Falta ID numérico del dispositivo"
+    elif not lock_plan["gateway_id"]:
+        lock_plan["error"] = f"Falta el ID del gateway necesario para el dispositivo {lock_plan['name']} (ID: {lock_plan['device_id']})"
+    elif not lock_plan["asset_id"]:
+        lock_plan["error"] = f"Falta ID de asset para el dispositivo {lock_plan['name']}"
+    return lock_plan["error"] is None
+
+
+def _check_indexed(lock_plan, card_index):
+    # Sin sus códigos leídos, la cerradura parecería vacía (y el slot 7 libre)
+    if not card_index.has_device(_index_device(lock_plan)):
+        lock_plan["error"] = f"No se pudieron leer los códigos NFC del dispositivo {lock_plan['name']}"
+    return lock_plan["error"] is None
+
+
+def _index_device(lock_plan):
+    return {"asset_id": lock_plan["asset_id"], "gateway_id": lock_plan["gateway_id"],
+            "real_device_id": lock_plan["device_id"]}
+
+
+def plan_assignment(devices, uuid_list, card_index):
+    """
+    Calcula el plan de asignación de varias tarjetas en varias cerraduras
+
+    Cada tarjeta que no está ya en la cerradura ocupa el primer slot libre;
+    si quedan menos slots libres que tarjetas nuevas, o sus códigos no están
+    en el índice (falló la lectura), la cerradura no se toca.
+
+    Args:
+        devices (list): Cerraduras seleccionadas (asset_id, gateway_id, real_device_id)
+        uuid_list (list): UUIDs de las tarjetas, en el orden en que se asignan
+        card_index (NfcCardIndex): Índice con los assets de las cerraduras ya cargados
+
+    Returns:
+        list: Un plan por cerradura con sus operaciones ('pending' o 'already_assigned')
+    """
+    cards = {}
+    for uuid_value in uuid_list:
+        cards.setdefault(normalize_card_uid(uuid_value), uuid_value)
+    cards.pop("", None)
+
+    plans = []
+    for device in devices:
+        lock_plan = _lock_plan(device, "assign", len(cards))
+        plans.append(lock_plan)
+        if not _check_lock(lock_plan) or not _check_indexed(lock_plan, card_index):
+            continue
+        index_device = _index_device(lock_plan)
+        existing = {uid: card_index.card_slot(index_device, uid) for uid in cards}
+        new_cards = sum(1 for slot in existing.values() if slot is None)
+        free_slots = card_index.free_slot_count(index_device)
+        if new_cards > free_slots:
+            lock_plan["error"] = f"No hay suficientes slots disponibles. Necesarios: {new_cards}, Disponibles: {free_slots}"
+            continue
+
+        reserved = 0
+        for uid, uuid_value in cards.items():
+            slot = existing[uid]
+            if slot is not None:
+                _add_operation(lock_plan, uuid_value, slot, status="already_assigned",
+                               message=f"Ya asignada en slot {slot}")
+                continue
+            slot = card_index.next_free_slot(index_device, reserved)
+            reserved |= 1 << int(slot)
+            _add_operation(lock_plan, uuid_value, slot, format_card_value(uuid_value))
+    return plans
+
+
+def plan_unassignment(devices, uuid_list, card_index):
+    """
+    Calcula el plan de desasignación de varias cerraduras
+
+    Con uuid_list vacía se vacían todos los slots con tarjeta; si no, se vacían
+    los slots donde está cada tarjeta indicada.
+
+    Returns:
+        list: Un plan por cerradura con sus operaciones ('pending' o 'not_found')
+    """
+    cards = {}
+    for uuid_value in uuid_list:
+        cards.setdefault(normalize_card_uid(uuid_value), uuid_value)
+    cards.pop("", None)
+
+    plans = []
+    for device in devices:
+        lock_plan = _lock_plan(device, "unassign", len(cards))
+        plans.append(lock_plan)
+        if not _check_lock(lock_plan) or not _check_indexed(lock_plan, card_index):
+            continue
+        device_cards = card_index.device_cards(_index_device(lock_plan))
+        if not cards:
+            for slot, uid in device_cards.items():
+                _add_operation(lock_plan, format_card_value(uid), slot, "")
+            continue
+        slots_by_card = {}
+        for slot, uid in device_cards.items():
+            slots_by_card.setdefault(uid, []).append(slot)
+        for uid, uuid_value in cards.items():
+            slots = slots_by_card.get(uid)
+            if not slots:
+                _add_operation(lock_plan, uuid_value, None, status="not_found", message="Tarjeta no encontrada")
+            for slot in slots or ():
+                _add_operation(lock_plan, uuid_value, slot, "")
+    return plans
+
+
+def _write(operation, jwt_token):
+    operation["attempts"] += 1
+    try:
+        success, response = api.update_nfc_code_value(
+            asset_id=operation["asset_id"],
+            device_id=operation["device_id"],
+            sensor_id=operation["slot"],
+            new_value=operation["value"],
+            jwt_token=jwt_token,
+            gateway_id=operation["gateway_id"],
+            is_master_card=operation["master"]
+        )
+    except Exception as e:
+        success, response = False, str(e)
+
+    if success:
+        operation["status"] = "success"
+        operation["message"] = _SUCCESS_MESSAGES[operation["action"]].format(slot=operation["slot"])
+    elif _is_auth_error(str(response)):
+        operation["status"] = "auth_error"
+        operation["message"] = "Error de autenticación"
+    else:
+        operation["status"] = "failed"
+        operation["message"] = f"Error: {response}"
+
+
+def execute_plan(plans, jwt_token, max_workers=NFC_ASSIGN_CONCURRENCY, retries=NFC_ASSIGN_RETRIES,
+                 retry_delay=NFC_ASSIGN_RETRY_DELAY):
+    """
+    Ejecuta las operaciones pendientes de un plan
+
+    Las operaciones de un mismo gateway se escriben en serie y en el orden del
+    plan; los gateways se procesan en paralelo. Actualiza el estado y el
+    mensaje de cada operación.
+
+    Returns:
+        list: Los mismos planes, con el resultado de cada operación
+    """
+    by_gateway = {}
+    for lock_plan in plans:
+        for operation in lock_plan["operations"]:
+            if operation["status"] == "pending":
+                by_gateway.setdefault(operation["gateway_id"], []).append(operation)
+    if not by_gateway:
+        return plans
+
+    auth_failed = threading.Event()
+
+    def run_gateway(operations):
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(retry_delay * 2 ** (attempt - 1))
+            for operation in operations:
+                if auth_failed.is_set():
+                    operation["status"] = "auth_error"
+                    operation["message"] = "Error de autenticación"
+                    continue
+                _write(operation, jwt_token)
+                if operation["status"] == "auth_error":
+                    auth_failed.set()
+            operations = [operation for operation in operations if operation["status"] == "failed"]
+            if not operations:
+                break
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(by_gateway)))) as executor:
+        list(executor.map(run_gateway, by_gateway.values()))
+    summary = plan_summary(plans)
+    logger.info(f"Plan NFC ejecutado en {time.perf_counter() - t0:.1f}s: {len(by_gateway)} gateways, {summary}")
+    return plans
+
+
+def plan_summary(plans):
+    """Número de cerraduras, gateways y operaciones por estado de un plan."""
+    summary = {
+        "locks": len(plans),
+        "locks_with_errors": sum(1 for lock_plan in plans if lock_plan["error"]),
+        "gateways": len({lock_plan["gateway_id"] for lock_plan in plans
+                         if not lock_plan["error"] and lock_plan["operations"]}),
+        "master_cards": sum(1 for lock_plan in plans for operation in lock_plan["operations"]
+                            if operation["master"] and operation["action"] == "assign"
+                            and operation["status"] in ("pending", "success")),
+        "retried": sum(1 for lock_plan in plans for operation in lock_plan["operations"]
+                       if operation["attempts"] > 1),
+    }
+    for lock_plan in plans:
+        for operation in lock_plan["operations"]:
+            summary[operation["status"]] = summary.get(operation["status"], 0) + 1
+    return summary
+
+
+def lock_result(lock_plan):
+    """
+    Resultado de una cerradura en el formato de los resultados por cerradura
+
+    Returns:
+        tuple: (success, message, details), con details como lista de
+        {'uuid', 'slot', 'status', 'message'}
+    """
+    if lock_plan["error"]:
+        return False, lock_plan["error"], []
+    details = [{key: operation[key] for key in ("uuid", "slot", "status", "message")}
+               for operation in lock_plan["operations"]]
+    counts = {}
+    for detail in details:
+        counts[detail["status"]] = counts.get(detail["status"], 0) + 1
+    successful = counts.get("success", 0)
+    auth_errors = counts.get("auth_error", 0)
+    failed = counts.get("failed", 0)
+
+    if lock_plan["action"] == "assign":
+        total = lock_plan["cards"]
+        if successful == total:
+            return True, f"Todas las tarjetas ({successful}) asignadas correctamente", details
+        if successful > 0:
+            return True, f"{successful} de {total} tarjetas asignadas correctamente", details
+        if counts.get("already_assigned", 0) == total:
+            return True, f"Todas las tarjetas ({total}) ya estaban asignadas", details
+        if auth_errors > 0:
+            return False, f"Error de autenticación en {auth_errors} tarjetas", details
+        return False, "No se pudo asignar ninguna tarjeta", details
+
+    not_found = counts.get("not_found", 0)
+    if not details:
+        return True, "No hay tarjetas activas para desasignar", details
+    if successful == len(details) - not_found and successful > 0:
+        message = f"Todas las {successful} tarjetas procesadas desasignadas correctamente."
+        if not_found:
+            message += f" {not_found} tarjetas especificadas no fueron encontradas."
+        return True, message, details
+    if successful > 0:
+        message = f"{successful} tarjetas desasignadas. {failed} fallaron. {auth_errors} errores de auth."
+        if not_found:
+            message += f" {not_found} no encontradas."
+        return True, message, details
+    if not_found == len(details):
+        return True, "Ninguna de las tarjetas especificadas fue encontrada en el dispositivo.", details
+    if auth_errors > 0 and failed == 0:
+        return False, f"Error de autenticación en {auth_errors} operaciones.", details
+    return False, f"No se pudo desasignar: {failed} fallaron, {auth_errors} errores de auth.", details
@@ -0,0 +1,224 @@
+"""
+Caché de códigos NFC por asset.
+
+Varios callbacks de Smart Locks (modal de detalles, sensores NFC, grid NFC,
+desasignación de tarjetas) piden los mismos datos de
+``/sensor-passwords/deployment/{asset_id}``. Esta caché los guarda por asset
+durante ``NFC_PASSWORDS_TTL`` segundos y agrupa las peticiones concurrentes
+del mismo asset en una sola llamada.
+
+Las entradas y la coalescencia van separadas por sesión (``scope``, la
+identidad del token): una petición solo se sirve con datos que la API ya ha
+devuelto a esa misma sesión, de modo que la API sigue comprobando el acceso
+de cada usuario a cada asset.
+
+Es de escritura directa: cuando ``update_nfc_code_value`` cambia un código,
+el valor se actualiza también en la entrada cacheada, de modo que la grid
+refleja la asignación sin volver a consultar la API.
+"""
+import copy
+import os
+import threading
+import time
+
+from utils.logging import get_logger
+from utils.sensor_metadata import PendingLoad
+
+logger = get_logger(__name__)
+
+# Segundos que se reutilizan los códigos NFC de un asset (0 = solo coalescencia)
+NFC_PASSWORDS_TTL = int(os.environ.get("NFC_PASSWORDS_TTL", "120"))
+
+
+def _nfc_devices(nfc_data):
+    data_section = nfc_data.get("data") if isinstance(nfc_data, dict) else None
+    devices = data_section.get("devices") if isinstance(data_section, dict) else None
+    return devices if isinstance(devices, list) else []
+
+
+def _same_device(nfc_device, device_ids):
+    return (str(nfc_device.get("real_device_id")) in device_ids or
+            str(nfc_device.get("device_id")) in device_ids)
+
+
+class NfcPasswordCache:
+    """Caché TTL de códigos NFC por sesión y asset con coalescencia y escritura directa."""
+
+    def __init__(self, ttl=NFC_PASSWORDS_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._pending = {}
+        # Versión de cada asset: una carga en curso no se guarda si el asset
+        # se ha actualizado o invalidado mientras tanto
+        self._versions = {}
+        self._last_prune = time.monotonic()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.updates = 0
+
+    def _fresh_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        loaded_at, nfc_data = entry
+        if time.monotonic() - loaded_at > self.ttl:
+            del self._entries[key]
+            return None
+        return nfc_data
+
+    def _prune(self, force=False):
+        """
+        Elimina las entradas caducadas (p. ej. de sesiones que no vuelven) y las
+        versiones de los assets sin cargas en curso, que ya no se comparan con nada.
+
+        Se llama con self._lock tomado; sin force, como mucho una vez por TTL.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_prune < max(self.ttl, 1):
+            return
+        self._last_prune = now
+        for key in [key for key, (loaded_at, _) in self._entries.items() if now - loaded_at > self.ttl]:
+            del self._entries[key]
+        loading = {key[1] for key in self._pending}
+        for asset_id in [asset_id for asset_id in self._versions if asset_id not in loading]:
+            del self._versions[asset_id]
+
+    def _asset_keys(self, asset_id):
+        return [key for key in self._entries if key[1] == asset_id]
+
+    def get(self, asset_id, loader, refresh=False, scope=None):
+        """
+        Devuelve los códigos NFC de un asset, cargándolos con ``loader`` si hace falta.
+
+        Args:
+            asset_id (str): ID del asset
+            loader (callable): Función ``loader(asset_id) -> dict`` que consulta la API
+            refresh (bool): Ignorar la entrada cacheada y volver a consultar
+            scope (str): Sesión que hace la petición (ver ``utils.auth.token_identity``);
+                solo se reutilizan datos cargados por la misma sesión
+
+        Returns:
+            dict: Copia de ``{'data': {'devices': [...]}}``, o None si la API falló
+        """
+        key = (scope, asset_id)
+        with self._lock:
+            self._prune()
+            if not refresh:
+                nfc_data = self._fresh_entry(key)
+                if nfc_data is not None:
+                    self.hits += 1
+                    return copy.deepcopy(nfc_data)
+
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = PendingLoad()
+                self._pending[key] = pending
+                self.misses += 1
+                version = self._versions.get(asset_id, 0)
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            pending.event.wait()
+            return copy.deepcopy(pending.result)
+
+        nfc_data = None
+        try:
+            nfc_data = loader(asset_id)
+        except Exception as e:
+            logger.error(f"Error al obtener los códigos NFC del asset {asset_id}: {str(e)}")
+        finally:
+            with self._lock:
+                # Las respuestas vacías pueden deberse a un error: no se cachean
+                if (_nfc_devices(nfc_data) and self.ttl > 0
+                        and self._versions.get(asset_id, 0) == version):
+                    self._entries[key] = (time.monotonic(), nfc_data)
+                del self._pending[key]
+            pending.result = nfc_data
+            pending.event.set()
+        return copy.deepcopy(nfc_data)
+
+    def apply_update(self, asset_id, device_id, sensor_id, value, gateway_id=None):
+        """
+        Aplica a la caché un código NFC que se acaba de escribir en la API
+
+        Args:
+            asset_id (str, optional): ID del asset; si no se indica se busca el
+                dispositivo en todos los assets cacheados
+            device_id (str or list): ID (o IDs equivalentes) del dispositivo
+            sensor_id (str): ID del sensor NFC
+            value (str): Nuevo código
+            gateway_id (str, optional): Gateway del dispositivo
+
+        Returns:
+            bool: True si se actualizó una entrada (de cualquier sesión); las
+            entradas del asset donde no se encontró el dispositivo se invalidan
+        """
+        device_ids = {str(d) for d in (device_id if isinstance(device_id, (list, tuple, set)) else [device_id])}
+        with self._lock:
+            self.updates += 1
+            if asset_id:
+                asset_ids = [asset_id]
+            else:
+                asset_ids = list(dict.fromkeys(key[1] for key in self._entries))
+            for current_asset_id in asset_ids:
+                self._versions[current_asset_id] = self._versions.get(current_asset_id, 0) + 1
+                updated = False
+                for key in self._asset_keys(current_asset_id):
+                    if self._update_entry(key, device_ids, sensor_id, value, gateway_id):
+                        updated = True
+                    elif asset_id:
+                        self._entries.pop(key, None)
+                if updated:
+                    return True
+            return False
+
+    def _update_entry(self, key, device_ids, sensor_id, value, gateway_id):
+        for nfc_device in _nfc_devices(self._fresh_entry(key)):
+            if not _same_device(nfc_device, device_ids):
+                continue
+            if gateway_id and nfc_device.get("gateway_id") not in (None, gateway_id):
+                continue
+            nfc_device[f"sensor_{sensor_id}"] = value
+            return True
+        return False
+
+    def invalidate(self, asset_id=None):
+        """Elimina la entrada de un asset, o todas si no se indica ninguno."""
+        with self._lock:
+            if asset_id is None:
+                asset_ids = {key[1] for key in list(self._entries) + list(self._pending)}
+            else:
+                asset_ids = [asset_id]
+            for current_asset_id in asset_ids:
+                self._versions[current_asset_id] = self._versions.get(current_asset_id, 0) + 1
+            if asset_id is None:
+                self._entries.clear()
+            else:
+                for key in self._asset_keys(asset_id):
+                    del self._entries[key]
+
+    def stats(self):
+        """Devuelve contadores de uso de la caché."""
+        with self._lock:
+            self._prune(force=True)
+            requests = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'updates': self.updates,
+                'hit_rate': (self.hits + self.coalesced) / requests if requests else 0.0,
+            }
+
+
+_nfc_password_cache = NfcPasswordCache()
+
+
+def get_nfc_password_cache():
+    """Devuelve la instancia compartida de la caché."""
+    return _nfc_password_cache
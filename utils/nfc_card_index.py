@@ -0,0 +1,274 @@
+"""
+Índice de tarjetas NFC del proyecto.
+
+Construido a partir de los mismos datos que la grid NFC (``get_nfc_passwords``
+de cada asset), el índice guarda:
+
+- para cada UID normalizado, las cerraduras y slots donde está asignado
+  (``(asset_id, gateway_id, real_device_id, slot)``);
+- para cada cerradura, un mapa UID → slot y un bitmap de slots libres.
+
+Así, comprobar si una tarjeta ya está en una cerradura, localizar una tarjeta
+en todo el proyecto y reservar el siguiente slot libre no requieren recorrer
+los sensores. ``update_nfc_code_value`` mantiene el índice al día tras cada
+asignación o desasignación.
+
+``ensure_assets`` solo da por cargado un asset para una sesión si sus códigos
+se leyeron con un token de esa misma sesión; si no, los vuelve a pedir a la
+API, que comprueba el acceso del usuario.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import api
+from utils.auth import token_identity
+from utils.logging import get_logger
+from utils.nfc_cache import NFC_PASSWORDS_TTL
+from utils.nfc_helper import FIRST_CARD_SLOT, LAST_CARD_SLOT, normalize_card_uid
+
+logger = get_logger(__name__)
+
+# Bits de los slots de tarjeta (FIRST_CARD_SLOT..LAST_CARD_SLOT)
+CARD_SLOTS_MASK = ((1 << (LAST_CARD_SLOT + 1)) - 1) & ~((1 << FIRST_CARD_SLOT) - 1)
+# Assets cuyos códigos NFC se cargan en paralelo al construir el índice
+CARD_INDEX_LOAD_WORKERS = 10
+
+
+def device_key(device):
+    """Clave de una cerradura en el índice: (asset_id, gateway_id, real_device_id)."""
+    return (
+        str(device.get("asset_id") or ""),
+        str(device.get("gateway_id") or ""),
+        str(device.get("real_device_id") or ""),
+    )
+
+
+class _DeviceSlots:
+    def __init__(self):
+        self.used = 0
+        self.slots = {}
+        self.cards = {}
+
+
+class NfcCardIndex:
+    """Índice UID → ubicaciones y slots libres por cerradura."""
+
+    def __init__(self):
+        self._devices = {}
+        self._cards = {}
+        # asset_id → momento en que se indexó
+        self._assets = {}
+        # (sesión, asset_id) → momento en que la sesión leyó el asset en la API
+        self._loaded_by = {}
+        # real_device_id / asset_id → claves de sus cerraduras
+        self._keys_by_device_id = {}
+        self._keys_by_asset = {}
+        self._lock = threading.Lock()
+
+    def index_asset(self, asset_id, nfc_data):
+        """
+        Indexa (o vuelve a indexar) las cerraduras de un asset
+
+        Args:
+            asset_id (str): ID del asset
+            nfc_data (dict): Respuesta de ``get_nfc_passwords`` ({'data': {'devices': [...]}})
+        """
+        data_section = nfc_data.get("data") if isinstance(nfc_data, dict) else None
+        devices = data_section.get("devices", []) if isinstance(data_section, dict) else []
+        with self._lock:
+            self._drop_asset(str(asset_id))
+            for nfc_device in devices:
+                if not isinstance(nfc_device, dict) or not nfc_device.get("real_device_id"):
+                    continue
+                key = device_key({**nfc_device, "asset_id": asset_id})
+                self._devices[key] = _DeviceSlots()
+                self._keys_by_device_id.setdefault(key[2], set()).add(key)
+                self._keys_by_asset.setdefault(key[0], set()).add(key)
+                for field, value in nfc_device.items():
+                    if field.startswith("sensor_") and field[7:].isdigit():
+                        self._set_slot(key, field[7:], value)
+            self._assets[str(asset_id)] = time.monotonic()
+
+    def ensure_assets(self, asset_ids, jwt_token, refresh=False, max_age=NFC_PASSWORDS_TTL):
+        """
+        Indexa en paralelo los assets que no están en el índice o se indexaron hace más de max_age segundos
+
+        Los códigos se leen con ``get_nfc_passwords``, por lo que normalmente salen
+        de la caché de códigos NFC. Con refresh se vuelven a consultar todos en la API.
+
+        Returns:
+            list: Assets que no se pudieron leer (sus cerraduras no están en el índice)
+        """
+        asset_ids = {str(asset_id) for asset_id in asset_ids if asset_id}
+        scope = token_identity(jwt_token)
+        now = time.monotonic()
+        with self._lock:
+            pending = sorted(
+                asset_id for asset_id in asset_ids
+                if refresh or asset_id not in self._assets
+                or now - self._loaded_by.get((scope, asset_id), float("-inf")) > max_age
+            )
+        if not pending:
+            return []
+        failed = []
+        with ThreadPoolExecutor(max_workers=min(CARD_INDEX_LOAD_WORKERS, len(pending))) as executor:
+            results = executor.map(lambda asset_id: api.get_nfc_passwords(asset_id, jwt_token, refresh=refresh), pending)
+            for asset_id, nfc_data in zip(pending, results):
+                if nfc_data is None:
+                    logger.warning(f"No se pudieron indexar las tarjetas NFC del asset {asset_id}")
+                    # Lo que hubiera indexado de ese asset ya no es fiable
+                    self.invalidate(asset_id)
+                    failed.append(asset_id)
+                    continue
+                self.index_asset(asset_id, nfc_data)
+                with self._lock:
+                    self._loaded_by[(scope, asset_id)] = time.monotonic()
+        logger.info(f"Índice de tarjetas NFC: {len(pending) - len(failed)} assets indexados ({self.stats()})")
+        return failed
+
+    def invalidate(self, asset_id=None):
+        """Elimina del índice un asset, o todos si no se indica ninguno."""
+        with self._lock:
+            if asset_id is None:
+                self._devices.clear()
+                self._cards.clear()
+                self._assets.clear()
+                self._loaded_by.clear()
+                self._keys_by_device_id.clear()
+                self._keys_by_asset.clear()
+            else:
+                self._drop_asset(str(asset_id))
+                for loaded in [loaded for loaded in self._loaded_by if loaded[1] == str(asset_id)]:
+                    del self._loaded_by[loaded]
+
+    def _drop_asset(self, asset_id):
+        for key in self._keys_by_asset.pop(asset_id, ()):
+            for slot in list(self._devices[key].slots):
+                self._clear_slot(key, slot)
+            del self._devices[key]
+            keys = self._keys_by_device_id[key[2]]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_device_id[key[2]]
+        self._assets.pop(asset_id, None)
+
+    def _set_slot(self, key, slot, value):
+        self._clear_slot(key, slot)
+        uid = normalize_card_uid(value)
+        if not uid:
+            return
+        entry = self._devices[key]
+        entry.slots[slot] = uid
+        entry.cards.setdefault(uid, slot)
+        if FIRST_CARD_SLOT <= int(slot) <= LAST_CARD_SLOT:
+            entry.used |= 1 << int(slot)
+        self._cards.setdefault(uid, set()).add(key + (slot,))
+
+    def _clear_slot(self, key, slot):
+        entry = self._devices[key]
+        uid = entry.slots.pop(slot, None)
+        if uid is None:
+            return
+        entry.used &= ~(1 << int(slot))
+        if entry.cards.get(uid) == slot:
+            other_slots = [other for other, other_uid in entry.slots.items() if other_uid == uid]
+            if other_slots:
+                entry.cards[uid] = min(other_slots, key=int)
+            else:
+                del entry.cards[uid]
+        locations = self._cards.get(uid)
+        if locations is not None:
+            locations.discard(key + (slot,))
+            if not locations:
+                del self._cards[uid]
+
+    def apply_update(self, asset_id, device_ids, gateway_id, slot, value):
+        """
+        Refleja en el índice un código escrito en una cerradura (vacío = desasignado)
+
+        Returns:
+            bool: True si la cerradura estaba indexada
+        """
+        device_ids = {str(device_id) for device_id in device_ids if device_id}
+        slot = str(slot)
+        with self._lock:
+            keys = {key for device_id in device_ids for key in self._keys_by_device_id.get(device_id, ())
+                    if (not asset_id or key[0] == str(asset_id))
+                    and (not gateway_id or key[1] in ("", str(gateway_id)))}
+            for key in keys:
+                self._set_slot(key, slot, value)
+            return bool(keys)
+
+    def has_device(self, device):
+        with self._lock:
+            return device_key(device) in self._devices
+
+    def card_slot(self, device, card_value):
+        """Slot de la cerradura donde está asignada la tarjeta, o None."""
+        with self._lock:
+            entry = self._devices.get(device_key(device))
+            return entry.cards.get(normalize_card_uid(card_value)) if entry else None
+
+    def device_cards(self, device):
+        """
+        Tarjetas asignadas en una cerradura
+
+        Returns:
+            dict: Slot → UID normalizado, ordenado por slot
+        """
+        with self._lock:
+            entry = self._devices.get(device_key(device))
+            slots = dict(entry.slots) if entry else {}
+        return {slot: slots[slot] for slot in sorted(slots, key=int)}
+
+    def find_card(self, card_value):
+        """
+        Ubicaciones de una tarjeta en el proyecto
+
+        Returns:
+            list: Tuplas (asset_id, gateway_id, real_device_id, slot)
+        """
+        with self._lock:
+            return sorted(self._cards.get(normalize_card_uid(card_value), ()))
+
+    def free_slot_count(self, device):
+        with self._lock:
+            entry = self._devices.get(device_key(device))
+            used = entry.used if entry else 0
+        return bin(CARD_SLOTS_MASK & ~used).count("1")
+
+    def next_free_slot(self, device, reserved=0):
+        """
+        Primer slot libre de la cerradura
+
+        Args:
+            device (dict): Cerradura (asset_id, gateway_id, real_device_id)
+            reserved (int): Bitmap de slots ya reservados por quien llama
+
+        Returns:
+            str: ID del slot, o None si no quedan slots libres
+        """
+        with self._lock:
+            entry = self._devices.get(device_key(device))
+            used = entry.used if entry else 0
+        free = CARD_SLOTS_MASK & ~used & ~reserved
+        if not free:
+            return None
+        return str((free & -free).bit_length() - 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'assets': len(self._assets),
+                'devices': len(self._devices),
+                'cards': len(self._cards),
+            }
+
+
+_nfc_card_index = NfcCardIndex()
+
+
+def get_nfc_card_index():
+    """Devuelve la instancia compartida del índice."""
+    return _nfc_card_index
@@ -5,6 +5,23 @@ from utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Slots para tarjetas NFC: del 1 al 6 suelen ser especiales, así que se usan del 7 al 98
+FIRST_CARD_SLOT = 7
+LAST_CARD_SLOT = 98
+
+def normalize_card_uid(card_value):
+    """
+    Normaliza el UID de una tarjeta NFC para comparaciones.
+    
+    Elimina espacios y separadores (AA:BB:CC:DD, AA-BB-CC-DD) y pasa a mayúsculas.
+    
+    Returns:
+        str: UID normalizado (AABBCCDD), o cadena vacía si no hay valor
+    """
+    if not card_value or not isinstance(card_value, str):
+        return ""
+    return card_value.strip().replace(":", "").replace("-", "").upper()
+
 def fetch_for_asset(asset_id, token):
     """
     Wrapper mejorado para obtener y procesar datos NFC de un asset específico.
@@ -120,11 +137,11 @@ def get_available_slots(device_data):
         if "sensors" not in device_data or not device_data["sensors"]:
             logger.warning(f"Dispositivo {device_data.get('device_id')} no tiene sensores definidos")
             # En lugar de devolver vacío, asumimos que todos los slots están disponibles
-            return [str(i) for i in range(7, 99)]  # Del 7 al 98
+            return [str(i) for i in range(FIRST_CARD_SLOT, LAST_CARD_SLOT + 1)]
         
         # Lista de todos los posibles slots para códigos NFC (1 al 98)
         # Slots del 1 al 6 suelen ser especiales, así que empezamos desde el 7
-        all_slots = [str(i) for i in range(7, 99)]
+        all_slots = [str(i) for i in range(FIRST_CARD_SLOT, LAST_CARD_SLOT + 1)]
         
         # Encontrar slots que ya están usados (tienen valor no vacío)
         used_slots = []
@@ -150,13 +167,15 @@ def get_available_slots(device_data):
         # En caso de error, devolver algunos slots predeterminados que suelen estar disponibles
         return [str(i) for i in range(7, 20)]
 
-def check_card_exists(device_data, card_value):
+def check_card_exists(device_data, card_value, card_index=None):
     """
     Verifica si una tarjeta ya existe en algún slot del dispositivo.
     
     Args:
         device_data (dict): Diccionario con datos del dispositivo incluyendo sensores
         card_value (str): Valor de la tarjeta NFC a verificar
+        card_index (NfcCardIndex, optional): Índice de tarjetas; si contiene el
+            dispositivo, la comprobación no recorre sus sensores
         
     Returns:
         tuple: (exists, slot_id) donde exists es booleano y slot_id es el ID del slot si existe
@@ -167,6 +186,18 @@ def check_card_exists(device_data, card_value):
         if not device_data or not isinstance(device_data, dict):
             logger.warning(f"Datos de dispositivo inválidos para verificar tarjeta existente. Device ID: {device_id}")
             return False, None
+        
+        # Normalizar el valor de la tarjeta para comparación (AA:BB:CC:DD y AA-BB-CC-DD → AABBCCDD)
+        normalized_card = normalize_card_uid(card_value)
+        if not normalized_card:
+            # Si no hay valor, no puede existir
+            return False, None
+        
+        if card_index is not None and card_index.has_device(device_data):
+            slot_id = card_index.card_slot(device_data, normalized_card)
+            if slot_id is not None:
+                logger.info(f"Tarjeta {card_value} encontrada en slot {slot_id} del dispositivo {device_id}")
+            return slot_id is not None, slot_id
             
         if "sensors" not in device_data:
             logger.warning(f"No se encontraron sensores en dispositivo {device_id}")
@@ -179,65 +210,23 @@ def check_card_exists(device_data, card_value):
         
         logger.debug(f"Verificando tarjeta {card_value} en dispositivo {device_id} con {len(sensors)} sensores")
         
-        # Normalizar el valor de la tarjeta para comparación
-        if card_value:
-            # Eliminar espacios
-            normalized_card = card_value.strip()
-            
-            # Si es formato AA:BB:CC:DD, convertir a AABBCCDD para comparación
-            if ":" in normalized_card:
-                normalized_card = normalized_card.replace(":", "")
-            
-            # Si es formato AA-BB-CC-DD, convertir a AABBCCDD para comparación
-            if "-" in normalized_card:
-                normalized_card = normalized_card.replace("-", "")
-                
-            logger.debug(f"Tarjeta normalizada para búsqueda: '{card_value}' → '{normalized_card}'")
-        else:
-            # Si no hay valor, no puede existir
-            return False, None
-        
         # Verificar en cada sensor
-        found_passwords = []  # Para logging de debug
-        comparison_details = []  # Para debug detallado
+        assigned_slots = 0
         for sensor in sensors:
             if not isinstance(sensor, dict):
                 continue
             
-            sensor_id = str(sensor.get("sensor_id", ""))
-            password = sensor.get("password", "")
-            
-            # Logging de debug para cada sensor con password
-            if password and password.strip():
-                found_passwords.append(f"slot {sensor_id}: {password}")
+            normalized_password = normalize_card_uid(sensor.get("password", ""))
+            if not normalized_password:
+                continue
+            assigned_slots += 1
             
-            # Normalizar el password para comparación
-            if password:
-                # Eliminar espacios
-                normalized_password = password.strip()
-                
-                # Si es formato AA:BB:CC:DD, convertir a AABBCCDD para comparación
-                if ":" in normalized_password:
-                    normalized_password = normalized_password.replace(":", "")
-                
-                # Si es formato AA-BB-CC-DD, convertir a AABBCCDD para comparación
-                if "-" in normalized_password:
-                    normalized_password = normalized_password.replace("-", "")
-                
-                # Debug detallado de cada comparación
-                comparison_details.append(f"slot {sensor_id}: '{password}' → '{normalized_password}' vs '{normalized_card}' = {normalized_password.upper() == normalized_card.upper()}")
-                
-                # Comparar los valores normalizados
-                if normalized_password.upper() == normalized_card.upper():
-                    logger.info(f"Tarjeta {card_value} encontrada en slot {sensor_id} del dispositivo {device_id}")
-                    return True, sensor_id
+            if normalized_password == normalized_card:
+                sensor_id = str(sensor.get("sensor_id", ""))
+                logger.info(f"Tarjeta {card_value} encontrada en slot {sensor_id} del dispositivo {device_id}")
+                return True, sensor_id
         
-        # Log detallado para ayudar en el debug
-        logger.debug(f"Comparaciones detalladas: {comparison_details}")
-        if found_passwords:
-            logger.info(f"Tarjeta {card_value} NO encontrada en dispositivo {device_id}. Tarjetas existentes: {', '.join(found_passwords)}")
-        else:
-            logger.info(f"Tarjeta {card_value} NO encontrada en dispositivo {device_id}. No hay tarjetas asignadas en ningún slot.")
+        logger.info(f"Tarjeta {card_value} NO encontrada en dispositivo {device_id} ({assigned_slots} slots con tarjeta asignada)")
         
         # Si llegamos aquí, la tarjeta no existe en ningún slot
         return False, None
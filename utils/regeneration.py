@@ -15,14 +15,26 @@ import logging
 # Importar funciones de API necesarias
 from utils.api import get_daily_readings_for_year_multiple_tags_project_parallel, ensure_project_folder_exists, get_daily_readings_for_tag, clean_readings_file_errors
 from utils.error_analysis import group_errors_for_regeneration
+from utils.auth import token_identity
+from utils.jobs import get_job_manager, register_job_handler
+from utils.repositories.readings_writer import get_readings_write_coordinator
 
 # Constantes
 REGENERATION_STATUS_FILE = "data/regeneration_status.json"
+REGENERATION_JOB = "readings_regeneration"
 
-def regenerate_readings_in_bulk(error_list, project_id, token_data, only_errors=True, continue_on_error=True, max_retries=3):
+def _task_key(asset_id, consumption_type, period):
+    return f"{asset_id}|{consumption_type}|{period}"
+
+def regenerate_readings_in_bulk(error_list, project_id, token_data, only_errors=True, continue_on_error=True, max_retries=3, job=None):
     """
     Regenera múltiples lecturas en lote.
     
+    Sin ``job`` el progreso se guarda en REGENERATION_STATUS_FILE tras cada
+    tarea. Con ``job`` (un ``utils.jobs.JobContext``) el progreso se cuenta en
+    el trabajo, la regeneración se detiene si se cancela y, si el trabajo se
+    reanuda tras un reinicio, se omiten las tareas ya registradas.
+    
     Args:
         error_list: Lista de errores a regenerar
         project_id: ID del proyecto
@@ -30,6 +42,7 @@ def regenerate_readings_in_bulk(error_list, project_id, token_data, only_errors=
         only_errors: Si es True, solo regenera los valores con error; si es False, regenera archivos completos
         continue_on_error: Si es True, continúa con la regeneración aunque haya errores
         max_retries: Número máximo de intentos por lectura
+        job: Trabajo en segundo plano al que informar del progreso
         
     Returns:
         dict: Resultados de la regeneración (éxitos, fallos, etc.)
@@ -46,18 +59,42 @@ def regenerate_readings_in_bulk(error_list, project_id, token_data, only_errors=
         'status': 'in_progress'
     }
     
-    # Guardar estado inicial
-    save_regeneration_status(results)
-    
     # Agrupar errores para regeneración eficiente
     tasks = group_errors_for_regeneration({"items": error_list}, only_errors)
     
+    def record(detail):
+        """Registra el resultado de una tarea."""
+        results['processed'] += 1
+        results['success' if detail['status'] == 'success' else 'failed'] += 1
+        results['details'].append(detail)
+        if job is not None:
+            job.advance(success=detail['status'] == 'success', detail=detail)
+        else:
+            save_regeneration_status(results)
+    
+    done_keys = set()
+    if job is not None:
+        job.set_total(len(tasks))
+        # Al reanudar un trabajo, sus tareas ya registradas no se repiten
+        for detail in job.details:
+            done_keys.add(_task_key(detail.get('asset_id'), detail.get('consumption_type'), detail.get('period')))
+    else:
+        # Guardar estado inicial
+        save_regeneration_status(results)
+    
     # Procesar cada tarea
     for task in tasks:
         asset_id = task.get('asset_id')
         consumption_type = task.get('consumption_type')
         period = task.get('period')
         
+        if job is not None:
+            if job.is_cancelled():
+                results['status'] = 'cancelled'
+                break
+            if _task_key(asset_id, consumption_type, period) in done_keys:
+                continue
+        
         # Extraer año y mes del período
         try:
             year, month = period.split('-')
@@ -65,16 +102,13 @@ def regenerate_readings_in_bulk(error_list, project_id, token_data, only_errors=
             month = int(month)
         except (ValueError, AttributeError):
             # Si hay un error en el formato del período, registrarlo y continuar
-            results['failed'] += 1
-            results['processed'] += 1
-            results['details'].append({
+            record({
                 'asset_id': asset_id,
                 'consumption_type': consumption_type,
                 'period': period,
                 'status': 'failed',
                 'reason': 'Formato de período inválido'
             })
-            save_regeneration_status(results)
             if not continue_on_error:
                 break
             continue
@@ -109,19 +143,15 @@ def regenerate_readings_in_bulk(error_list, project_id, token_data, only_errors=
                 time.sleep(1)  # Pequeña pausa antes del siguiente intento
         
         # Registrar el resultado
-        results['processed'] += 1
-        
         if success:
-            results['success'] += 1
-            results['details'].append({
+            record({
                 'asset_id': asset_id,
                 'consumption_type': consumption_type,
                 'period': period,
                 'status': 'success'
             })
         else:
-            results['failed'] += 1
-            results['details'].append({
+            record({
                 'asset_id': asset_id,
                 'consumption_type': consumption_type,
                 'period': period,
@@ -129,20 +159,48 @@ def regenerate_readings_in_bulk(error_list, project_id, token_data, only_errors=
                 'reason': error_message
             })
         
-        # Guardar estado actual
-        save_regeneration_status(results)
-        
         # Si hay un error y no se debe continuar, detener el proceso
         if not success and not continue_on_error:
             break
     
     # Finalizar y guardar resultados
     results['end_time'] = datetime.now().isoformat()
-    results['status'] = 'completed'
-    save_regeneration_status(results)
+    if results['status'] != 'cancelled':
+        results['status'] = 'completed'
+    if job is None:
+        save_regeneration_status(results)
     
     return results
 
+def _run_regeneration_job(job, error_list, project_id, token_data, only_errors=True, continue_on_error=True, max_retries=3):
+    results = regenerate_readings_in_bulk(
+        error_list, project_id, token_data,
+        only_errors=only_errors,
+        continue_on_error=continue_on_error,
+        max_retries=max_retries,
+        job=job
+    )
+    # El detalle ya está en el trabajo; el resultado solo guarda el resumen
+    return {key: value for key, value in results.items() if key != 'details'}
+
+register_job_handler(REGENERATION_JOB, _run_regeneration_job)
+
+def submit_bulk_regeneration(error_list, project_id, token_data, only_errors=True, continue_on_error=True, max_retries=3):
+    """
+    Encola una regeneración masiva como trabajo en segundo plano.
+    
+    Returns:
+        str: ID del trabajo; su progreso se consulta con get_regeneration_status(job_id)
+    """
+    return get_job_manager().submit(REGENERATION_JOB, {
+        'error_list': error_list,
+        'project_id': project_id,
+        'only_errors': only_errors,
+        'continue_on_error': continue_on_error,
+        'max_retries': max_retries,
+    }, total=len(error_list), secrets={'token_data': token_data},
+        owner=token_identity(token_data.get('token') if isinstance(token_data, dict) else token_data))
+
 def regenerate_single_reading(asset_id, consumption_type, year, month, project_id, token_data, only_errors=True):
     """
     Regenera una lectura individual.
@@ -184,44 +242,48 @@ def regenerate_single_reading(asset_id, consumption_type, year, month, project_i
         # Asegurar que el directorio existe
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         
+        # Las escrituras pasan por el coordinador compartido, que serializa cada
+        # archivo y mantiene al día el catálogo y el almacén de lecturas
+        coordinator = get_readings_write_coordinator()
+        
         if only_errors:
             # Si solo se regeneran valores con error, primero hay que cargar el archivo existente
             if os.path.exists(file_path):
-                df = pd.read_csv(file_path)
-                
-                # Convertir la fecha a datetime
-                df['date'] = pd.to_datetime(df['date'])
-                
-                # Filtrar las filas del mes específico
-                month_mask = (df['date'].dt.month == month) & (df['date'].dt.year == year)
-                
-                # Filtrar las filas con error
-                error_mask = df['consumption'] == 'Error'
-                
-                # Combinar las máscaras
-                combined_mask = month_mask & error_mask
-                
-                if not combined_mask.any():
-                    # No hay errores para regenerar en este mes
-                    return True
-                
-                # Obtener las fechas con error
-                error_dates = df.loc[combined_mask, 'date'].dt.strftime('%Y-%m-%d').tolist()
-                
-                # Regenerar solo las fechas con error
-                # Aquí iría la llamada a la API para regenerar lecturas específicas
-                # Por ahora, simulamos que se regeneran correctamente
-                
-                # En un caso real, aquí se llamaría a la API para obtener nuevas lecturas
-                # y se actualizarían solo las filas correspondientes
-                
-                # Simulación: marcar como regeneradas
-                df.loc[combined_mask, 'consumption'] = 0.0  # Valor simulado
-                df.loc[combined_mask, 'regenerated'] = True
+                def regenerate_errors(df):
+                    if df is None:
+                        return None
+                    df = df.copy()
+                    
+                    # Convertir la fecha a datetime
+                    df['date'] = pd.to_datetime(df['date'])
+                    
+                    # Filtrar las filas del mes específico
+                    month_mask = (df['date'].dt.month == month) & (df['date'].dt.year == year)
+                    
+                    # Filtrar las filas con error
+                    error_mask = df['consumption'] == 'Error'
+                    
+                    # Combinar las máscaras
+                    combined_mask = month_mask & error_mask
+                    
+                    if not combined_mask.any():
+                        # No hay errores para regenerar en este mes: el archivo no cambia
+                        return None
+                    
+                    # Regenerar solo las fechas con error
+                    # Aquí iría la llamada a la API para regenerar lecturas específicas
+                    # Por ahora, simulamos que se regeneran correctamente
+                    
+                    # En un caso real, aquí se llamaría a la API para obtener nuevas lecturas
+                    # y se actualizarían solo las filas correspondientes
+                    
+                    # Simulación: marcar como regeneradas
+                    df.loc[combined_mask, 'consumption'] = 0.0  # Valor simulado
+                    df.loc[combined_mask, 'regenerated'] = True
+                    return df
                 
                 # Guardar el archivo actualizado
-                df.to_csv(file_path, index=False)
-                
+                coordinator.update(file_path, regenerate_errors)
                 return True
             else:
                 # Si el archivo no existe, regenerar el mes completo
@@ -252,35 +314,26 @@ def regenerate_single_reading(asset_id, consumption_type, year, month, project_i
             }
             new_df = pd.DataFrame(data)
             
-            # Si el archivo existe, actualizar solo el mes específico
-            if os.path.exists(file_path):
+            def replace_month(df):
+                # Si el archivo no existe, se guarda el nuevo mes
+                if df is None:
+                    return new_df
                 try:
-                    df = pd.read_csv(file_path)
+                    df = df.copy()
                     df['date'] = pd.to_datetime(df['date'])
                     
                     # Eliminar las filas del mes a regenerar
                     month_mask = (df['date'].dt.month == month) & (df['date'].dt.year == year)
                     df = df[~month_mask]
                     
-                    # Concatenar con los nuevos datos
-                    df = pd.concat([df, new_df], ignore_index=True)
-                    
-                    # Ordenar por fecha
-                    df = df.sort_values('date')
-                    
-                    # Guardar el archivo actualizado
-                    df.to_csv(file_path, index=False)
-                except Exception as e:
+                    # Concatenar con los nuevos datos y ordenar por fecha
+                    return pd.concat([df, new_df], ignore_index=True).sort_values('date')
+                except Exception:
                     # Si hay un error al procesar el archivo existente, crear uno nuevo
-                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                    new_df.to_csv(file_path, index=False)
-            else:
-                # Crear el directorio si no existe
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                
-                # Guardar el nuevo archivo
-                new_df.to_csv(file_path, index=False)
+                    return new_df
             
+            # Guardar el archivo actualizado
+            coordinator.update(file_path, replace_month)
             return True
         
         return False
@@ -291,13 +344,24 @@ def regenerate_single_reading(asset_id, consumption_type, year, month, project_i
         traceback.print_exc()
         return False
 
-def get_regeneration_status():
+def get_regeneration_status(job_id=None):
     """
     Obtiene el estado actual de la regeneración.
     
+    Args:
+        job_id: ID del trabajo de regeneración; por defecto, el más reciente
+        
     Returns:
         dict: Estado actual de la regeneración
     """
+    manager = get_job_manager()
+    if job_id:
+        return manager.get(job_id)
+    jobs = manager.list_jobs(REGENERATION_JOB)
+    if jobs:
+        return manager.get(jobs[0]['job_id'])
+    
+    # Estado de una regeneración lanzada sin trabajo (llamada directa)
     try:
         if os.path.exists(REGENERATION_STATUS_FILE):
             with open(REGENERATION_STATUS_FILE, 'r') as f:
@@ -340,8 +404,7 @@ def is_regeneration_in_progress():
     Returns:
         bool: True si hay una regeneración en progreso, False en caso contrario
     """
-    status = get_regeneration_status()
-    return status is not None and status.get('status') == 'in_progress'
+    return get_job_manager().find_active(REGENERATION_JOB) is not None
 
 def regenerate_readings(asset_id, consumption_type, project_id, token_data, month_year=None):
     """
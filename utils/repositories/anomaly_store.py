@@ -0,0 +1,333 @@
+# utils/repositories/anomaly_store.py
+"""
+Almacén indexado (SQLite) de anomalías de lecturas.
+
+Sustituye a los archivos ``data/anomalies/anomaly_<asset>_<yyyymmdd>.json``:
+cada anomalía es una fila de la tabla ``anomalies`` con su clave
+(``<asset>_<tipo de consumo>_<yyyymmdd>``), las columnas por las que se
+consulta (asset, tipo de consumo y fecha) y el diccionario completo
+serializado en JSON.
+
+Las consultas por asset, tipo de consumo y rango de fechas usan índices, de
+modo que su coste no depende del número total de anomalías guardadas. Hay una
+anomalía por asset, tipo de consumo y día: guardar otra con la misma clave la
+sustituye. A diferencia de los archivos, que solo distinguían asset y día, dos
+reinicios del mismo día en contadores distintos de un asset (por ejemplo, agua
+fría y caliente cambiados a la vez) se guardan por separado. Las bases de
+datos creadas con la clave antigua se migran al abrirlas.
+
+Los archivos JSON existentes se migran una sola vez (``migrate_json_files``);
+la migración queda registrada en la propia base de datos y los archivos no se
+modifican. También puede lanzarse a mano::
+
+    python -m utils.repositories.anomaly_store [--db data/anomalies/anomalies.db] [--json-dir data/anomalies]
+"""
+import os
+import glob
+import json
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+ANOMALIES_PATH = "data/anomalies/"
+DB_FILENAME = "anomalies.db"
+DATE_KEY_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+# Versión del formato de anomaly_key guardada en store_meta (1: <asset>_<yyyymmdd>)
+KEY_FORMAT_VERSION = "2"
+NUMERIC_FIELDS = ['previous_value', 'current_value', 'offset']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS anomalies (
+    anomaly_key TEXT PRIMARY KEY,
+    asset_id TEXT,
+    consumption_type TEXT,
+    date_key TEXT,
+    type TEXT,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_anomalies_series ON anomalies (asset_id, consumption_type, date_key);
+CREATE INDEX IF NOT EXISTS idx_anomalies_type_date ON anomalies (consumption_type, date_key);
+CREATE INDEX IF NOT EXISTS idx_anomalies_date ON anomalies (date_key);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_init_lock = threading.Lock()
+
+
+def parse_anomaly_date(value):
+    """Convierte la fecha de una anomalía (o de un filtro) a datetime; devuelve None si no se puede"""
+    if value is None or isinstance(value, datetime):
+        return value
+    if hasattr(value, 'to_pydatetime'):
+        return value.to_pydatetime()
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            try:
+                # Intentar otro formato común
+                return datetime.strptime(value.split('T')[0], '%Y-%m-%d')
+            except ValueError:
+                return None
+    return None
+
+
+def date_key(value) -> Optional[str]:
+    """Fecha en texto de ancho fijo (UTC sin zona horaria) para comparar en SQL"""
+    parsed = parse_anomaly_date(value)
+    if parsed is None:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime(DATE_KEY_FORMAT)
+
+
+def anomaly_key(anomaly: Dict) -> str:
+    """Clave de una anomalía: asset, tipo de consumo y día"""
+    anomaly_date = parse_anomaly_date(anomaly.get('date'))
+    if anomaly_date is None:
+        logger.error(f"No se pudo convertir la fecha de anomalía: {anomaly.get('date')}")
+        # Usar la fecha actual como fallback
+        anomaly_date = datetime.now()
+    return f"{anomaly.get('asset_id')}_{anomaly.get('consumption_type')}_{anomaly_date.strftime('%Y%m%d')}"
+
+
+def _optional_text(value) -> Optional[str]:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    return str(value)
+
+
+class AnomalyStore:
+    """Anomalías en una base de datos SQLite con índices por asset, tipo de consumo y fecha."""
+
+    def __init__(self, db_path: str = os.path.join(ANOMALIES_PATH, DB_FILENAME)):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with _init_lock, closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+            self._migrate_keys(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        # WAL permite lecturas mientras otro hilo o proceso escribe
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _migrate_keys(self, conn: sqlite3.Connection) -> None:
+        """Pasa las claves <asset>_<yyyymmdd> de bases de datos anteriores al formato actual"""
+        row = conn.execute("SELECT value FROM store_meta WHERE key = 'key_format'").fetchone()
+        if row and row[0] == KEY_FORMAT_VERSION:
+            return
+        renamed = []
+        for key, payload in conn.execute("SELECT anomaly_key, payload FROM anomalies").fetchall():
+            try:
+                new_key = anomaly_key(json.loads(payload))
+            except ValueError as e:
+                logger.error(f"Error al migrar la clave de la anomalía {key}: {str(e)}")
+                continue
+            if new_key != key:
+                renamed.append((new_key, key))
+        with conn:
+            conn.executemany("UPDATE OR REPLACE anomalies SET anomaly_key = ? WHERE anomaly_key = ?", renamed)
+            conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('key_format', ?)",
+                         (KEY_FORMAT_VERSION,))
+        if renamed:
+            logger.info(f"Migradas {len(renamed)} claves de anomalías al formato asset, tipo de consumo y día")
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def _row(self, anomaly: Dict) -> tuple:
+        return (
+            anomaly_key(anomaly),
+            _optional_text(anomaly.get('asset_id')),
+            _optional_text(anomaly.get('consumption_type')),
+            date_key(anomaly.get('date')),
+            _optional_text(anomaly.get('type')),
+            json.dumps(anomaly, default=str),
+        )
+
+    def save_many(self, anomalies: Iterable[Dict]) -> List[str]:
+        """
+        Inserta o sustituye un lote de anomalías en una sola transacción
+
+        Si varias anomalías comparten asset, tipo de consumo y día, queda la última.
+
+        Returns:
+            Lista de claves guardadas (sin repetir)
+        """
+        rows = {}
+        for anomaly in anomalies:
+            row = self._row(anomaly)
+            rows[row[0]] = row
+        if not rows:
+            return []
+
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO anomalies "
+                "(anomaly_key, asset_id, consumption_type, date_key, type, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                list(rows.values())
+            )
+        return list(rows)
+
+    def update_many(self, anomalies: Iterable[Dict]) -> List[str]:
+        """
+        Actualiza un lote de anomalías, conservando en 'original_type' el tipo guardado
+
+        Las anomalías que no existen se crean.
+
+        Returns:
+            Lista de claves guardadas (sin repetir)
+        """
+        anomalies = list(anomalies)
+        keys = [anomaly_key(anomaly) for anomaly in anomalies]
+        existing = self._existing_types(keys)
+        for key, anomaly in zip(keys, anomalies):
+            if 'original_type' not in anomaly and existing.get(key) is not None:
+                anomaly['original_type'] = existing[key]
+        return self.save_many(anomalies)
+
+    def _existing_types(self, keys: List[str]) -> Dict[str, str]:
+        types = {}
+        with closing(self._connect()) as conn:
+            # Consultas por bloques para no superar el límite de parámetros de SQLite
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                types.update(conn.execute(
+                    f"SELECT anomaly_key, type FROM anomalies WHERE anomaly_key IN ({placeholders})", chunk
+                ).fetchall())
+        return types
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def query(self, asset_id=None, consumption_type=None, start_date=None, end_date=None) -> List[Dict]:
+        """
+        Obtiene las anomalías que cumplen los filtros, ordenadas por fecha
+
+        Los filtros vacíos no se aplican. Las fechas pueden ser datetime o texto ISO.
+        Las anomalías con una fecha no interpretable no se devuelven.
+        """
+        conditions = ["date_key IS NOT NULL"]
+        params = []
+        if asset_id:
+            conditions.append("asset_id = ?")
+            params.append(str(asset_id))
+        if consumption_type:
+            conditions.append("consumption_type = ?")
+            params.append(str(consumption_type))
+        if start_date:
+            conditions.append("date_key >= ?")
+            params.append(date_key(start_date))
+        if end_date:
+            conditions.append("date_key <= ?")
+            params.append(date_key(end_date))
+
+        sql = f"SELECT anomaly_key, payload FROM anomalies WHERE {' AND '.join(conditions)} ORDER BY date_key"
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        anomalies = []
+        for key, payload in rows:
+            try:
+                anomaly = json.loads(payload)
+            except ValueError as e:
+                logger.error(f"Error al procesar la anomalía {key}: {str(e)}")
+                continue
+            # Asegurar que los valores numéricos sean de tipo float
+            for field in NUMERIC_FIELDS:
+                if field in anomaly and isinstance(anomaly[field], str):
+                    try:
+                        anomaly[field] = float(anomaly[field])
+                    except (ValueError, TypeError):
+                        logger.warning(f"No se pudo convertir {field} a número: {anomaly[field]}")
+            anomalies.append(anomaly)
+        return anomalies
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Devuelve la anomalía con la clave indicada, o None si no existe"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT payload FROM anomalies WHERE anomaly_key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def count(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM anomalies").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Migración
+    # ------------------------------------------------------------------
+    def _get_meta(self, key: str) -> Optional[str]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def migrate_json_files(self, json_dir: str = ANOMALIES_PATH, force: bool = False) -> int:
+        """
+        Importa los archivos ``anomaly_*.json`` de una carpeta (una sola vez)
+
+        Los archivos no se modifican. Si ya hay una anomalía con la misma clave
+        en el almacén, se conserva la del almacén.
+
+        Args:
+            json_dir: Carpeta con los archivos JSON
+            force: Si es True, vuelve a importar aunque la carpeta ya se haya migrado
+
+        Returns:
+            Número de anomalías importadas
+        """
+        meta_key = f"json_migrated:{os.path.abspath(json_dir)}"
+        if not force and self._get_meta(meta_key):
+            return 0
+
+        rows = []
+        for path in sorted(glob.glob(os.path.join(json_dir, "anomaly_*.json"))):
+            try:
+                with open(path, 'r') as f:
+                    rows.append(self._row(json.load(f)))
+            except Exception as e:
+                logger.error(f"Error al migrar el archivo de anomalía {path}: {str(e)}")
+
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO anomalies "
+                "(anomaly_key, asset_id, consumption_type, date_key, type, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            imported = max(cursor.rowcount, 0)
+            conn.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)",
+                (meta_key, datetime.now().isoformat())
+            )
+
+        if rows:
+            logger.info(f"Migradas {imported} anomalías desde {len(rows)} archivos JSON de {json_dir}")
+        return imported
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migra las anomalías en JSON al almacén SQLite")
+    parser.add_argument("--db", default=os.path.join(ANOMALIES_PATH, DB_FILENAME))
+    parser.add_argument("--json-dir", default=ANOMALIES_PATH)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+    count = AnomalyStore(args.db).migrate_json_files(args.json_dir, force=args.force)
+    print(f"Anomalías migradas: {count}")
@@ -1,65 +1,38 @@
 # utils/repositories/reading_repository.py
 import os
-import json
-import glob
 from datetime import datetime
 import pandas as pd
 import logging
 from utils.logging import get_logger
+from utils.repositories.anomaly_store import ANOMALIES_PATH, DB_FILENAME, AnomalyStore
+from utils.repositories.readings_catalog import get_readings_catalog
 
 logger = get_logger(__name__)
 
 class ReadingRepository:
-    def __init__(self, data_source_path="data/readings/"):
+    def __init__(self, data_source_path="data/readings/", anomaly_store=None):
         self.data_source_path = data_source_path
-        self.anomalies_path = "data/anomalies/"
+        self.anomalies_path = ANOMALIES_PATH
         
-        # Crear directorio para anomalías si no existe
-        os.makedirs(self.anomalies_path, exist_ok=True)
+        # Almacén indexado de anomalías; importa una sola vez los antiguos archivos JSON
+        self.anomaly_store = anomaly_store or AnomalyStore(os.path.join(self.anomalies_path, DB_FILENAME))
+        self.anomaly_store.migrate_json_files(self.anomalies_path)
     
     def get_original_readings(self, asset_id, consumption_type, start_date=None, end_date=None):
         """Obtiene las lecturas originales sin modificaciones"""
         logger.info(f"Buscando lecturas para asset_id={asset_id}, consumption_type={consumption_type}")
         
-        # Buscar en la carpeta de datos analizados
-        analyzed_data_folder = os.path.join("data", "analyzed_data")
-        matching_files = []
-        
-        if os.path.exists(analyzed_data_folder):
-            # Buscar en todas las carpetas de proyectos
-            for project_folder in os.listdir(analyzed_data_folder):
-                project_path = os.path.join(analyzed_data_folder, project_folder)
-                if os.path.isdir(project_path):
-                    # Buscar archivos que coincidan con el patrón
-                    for filename in os.listdir(project_path):
-                        # Buscar archivos con un solo guion bajo (formato según PROJECT_CONTEXT.md)
-                        if filename.startswith(f"daily_readings_{asset_id}_") and filename.endswith(".csv"):
-                            file_path = os.path.join(project_path, filename)
-                            matching_files.append({
-                                "project_id": project_folder,
-                                "filename": filename,
-                                "full_path": file_path,
-                                "priority": 1  # Mayor prioridad para el formato según PROJECT_CONTEXT.md
-                            })
-                        # Buscar archivos con doble guion bajo (formato antiguo)
-                        elif filename.startswith(f"daily_readings_{asset_id}__") and filename.endswith(".csv"):
-                            file_path = os.path.join(project_path, filename)
-                            matching_files.append({
-                                "project_id": project_folder,
-                                "filename": filename,
-                                "full_path": file_path,
-                                "priority": 2  # Menor prioridad para el formato antiguo
-                            })
+        # Buscar los archivos del asset en el catálogo de lecturas (sin recorrer las carpetas de proyecto)
+        # Primero los del tipo de consumo pedido y, dentro de ellos, el formato según PROJECT_CONTEXT.md
+        # (un solo guion bajo) antes que el formato antiguo (doble guion bajo)
+        matching_files = get_readings_catalog().get_asset_files(asset_id, consumption_type)
         
         # Si encontramos archivos CSV, cargar los datos
         if matching_files:
             logger.info(f"Se encontraron {len(matching_files)} archivos CSV para el asset {asset_id}")
             
-            # Ordenar por prioridad (primero los de formato nuevo, luego los antiguos)
-            matching_files.sort(key=lambda x: x.get("priority", 99))
-            
             # Usar el primer archivo encontrado según la prioridad
-            file_path = matching_files[0]["full_path"]
+            file_path = matching_files[0]["path"]
             logger.info(f"Cargando datos desde {file_path}")
             
             try:
@@ -164,149 +137,48 @@ class ReadingRepository:
         return example_data
     
     def save_anomaly(self, anomaly):
-        """Guarda una anomalía detectada"""
-        # Generar nombre de archivo basado en asset_id y fecha
-        asset_id = anomaly.get('asset_id')
-        
-        # Convertir fecha a datetime si es string
-        anomaly_date = anomaly.get('date')
-        if isinstance(anomaly_date, str):
-            try:
-                anomaly_date = datetime.fromisoformat(anomaly_date.replace('Z', '+00:00'))
-            except ValueError:
-                try:
-                    # Intentar otro formato común
-                    anomaly_date = datetime.strptime(anomaly_date.split('T')[0], '%Y-%m-%d')
-                except ValueError:
-                    logger.error(f"No se pudo convertir la fecha de anomalía: {anomaly_date}")
-                    # Usar la fecha actual como fallback
-                    anomaly_date = datetime.now()
-        
-        date_str = anomaly_date.strftime('%Y%m%d')
-        filename = f"{self.anomalies_path}anomaly_{asset_id}_{date_str}.json"
-        
-        # Guardar anomalía como JSON
-        with open(filename, 'w') as f:
-            json.dump(anomaly, f, default=str)
-        
-        return filename
+        """Guarda una anomalía detectada y devuelve su clave en el almacén"""
+        return self.anomaly_store.save_many([anomaly])[0]
     
-    def update_anomaly(self, anomaly):
-        """Actualiza una anomalía existente"""
-        # Generar nombre de archivo basado en asset_id y fecha
-        asset_id = anomaly.get('asset_id')
+    def save_anomalies(self, anomalies):
+        """
+        Guarda un lote de anomalías detectadas en una sola transacción
         
-        # Convertir fecha a datetime si es string
-        anomaly_date = anomaly.get('date')
-        if isinstance(anomaly_date, str):
-            try:
-                anomaly_date = datetime.fromisoformat(anomaly_date.replace('Z', '+00:00'))
-            except ValueError:
-                try:
-                    # Intentar otro formato común
-                    anomaly_date = datetime.strptime(anomaly_date.split('T')[0], '%Y-%m-%d')
-                except ValueError:
-                    logger.error(f"No se pudo convertir la fecha de anomalía: {anomaly_date}")
-                    # Usar la fecha actual como fallback
-                    anomaly_date = datetime.now()
-        
-        date_str = anomaly_date.strftime('%Y%m%d')
-        filename = f"{self.anomalies_path}anomaly_{asset_id}_{date_str}.json"
-        
-        logger.info(f"Actualizando anomalía en {filename}")
-        logger.info(f"Tipo anterior: {anomaly.get('original_type', 'desconocido')}, Nuevo tipo: {anomaly.get('type')}")
-        
-        # Verificar si el archivo existe
-        if not os.path.exists(filename):
-            logger.warning(f"No se encontró el archivo de anomalía {filename}, creando uno nuevo")
-            return self.save_anomaly(anomaly)
-        
-        # Leer la anomalía existente para comparar
-        try:
-            with open(filename, 'r') as f:
-                existing_anomaly = json.load(f)
-            logger.info(f"Anomalía existente: {existing_anomaly.get('type')}")
+        Args:
+            anomalies: Lista de anomalías (diccionarios) o DataFrame con una anomalía por fila
             
-            # Guardar el tipo original antes de actualizarlo
-            if 'original_type' not in anomaly and 'type' in existing_anomaly:
-                anomaly['original_type'] = existing_anomaly['type']
-        except Exception as e:
-            logger.error(f"Error al leer la anomalía existente: {str(e)}")
-        
-        # Guardar anomalía actualizada como JSON
-        try:
-            with open(filename, 'w') as f:
-                json.dump(anomaly, f, default=str)
-            logger.info(f"Anomalía actualizada correctamente en {filename}")
-        except Exception as e:
-            logger.error(f"Error al guardar la anomalía actualizada: {str(e)}")
-            return None
-        
-        return filename
+        Returns:
+            Lista de claves guardadas (si varias anomalías comparten asset, tipo de consumo y día, queda la última)
+        """
+        if isinstance(anomalies, pd.DataFrame):
+            anomalies = anomalies.to_dict('records')
+        
+        keys = self.anomaly_store.save_many(anomalies)
+        logger.info(f"Guardadas {len(keys)} anomalías en {self.anomaly_store.db_path}")
+        return keys
+    
+    def update_anomaly(self, anomaly):
+        """Actualiza una anomalía existente (o la crea si no existe)"""
+        return self.update_anomalies([anomaly])[0]
+    
+    def update_anomalies(self, anomalies):
+        """
+        Actualiza un lote de anomalías, guardando el tipo anterior en 'original_type'
+        
+        Returns:
+            Lista de claves actualizadas
+        """
+        anomalies = list(anomalies)
+        for anomaly in anomalies:
+            logger.info(f"Actualizando anomalía: tipo anterior {anomaly.get('original_type', 'desconocido')}, "
+                        f"nuevo tipo {anomaly.get('type')}")
+        return self.anomaly_store.update_many(anomalies)
     
     def get_anomalies(self, asset_id=None, consumption_type=None, start_date=None, end_date=None):
-        """Obtiene las anomalías registradas con filtros opcionales"""
-        # Listar todos los archivos de anomalías
-        anomaly_files = glob.glob(f"{self.anomalies_path}anomaly_*.json")
-        
-        # Convertir start_date y end_date a objetos datetime si son strings
-        if start_date and isinstance(start_date, str):
-            try:
-                start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            except ValueError:
-                # Intentar otro formato común
-                start_date = datetime.strptime(start_date.split('T')[0], '%Y-%m-%d')
-        
-        if end_date and isinstance(end_date, str):
-            try:
-                end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            except ValueError:
-                # Intentar otro formato común
-                end_date = datetime.strptime(end_date.split('T')[0], '%Y-%m-%d')
-        
-        anomalies = []
-        for file in anomaly_files:
-            try:
-                with open(file, 'r') as f:
-                    anomaly = json.load(f)
-                    
-                    # Aplicar filtros
-                    if asset_id and anomaly.get('asset_id') != asset_id:
-                        continue
-                        
-                    if consumption_type and anomaly.get('consumption_type') != consumption_type:
-                        continue
-                    
-                    # Convertir fecha a datetime para comparación
-                    anomaly_date = anomaly.get('date')
-                    if isinstance(anomaly_date, str):
-                        try:
-                            anomaly_date = datetime.fromisoformat(anomaly_date.replace('Z', '+00:00'))
-                        except ValueError:
-                            # Intentar otro formato común
-                            try:
-                                anomaly_date = datetime.strptime(anomaly_date.split('T')[0], '%Y-%m-%d')
-                            except ValueError:
-                                # Si no se puede convertir, omitir esta anomalía
-                                logger.warning(f"No se pudo convertir la fecha de anomalía: {anomaly_date}")
-                                continue
-                    
-                    if start_date and anomaly_date < start_date:
-                        continue
-                        
-                    if end_date and anomaly_date > end_date:
-                        continue
-                    
-                    # Asegurar que los valores numéricos sean de tipo float
-                    for key in ['previous_value', 'current_value', 'offset']:
-                        if key in anomaly and isinstance(anomaly[key], str):
-                            try:
-                                anomaly[key] = float(anomaly[key])
-                            except (ValueError, TypeError):
-                                logger.warning(f"No se pudo convertir {key} a número: {anomaly[key]}")
-                    
-                    anomalies.append(anomaly)
-            except Exception as e:
-                logger.error(f"Error al procesar archivo de anomalía {file}: {str(e)}")
-        
-        return anomalies
\ No newline at end of file
+        """Obtiene las anomalías registradas con filtros opcionales (consulta indexada)"""
+        return self.anomaly_store.query(
+            asset_id=asset_id,
+            consumption_type=consumption_type,
+            start_date=start_date,
+            end_date=end_date
+        )
@@ -0,0 +1,400 @@
+# utils/repositories/readings_catalog.py
+"""
+Catálogo de archivos de lecturas diarias por asset.
+
+Mantiene, para cada asset, sus archivos ``daily_readings_*.csv`` bajo
+``data/analyzed_data``: proyecto, tag, tipo de consumo, ruta, formato del
+nombre (``single`` para ``daily_readings_<asset>_<tipo>.csv``, ``double`` para
+``daily_readings_<asset>__<tag>.csv``), número de filas, rango de fechas y
+mtime/tamaño del archivo. Buscar los archivos de un asset o los assets de un
+proyecto es una consulta a un diccionario, sin recorrer directorios.
+
+El catálogo se mantiene al día de tres formas:
+
+* los escritores (``ReadingsWriteCoordinator``) y el cargador
+  (``load_all_csv_data``) registran cada archivo que escriben o leen, con las
+  filas y fechas que ya tienen en memoria;
+* antes de cada consulta se compara el mtime de cada carpeta de proyecto con
+  el registrado y solo se vuelven a escanear las carpetas en las que se han
+  creado, renombrado o borrado archivos (una llamada a ``stat`` por proyecto);
+* ``rebuild()`` lo reconstruye por completo desde disco.
+
+El catálogo se guarda en ``data/readings_catalog.json`` para no tener que
+escanear todo al arrancar.
+"""
+import os
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+ANALYZED_DATA_PATH = "data/analyzed_data"
+CATALOG_PATH = "data/readings_catalog.json"
+FILE_PREFIX = "daily_readings_"
+# Proyecto al que se asignan los CSV guardados directamente en la carpeta base
+ROOT_PROJECT = "default"
+# Intervalo mínimo entre escrituras del catálogo a disco tras registrar archivos
+SAVE_INTERVAL_SECONDS = 10
+
+
+def _file_format(filename: str, asset_id: str) -> str:
+    """'double' para daily_readings_<asset>__<tag>.csv, 'single' para el resto"""
+    rest = filename[len(FILE_PREFIX) + len(asset_id):]
+    return 'double' if rest.startswith('__') else 'single'
+
+
+def _date_range(dates) -> Dict:
+    """Número de filas y rango de fechas (ISO) de una columna de fechas"""
+    parsed = pd.to_datetime(pd.Series(dates), errors='coerce', format='mixed').dropna()
+    return {
+        'rows': int(len(dates)),
+        'start_date': parsed.min().isoformat() if not parsed.empty else None,
+        'end_date': parsed.max().isoformat() if not parsed.empty else None,
+    }
+
+
+class ReadingsCatalog:
+    """Índice asset -> archivos de lecturas, sincronizado con las carpetas de proyecto."""
+
+    def __init__(self, base_path: str = ANALYZED_DATA_PATH, catalog_path: Optional[str] = CATALOG_PATH):
+        self.base_path = base_path
+        self.catalog_path = catalog_path
+        self._lock = threading.RLock()
+        self._files = {}        # ruta -> entrada
+        self._by_asset = {}     # asset_id -> {ruta: entrada}
+        self._projects = {}     # project_id -> {'mtime_ns': ..., 'paths': set()}
+        self._base_mtime_ns = None
+        self._dirty = False
+        self._last_save = 0.0
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+    def _load(self) -> None:
+        if not self.catalog_path or not os.path.exists(self.catalog_path):
+            return
+        try:
+            with open(self.catalog_path, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Catálogo de lecturas ilegible en {self.catalog_path}, se reconstruirá: {str(e)}")
+            return
+        if saved.get('base_path') != os.path.abspath(self.base_path):
+            return
+        for entry in saved.get('files', []):
+            self._add_entry(entry)
+        for project_id, mtime_ns in saved.get('projects', {}).items():
+            self._projects.setdefault(project_id, {'mtime_ns': None, 'paths': set()})['mtime_ns'] = mtime_ns
+        self._base_mtime_ns = saved.get('base_mtime_ns')
+
+    def save(self) -> None:
+        """Guarda el catálogo en disco (escritura atómica)"""
+        if not self.catalog_path:
+            return
+        with self._lock:
+            saved = {
+                'base_path': os.path.abspath(self.base_path),
+                'base_mtime_ns': self._base_mtime_ns,
+                'projects': {project_id: state['mtime_ns'] for project_id, state in self._projects.items()},
+                'files': list(self._files.values()),
+            }
+            self._dirty = False
+            self._last_save = time.monotonic()
+        directory = os.path.dirname(self.catalog_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.catalog_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(saved, f)
+            os.replace(tmp_path, self.catalog_path)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el catálogo de lecturas en {self.catalog_path}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _save_if_due(self) -> None:
+        if self._dirty and time.monotonic() - self._last_save >= SAVE_INTERVAL_SECONDS:
+            self.save()
+
+    # ------------------------------------------------------------------
+    # Entradas
+    # ------------------------------------------------------------------
+    def _add_entry(self, entry: Dict) -> None:
+        path = entry['path']
+        self._remove_entry(path)
+        self._files[path] = entry
+        self._by_asset.setdefault(entry['asset_id'], {})[path] = entry
+        self._projects.setdefault(entry['project_id'], {'mtime_ns': None, 'paths': set()})['paths'].add(path)
+
+    def _remove_entry(self, path: str) -> None:
+        entry = self._files.pop(path, None)
+        if entry is None:
+            return
+        asset_files = self._by_asset.get(entry['asset_id'], {})
+        asset_files.pop(path, None)
+        if not asset_files:
+            self._by_asset.pop(entry['asset_id'], None)
+        project = self._projects.get(entry['project_id'])
+        if project:
+            project['paths'].discard(path)
+
+    def _normalize(self, path: str) -> str:
+        """Ruta de un archivo relativa a la misma raíz que base_path, para usarla como clave"""
+        relative = os.path.relpath(os.path.abspath(path), os.path.abspath(self.base_path))
+        return os.path.normpath(os.path.join(self.base_path, relative))
+
+    def _project_for_path(self, path: str) -> str:
+        directory = os.path.dirname(path)
+        if os.path.abspath(directory) == os.path.abspath(self.base_path):
+            return ROOT_PROJECT
+        return os.path.basename(directory)
+
+    def _make_entry(self, path: str, stat: os.stat_result, frame: Optional[pd.DataFrame] = None) -> Optional[Dict]:
+        """Entrada de catálogo de un archivo; lee la columna de fechas si no se proporciona el contenido"""
+        from utils.data_loader import TAGS_TO_CONSUMPTION_TYPE, extract_asset_and_tag
+
+        filename = os.path.basename(path)
+        asset_id, tag = extract_asset_and_tag(filename)
+        if not asset_id:
+            return None
+
+        if frame is None:
+            try:
+                frame = pd.read_csv(path, usecols=['date'])
+            except Exception as e:
+                logger.debug(f"No se pudieron leer las fechas de {path}: {str(e)}")
+                frame = pd.DataFrame({'date': []})
+        dates = frame['date'] if 'date' in frame.columns else []
+
+        entry = {
+            'asset_id': asset_id,
+            'project_id': self._project_for_path(path),
+            'tag': tag,
+            'consumption_type': TAGS_TO_CONSUMPTION_TYPE.get(tag),
+            'path': path,
+            'filename': filename,
+            'format': _file_format(filename, asset_id),
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+        }
+        entry.update(_date_range(dates))
+        return entry
+
+    def record_file(self, path: str, frame: Optional[pd.DataFrame] = None) -> Optional[Dict]:
+        """
+        Registra (o actualiza) un archivo de lecturas recién escrito o leído
+
+        Args:
+            path: Ruta del CSV
+            frame: Contenido ya cargado del archivo (opcional); si no se da, se leen sus fechas
+
+        Returns:
+            La entrada registrada, o None si el archivo no existe o su nombre no es reconocible
+        """
+        path = self._normalize(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._remove_entry(path)
+            return None
+
+        with self._lock:
+            current = self._files.get(path)
+            if frame is None and current and current['mtime_ns'] == stat.st_mtime_ns and current['size'] == stat.st_size:
+                return current
+        entry = self._make_entry(path, stat, frame)
+        with self._lock:
+            if entry is None:
+                self._remove_entry(path)
+            else:
+                self._add_entry(entry)
+            self._dirty = True
+            self._save_if_due()
+        return entry
+
+    # ------------------------------------------------------------------
+    # Sincronización con disco
+    # ------------------------------------------------------------------
+    def _scan_directory(self, directory: str, project_id: str) -> None:
+        """Vuelve a escanear una carpeta: registra archivos nuevos o modificados y elimina los borrados"""
+        found = {}
+        try:
+            with os.scandir(directory) as entries:
+                for item in entries:
+                    if item.name.startswith(FILE_PREFIX) and item.name.endswith('.csv') and item.is_file():
+                        found[os.path.normpath(item.path)] = item.stat()
+        except OSError:
+            pass
+
+        project = self._projects.setdefault(project_id, {'mtime_ns': None, 'paths': set()})
+        for path in list(project['paths']):
+            if path not in found:
+                self._remove_entry(path)
+        for path, stat in found.items():
+            current = self._files.get(path)
+            if current and current['mtime_ns'] == stat.st_mtime_ns and current['size'] == stat.st_size:
+                continue
+            entry = self._make_entry(path, stat)
+            if entry is not None:
+                self._add_entry(entry)
+        self._dirty = True
+
+    def refresh(self) -> None:
+        """
+        Sincroniza el catálogo con las carpetas que han cambiado desde la última consulta
+
+        Solo se escanean las carpetas cuyo mtime ha cambiado (se han creado, renombrado
+        o borrado archivos en ellas); el resto cuesta un ``stat`` por carpeta.
+        """
+        with self._lock:
+            try:
+                base_stat = os.stat(self.base_path)
+            except OSError:
+                if self._files:
+                    self._files, self._by_asset, self._projects = {}, {}, {}
+                    self._dirty = True
+                return
+
+            changed = False
+            if base_stat.st_mtime_ns != self._base_mtime_ns:
+                # Carpeta base modificada: proyectos nuevos o borrados y CSV en la raíz
+                directories = {}
+                with os.scandir(self.base_path) as entries:
+                    for item in entries:
+                        if item.is_dir() and not item.name.startswith('.'):
+                            directories[item.name] = item.path
+                for project_id in list(self._projects):
+                    if project_id != ROOT_PROJECT and project_id not in directories:
+                        for path in list(self._projects[project_id]['paths']):
+                            self._remove_entry(path)
+                        del self._projects[project_id]
+                for project_id in directories:
+                    self._projects.setdefault(project_id, {'mtime_ns': None, 'paths': set()})
+                self._scan_directory(self.base_path, ROOT_PROJECT)
+                self._base_mtime_ns = base_stat.st_mtime_ns
+                changed = True
+
+            for project_id, project in self._projects.items():
+                if project_id == ROOT_PROJECT:
+                    continue
+                directory = os.path.join(self.base_path, project_id)
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                except OSError:
+                    continue
+                if mtime_ns != project['mtime_ns']:
+                    self._scan_directory(directory, project_id)
+                    project['mtime_ns'] = mtime_ns
+                    changed = True
+
+            if changed:
+                self._dirty = True
+                self._save_if_due()
+
+    def rebuild(self) -> int:
+        """
+        Reconstruye el catálogo desde disco
+
+        Returns:
+            Número de archivos catalogados
+        """
+        with self._lock:
+            self._files, self._by_asset, self._projects = {}, {}, {}
+            self._base_mtime_ns = None
+            self.refresh()
+            count = len(self._files)
+        self.save()
+        logger.info(f"Catálogo de lecturas reconstruido: {count} archivos en {self.base_path}")
+        return count
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def get_asset_files(self, asset_id: str, consumption_type: Optional[str] = None) -> List[Dict]:
+        """
+        Archivos de lecturas de un asset
+
+        Se devuelven primero los del tipo de consumo indicado (si hay) y, dentro de
+        ellos, los de formato 'single' antes que los de formato 'double'.
+        """
+        self.refresh()
+        with self._lock:
+            entries = list(self._by_asset.get(asset_id, {}).values())
+        if consumption_type:
+            matching = [entry for entry in entries if entry.get('consumption_type') == consumption_type]
+            entries = matching or entries
+        return sorted(entries, key=lambda entry: (entry['format'] != 'single', entry['project_id'], entry['path']))
+
+    def get_project_for_asset(self, asset_id: str, exclude=(ROOT_PROJECT,)) -> Optional[str]:
+        """Proyecto al que pertenece un asset, o None si no tiene archivos"""
+        for entry in self.get_asset_files(asset_id):
+            if entry['project_id'] not in exclude:
+                return entry['project_id']
+        return None
+
+    def get_project_files(self, project_id: str) -> List[Dict]:
+        """Archivos de lecturas de un proyecto, ordenados por asset y ruta"""
+        self.refresh()
+        with self._lock:
+            project = self._projects.get(project_id)
+            entries = [self._files[path] for path in project['paths']] if project else []
+        return sorted(entries, key=lambda entry: (entry['asset_id'], entry['path']))
+
+    def get_projects(self) -> List[str]:
+        """Proyectos con al menos un archivo de lecturas"""
+        self.refresh()
+        with self._lock:
+            return sorted(project_id for project_id, project in self._projects.items() if project['paths'])
+
+    def get_assets(self, project_id: Optional[str] = None) -> List[str]:
+        """Assets con archivos de lecturas, opcionalmente de un proyecto"""
+        self.refresh()
+        with self._lock:
+            if project_id:
+                project = self._projects.get(project_id)
+                paths = project['paths'] if project else set()
+                assets = {self._files[path]['asset_id'] for path in paths}
+            else:
+                assets = set(self._by_asset)
+        return sorted(assets)
+
+
+_catalogs = {}
+_catalogs_guard = threading.Lock()
+
+
+def get_readings_catalog(base_path: str = ANALYZED_DATA_PATH) -> ReadingsCatalog:
+    """Devuelve el catálogo compartido de una carpeta de lecturas"""
+    key = os.path.abspath(base_path)
+    with _catalogs_guard:
+        catalog = _catalogs.get(key)
+        if catalog is None:
+            catalog_path = CATALOG_PATH if key == os.path.abspath(ANALYZED_DATA_PATH) else None
+            catalog = ReadingsCatalog(base_path, catalog_path)
+            _catalogs[key] = catalog
+        return catalog
+
+
+def record_readings_file(path: str, frame: Optional[pd.DataFrame] = None) -> None:
+    """Atajo para escritores y lectores: registra un archivo en el catálogo de su carpeta base"""
+    directory = os.path.dirname(os.path.abspath(path))
+    parent = os.path.dirname(directory)
+    for base_path in (parent, directory):
+        key = os.path.abspath(base_path)
+        with _catalogs_guard:
+            catalog = _catalogs.get(key)
+        if catalog is not None:
+            try:
+                catalog.record_file(path, frame)
+            except Exception as e:
+                logger.warning(f"No se pudo registrar {path} en el catálogo de lecturas: {str(e)}")
+            return
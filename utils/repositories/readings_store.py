@@ -0,0 +1,296 @@
+# utils/repositories/readings_store.py
+"""
+Almacén columnar (Parquet) de lecturas diarias.
+
+Cada proyecto tiene su propio dataset en ``data/readings_store/<project_id>``,
+particionado por tag y año::
+
+    data/readings_store/<project_id>/tag=<tag>/year=<yyyy>/<asset_id>.parquet
+
+Los CSV ``daily_readings_*.csv`` siguen siendo la fuente de verdad. El almacén
+guarda la versión ya procesada por ``load_csv_data`` (fechas convertidas,
+valores numéricos, tipo de consumo asignado), de modo que cargarlo no requiere
+volver a interpretar formatos de fecha ni valores de error.
+
+Un manifiesto por proyecto (``_manifest.json``) registra, para cada CSV
+convertido, el mtime y tamaño del archivo de origen. Si el CSV cambia en disco
+sin pasar por el almacén, la entrada se considera obsoleta y el cargador vuelve
+a leer el CSV.
+"""
+import os
+import json
+import threading
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    pq = None
+    PYARROW_AVAILABLE = False
+
+STORE_BASE_PATH = "data/readings_store"
+MANIFEST_FILE = "_manifest.json"
+
+# Columnas persistidas y su tipo en el almacén. 'month' no se guarda: se deriva
+# de 'date' al leer.
+STORE_COLUMNS = {
+    'date': 'datetime64[ns]',
+    'value': 'float64',
+    'timestamp': 'int64',
+    'asset_id': 'object',
+    'tag': 'object',
+    'consumption_type': 'object',
+    'project_id': 'object',
+    'consumption': 'float64',
+    'is_estimated': 'bool',
+}
+
+_project_locks = {}
+_project_locks_guard = threading.Lock()
+
+
+def _get_project_lock(project_dir: str) -> threading.Lock:
+    """Devuelve el lock que protege el manifiesto de un proyecto."""
+    with _project_locks_guard:
+        lock = _project_locks.get(project_dir)
+        if lock is None:
+            lock = threading.Lock()
+            _project_locks[project_dir] = lock
+        return lock
+
+
+def _source_signature(csv_path: str) -> Optional[Dict[str, int]]:
+    """Devuelve el mtime (ns) y tamaño de un CSV, o None si no existe."""
+    try:
+        stat = os.stat(csv_path)
+    except OSError:
+        return None
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def normalize_readings_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Reduce un DataFrame de lecturas a las columnas del almacén con tipos estables."""
+    frame = pd.DataFrame(index=df.index)
+    for column, dtype in STORE_COLUMNS.items():
+        if column in df.columns:
+            series = df[column]
+        elif column == 'is_estimated':
+            series = pd.Series(False, index=df.index)
+        else:
+            series = pd.Series(None, index=df.index)
+
+        if dtype == 'datetime64[ns]':
+            frame[column] = pd.to_datetime(series, errors='coerce')
+        elif dtype == 'float64':
+            frame[column] = pd.to_numeric(series, errors='coerce').astype('float64')
+        elif dtype == 'int64':
+            frame[column] = pd.to_numeric(series, errors='coerce').fillna(0).astype('int64')
+        elif dtype == 'bool':
+            frame[column] = series.fillna(False).astype(bool)
+        else:
+            frame[column] = series.astype(str)
+    return frame.dropna(subset=['date'])
+
+
+class ReadingsStore:
+    """Dataset Parquet por proyecto, particionado por tag y año."""
+
+    def __init__(self, base_path: str = STORE_BASE_PATH):
+        self.base_path = base_path
+
+    @property
+    def available(self) -> bool:
+        return PYARROW_AVAILABLE
+
+    def project_dir(self, project_id: str) -> str:
+        return os.path.join(self.base_path, project_id)
+
+    def partition_path(self, project_id: str, tag: str, year: int, asset_id: str) -> str:
+        return os.path.join(
+            self.project_dir(project_id), f"tag={tag}", f"year={int(year)}", f"{asset_id}.parquet"
+        )
+
+    # ------------------------------------------------------------------
+    # Manifiesto
+    # ------------------------------------------------------------------
+    def load_manifest(self, project_id: str) -> Dict[str, Dict]:
+        manifest_path = os.path.join(self.project_dir(project_id), MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return {}
+        try:
+            with open(manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Manifiesto ilegible en {manifest_path}, se ignorará: {str(e)}")
+            return {}
+
+    def _save_manifest(self, project_id: str, manifest: Dict[str, Dict]) -> None:
+        project_dir = self.project_dir(project_id)
+        os.makedirs(project_dir, exist_ok=True)
+        manifest_path = os.path.join(project_dir, MANIFEST_FILE)
+        tmp_path = f"{manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+
+    def is_fresh(self, csv_path: str, manifest: Dict[str, Dict]) -> bool:
+        """Indica si el CSV ya está convertido y no ha cambiado desde entonces."""
+        entry = manifest.get(os.path.basename(csv_path))
+        if not entry:
+            return False
+        signature = _source_signature(csv_path)
+        return (
+            signature is not None
+            and entry.get('mtime_ns') == signature['mtime_ns']
+            and entry.get('size') == signature['size']
+        )
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def write_frame(self, csv_path: str, df: pd.DataFrame, project_id: Optional[str] = None,
+                    signature: Optional[Dict[str, int]] = None) -> bool:
+        """
+        Guarda en el almacén el DataFrame ya procesado de un CSV de lecturas.
+
+        Args:
+            csv_path: Ruta del CSV de origen (clave del manifiesto)
+            df: DataFrame devuelto por load_csv_data para ese CSV
+            project_id: Proyecto destino (por defecto, la carpeta del CSV)
+            signature: mtime/tamaño del CSV tomados antes de leerlo. Si el CSV
+                cambia mientras se convierte, la entrada quedará obsoleta y se
+                reconvertirá en la siguiente carga.
+
+        Returns:
+            bool: True si se escribió el almacén
+        """
+        if not self.available or df is None or df.empty:
+            return False
+
+        signature = signature or _source_signature(csv_path)
+        if signature is None:
+            return False
+
+        project_id = project_id or os.path.basename(os.path.dirname(os.path.abspath(csv_path)))
+        frame = normalize_readings_frame(df)
+        asset_id = str(frame['asset_id'].iloc[0])
+        tag = str(frame['tag'].iloc[0])
+        years = frame['date'].dt.year
+
+        lock = _get_project_lock(self.project_dir(project_id))
+        with lock:
+            manifest = self.load_manifest(project_id)
+            previous = manifest.get(os.path.basename(csv_path), {})
+
+            written_years = []
+            for year, year_df in frame.groupby(years, sort=True):
+                path = self.partition_path(project_id, tag, year, asset_id)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                table = pa.Table.from_pandas(year_df.reset_index(drop=True), preserve_index=False)
+                pq.write_table(table, tmp_path)
+                os.replace(tmp_path, path)
+                written_years.append(int(year))
+
+            # Eliminar particiones de años que ya no están en el CSV
+            for year in set(previous.get('years', [])) - set(written_years):
+                stale_path = self.partition_path(project_id, previous.get('tag', tag), year, asset_id)
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+
+            manifest[os.path.basename(csv_path)] = {
+                'asset_id': asset_id,
+                'tag': tag,
+                'years': written_years,
+                'rows': int(len(frame)),
+                'mtime_ns': signature['mtime_ns'],
+                'size': signature['size'],
+            }
+            self._save_manifest(project_id, manifest)
+
+        logger.debug(f"Almacén actualizado para {csv_path}: {len(frame)} filas en {len(written_years)} particiones")
+        return True
+
+    def update_from_csv(self, csv_path: str, project_id: Optional[str] = None) -> bool:
+        """
+        Convierte (o reconvierte) un CSV de lecturas al almacén.
+
+        Pensado para llamarse desde los escritores de lecturas justo después de
+        guardar el CSV. Los errores se registran pero nunca se propagan: el CSV
+        sigue siendo válido y el cargador hará fallback a él.
+        """
+        if not self.available:
+            return False
+        try:
+            from utils.data_loader import load_csv_data
+            signature = _source_signature(csv_path)
+            df = load_csv_data(csv_path)
+            if df is None or df.empty:
+                return False
+            return self.write_frame(csv_path, df, project_id=project_id, signature=signature)
+        except Exception as e:
+            logger.error(f"Error al actualizar el almacén columnar desde {csv_path}: {str(e)}")
+            return False
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def read_entries(self, project_id: str, entries: List[Dict], columns: Optional[List[str]] = None,
+                     years: Optional[List[int]] = None) -> pd.DataFrame:
+        """
+        Lee del almacén las particiones de las entradas de manifiesto indicadas.
+
+        Args:
+            project_id: Proyecto del que leer
+            entries: Entradas del manifiesto (una por CSV convertido)
+            columns: Columnas a leer (por defecto, todas las del almacén)
+            years: Años a leer (por defecto, todos)
+
+        Returns:
+            pd.DataFrame con las lecturas combinadas
+        """
+        read_columns = [c for c in (columns or STORE_COLUMNS) if c in STORE_COLUMNS]
+        if not self.available or not entries:
+            return pd.DataFrame(columns=read_columns)
+
+        year_filter = set(int(y) for y in years) if years else None
+        paths = []
+        for entry in entries:
+            for year in entry.get('years', []):
+                if year_filter is not None and int(year) not in year_filter:
+                    continue
+                path = self.partition_path(project_id, entry['tag'], year, entry['asset_id'])
+                if os.path.exists(path):
+                    paths.append(path)
+
+        if not paths:
+            return pd.DataFrame(columns=read_columns)
+
+        tables = [pq.read_table(path, columns=read_columns) for path in paths]
+        table = pa.concat_tables(tables)
+        return table.to_pandas()
+
+
+_default_store = None
+
+
+def get_readings_store() -> ReadingsStore:
+    """Devuelve la instancia compartida del almacén."""
+    global _default_store
+    if _default_store is None:
+        _default_store = ReadingsStore()
+    return _default_store
+
+
+def sync_readings_file(csv_path: str) -> bool:
+    """Atajo para los escritores: refleja en el almacén un CSV recién guardado."""
+    return get_readings_store().update_from_csv(csv_path)
@@ -0,0 +1,183 @@
+# utils/repositories/readings_writer.py
+"""
+Coordinador de escrituras de los CSV ``daily_readings_*.csv``.
+
+Varias tareas pueden actualizar el mismo CSV a la vez (por ejemplo, meses
+distintos del mismo sensor). Si cada una lee, combina y reescribe el archivo
+por su cuenta, las actualizaciones se pisan y un lector puede encontrar el
+archivo a medio escribir.
+
+El coordinador serializa las escrituras por archivo: las actualizaciones que
+llegan mientras otra está escribiendo se encolan y el siguiente escritor las
+aplica todas sobre una única lectura del CSV. La escritura final es atómica
+(archivo temporal + ``os.replace``). Archivos distintos se escriben en
+paralelo.
+"""
+import os
+import threading
+from typing import Callable, Optional
+
+import pandas as pd
+
+from utils.logging import get_logger
+from utils.anomaly.streaming import evaluate_readings_file
+from utils.repositories.readings_catalog import record_readings_file
+from utils.repositories.readings_store import sync_readings_file
+
+logger = get_logger(__name__)
+
+
+class _PendingUpdate:
+    """Actualización encolada para un archivo."""
+
+    def __init__(self, transform):
+        self.transform = transform
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _FileState:
+    def __init__(self):
+        self.write_lock = threading.Lock()
+        self.pending = []
+
+
+def write_csv_atomic(df: pd.DataFrame, file_path: str) -> None:
+    """Escribe un CSV en un archivo temporal y lo renombra sobre el destino."""
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def merge_readings(existing: Optional[pd.DataFrame], new_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combina lecturas nuevas con las existentes.
+
+    Las fechas presentes en ``new_data`` sustituyen a las existentes. El
+    resultado queda ordenado por fecha, con la fecha como texto YYYY-MM-DD.
+    """
+    new_data = new_data.copy()
+    new_data['date'] = pd.to_datetime(new_data['date'])
+    new_data = new_data.drop_duplicates(subset='date', keep='last')
+
+    if existing is not None and not existing.empty and 'date' in existing.columns:
+        existing = existing.copy()
+        existing['date'] = pd.to_datetime(existing['date'], errors='coerce')
+        existing = existing.dropna(subset=['date'])
+        # Eliminar fechas duplicadas (preferir nuevas lecturas)
+        existing = existing[~existing['date'].isin(new_data['date'])]
+        combined = pd.concat([existing, new_data], ignore_index=True)
+    else:
+        combined = new_data
+
+    combined = combined.sort_values('date', kind='mergesort').reset_index(drop=True)
+    combined['date'] = combined['date'].dt.strftime('%Y-%m-%d')
+    return combined
+
+
+class ReadingsWriteCoordinator:
+    """Serializa y agrupa las escrituras de cada CSV de lecturas."""
+
+    def __init__(self, sync_store: bool = True):
+        self.sync_store = sync_store
+        self._files = {}
+        self._guard = threading.Lock()
+
+    def _state(self, file_path: str) -> _FileState:
+        key = os.path.abspath(file_path)
+        with self._guard:
+            state = self._files.get(key)
+            if state is None:
+                state = _FileState()
+                self._files[key] = state
+            return state
+
+    def update(self, file_path: str, transform: Callable[[Optional[pd.DataFrame]], Optional[pd.DataFrame]]):
+        """
+        Aplica ``transform`` al contenido actual del CSV y guarda el resultado.
+
+        ``transform`` recibe el DataFrame del archivo (o None si no existe) y
+        devuelve el nuevo contenido, o None para no modificar el archivo. Si
+        hay otras actualizaciones encoladas para el mismo archivo, se aplican
+        en orden de llegada sobre una sola lectura y se escribe una sola vez.
+
+        Returns:
+            pd.DataFrame: Contenido del archivo tras aplicar la actualización
+        """
+        state = self._state(file_path)
+        update = _PendingUpdate(transform)
+        with self._guard:
+            state.pending.append(update)
+
+        with state.write_lock:
+            with self._guard:
+                batch, state.pending = state.pending, []
+            if batch:
+                self._apply(file_path, batch)
+
+        # Si otro hilo aplicó esta actualización, su resultado ya está disponible
+        update.done.wait()
+        if update.error is not None:
+            raise update.error
+        return update.result
+
+    def merge(self, file_path: str, new_data: pd.DataFrame) -> pd.DataFrame:
+        """Combina ``new_data`` con el CSV (las fechas nuevas prevalecen)."""
+        return self.update(file_path, lambda existing: merge_readings(existing, new_data))
+
+    def _apply(self, file_path: str, batch) -> None:
+        try:
+            data = pd.read_csv(file_path) if os.path.exists(file_path) else None
+        except Exception as e:
+            # No sobrescribir un archivo que no se ha podido leer: se perderían lecturas
+            logger.error(f"No se pudo leer {file_path} antes de escribir: {str(e)}")
+            for update in batch:
+                update.error = e
+                update.done.set()
+            return
+
+        changed = False
+        for update in batch:
+            try:
+                result = update.transform(data)
+                if result is not None:
+                    data = result
+                    changed = True
+                update.result = data
+            except Exception as e:
+                logger.error(f"Error al preparar la actualización de {file_path}: {str(e)}")
+                update.error = e
+
+        try:
+            if changed:
+                write_csv_atomic(data, file_path)
+                record_readings_file(file_path, data)
+                if self.sync_store:
+                    sync_readings_file(file_path)
+                # Puntuar solo las lecturas nuevas si la detección de anomalías está habilitada
+                evaluate_readings_file(file_path, data)
+                logger.debug(f"{file_path} actualizado: {len(batch)} actualizaciones, {len(data)} registros")
+        except Exception as e:
+            logger.error(f"Error al escribir {file_path}: {str(e)}")
+            for update in batch:
+                if update.error is None:
+                    update.error = e
+        finally:
+            for update in batch:
+                update.done.set()
+
+
+_default_coordinator = ReadingsWriteCoordinator()
+
+
+def get_readings_write_coordinator() -> ReadingsWriteCoordinator:
+    """Devuelve el coordinador compartido por los escritores de lecturas."""
+    return _default_coordinator
@@ -0,0 +1,203 @@
+"""
+Descarga de la exportación anual de entradas de SALTO (página de Accesos).
+
+La exportación de un año se pide mes a mes al endpoint de exportación de
+entradas del site. Los meses se descargan en paralelo
+(``SALTO_EXPORT_CONCURRENCY`` peticiones) por el cliente HTTP compartido y sin
+la petición OPTIONS previa, que es el preflight CORS del navegador y no hace
+falta desde el servidor.
+
+Cada CSV mensual se escribe en disco a medida que llega. Después se copian en
+orden al CSV del año por bloques de ``SALTO_EXPORT_CHUNK_ROWS`` filas, con un
+esquema fijo: todas las columnas como texto y en el orden de columnas del
+primer mes con datos. Así el año completo nunca está en memoria.
+"""
+import calendar
+import os
+import random
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from utils.http_client import get_http_client
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+SALTO_EXPORT_URL = "https://connect.my-clay.com/v1.1/sites/{site_id}/entries/export"
+# Meses que se descargan a la vez
+SALTO_EXPORT_CONCURRENCY = int(os.environ.get("SALTO_EXPORT_CONCURRENCY", "4"))
+# Filas por bloque al copiar cada mes al CSV del año
+SALTO_EXPORT_CHUNK_ROWS = int(os.environ.get("SALTO_EXPORT_CHUNK_ROWS", "50000"))
+# Tamaño de los bloques que se escriben a disco durante la descarga (bytes)
+SALTO_EXPORT_STREAM_CHUNK = 1 << 16
+# Timeout (conexión, lectura) de cada exportación mensual
+SALTO_EXPORT_TIMEOUT = (10, 300)
+# Separador del CSV del año: el que espera el análisis de la página de Accesos
+SALTO_CSV_SEPARATOR = ";"
+
+
+class SaltoAuthError(Exception):
+    """El token de SALTO es inválido o ha expirado."""
+
+
+def month_ranges(year):
+    """Primer y último día de cada mes del año: [(mes, inicio, fin), ...]."""
+    return [
+        (month, datetime(year, month, 1), datetime(year, month, calendar.monthrange(year, month)[1]))
+        for month in range(1, 13)
+    ]
+
+
+def salto_headers(bearer_token):
+    """Cabeceras de la petición de exportación, como las envía la web de SALTO KS."""
+    return {
+        'accept': 'application/json, text/plain, */*',
+        'accept-language': 'en-GB,en-US;q=0.9,en;q=0.8',
+        'authorization': f'Bearer {bearer_token}',
+        'clp-disable-odata-v3-conversion': 'true',
+        'origin': 'https://app.saltoks.com',
+        'referer': 'https://app.saltoks.com/',
+        'sec-ch-ua': '"Not A(Brand";v="8", "Chromium";v="132", "Google Chrome";v="132"',
+        'sec-ch-ua-mobile': '?0',
+        'sec-ch-ua-platform': '"macOS"',
+        'sec-fetch-dest': 'empty',
+        'sec-fetch-mode': 'cors',
+        'sec-fetch-site': 'cross-site',
+        'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36',
+        'x-datadog-origin': 'rum',
+        'x-datadog-sampling-priority': '1',
+        'x-datadog-parent-id': str(random.randint(1000000000000000000, 9999999999999999999)),
+        'x-datadog-trace-id': str(random.randint(1000000000000000000, 9999999999999999999))
+    }
+
+
+def download_entries(site_id, start_date, end_date, bearer_token, path):
+    """
+    Descarga en path la exportación de entradas de un periodo
+
+    Raises:
+        SaltoAuthError: Si SALTO responde 401
+        Exception: Si la respuesta no es 200
+    """
+    params = {
+        'export_file_name': 'entries.csv',
+        'from_date': start_date.strftime('%Y-%m-%dT00:00:00.000Z'),
+        'to_date': end_date.strftime('%Y-%m-%dT23:59:59.999Z')
+    }
+    response = get_http_client().get(
+        SALTO_EXPORT_URL.format(site_id=site_id),
+        params=params,
+        headers=salto_headers(bearer_token),
+        stream=True,
+        timeout=SALTO_EXPORT_TIMEOUT
+    )
+    try:
+        if response.status_code == 401:
+            raise SaltoAuthError("El token de acceso es inválido o ha expirado. Por favor, obtenga un nuevo token.")
+        if response.status_code != 200:
+            raise Exception(f"Error en la respuesta de SALTO (código {response.status_code}): {response.text[:200]}")
+        with open(path, "wb") as f:
+            for chunk in response.iter_content(SALTO_EXPORT_STREAM_CHUNK):
+                f.write(chunk)
+    finally:
+        response.close()
+
+
+def _detect_separator(path):
+    with open(path, encoding="utf-8-sig", errors="replace") as f:
+        header = f.readline()
+    return ";" if header.count(";") >= header.count(",") else ","
+
+
+def append_entries(path, output_path, columns=None, chunk_rows=SALTO_EXPORT_CHUNK_ROWS):
+    """
+    Copia un CSV de entradas al CSV del año por bloques
+
+    Args:
+        path (str): CSV descargado de un periodo
+        output_path (str): CSV del año; se escribe la cabecera si columns es None
+        columns (list): Columnas del CSV del año (None si aún no se ha escrito nada)
+
+    Returns:
+        tuple: (columnas del CSV del año, filas copiadas)
+    """
+    if os.path.getsize(path) == 0:
+        return columns, 0
+    rows = 0
+    reader = pd.read_csv(path, sep=_detect_separator(path), dtype=str, keep_default_na=False,
+                         encoding="utf-8-sig", chunksize=chunk_rows)
+    with reader:
+        for chunk in reader:
+            write_header = columns is None
+            if write_header:
+                columns = list(chunk.columns)
+            else:
+                unknown = [column for column in chunk.columns if column not in columns]
+                if unknown:
+                    logger.warning(f"Columnas de SALTO fuera del esquema del año, se descartan: {unknown}")
+            chunk.reindex(columns=columns, fill_value="").to_csv(
+                output_path, sep=SALTO_CSV_SEPARATOR, mode="w" if write_header else "a",
+                header=write_header, index=False
+            )
+            rows += len(chunk)
+    return columns, rows
+
+
+def download_year(site_id, year, bearer_token, output_path, max_workers=SALTO_EXPORT_CONCURRENCY,
+                  chunk_rows=SALTO_EXPORT_CHUNK_ROWS):
+    """
+    Descarga las entradas de un año en output_path (CSV separado por ';')
+
+    Los meses que fallan (al descargarlos o al leer su CSV) se omiten y se
+    devuelven en 'errors'; un token inválido en cualquier mes aborta la descarga.
+
+    Returns:
+        dict: {'rows': filas escritas, 'months': meses con datos, 'errors': {mes: mensaje}}
+
+    Raises:
+        SaltoAuthError: Si el token es inválido o ha expirado
+    """
+    months = month_ranges(year)
+    errors = {}
+    with tempfile.TemporaryDirectory(prefix="salto_export_") as tmp_dir:
+        paths = {month: os.path.join(tmp_dir, f"{month:02d}.csv") for month, _, _ in months}
+
+        def download(month_range):
+            month, start_date, end_date = month_range
+            download_entries(site_id, start_date, end_date, bearer_token, paths[month])
+
+        columns = None
+        rows = 0
+        months_with_data = []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(months)))) as executor:
+            futures = {month: executor.submit(download, (month, start, end)) for month, start, end in months}
+            # Cada mes se copia al CSV del año en cuanto llega, mientras se descargan los siguientes
+            for month, future in futures.items():
+                written = os.path.getsize(output_path) if columns is not None else 0
+                try:
+                    future.result()
+                    month_columns, month_rows = append_entries(paths[month], output_path, columns, chunk_rows)
+                except SaltoAuthError:
+                    for pending in futures.values():
+                        pending.cancel()
+                    raise
+                except Exception as e:
+                    logger.warning(f"Error descargando las entradas de SALTO de {month:02d}/{year}: {str(e)}")
+                    errors[month] = str(e)
+                    # Un mes que no se puede leer no deja filas a medias en el CSV del año
+                    if os.path.exists(output_path):
+                        with open(output_path, "r+b") as f:
+                            f.truncate(written)
+                    continue
+                columns = month_columns
+                if month_rows:
+                    months_with_data.append(month)
+                    rows += month_rows
+                os.remove(paths[month])
+
+    logger.info(f"Exportación SALTO {site_id} {year}: {rows} entradas en {len(months_with_data)} meses, "
+                f"{len(errors)} meses con errores")
+    return {'rows': rows, 'months': months_with_data, 'errors': errors}
@@ -0,0 +1,129 @@
+"""
+Caché de metadatos de sensores por asset.
+
+Los metadatos que devuelve ``/available-utilities-sensors`` (gateway, device,
+sensor, tag y sensor_uuid) cambian muy rara vez, pero los procesos de
+actualización de lecturas los necesitan para cada combinación de asset, tag y
+mes. Esta caché los guarda por asset durante ``SENSOR_METADATA_TTL`` segundos y
+agrupa las peticiones concurrentes: si varios hilos piden el mismo asset a la
+vez, solo uno llama a la API y el resto espera su resultado.
+"""
+import os
+import threading
+import time
+
+from utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Segundos que se reutilizan los metadatos entre ejecuciones (0 = solo coalescencia)
+SENSOR_METADATA_TTL = int(os.environ.get("SENSOR_METADATA_TTL", "600"))
+
+
+class PendingLoad:
+    """
+    Carga en curso de un asset, compartida por los hilos que la esperan.
+
+    La usan también otras cachés con coalescencia de peticiones (p. ej. la de
+    códigos NFC): el hilo que carga guarda ``result`` y activa ``event``.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+class SensorMetadataCache:
+    """Caché TTL de sensores por asset con coalescencia de peticiones."""
+
+    def __init__(self, ttl=SENSOR_METADATA_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _fresh_entry(self, asset_id):
+        entry = self._entries.get(asset_id)
+        if entry is None:
+            return None
+        loaded_at, sensors = entry
+        if time.monotonic() - loaded_at > self.ttl:
+            del self._entries[asset_id]
+            return None
+        return sensors
+
+    def get(self, asset_id, loader, refresh=False):
+        """
+        Devuelve los sensores de un asset, cargándolos con ``loader`` si hace falta.
+
+        Args:
+            asset_id (str): ID del asset
+            loader (callable): Función ``loader(asset_id) -> list`` que consulta la API
+            refresh (bool): Ignorar la entrada cacheada y volver a consultar
+
+        Returns:
+            list: Lista de sensores (vacía si la API no devolvió ninguno)
+        """
+        with self._lock:
+            if not refresh:
+                sensors = self._fresh_entry(asset_id)
+                if sensors is not None:
+                    self.hits += 1
+                    return sensors
+
+            pending = self._pending.get(asset_id)
+            owner = pending is None
+            if owner:
+                pending = PendingLoad()
+                self._pending[asset_id] = pending
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            pending.event.wait()
+            return pending.result if pending.result is not None else []
+
+        sensors = []
+        try:
+            sensors = loader(asset_id) or []
+        except Exception as e:
+            logger.error(f"Error al obtener los sensores del asset {asset_id}: {str(e)}")
+        finally:
+            with self._lock:
+                # Las respuestas vacías pueden deberse a un error: no se cachean
+                if sensors and self.ttl > 0:
+                    self._entries[asset_id] = (time.monotonic(), sensors)
+                del self._pending[asset_id]
+            pending.result = sensors
+            pending.event.set()
+        return sensors
+
+    def invalidate(self, asset_id=None):
+        """Elimina la entrada de un asset, o todas si no se indica ninguno."""
+        with self._lock:
+            if asset_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(asset_id, None)
+
+    def stats(self):
+        """Devuelve contadores de uso de la caché."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+            }
+
+
+_sensor_metadata_cache = SensorMetadataCache()
+
+
+def get_sensor_metadata_cache():
+    """Devuelve la instancia compartida de la caché."""
+    return _sensor_metadata_cache
@@ -228,127 +228,200 @@ def compare_time_periods(data, current_start, current_end, previous_start=None,
         }
     }
 
-def detect_anomalies_in_water_consumption(data, method='zscore', threshold=3.0, min_periods=7):
+WATER_SERIES_COLUMNS = ['asset_id', 'consumption_type']
+WATER_ANOMALY_METHODS = ('zscore', 'iqr', 'percentile')
+WATER_ANOMALY_BASELINES = ('global', 'rolling', 'weekday')
+WATER_ANOMALY_COLUMNS = ['date', 'value', 'expected', 'lower_bound', 'upper_bound', 'zscore', 'direction', 'percentage']
+# Each day-of-week baseline needs at least this many readings of the same weekday
+MIN_WEEKDAY_READINGS = 3
+
+def _baseline_statistics(values, keys, method, threshold, baseline, window, min_periods):
     """
-    Detect anomalies in water consumption data.
+    Compute the baseline of every reading for the selected method.
     
     Args:
-        data (pandas.DataFrame): DataFrame containing consumption data with 'date' and 'consumption' columns
+        values (pandas.Series): Consumption values, sorted by series and date
+        keys (numpy.ndarray): Series code of each value
+        method (str): 'zscore', 'iqr' or 'percentile'
+        threshold (float): Threshold for anomaly detection
+        baseline (str): 'global', 'rolling' or 'weekday' (keys already include the weekday)
+        window (int): Number of previous readings in a rolling baseline
+        min_periods (int): Minimum number of readings required in a baseline
+        
+    Returns:
+        tuple: (expected, lower_bound, upper_bound, upper_reference, spread) arrays;
+            upper_reference is the value above which an anomaly is 'superior' and
+            spread the z-score denominator (NaN for the quantile methods)
+    """
+    if baseline == 'rolling':
+        # Baseline from the previous readings of the same series (the current one is excluded)
+        previous = values.groupby(keys).shift(1)
+        rolling = previous.groupby(keys).rolling(window, min_periods=min(min_periods, window))
+        
+        def stat(name, *args):
+            return getattr(rolling, name)(*args).droplevel(0).sort_index().to_numpy()
+        
+        count = stat('count')
+    else:
+        grouped = values.groupby(keys)
+        
+        def stat(name, *args):
+            return grouped.transform(name, *args).to_numpy()
+        
+        count = stat('count')
+    
+    if method == 'zscore':
+        mean = stat('mean')
+        std = stat('std')
+        # Skip baselines whose standard deviation is zero (all values are the same)
+        std = np.where(std > 0, std, np.nan)
+        expected, upper_reference, spread = mean, mean, std
+        lower_bound = mean - threshold * std
+        upper_bound = mean + threshold * std
+    elif method == 'iqr':
+        q1 = stat('quantile', 0.25)
+        q3 = stat('quantile', 0.75)
+        iqr = q3 - q1
+        expected, upper_reference, spread = stat('median'), q3, np.full(len(values), np.nan)
+        lower_bound = q1 - (threshold * iqr)
+        upper_bound = q3 + (threshold * iqr)
+    else:
+        lower_percentile = (100 - threshold) / 2
+        upper_percentile = 100 - lower_percentile
+        expected = stat('median')
+        upper_reference, spread = expected, np.full(len(values), np.nan)
+        lower_bound = stat('quantile', lower_percentile / 100)
+        upper_bound = stat('quantile', upper_percentile / 100)
+    
+    if baseline == 'weekday':
+        required = MIN_WEEKDAY_READINGS
+    elif baseline == 'rolling':
+        required = min(min_periods, window)
+    else:
+        required = min_periods
+    expected = np.where(count < required, np.nan, expected)
+    return expected, lower_bound, upper_bound, upper_reference, spread
+
+def detect_water_anomalies(data, method='zscore', threshold=3.0, min_periods=7, baseline='global', window=28,
+                           series_columns=None, anomalies_only=True):
+    """
+    Detect anomalies in the water consumption of many series (assets, sensors...) at once.
+    
+    Every series is compared with its own baseline, computed for all series
+    together with grouped operations:
+    
+    - 'global': all the readings of the series
+    - 'rolling': the previous `window` readings of the series (the current one is excluded)
+    - 'weekday': the readings of the series on the same day of the week
+    
+    Args:
+        data (pandas.DataFrame): DataFrame with 'date' and 'consumption' columns and the series columns
         method (str): Method for anomaly detection ('zscore', 'iqr', 'percentile')
         threshold (float): Threshold for anomaly detection (e.g., z-score threshold)
-        min_periods (int): Minimum number of periods required to perform anomaly detection
+        min_periods (int): Minimum number of readings a series (and a rolling baseline) needs
+        baseline (str): Baseline each reading is compared with ('global', 'rolling', 'weekday')
+        window (int): Number of previous readings in the rolling baseline
+        series_columns (list, optional): Columns identifying a series (default: the
+            columns of WATER_SERIES_COLUMNS present in data; [] for a single series)
+        anomalies_only (bool): If False, return every reading with an 'is_anomaly' column
         
     Returns:
-        list: Anomalies detected in the data with date, value, and additional information
+        pandas.DataFrame: One row per anomaly (series columns + WATER_ANOMALY_COLUMNS),
+            sorted by series and date
     """
+    if series_columns is None:
+        series_columns = [column for column in WATER_SERIES_COLUMNS if isinstance(data, pd.DataFrame) and column in data.columns]
+    columns = list(series_columns) + WATER_ANOMALY_COLUMNS + ([] if anomalies_only else ['is_anomaly'])
+    empty = pd.DataFrame(columns=columns)
+    
     if not isinstance(data, pd.DataFrame) or data.empty:
         logger.warning("No data provided for anomaly detection")
-        return []
+        return empty
     
     if 'date' not in data.columns or 'consumption' not in data.columns:
         logger.error("Data must contain 'date' and 'consumption' columns")
-        return []
+        return empty
     
-    # Create a copy to avoid modifying the original DataFrame
-    df = data.copy()
-    
-    # Convert date to datetime if it's not already
-    if not pd.api.types.is_datetime64_any_dtype(df['date']):
-        df['date'] = pd.to_datetime(df['date'])
+    if method not in WATER_ANOMALY_METHODS:
+        logger.error(f"Unknown anomaly detection method: {method}")
+        return empty
     
-    # Sort by date
-    df = df.sort_values('date')
+    if baseline not in WATER_ANOMALY_BASELINES:
+        logger.error(f"Unknown anomaly detection baseline: {baseline}")
+        return empty
     
-    # Check if we have enough data points
-    if len(df) < min_periods:
+    df = data[list(series_columns) + ['date', 'consumption']]
+    dates = df['date'] if pd.api.types.is_datetime64_any_dtype(df['date']) else pd.to_datetime(df['date'])
+    if series_columns:
+        series = df.groupby(list(series_columns), sort=False, dropna=False).ngroup().to_numpy()
+    else:
+        series = np.zeros(len(df), dtype=int)
+    
+    # Sort by series and date
+    order = pd.DataFrame({'series': series, 'date': dates.to_numpy()}).sort_values(
+        ['series', 'date'], kind='mergesort'
+    ).index.to_numpy()
+    series = series[order]
+    dates = dates.iloc[order].reset_index(drop=True)
+    values = pd.Series(pd.to_numeric(df['consumption'].iloc[order], errors='coerce').to_numpy(dtype=float))
+    
+    # Series with too few readings are not analyzed
+    rows_per_series = np.bincount(series)
+    eligible = rows_per_series[series] >= min_periods
+    if not eligible.any():
         logger.warning(f"Not enough data points for anomaly detection (minimum required: {min_periods})")
-        return []
+        return empty
     
-    anomalies = []
+    keys = series * 7 + dates.dt.dayofweek.to_numpy() if baseline == 'weekday' else series
+    expected, lower_bound, upper_bound, upper_reference, spread = _baseline_statistics(
+        values, keys, method, threshold, baseline, window, min_periods
+    )
     
-    if method == 'zscore':
-        # Z-score method
-        mean = df['consumption'].mean()
-        std = df['consumption'].std()
-        
-        # Skip if standard deviation is zero (all values are the same)
-        if std == 0:
-            logger.warning("Standard deviation is zero, skipping z-score anomaly detection")
-            return []
-        
-        # Calculate z-scores
-        df['zscore'] = (df['consumption'] - mean) / std
-        
-        # Identify anomalies
-        anomaly_df = df[abs(df['zscore']) > threshold]
-        
-        for _, row in anomaly_df.iterrows():
-            direction = "superior" if row['zscore'] > 0 else "inferior"
-            percentage = abs((row['consumption'] - mean) / mean * 100) if mean > 0 else 0
-            
-            anomalies.append({
-                'date': row['date'],
-                'value': row['consumption'],
-                'zscore': row['zscore'],
-                'direction': direction,
-                'percentage': percentage,
-                'expected': mean
-            })
+    value_array = values.to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        is_anomaly = eligible & ~np.isnan(expected) & ((value_array < lower_bound) | (value_array > upper_bound))
+        zscore = (value_array - expected) / spread
+        percentage = np.where(expected > 0, np.abs((value_array - expected) / expected * 100), 0.0)
+    
+    # Build the columnar result only for the rows to return
+    rows = np.flatnonzero(is_anomaly) if anomalies_only else np.arange(len(order))
+    result = df[list(series_columns)].iloc[order[rows]].reset_index(drop=True)
+    result['date'] = dates.iloc[rows].reset_index(drop=True)
+    result['value'] = value_array[rows]
+    result['expected'] = expected[rows]
+    result['lower_bound'] = lower_bound[rows]
+    result['upper_bound'] = upper_bound[rows]
+    result['zscore'] = zscore[rows]
+    result['direction'] = np.where(value_array[rows] > upper_reference[rows], "superior", "inferior")
+    result['percentage'] = percentage[rows]
+    if not anomalies_only:
+        result['is_anomaly'] = is_anomaly
+    return result
+
+def detect_anomalies_in_water_consumption(data, method='zscore', threshold=3.0, min_periods=7):
+    """
+    Detect anomalies in water consumption data.
     
-    elif method == 'iqr':
-        # IQR method
-        q1 = df['consumption'].quantile(0.25)
-        q3 = df['consumption'].quantile(0.75)
-        iqr = q3 - q1
-        
-        # Calculate lower and upper bounds
-        lower_bound = q1 - (threshold * iqr)
-        upper_bound = q3 + (threshold * iqr)
-        
-        # Identify anomalies
-        anomaly_df = df[(df['consumption'] < lower_bound) | (df['consumption'] > upper_bound)]
-        
-        for _, row in anomaly_df.iterrows():
-            direction = "superior" if row['consumption'] > q3 else "inferior"
-            median = df['consumption'].median()
-            percentage = abs((row['consumption'] - median) / median * 100) if median > 0 else 0
-            
-            anomalies.append({
-                'date': row['date'],
-                'value': row['consumption'],
-                'direction': direction,
-                'percentage': percentage,
-                'expected': median
-            })
-    
-    elif method == 'percentile':
-        # Percentile method
-        lower_percentile = (100 - threshold) / 2
-        upper_percentile = 100 - lower_percentile
-        
-        lower_bound = df['consumption'].quantile(lower_percentile / 100)
-        upper_bound = df['consumption'].quantile(upper_percentile / 100)
-        
-        # Identify anomalies
-        anomaly_df = df[(df['consumption'] < lower_bound) | (df['consumption'] > upper_bound)]
-        
-        for _, row in anomaly_df.iterrows():
-            direction = "superior" if row['consumption'] > df['consumption'].median() else "inferior"
-            median = df['consumption'].median()
-            percentage = abs((row['consumption'] - median) / median * 100) if median > 0 else 0
-            
-            anomalies.append({
-                'date': row['date'],
-                'value': row['consumption'],
-                'direction': direction,
-                'percentage': percentage,
-                'expected': median
-            })
+    The whole DataFrame is analyzed as a single series with a global baseline;
+    see detect_water_anomalies to analyze many series, or to use rolling or
+    day-of-week baselines.
     
-    else:
-        logger.error(f"Unknown anomaly detection method: {method}")
+    Args:
+        data (pandas.DataFrame): DataFrame containing consumption data with 'date' and 'consumption' columns
+        method (str): Method for anomaly detection ('zscore', 'iqr', 'percentile')
+        threshold (float): Threshold for anomaly detection (e.g., z-score threshold)
+        min_periods (int): Minimum number of periods required to perform anomaly detection
+        
+    Returns:
+        list: Anomalies detected in the data with date, value, and additional information
+    """
+    result = detect_water_anomalies(data, method=method, threshold=threshold, min_periods=min_periods,
+                                    series_columns=[])
     
-    return anomalies
+    fields = ['date', 'value', 'zscore', 'direction', 'percentage', 'expected']
+    if method != 'zscore':
+        fields.remove('zscore')
+    return result[fields].to_dict('records')
 
 def generate_water_consumption_analysis(data, config=None):
     """